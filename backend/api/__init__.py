@@ -17,6 +17,7 @@ from .media import media_bp
 from .discord import discord_bp
 from .tts import tts_bp, init_tts_routes
 from .chill import chill_bp
+from .blob import blob_bp
 
 
 def register_api_routes(app, get_connection=None, config=None):
@@ -51,6 +52,20 @@ def register_api_routes(app, get_connection=None, config=None):
         # 媒体创作产出服务
         from services.media_output_service import init_media_output_service
         init_media_output_service(get_connection)
+
+        # 媒体生成任务编排（恢复未完成任务的后台轮询）
+        try:
+            from services.media_job_service import init_media_job_service
+            init_media_job_service(get_connection, ((config or {}).get('media') or {}).get('jobs'))
+        except Exception as e:
+            print(f"[API] Warning: Failed to initialize media job service: {e}")
+
+        # Research 上传入库（接管进程重启前未完成的入库任务）
+        try:
+            from services.research.ingest import get_ingest_queue
+            get_ingest_queue().resume()
+        except Exception as e:
+            print(f"[API] Warning: Failed to resume research ingest jobs: {e}")
     
     # 初始化 TTS 服务
     if config:
@@ -71,5 +86,6 @@ def register_api_routes(app, get_connection=None, config=None):
     app.register_blueprint(discord_bp, url_prefix='/api/discord')
     app.register_blueprint(tts_bp, url_prefix='/api/tts')
     app.register_blueprint(chill_bp, url_prefix='/api/chill')
+    app.register_blueprint(blob_bp, url_prefix='/api/blobs')
 
     print("[API] All API routes registered successfully")
@@ -3,7 +3,7 @@ Actor 池监控 API
 提供正在工作的 Actor 列表及状态（上下文大小、persona、错误率、默认模型等）
 """
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 
 actor_pool_bp = Blueprint('actor_pool_api', __name__)
 
@@ -27,3 +27,23 @@ def get_pool_status():
             'count': 0,
             'actors': [],
         }), 500
+
+
+@actor_pool_bp.route('/decisions', methods=['GET'])
+def get_decision_stats():
+    """群聊响应决策统计：按话题的决策数、本地 / 缓存 / LLM 次数与耗时（?topic_id= 过滤）"""
+    from services.actor.response_arbiter import get_response_arbiter
+    return jsonify({
+        'ok': True,
+        'topics': get_response_arbiter().stats(request.args.get('topic_id')),
+    })
+
+
+@actor_pool_bp.route('/logging', methods=['GET'])
+def get_logging_stats():
+    """热路径日志管道计数：入队、队列满丢弃、采样丢弃、当前积压"""
+    from utils.log_pipeline import pipeline_stats
+    return jsonify({
+        'ok': True,
+        'logging': pipeline_stats(),
+    })
@@ -0,0 +1,47 @@
+"""
+Blob 懒加载 API 路由
+
+消息中的大字段（媒体、MCP 原始结果、执行日志）以 sha256 引用存放，
+前端按需通过 /api/blobs/<sha256> 获取；支持 Range / If-None-Match。
+"""
+
+from flask import Blueprint, jsonify, request, send_file
+
+from services.blob_store import get_blob_store
+
+# 创建 Blueprint
+blob_bp = Blueprint('blob', __name__)
+
+
+@blob_bp.route('/<digest>', methods=['GET', 'HEAD'])
+def get_blob(digest: str):
+    """
+    读取 Blob 内容
+
+    内容按 sha256 寻址、不可变，因此可长期缓存；
+    Range 请求（视频拖动、分段读取大日志）由 send_file(conditional=True) 处理并返回 206。
+    """
+    store = get_blob_store()
+    path = store.path_for(digest)
+    if path is None:
+        return jsonify({'error': 'Invalid blob id'}), 400
+    if not path.is_file():
+        return jsonify({'error': 'Blob not found'}), 404
+
+    response = send_file(
+        str(path),
+        mimetype=store.content_type(digest),
+        conditional=True,
+        etag=digest,
+        max_age=31536000,
+        as_attachment=request.args.get('download') == '1',
+        download_name=digest,
+    )
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@blob_bp.route('/stats', methods=['GET'])
+def get_blob_stats():
+    """Blob 存储读写统计"""
+    return jsonify(get_blob_store().stats())
@@ -86,6 +86,9 @@ def _apply_default_llm_to_discord_sessions_without_model(default_llm_config_id:
         )
         n = cur.rowcount
         conn.commit()
+        if n:
+            from services.repository_cache import get_repository_cache
+            get_repository_cache().invalidate_all()
         cur.close()
         conn.close()
         if n:
@@ -227,6 +230,7 @@ def bind_channel():
         )
         if not binding:
             return jsonify({"error": "Failed to create binding"}), 500
+        _svc().notify_bindings_changed()
         return jsonify(binding.to_dict()), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -271,6 +275,8 @@ def update_channel(channel_id):
         }
         if updates:
             repo.update(channel_id, **updates)
+            if "linked_agent_id" in updates:
+                _svc().notify_bindings_changed()
 
         updated = repo.find_by_channel_id(channel_id)
         return jsonify(updated.to_dict() if updated else existing.to_dict())
@@ -289,6 +295,7 @@ def unbind_channel(channel_id):
 
         session_id = existing.session_id
         repo.delete(channel_id)
+        _svc().notify_bindings_changed()
 
         data = request.get_json(silent=True) or {}
         if data.get("delete_session") and session_id:
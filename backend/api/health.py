@@ -59,3 +59,15 @@ def health_check():
         result['redis_error'] = f'Redis检查失败: {str(e)}'
     
     return jsonify(result)
+
+
+@health_bp.route('/db-pool', methods=['GET'])
+def db_pool_metrics():
+    """MySQL 连接池指标：等待/占用耗时直方图、使用中/空闲数、慢查询调用点、疑似泄漏"""
+    from database import get_pool_metrics
+
+    try:
+        return jsonify({'ok': True, **get_pool_metrics()})
+    except Exception as e:
+        print(f"[Health] DB pool metrics failed: {e}")
+        return jsonify({'ok': False, 'error': str(e)}), 500
@@ -1484,6 +1484,8 @@ def delete_provider(provider_id):
                 f"UPDATE sessions SET llm_config_id = NULL WHERE llm_config_id IN ({placeholders})",
                 config_ids,
             )
+            from services.repository_cache import get_repository_cache
+            get_repository_cache().invalidate_all()
             try:
                 cursor.execute(
                     f"UPDATE role_versions SET llm_config_id = NULL WHERE llm_config_id IN ({placeholders})",
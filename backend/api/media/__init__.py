@@ -15,3 +15,4 @@ from . import routes_veo
 from . import routes_providers
 from . import routes_outputs
 from . import routes_drive
+from . import routes_jobs
@@ -15,6 +15,7 @@ import requests
 from flask import jsonify, request, Response
 
 from . import media_bp
+from services.media_cache import get_media_cache, media_response
 from services.media_output_service import get_media_output_service
 from database import get_oauth_config, save_oauth_config, delete_oauth_config, get_oauth_token, save_oauth_token
 
@@ -27,7 +28,6 @@ GOOGLE_DRIVE_SCOPE = "https://www.googleapis.com/auth/drive.file"
 GOOGLE_DRIVE_TOKEN_KEY = "google_drive:default"
 DEFAULT_DRIVE_FOLDER_NAME = "chaya"
 THUMB_CACHE_TTL_SECONDS = 600
-_thumb_cache: Dict[str, Dict[str, Any]] = {}
 
 
 def _backend_config() -> Dict[str, Any]:
@@ -142,30 +142,6 @@ def _drive_headers(access_token: str) -> Dict[str, str]:
     return {"Authorization": f"Bearer {access_token}"}
 
 
-def _thumb_cache_get(file_id: str) -> Optional[Dict[str, Any]]:
-    entry = _thumb_cache.get(file_id)
-    if not entry:
-        return None
-    if int(time.time()) > int(entry.get("expires_at") or 0):
-        _thumb_cache.pop(file_id, None)
-        return None
-    return entry
-
-
-def _thumb_cache_set(file_id: str, content: bytes, mime_type: str) -> None:
-    _thumb_cache[file_id] = {
-        "content": content,
-        "mime_type": mime_type,
-        "expires_at": int(time.time()) + THUMB_CACHE_TTL_SECONDS,
-    }
-    # 简易上限控制，避免无限增长
-    if len(_thumb_cache) > 300:
-        # 删除最早过期的一批（按过期时间排序）
-        keys = sorted(_thumb_cache.keys(), key=lambda k: _thumb_cache[k].get("expires_at", 0))[:80]
-        for k in keys:
-            _thumb_cache.pop(k, None)
-
-
 def _ensure_drive_folder(access_token: str, folder_name: str) -> tuple[Optional[str], Optional[str]]:
     headers = _drive_headers(access_token)
     query = (
@@ -470,46 +446,45 @@ def get_google_drive_file_thumb(file_id: str):
     if err or not access_token:
         return jsonify({"error": err or "Google Drive 未连接"}), 401
 
-    cached = _thumb_cache_get(file_id)
-    if cached:
-        return Response(
-            cached["content"],
-            mimetype=cached["mime_type"],
-            headers={"Cache-Control": "public, max-age=600"},
-        )
-
-    headers = _drive_headers(access_token)
-    meta = requests.get(
-        f"{GOOGLE_DRIVE_FILES_URL}/{file_id}",
-        headers=headers,
-        params={"fields": "id,mimeType,name,thumbnailLink"},
-        timeout=30,
-    )
-    if meta.status_code != 200:
-        return jsonify({"error": "读取 Drive 缩略图信息失败"}), 404
-    meta_data = meta.json() or {}
-    mime_type = meta_data.get("mimeType") or "application/octet-stream"
-    thumb_link = meta_data.get("thumbnailLink")
-    if not thumb_link:
-        # 回退：没有缩略图时直接返回原图（对小图也能接受）
-        return get_google_drive_file_content(file_id)
-
-    # 谷歌缩略图支持 sz 参数，减少体积以提升列表渲染速度
-    thumb_url = f"{thumb_link}&sz=w320-h320"
-    dl = requests.get(thumb_url, headers=headers, timeout=30)
-    if dl.status_code != 200:
-        return get_google_drive_file_content(file_id)
-
-    # 缩略图通常是 image/jpeg
-    resp_mime = (dl.headers.get("Content-Type") or "").split(";")[0].strip() or "image/jpeg"
-    # 视频缩略图也作为图片返回
-    if mime_type.startswith("video/") and not resp_mime.startswith("image/"):
-        resp_mime = "image/jpeg"
-
-    _thumb_cache_set(file_id, dl.content, resp_mime)
+    # 缩略图进入共享媒体缓存（字节限额 + single-flight），带 ETag，浏览器复验时返回 304
+    outcome: Dict[str, Any] = {}
 
-    return Response(
-        dl.content,
-        mimetype=resp_mime,
-        headers={"Cache-Control": "public, max-age=600"},
+    def _fetch_thumb():
+        headers = _drive_headers(access_token)
+        meta = requests.get(
+            f"{GOOGLE_DRIVE_FILES_URL}/{file_id}",
+            headers=headers,
+            params={"fields": "id,mimeType,name,thumbnailLink"},
+            timeout=30,
+        )
+        if meta.status_code != 200:
+            outcome["error"] = "读取 Drive 缩略图信息失败"
+            return None
+        meta_data = meta.json() or {}
+        mime_type = meta_data.get("mimeType") or "application/octet-stream"
+        thumb_link = meta_data.get("thumbnailLink")
+        if not thumb_link:
+            # 回退：没有缩略图时直接返回原图（对小图也能接受）
+            return None
+
+        # 谷歌缩略图支持 sz 参数，减少体积以提升列表渲染速度
+        thumb_url = f"{thumb_link}&sz=w320-h320"
+        dl = requests.get(thumb_url, headers=headers, timeout=30)
+        if dl.status_code != 200:
+            return None
+
+        # 缩略图通常是 image/jpeg
+        resp_mime = (dl.headers.get("Content-Type") or "").split(";")[0].strip() or "image/jpeg"
+        # 视频缩略图也作为图片返回
+        if mime_type.startswith("video/") and not resp_mime.startswith("image/"):
+            resp_mime = "image/jpeg"
+        return dl.content, resp_mime
+
+    entry = get_media_cache().get_or_fetch(
+        f"drive:thumb:{file_id}", _fetch_thumb, ttl=THUMB_CACHE_TTL_SECONDS
     )
+    if entry is not None:
+        return media_response(entry, max_age=THUMB_CACHE_TTL_SECONDS)
+    if outcome.get("error"):
+        return jsonify({"error": outcome["error"]}), 404
+    return get_google_drive_file_content(file_id)
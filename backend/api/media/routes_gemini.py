@@ -1,8 +1,9 @@
 """Gemini 媒体接口：图像 + 视频（Veo）"""
 
-from flask import request, jsonify, Response
+from flask import request, jsonify, Response, stream_with_context
 from . import media_bp
 from services import media_service as svc
+from services.media_output_service import get_media_output_service
 
 
 # ─── 图像 ───
@@ -116,8 +117,9 @@ def gemini_video_download():
     """
     代理下载 Gemini Veo 视频。
     前端无法直接访问 Google 的视频 URI（需要 API Key），
-    通过此接口中转下载。
-    Body: { "video_uri": str, "config_id": str? }
+    通过此接口中转下载（流式转发，不在后端缓冲整个视频）。
+    Body: { "video_uri": str, "config_id": str?, "save": bool?, "prompt": str?, "model": str? }
+    save=true 时直接流式写入媒体产出库，返回产出记录而不是视频内容。
     """
     try:
         body = request.get_json(silent=True) or {}
@@ -130,13 +132,32 @@ def gemini_video_download():
         if result.get('error'):
             return jsonify(result), 400
 
+        content_type = result.get('content_type', 'video/mp4')
+        if body.get('save'):
+            output = get_media_output_service().save_output_stream(
+                result['chunks'],
+                media_type='video',
+                mime_type=content_type.split(';')[0].strip() or 'video/mp4',
+                prompt=body.get('prompt'),
+                model=body.get('model'),
+                provider='gemini',
+                source='generated',
+                metadata={'video_uri': video_uri},
+            )
+            if output.get('error'):
+                return jsonify(output), 400
+            return jsonify(output), 201
+
+        headers = {
+            'Content-Disposition': 'attachment; filename="generated_video.mp4"',
+            'Cache-Control': 'public, max-age=3600',
+        }
+        if result.get('content_length'):
+            headers['Content-Length'] = str(result['content_length'])
         return Response(
-            result['data'],
-            mimetype=result.get('content_type', 'video/mp4'),
-            headers={
-                'Content-Disposition': 'attachment; filename="generated_video.mp4"',
-                'Cache-Control': 'public, max-age=3600',
-            },
+            stream_with_context(result['chunks']),
+            mimetype=content_type,
+            headers=headers,
         )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
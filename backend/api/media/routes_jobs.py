@@ -0,0 +1,54 @@
+"""媒体生成任务接口：服务端提交 + 后台轮询 + 自动保存产出"""
+
+from flask import request, jsonify
+from . import media_bp
+from services.media_job_service import get_media_job_service
+
+
+@media_bp.route('/jobs', methods=['POST'])
+def submit_media_job():
+    """
+    提交视频生成任务，由服务端轮询供应商状态，完成后自动保存到产出库。
+    Body: {
+        "provider": "gemini" | "runway",
+        "topic_id": str?,     // 可选：完成事件推送到该 Topic 的 SSE（media_job_update）
+        ...                   // 其余字段同 /gemini/video/submit、/runway/video/submit
+    }
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        provider = (body.pop('provider', None) or '').strip().lower()
+        if not provider:
+            return jsonify({'error': '缺少 provider'}), 400
+        topic_id = body.pop('topic_id', None)
+        result = get_media_job_service().submit(provider, body, topic_id=topic_id)
+        if result.get('error'):
+            return jsonify(result), 400
+        return jsonify(result), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@media_bp.route('/jobs', methods=['GET'])
+def list_media_jobs():
+    """任务列表。Query: active=1 只返回未完成任务，limit=50"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 200)
+        items = get_media_job_service().list_jobs(
+            active_only=request.args.get('active') == '1', limit=limit
+        )
+        return jsonify({'items': items}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@media_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_media_job(job_id: str):
+    """查询任务状态（只读服务端记录，不访问供应商）"""
+    try:
+        job = get_media_job_service().get(job_id)
+        if not job:
+            return jsonify({'error': '任务不存在'}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
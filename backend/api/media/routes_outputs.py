@@ -1,15 +1,25 @@
 """媒体创作产出持久化 API"""
 
+import json
+import mimetypes
+
 from flask import request, jsonify, Response, send_file
 from . import media_bp
+from services.media_cache import get_media_cache, media_response
 from services.media_output_service import get_media_output_service
 
+# 产出文件内容不可变（同 output_id 不会被覆盖），浏览器可长时间缓存
+OUTPUT_CACHE_MAX_AGE = 3600
+
+# 这些请求体不是原始文件内容
+_FORM_MIMETYPES = ('application/json', 'multipart/form-data', 'application/x-www-form-urlencoded')
+
 
 @media_bp.route('/outputs', methods=['POST'])
 def save_output():
     """
     保存媒体产出。
-    Body: {
+    JSON Body: {
         "data": str,           // base64 或 data URI（图片/视频）
         "media_type": str,     // "image" | "video"
         "mime_type": str?,
@@ -19,8 +29,44 @@ def save_output():
         "source": str?,
         "metadata": dict?
     }
+    大文件（视频）可改用 multipart：file 字段为二进制内容，其余字段同上（metadata 为 JSON 字符串）；
+    或直接以二进制作为请求体、其余字段放在 query string。两种方式都流式写盘，不做 base64。
     """
     try:
+        upload = request.files.get('file')
+        if upload is not None:
+            fields, stream = request.form, upload.stream
+            default_mime = upload.mimetype
+        elif request.mimetype and request.mimetype not in _FORM_MIMETYPES:
+            fields, stream = request.args, request.stream
+            default_mime = request.mimetype
+        else:
+            fields, stream, default_mime = None, None, None
+
+        if stream is not None:
+            media_type = (fields.get('media_type') or '').strip().lower()
+            if media_type not in ('image', 'video'):
+                return jsonify({'error': 'media_type 须为 image 或 video'}), 400
+            metadata = fields.get('metadata')
+            if isinstance(metadata, str):
+                try:
+                    metadata = json.loads(metadata) if metadata else None
+                except ValueError:
+                    return jsonify({'error': 'metadata 须为 JSON'}), 400
+            result = get_media_output_service().save_output_stream(
+                stream,
+                media_type=media_type,
+                mime_type=fields.get('mime_type') or default_mime,
+                prompt=fields.get('prompt'),
+                model=fields.get('model'),
+                provider=fields.get('provider'),
+                source=fields.get('source') or 'generated',
+                metadata=metadata,
+            )
+            if result.get('error'):
+                return jsonify(result), 400
+            return jsonify(result), 201
+
         body = request.get_json(silent=True) or {}
         data = body.get('data')
         if not data:
@@ -68,11 +114,23 @@ def get_output_file(output_id: str):
         path = svc.get_output_file_path(output_id)
         if not path:
             return jsonify({'error': '产出不存在或文件已丢失'}), 404
+        download = request.args.get('download') == '1'
+        cache = get_media_cache()
+        st = path.stat()
+        # 小文件（图片等）走内存缓存 + ETag；视频 / Range 请求 / 下载仍由 send_file 从磁盘流式发送
+        if not download and request.range is None and st.st_size <= cache.max_item_bytes:
+            mime = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+            entry = cache.get_or_fetch(
+                f"output:{output_id}:{st.st_mtime_ns}",
+                lambda: (path.read_bytes(), mime),
+            )
+            return media_response(entry, max_age=OUTPUT_CACHE_MAX_AGE)
         return send_file(
             str(path),
             mimetype=None,
-            as_attachment=request.args.get('download') == '1',
+            as_attachment=download,
             download_name=path.name,
+            conditional=True,
         )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,8 +1,9 @@
-from flask import Blueprint, request, jsonify, send_file
-import io
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 import logging
 from typing import Optional
+from services.media_cache import media_response
 from services.tts_service import get_tts_client, ElevenLabsClient
+from services.tts_stream import TTSError, VoiceParams, cached_speech, init_tts_audio_cache, stream_speech
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +18,7 @@ def init_tts_routes(app, config):
     global _tts_client, _tts_config
     _tts_config = config
     _tts_client = get_tts_client(config)
+    init_tts_audio_cache(config.get("tts", {}).get("cache"))
 
 
 @tts_bp.route('/voices', methods=['GET'])
@@ -70,56 +72,85 @@ def get_voice_details(voice_id: str):
     })
 
 
-@tts_bp.route('/speak', methods=['POST'])
-def speak():
-    """Convert text to speech."""
+def _parse_speech_request():
+    """Validate a /speak or /stream body; returns (client, params, text, error_response)"""
     data = request.get_json()
-    
+
     if not data or "text" not in data:
-        return jsonify({"error": "Missing 'text' parameter"}), 400
-    
+        return None, None, None, (jsonify({"error": "Missing 'text' parameter"}), 400)
+
     if "voice_id" not in data:
-        return jsonify({"error": "Missing 'voice_id' parameter"}), 400
+        return None, None, None, (jsonify({"error": "Missing 'voice_id' parameter"}), 400)
 
     text = data.get("text", "").strip()
     if not text:
-        return jsonify({"error": "Text cannot be empty"}), 400
-    
+        return None, None, None, (jsonify({"error": "Text cannot be empty"}), 400)
+
     if len(text) > 5000:
-        return jsonify({"error": "Text too long (max 5000 characters)"}), 400
+        return None, None, None, (jsonify({"error": "Text too long (max 5000 characters)"}), 400)
 
     custom_api_token = data.get("api_token")
     tts_client = get_tts_client(_tts_config, custom_api_token)
-    
-    if not tts_client:
-        return jsonify({"error": "TTS service not configured"}), 503
 
-    voice_id = data.get("voice_id")
-    model_id = data.get("model_id", "eleven_multilingual_v2")
-    stability = float(data.get("stability", 0.5))
-    similarity_boost = float(data.get("similarity_boost", 0.75))
-    output_format = data.get("output_format", "mp3_44100_128")
-    optimize_streaming_latency = int(data.get("optimize_streaming_latency", 0))
-
-    audio_bytes, error = tts_client.text_to_speech(
-        text=text,
-        voice_id=voice_id,
-        model_id=model_id,
-        stability=stability,
-        similarity_boost=similarity_boost,
-        output_format=output_format,
-        optimize_streaming_latency=optimize_streaming_latency
+    if not tts_client:
+        return None, None, None, (jsonify({"error": "TTS service not configured"}), 503)
+
+    params = VoiceParams(
+        voice_id=data.get("voice_id"),
+        model_id=data.get("model_id", "eleven_multilingual_v2"),
+        stability=float(data.get("stability", 0.5)),
+        similarity_boost=float(data.get("similarity_boost", 0.75)),
+        output_format=data.get("output_format", "mp3_44100_128"),
+        optimize_streaming_latency=int(data.get("optimize_streaming_latency", 0)),
     )
+    return tts_client, params, text, None
 
-    if error:
-        return jsonify({"error": error}), 400
 
-    audio_stream = io.BytesIO(audio_bytes)
-    return send_file(
-        audio_stream,
-        mimetype="audio/mpeg",
-        as_attachment=False,
-        download_name="speech.mp3"
+@tts_bp.route('/speak', methods=['POST'])
+def speak():
+    """Convert text to speech (identical requests are served from the audio cache)."""
+    tts_client, params, text, error_response = _parse_speech_request()
+    if error_response:
+        return error_response
+
+    try:
+        entry = cached_speech(tts_client, params, text)
+    except TTSError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return media_response(entry, max_age=86400, headers={
+        "Content-Disposition": "inline; filename=speech.mp3",
+    })
+
+
+@tts_bp.route('/stream', methods=['POST'])
+def speak_stream():
+    """
+    Stream speech for text, split at sentence boundaries.
+
+    Audio for the first phrase is sent as soon as it arrives; cached phrases
+    are sent without calling the API.
+    """
+    tts_client, params, text, error_response = _parse_speech_request()
+    if error_response:
+        return error_response
+
+    audio = stream_speech(tts_client, params, text)
+    # Pull the first chunk here so failures before any audio still map to a JSON error
+    try:
+        first = next(audio, b"")
+    except TTSError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def _generate():
+        if first:
+            yield first
+        yield from audio
+
+    return Response(
+        stream_with_context(_generate()),
+        mimetype=params.mime_type,
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
     )
 
 
@@ -23,7 +23,19 @@ from werkzeug.exceptions import RequestEntityTooLarge
 from flask_compress import Compress
 from database import get_mysql_connection
 import traceback
+from services.repository_cache import (
+    get_repository_cache,
+    invalidate_research_sources,
+    invalidate_session,
+    invalidate_skill_assignments,
+    invalidate_skill_pack,
+)
+from services.blob_store import offload_column, offload_payload, hydrate_column, hydrate_message
+from services.research import get_research_index, load_alias_index
+from services.research.aliases import refresh_source_stats
+from services.research.ingest import IngestFile, get_ingest_queue, init_ingest_queue
 from utils.db import (
+    DatabaseUnavailableError,
     get_db_cursor,
     safe_route,
     parse_json_field,
@@ -71,6 +83,14 @@ def load_config():
 
 config = load_config()
 
+# Actor / MCP / Provider 热路径日志管道（分类级别、预览采样）
+try:
+    from utils.log_pipeline import init_log_pipeline
+
+    init_log_pipeline((config or {}).get("logging"))
+except Exception as e:
+    print(f"[Logging] ⚠️ Failed to init log pipeline: {e}")
+
 # ==================== Upload Limits (Research / multipart) ====================
 # 防止目录/大文件上传触发 werkzeug 413（默认限制较小）
 try:
@@ -90,6 +110,33 @@ try:
 except Exception as e:
     print(f"[Upload Limits] ⚠️ Failed to apply upload limits: {e}")
 
+# Research 检索：可选的本地向量重排（未启用或依赖缺失时仅使用 BM25）
+try:
+    from services.research.reranker import configure_reranker
+
+    configure_reranker(((config or {}).get("research", {}) or {}).get("reranker"))
+except Exception as e:
+    print(f"[Research] ⚠️ Failed to configure reranker: {e}")
+
+# Research 上传后台入库队列
+try:
+    _research_cfg = (config or {}).get("research", {}) or {}
+    init_ingest_queue(
+        max_workers=int(_research_cfg.get("ingest_workers", 2)),
+        batch_size=int(_research_cfg.get("ingest_batch_size", 50)),
+        lease_seconds=float(_research_cfg.get("ingest_lease_seconds", 300)),
+    )
+except Exception as e:
+    print(f"[Research] ⚠️ Failed to init ingest queue: {e}")
+
+# 媒体缩略图 / 产出文件共享缓存（字节限额 + 可选磁盘溢出层）
+try:
+    from services.media_cache import init_media_cache
+
+    init_media_cache(((config or {}).get("media", {}) or {}).get("cache"))
+except Exception as e:
+    print(f"[Media] ⚠️ Failed to init media cache: {e}")
+
 
 @app.errorhandler(RequestEntityTooLarge)
 def handle_request_entity_too_large(e):
@@ -3981,7 +4028,7 @@ def mcp_market_search():
         limit = request.args.get("limit", 50, type=int)
         offset = request.args.get("offset", 0, type=int)
 
-        service = MCPMarketService(get_mysql_connection)
+        service = MCPMarketService(get_mysql_connection, lambda: get_mysql_connection(read_only=True))
         result = service.search_items(
             q=q,
             runtime_type=runtime_type,
@@ -4003,7 +4050,7 @@ def mcp_market_item_detail(item_id):
     try:
         from services.mcp_market_service import MCPMarketService
 
-        service = MCPMarketService(get_mysql_connection)
+        service = MCPMarketService(get_mysql_connection, lambda: get_mysql_connection(read_only=True))
         item = service.get_item(item_id)
         if not item:
             return jsonify({"error": "item not found"}), 404
@@ -4380,6 +4427,8 @@ def update_llm_config(config_id):
 
         conn.commit()
         cursor.close()
+        # Agent 配置缓存联表了 llm_configs（含 api_key），配置变更时整体失效
+        get_repository_cache().invalidate_all()
 
         return jsonify({"message": "LLM config updated successfully"})
     except Exception as e:
@@ -4403,6 +4452,7 @@ def delete_llm_config(config_id):
             return jsonify({"error": "Config not found"}), 404
 
         cursor.close()
+        get_repository_cache().invalidate_all()
         return jsonify({"message": "LLM config deleted successfully"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -4620,6 +4670,7 @@ def import_llm_configs():
         conn.commit()
         cursor.close()
         conn.close()
+        get_repository_cache().invalidate_all()
 
         return jsonify(
             {
@@ -5596,6 +5647,7 @@ def delete_session(session_id):
             cursor.execute("DELETE FROM sessions WHERE session_id = %s", (session_id,))
             deleted_rows = cursor.rowcount
             conn.commit()
+            invalidate_session(session_id, cascade=True)
 
             if deleted_rows > 0:
                 print(f"[Session API] Deleted session: {session_id}")
@@ -5939,21 +5991,31 @@ def _process_message_row(row):
 
 @app.route("/api/sessions/<session_id>/messages", methods=["GET", "OPTIONS"])
 def get_session_messages(session_id):
-    """获取会话消息（分页）- 支持游标分页和传统分页两种模式"""
+    """获取会话消息（分页）- 支持游标分页和传统分页两种模式
+
+    游标分页（limit / before_id / cursor 任一存在时）:
+      - before_id / cursor: 上一页返回的 next_cursor（不透明游标），也兼容旧版 message_id
+      - limit: 每页条数
+      - lightweight=true: 只返回 message_id / role / content / created_at
+      - include=thinking,tool_calls,ext,mcpdetail: 只读取列出的大字段，其余大字段延迟加载
+        （返回 has_<字段> 标记与 deferred 列表，按需调用 GET /api/messages/<message_id>）
+    """
 
     try:
         from database import get_mysql_connection, get_redis_client
-
-        conn = get_mysql_connection()
-        if not conn:
-            return jsonify(
-                {"messages": [], "total": 0, "error": "MySQL not available"}
-            ), 503
+        from models.message import (
+            MessageRepository,
+            encode_message_cursor,
+            HEAVY_MESSAGE_COLUMNS,
+            BASE_MESSAGE_COLUMNS,
+        )
 
         # 游标分页参数（优先使用，更高效）
-        before_id = request.args.get("before_id")  # 获取此消息之前的消息
+        before_id = request.args.get("before_id") or request.args.get(
+            "cursor"
+        )  # 获取此游标之前的消息
         limit_param = request.args.get("limit")  # 如果有 limit 参数，使用游标分页模式
-        limit = int(limit_param) if limit_param else 20
+        limit = max(1, min(int(limit_param), 500)) if limit_param else 20
 
         # 传统分页参数（向后兼容）
         page = int(request.args.get("page", 1))
@@ -5965,115 +6027,94 @@ def get_session_messages(session_id):
         # 判断使用哪种分页模式：有 limit 参数或 before_id 参数时使用游标分页
         use_cursor_pagination = limit_param is not None or before_id is not None
 
-        cursor = None
-        try:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
+        # ========== 游标分页模式（keyset，与翻页深度无关） ==========
+        if use_cursor_pagination:
+            include_param = request.args.get("include")
+            deferred: List[str] = []
+            if lightweight:
+                columns = ["message_id", "role", "content", "created_at"]
+            elif include_param is not None:
+                included = [
+                    c.strip()
+                    for c in include_param.split(",")
+                    if c.strip() in HEAVY_MESSAGE_COLUMNS
+                ]
+                deferred = [c for c in HEAVY_MESSAGE_COLUMNS if c not in included]
+                columns = list(BASE_MESSAGE_COLUMNS) + included
+            else:
+                columns = list(BASE_MESSAGE_COLUMNS) + list(HEAVY_MESSAGE_COLUMNS)
 
-            # ========== 游标分页模式（高效） ==========
-            if use_cursor_pagination:
-                if before_id:
-                    # 有 before_id：获取该消息之前的消息
-                    cursor.execute(
-                        "SELECT created_at FROM messages WHERE message_id = %s",
-                        (before_id,),
-                    )
-                    before_row = cursor.fetchone()
-                    if not before_row:
-                        return jsonify(
-                            {
-                                "messages": [],
-                                "has_more": False,
-                                "next_cursor": None,
-                                "error": "before_id not found",
-                            }
-                        ), 404
+            repo = MessageRepository(get_mysql_connection)
+            try:
+                rows, has_more = repo.find_page(
+                    session_id,
+                    limit=limit,
+                    before=before_id,
+                    columns=columns,
+                    presence=deferred,
+                )
+            except DatabaseUnavailableError as e:
+                return jsonify({"error": f"Failed to load messages: {e}"}), 503
+            except KeyError:
+                return jsonify(
+                    {
+                        "messages": [],
+                        "has_more": False,
+                        "next_cursor": None,
+                        "error": "before_id not found",
+                    }
+                ), 404
 
-                    before_time = before_row["created_at"]
+            # 处理消息
+            messages = []
+            for row in rows:
+                if lightweight:
+                    messages.append(
+                        {
+                            "message_id": row["message_id"],
+                            "role": row["role"],
+                            "content": row["content"],
+                            "created_at": row["created_at"].isoformat()
+                            if row["created_at"]
+                            else None,
+                        }
+                    )
+                    continue
+                message = _process_message_row(row)
+                if deferred:
+                    for col in deferred:
+                        message.pop(col, None)
+                        message[f"has_{col}"] = bool(row.get(f"has_{col}"))
+                    message["deferred"] = deferred
+                messages.append(message)
 
-                    # 获取 created_at < before_time 的消息
-                    if lightweight:
-                        cursor.execute(
-                            """
-                            SELECT message_id, role, content, created_at
-                            FROM messages
-                            WHERE session_id = %s AND created_at < %s
-                            ORDER BY created_at DESC
-                            LIMIT %s
-                        """,
-                            (session_id, before_time, limit + 1),
-                        )
-                    else:
-                        cursor.execute(
-                            """
-                            SELECT message_id, session_id, role, content, thinking, 
-                                   tool_calls, token_count, acc_token, ext, mcpdetail, created_at
-                            FROM messages
-                            WHERE session_id = %s AND created_at < %s
-                            ORDER BY created_at DESC
-                            LIMIT %s
-                        """,
-                            (session_id, before_time, limit + 1),
-                        )
-                else:
-                    # 没有 before_id：获取最新的消息
-                    if lightweight:
-                        cursor.execute(
-                            """
-                            SELECT message_id, role, content, created_at
-                            FROM messages
-                            WHERE session_id = %s
-                            ORDER BY created_at DESC
-                            LIMIT %s
-                        """,
-                            (session_id, limit + 1),
-                        )
-                    else:
-                        cursor.execute(
-                            """
-                            SELECT message_id, session_id, role, content, thinking, 
-                                   tool_calls, token_count, acc_token, ext, mcpdetail, created_at
-                            FROM messages
-                            WHERE session_id = %s
-                            ORDER BY created_at DESC
-                            LIMIT %s
-                        """,
-                            (session_id, limit + 1),
-                        )
+            # 游标指向本页最旧的一条（rows 为倒序，最后一条最旧）
+            next_cursor = (
+                encode_message_cursor(rows[-1]["created_at"], rows[-1]["message_id"])
+                if rows and has_more
+                else None
+            )
 
-                rows = cursor.fetchall()
-                has_more = len(rows) > limit
-                if has_more:
-                    rows = rows[:limit]
+            # 反转顺序，使最旧的在前（用于前端显示）
+            messages.reverse()
 
-                # 处理消息
-                messages = []
-                for row in rows:
-                    if lightweight:
-                        messages.append(
-                            {
-                                "message_id": row["message_id"],
-                                "role": row["role"],
-                                "content": row["content"],
-                                "created_at": row["created_at"].isoformat()
-                                if row["created_at"]
-                                else None,
-                            }
-                        )
-                    else:
-                        messages.append(_process_message_row(row))
+            return jsonify(
+                {
+                    "messages": messages,
+                    "has_more": has_more,
+                    "next_cursor": next_cursor,
+                }
+            )
 
-                # 反转顺序，使最旧的在前（用于前端显示）
-                messages.reverse()
+        conn = get_mysql_connection()
+        if not conn:
+            return jsonify(
+                {"messages": [], "total": 0, "error": "MySQL not available"}
+            ), 503
 
-                return jsonify(
-                    {
-                        "messages": messages,
-                        "has_more": has_more,
-                        "next_cursor": messages[0]["message_id"]
-                        if messages and has_more
-                        else None,
-                    }
-                )
+        cursor = None
+        try:
+            cursor = conn.cursor(pymysql.cursors.DictCursor)
 
             # ========== 传统分页模式（向后兼容） ==========
             # 获取总数
@@ -6092,43 +6133,27 @@ def get_session_messages(session_id):
                 offset = (page - 1) * page_size
 
             # 获取消息（按时间倒序，最新的在前）
-            if lightweight:
-                cursor.execute(
-                    """
-                    SELECT 
-                        message_id,
-                        role,
-                        content,
-                        created_at
-                    FROM messages
+            # OFFSET 只在覆盖索引 idx_session_created_msg 上跳过，再按主键回表读取本页
+            select_cols = (
+                "m.message_id, m.role, m.content, m.created_at"
+                if lightweight
+                else "m.message_id, m.session_id, m.role, m.content, m.thinking, "
+                "m.tool_calls, m.token_count, m.acc_token, m.ext, m.mcpdetail, m.created_at"
+            )
+            cursor.execute(
+                f"""
+                SELECT {select_cols}
+                FROM messages m
+                INNER JOIN (
+                    SELECT id FROM messages
                     WHERE session_id = %s
-                    ORDER BY created_at DESC
+                    ORDER BY created_at DESC, message_id DESC
                     LIMIT %s OFFSET %s
+                ) pg ON pg.id = m.id
+                ORDER BY m.created_at DESC, m.message_id DESC
                 """,
-                    (session_id, immediate_limit, offset),
-                )
-            else:
-                cursor.execute(
-                    """
-                    SELECT 
-                        message_id,
-                        session_id,
-                        role,
-                        content,
-                        thinking,
-                        tool_calls,
-                        token_count,
-                        acc_token,
-                        ext,
-                        mcpdetail,
-                        created_at
-                    FROM messages
-                    WHERE session_id = %s
-                    ORDER BY created_at DESC
-                    LIMIT %s OFFSET %s
-                    """,
-                    (session_id, immediate_limit, offset),
-                )
+                (session_id, immediate_limit, offset),
+            )
 
             messages = []
             invalid_message_ids = []
@@ -6345,7 +6370,7 @@ def get_message(message_id):
                 else None,
             }
 
-            return jsonify(message)
+            return jsonify(hydrate_message(message))
 
         finally:
             if cursor:
@@ -6655,6 +6680,7 @@ def research_add_url_source():
                 ),
             )
             conn.commit()
+            invalidate_research_sources(session_id)
             return jsonify(
                 {
                     "source_id": source_id,
@@ -6678,7 +6704,13 @@ def research_add_url_source():
 @app.route("/api/research/sources/upload", methods=["POST", "OPTIONS"])
 def research_upload_sources():
     """
-    上传文件/图片/目录（通过 webkitdirectory 上传时 filename 带相对路径），并将可文本化的内容写入 research_documents。
+    上传文件/图片/目录（通过 webkitdirectory 上传时 filename 带相对路径）。
+
+    请求内只把文件落盘并登记来源，立即返回 202 与 job_id；
+    可文本化文件的抽取、去重与写入 research_documents 由后台入库队列完成，
+    进度通过 Topic SSE（research_ingest_progress）推送，也可轮询 /api/research/ingest/<job_id>。
+
+    大目录可分多次请求上传：首个请求返回 dir_source_id，后续请求携带同一 dir_source_id 追加到该目录来源。
     """
     try:
         conn = get_mysql_connection()
@@ -6691,6 +6723,7 @@ def research_upload_sources():
 
         upload_kind = request.form.get("upload_kind") or "files"  # files|dir
         dir_alias = request.form.get("dir_alias")  # optional human alias for directory
+        dir_source_id = request.form.get("dir_source_id")  # optional: continue a batched dir upload
 
         files = request.files.getlist("files")
         if not files:
@@ -6701,18 +6734,46 @@ def research_upload_sources():
 
         base_dir = Path(__file__).resolve().parent / "uploads" / "research" / session_id
         base_dir.mkdir(parents=True, exist_ok=True)
+        base_resolved = str(base_dir.resolve())
 
         created_sources = []
-        created_docs = 0
+        ingest_files = []
 
         cursor = None
         try:
             cursor = conn.cursor(pymysql.cursors.DictCursor)
 
             # If uploading a directory, create ONE dir source (alias) and index docs under it.
-            dir_source_id = None
             dir_title = None
-            if upload_kind == "dir":
+            if upload_kind == "dir" and dir_source_id:
+                cursor.execute(
+                    """
+                    SELECT title FROM research_sources
+                    WHERE session_id=%s AND source_id=%s AND source_type='dir'
+                    LIMIT 1
+                """,
+                    (session_id, dir_source_id),
+                )
+                row = cursor.fetchone()
+                if not row:
+                    return jsonify({"error": "dir source not found"}), 404
+                dir_title = row["title"]
+            elif upload_kind == "dir" and dir_alias:
+                # 同名目录重复上传：复用原目录来源，内容未变的文件由后台跳过
+                cursor.execute(
+                    """
+                    SELECT source_id FROM research_sources
+                    WHERE session_id=%s AND title=%s AND source_type='dir'
+                    LIMIT 1
+                """,
+                    (session_id, dir_alias),
+                )
+                row = cursor.fetchone()
+                if row:
+                    dir_source_id = row["source_id"]
+                    dir_title = dir_alias
+
+            if upload_kind == "dir" and not dir_source_id:
                 dir_source_id = f"rs-dir-{int(time.time() * 1000)}"
                 dir_title = _unique_source_title(
                     cursor, session_id, dir_alias or f"dir-{int(time.time() * 1000)}"
@@ -6744,15 +6805,36 @@ def research_upload_sources():
                     }
                 )
 
+            # 普通文件上传：同一路径重复上传时复用已有来源（内容未变则后台直接跳过）
+            planned = []
             for f in files:
                 rel = _research_safe_relpath(f.filename)
                 target_path = (base_dir / rel).resolve()
                 # Ensure under base_dir
-                if str(target_path).startswith(str(base_dir.resolve())) is False:
+                if not str(target_path).startswith(base_resolved):
                     continue
+                planned.append((f, rel, target_path))
+
+            existing_sources = {}
+            if upload_kind != "dir" and planned:
+                paths = [str(p) for _, _, p in planned]
+                placeholders = ", ".join(["%s"] * len(paths))
+                cursor.execute(
+                    f"""
+                    SELECT source_id, source_type, title, file_path, mime_type
+                    FROM research_sources
+                    WHERE session_id=%s AND file_path IN ({placeholders})
+                """,
+                    (session_id, *paths),
+                )
+                existing_sources = {
+                    r["file_path"]: r for r in cursor.fetchall() or []
+                }
+
+            for idx, (f, rel, target_path) in enumerate(planned):
                 target_path.parent.mkdir(parents=True, exist_ok=True)
 
-                # Save file
+                # Save file（werkzeug 已将大文件缓冲在磁盘临时文件中，这里按块拷贝）
                 f.save(str(target_path))
 
                 guessed_mime, _ = mimetypes.guess_type(str(target_path))
@@ -6760,14 +6842,19 @@ def research_upload_sources():
 
                 # For directory upload, do NOT create per-file source records.
                 # For normal file upload, create per-file sources as before.
-                source_id_for_doc = None
                 if upload_kind == "dir" and dir_source_id:
                     source_id_for_doc = dir_source_id
+                elif str(target_path) in existing_sources:
+                    existing = existing_sources[str(target_path)]
+                    source_id_for_doc = existing["source_id"]
+                    created_sources.append(
+                        {**existing, "session_id": session_id, "reused": True}
+                    )
                 else:
                     source_type = (
                         "image" if mime.lower().startswith("image/") else "file"
                     )
-                    source_id = f"rs-{int(time.time() * 1000)}-{created_docs}"
+                    source_id = f"rs-{int(time.time() * 1000)}-{idx}"
                     title = _unique_source_title(cursor, session_id, rel)
                     cursor.execute(
                         """
@@ -6796,42 +6883,35 @@ def research_upload_sources():
                     )
                     source_id_for_doc = source_id
 
-                # Index text-like files
+                # Index text-like files（后台完成）
                 if _is_text_mime(mime):
-                    try:
-                        # Limit size to 2MB per file to avoid huge DB writes
-                        size = target_path.stat().st_size
-                        if size <= 2 * 1024 * 1024:
-                            content_text = target_path.read_text(
-                                encoding="utf-8", errors="ignore"
-                            )
-                            doc_id = f"rd-{int(time.time() * 1000)}-{created_docs}"
-                            cursor.execute(
-                                """
-                                INSERT INTO research_documents (doc_id, session_id, source_id, rel_path, content_text)
-                                VALUES (%s, %s, %s, %s, %s)
-                            """,
-                                (
-                                    doc_id,
-                                    session_id,
-                                    source_id_for_doc,
-                                    rel,
-                                    content_text,
-                                ),
-                            )
-                            created_docs += 1
-                    except Exception as ie:
-                        print(f"[Research API] Index text failed: {ie}")
+                    ingest_files.append(
+                        IngestFile(str(target_path), rel, source_id_for_doc)
+                    )
 
             conn.commit()
-            return jsonify(
-                {"sources": created_sources, "indexed_documents": created_docs}
-            ), 201
+            if any(not s.get("reused") for s in created_sources):
+                invalidate_research_sources(session_id)
         finally:
             if cursor:
                 cursor.close()
             if conn:
                 conn.close()
+
+        job = (
+            get_ingest_queue().submit(session_id, ingest_files)
+            if ingest_files
+            else None
+        )
+        return jsonify(
+            {
+                "sources": created_sources,
+                "indexed_documents": 0,
+                "queued_documents": len(ingest_files),
+                "job_id": job.job_id if job else None,
+                "dir_source_id": dir_source_id,
+            }
+        ), 202
     except RequestEntityTooLarge as e:
         # 解析 multipart 前就会触发；不要转 500
         limit = app.config.get("MAX_CONTENT_LENGTH")
@@ -6848,6 +6928,15 @@ def research_upload_sources():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/research/ingest/<job_id>", methods=["GET", "OPTIONS"])
+def research_ingest_status(job_id):
+    """查询上传入库任务进度"""
+    status = get_ingest_queue().get_status(job_id)
+    if status is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(status), 200
+
+
 @app.route("/api/research/sources", methods=["GET", "OPTIONS"])
 def research_list_sources():
     """列出指定 Research 会话的 sources"""
@@ -6963,19 +7052,38 @@ def research_get_source_file():
 
 @app.route("/api/research/retrieve", methods=["POST", "OPTIONS"])
 def research_retrieve():
-    """基于 MySQL FULLTEXT 检索 research_documents"""
-    try:
-        conn = get_mysql_connection()
-        if not conn:
-            return jsonify({"error": "MySQL not available"}), 503
+    """
+    检索 research_documents 中与 query 最相关的段落
+
+    使用会话级 BM25 段落索引（CJK 二元组分词），返回命中段落与高亮区间；
+    索引不可用时退回 MySQL FULLTEXT。
 
+    Body:
+        session_id, query, limit(默认8), source_ids(可选，限定来源), rerank(可选，启用向量重排)
+    """
+    try:
         data = request.json or {}
         session_id = data.get("session_id")
         query = data.get("query")
-        limit = int(data.get("limit", 8))
+        limit = max(1, min(int(data.get("limit", 8)), 50))
+        source_ids = data.get("source_ids") or None
+        rerank = bool(data.get("rerank", False))
         if not session_id or not query:
             return jsonify({"error": "session_id and query are required"}), 400
 
+        try:
+            results = get_research_index().search(
+                session_id, query, limit=limit, source_ids=source_ids, rerank=rerank
+            )
+            return jsonify({"results": results, "engine": "bm25"}), 200
+        except Exception as e:
+            print(f"[Research API] BM25 index unavailable, falling back to FULLTEXT: {e}")
+            traceback.print_exc()
+
+        conn = get_mysql_connection()
+        if not conn:
+            return jsonify({"error": "MySQL not available"}), 503
+
         cursor = None
         try:
             cursor = conn.cursor(pymysql.cursors.DictCursor)
@@ -6996,7 +7104,7 @@ def research_retrieve():
                 (query, session_id, query, limit),
             )
             rows = cursor.fetchall()
-            return jsonify({"results": rows}), 200
+            return jsonify({"results": rows, "engine": "fulltext"}), 200
         finally:
             if cursor:
                 cursor.close()
@@ -7010,12 +7118,13 @@ def research_retrieve():
 
 @app.route("/api/research/sources/resolve", methods=["POST", "OPTIONS"])
 def research_resolve_sources():
-    """Resolve $alias references into structured info (url/snippet/dir stats)."""
-    try:
-        conn = get_mysql_connection()
-        if not conn:
-            return jsonify({"error": "MySQL not available"}), 503
+    """
+    Resolve $alias references into structured info (url/snippet/dir stats).
 
+    别名查找走会话级别名索引（读穿缓存）；目录统计读取入库时预计算的 meta.stats，
+    文件片段对所有 token 合并为一次查询。`目录别名/子路径` 形式按 rel_path 前缀统计。
+    """
+    try:
         data = request.json or {}
         session_id = data.get("session_id")
         tokens = data.get("tokens") or []
@@ -7026,102 +7135,89 @@ def research_resolve_sources():
         if not tokens:
             return jsonify({"resolved": []}), 200
 
-        cursor = None
         try:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            cursor.execute(
-                """
-                SELECT source_id, session_id, source_type, title, url, file_path, mime_type, meta, created_at
-                FROM research_sources
-                WHERE session_id = %s
-                ORDER BY created_at DESC
-                LIMIT 2000
-            """,
-                (session_id,),
-            )
-            sources = cursor.fetchall() or []
-            for s in sources:
-                try:
-                    if s.get("meta") and isinstance(s["meta"], str):
-                        s["meta"] = json.loads(s["meta"])
-                except Exception:
-                    s["meta"] = None
-                if s.get("created_at"):
-                    s["created_at"] = s["created_at"].isoformat()
-
-            def find_source(tok: str):
-                # exact match by source_id
-                for s in sources:
-                    if s.get("source_id") == tok:
-                        return s
-                # exact match by title (alias)
-                for s in sources:
-                    if (s.get("title") or "") == tok:
-                        return s
-                # exact match by url
-                for s in sources:
-                    if (s.get("url") or "") == tok:
-                        return s
-                # fallback: prefix match title
-                for s in sources:
-                    if (s.get("title") or "").startswith(tok):
-                        return s
-                return None
-
-            resolved = []
-            for tok in tokens:
-                s = find_source(tok)
-                if not s:
-                    resolved.append({"token": tok, "found": False})
-                    continue
-                item = {"token": tok, "found": True, "source": s}
+            index = load_alias_index(session_id)
+        except RuntimeError:
+            return jsonify({"error": "MySQL not available"}), 503
 
-                if s.get("source_type") == "url":
-                    item["url"] = s.get("url")
-                elif s.get("source_type") == "dir":
-                    cursor.execute(
-                        """
-                        SELECT COUNT(*) AS total
-                        FROM research_documents
-                        WHERE session_id=%s AND source_id=%s
-                    """,
-                        (session_id, s.get("source_id")),
-                    )
-                    total = cursor.fetchone().get("total", 0)
-                    cursor.execute(
-                        """
-                        SELECT rel_path
-                        FROM research_documents
-                        WHERE session_id=%s AND source_id=%s
-                        ORDER BY created_at DESC
-                        LIMIT 30
-                    """,
-                        (session_id, s.get("source_id")),
-                    )
-                    paths = [
-                        r.get("rel_path")
-                        for r in cursor.fetchall() or []
-                        if r.get("rel_path")
-                    ]
-                    item["dir"] = {"doc_count": total, "sample_paths": paths}
+        resolved = []
+        snippet_items = {}  # source_id -> [item]
+        prefix_items = []  # (item, source_id, rel_prefix)
+        missing_stats = {}  # source_id -> [item]
+        for tok in tokens:
+            s, rel_prefix = index.find(tok)
+            if not s:
+                resolved.append({"token": tok, "found": False})
+                continue
+            item = {"token": tok, "found": True, "source": s}
+            resolved.append(item)
+
+            if s.get("source_type") == "url":
+                item["url"] = s.get("url")
+            elif s.get("source_type") == "dir":
+                if rel_prefix:
+                    item["rel_path"] = rel_prefix
+                    prefix_items.append((item, s["source_id"], rel_prefix))
+                    continue
+                stats = (s.get("meta") or {}).get("stats")
+                if stats:
+                    item["dir"] = stats
                 else:
-                    # file/image: try return snippet if indexed
-                    cursor.execute(
-                        """
-                        SELECT LEFT(content_text, 2500) AS snippet, rel_path
-                        FROM research_documents
-                        WHERE session_id=%s AND source_id=%s
-                        ORDER BY created_at DESC
-                        LIMIT 1
-                    """,
-                        (session_id, s.get("source_id")),
-                    )
-                    row = cursor.fetchone()
-                    if row and row.get("snippet"):
+                    missing_stats.setdefault(s["source_id"], []).append(item)
+            else:
+                # file/image: try return snippet if indexed
+                snippet_items.setdefault(s["source_id"], []).append(item)
+
+        if not (snippet_items or prefix_items or missing_stats):
+            return jsonify({"resolved": resolved}), 200
+
+        conn = get_mysql_connection()
+        if not conn:
+            return jsonify({"error": "MySQL not available"}), 503
+
+        cursor = None
+        try:
+            cursor = conn.cursor(pymysql.cursors.DictCursor)
+            if snippet_items:
+                placeholders = ", ".join(["%s"] * len(snippet_items))
+                cursor.execute(
+                    f"""
+                    SELECT source_id, LEFT(content_text, 2500) AS snippet, rel_path
+                    FROM research_documents
+                    WHERE session_id=%s AND source_id IN ({placeholders})
+                    ORDER BY created_at DESC
+                """,
+                    (session_id, *snippet_items),
+                )
+                for row in cursor.fetchall() or []:
+                    items = snippet_items.pop(row["source_id"], None)
+                    if not items or not row.get("snippet"):
+                        continue
+                    for item in items:
                         item["snippet"] = row.get("snippet")
                         item["rel_path"] = row.get("rel_path")
 
-                resolved.append(item)
+            for item, source_id, rel_prefix in prefix_items:
+                like = rel_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                cursor.execute(
+                    """
+                    SELECT rel_path
+                    FROM research_documents
+                    WHERE session_id=%s AND source_id=%s AND rel_path LIKE %s
+                    ORDER BY created_at DESC
+                """,
+                    (session_id, source_id, like),
+                )
+                paths = [r["rel_path"] for r in cursor.fetchall() or []]
+                item["dir"] = {"doc_count": len(paths), "sample_paths": paths[:30]}
+
+            if missing_stats:
+                # 旧目录来源没有预计算统计：补算一次并写回，之后走缓存
+                stats = refresh_source_stats(conn, session_id, missing_stats)
+                for source_id, items in missing_stats.items():
+                    for item in items:
+                        item["dir"] = stats.get(source_id)
+                invalidate_research_sources(session_id)
 
             return jsonify({"resolved": resolved}), 200
         finally:
@@ -7493,6 +7589,7 @@ def update_session_name(session_id):
             )
 
             conn.commit()
+            invalidate_session(session_id, cascade=session_type == "agent")
             # 如果是角色（agent），则沉淀一个新版本
             if session_type == "agent":
                 try:
@@ -7549,6 +7646,7 @@ def update_session_avatar(session_id):
                 (avatar, session_id),
             )
             conn.commit()
+            invalidate_session(session_id, cascade=session_type == "agent")
 
             # 如果是角色（agent），则沉淀一个新版本
             if session_type == "agent":
@@ -7611,6 +7709,7 @@ def update_session_system_prompt(session_id):
                 (system_prompt, session_id),
             )
             conn.commit()
+            invalidate_session(session_id, cascade=session_type == "agent")
 
             # 如果是角色（agent），则沉淀一个新版本
             if session_type == "agent":
@@ -7686,6 +7785,7 @@ def update_session_media_output_path(session_id):
                 (media_output_path, session_id),
             )
             conn.commit()
+            invalidate_session(session_id)
 
             print(
                 f"[Session API] Updated media_output_path for session {session_id}: {media_output_path}"
@@ -8031,6 +8131,7 @@ def update_session_llm_config(session_id):
                 (llm_config_id, session_id),
             )
             conn.commit()
+            invalidate_session(session_id)
 
             # 如果是角色（agent），则沉淀一个新版本
             if session_type == "agent":
@@ -8138,6 +8239,7 @@ def apply_role_to_session(session_id):
                 ),
             )
             conn.commit()
+            invalidate_session(session_id)
 
             return jsonify(
                 {
@@ -8623,6 +8725,7 @@ def update_agent_profile(role_id):
                 WHERE session_id = %s
             """
             cursor.execute(sql, tuple(update_values))
+            invalidate_session(role_id, cascade=True)
 
             version_id = None
             # 版本控制只对 agent 类型会话生效
@@ -8791,6 +8894,7 @@ def activate_role_version(role_id, version_id):
                 ),
             )
             conn.commit()
+            invalidate_session(role_id, cascade=True)
 
             return jsonify(
                 {
@@ -9153,7 +9257,8 @@ def create_skill_pack():
                 message_ids,
             )
 
-            messages = cursor.fetchall()
+            # 总结只用文本：还原 {"$blob"} 文本引用，媒体保留引用（只统计类型）
+            messages = [hydrate_message(dict(m), media=False) for m in cursor.fetchall()]
             if not messages:
                 return jsonify({"error": "No messages found"}), 404
 
@@ -9681,8 +9786,11 @@ def create_sop_skill_pack():
                     """,
                         (json.dumps(current_ext), assign_to_session_id),
                     )
+                    invalidate_session(assign_to_session_id)
 
             conn.commit()
+            if assign_to_session_id:
+                invalidate_skill_assignments(assign_to_session_id)
 
             return jsonify(
                 {
@@ -10079,6 +10187,7 @@ def update_skill_pack(skill_pack_id):
                 return jsonify({"error": "Skill pack not found"}), 404
 
             conn.commit()
+            invalidate_skill_pack(skill_pack_id)
 
             return jsonify({"message": "Skill pack updated successfully"})
 
@@ -10110,6 +10219,13 @@ def delete_skill_pack(skill_pack_id):
         try:
             cursor = conn.cursor()
 
+            # 记录分配对象，删除后失效其技能目录
+            cursor.execute(
+                "SELECT target_session_id FROM skill_pack_assignments WHERE skill_pack_id = %s",
+                (skill_pack_id,),
+            )
+            assigned_to = [row[0] for row in cursor.fetchall()]
+
             cursor.execute(
                 """
                 DELETE FROM skill_packs
@@ -10122,6 +10238,9 @@ def delete_skill_pack(skill_pack_id):
                 return jsonify({"error": "Skill pack not found"}), 404
 
             conn.commit()
+            invalidate_skill_pack(skill_pack_id)
+            for target_session_id in assigned_to:
+                invalidate_skill_assignments(target_session_id)
 
             return jsonify({"message": "Skill pack deleted successfully"})
 
@@ -10195,6 +10314,7 @@ def assign_skill_pack(skill_pack_id):
             )
 
             conn.commit()
+            invalidate_skill_assignments(target_session_id)
 
             return jsonify(
                 {
@@ -10251,6 +10371,7 @@ def unassign_skill_pack(skill_pack_id):
                 return jsonify({"error": "Assignment not found"}), 404
 
             conn.commit()
+            invalidate_skill_assignments(target_session_id)
 
             return jsonify({"message": "Skill pack unassigned successfully"})
 
@@ -10467,6 +10588,7 @@ def set_current_sop(session_id):
             )
 
             conn.commit()
+            invalidate_session(session_id)
 
             return jsonify(
                 {
@@ -10572,6 +10694,7 @@ def execute_message_component(message_id):
                         if isinstance(message["tool_calls"], str)
                         else message["tool_calls"]
                     )
+                    tool_calls = hydrate_message({"tool_calls": tool_calls})["tool_calls"]
                 except (json.JSONDecodeError, TypeError):
                     pass
 
@@ -10705,6 +10828,13 @@ def execute_message_component(message_id):
             except Exception as e:
                 print(f"[Message Execution] Failed to serialize raw_result: {e}")
 
+            # 大字段移入 Blob 存储，行内只保留引用
+            try:
+                logs_json = offload_column(logs_json)
+                raw_result_json = offload_column(raw_result_json)
+            except Exception as e:
+                print(f"[Message Execution] Failed to offload logs/raw_result: {e}")
+
             # 更新执行记录
             cursor.execute(
                 """
@@ -10741,6 +10871,10 @@ def execute_message_component(message_id):
                     "error_message": error_message,
                     "executed_at": datetime.now().isoformat(),
                 }
+                try:
+                    mcp_detail = offload_payload(mcp_detail)
+                except Exception as e:
+                    print(f"[MCP Detail] Failed to offload mcpdetail payload: {e}")
                 mcp_detail_json = json.dumps(mcp_detail, ensure_ascii=False)
 
                 # 查找对应的 assistant 消息（当前消息之前最近的 assistant 消息）
@@ -11427,6 +11561,8 @@ def get_message_execution(message_id):
             # 尝试解析 logs/raw_result 为结构化对象
             parsed_logs = None
             parsed_raw_result = None
+            execution["logs"] = hydrate_column(execution.get("logs"))
+            execution["raw_result"] = hydrate_column(execution.get("raw_result"))
             try:
                 if execution.get("logs"):
                     parsed_logs = json.loads(execution["logs"])
@@ -0,0 +1,163 @@
+"""
+历史消息加载基准：大字段内联 vs Blob 引用
+
+两种模式:
+1. 离线（默认）：构造带 base64 图片与大 MCP 结果的消息，按生产列表读取链路
+   （Message.from_db_row → to_dict → Redis 缓存 JSON → 解析）对比一页历史的耗时与字节数；
+   另测打开单条消息时 hydrate_message 还原的开销（列表与历史读取保持引用，不做还原）
+2. 在线（--session）：对真实会话按页调用 MessageRepository.find_page，
+   在执行 migrate_message_blobs.py 前后各跑一次对比
+
+用法:
+    python benchmark_message_blobs.py [--messages 50] [--image-kb 512] [--rounds 20]
+    python benchmark_message_blobs.py --session <session_id> [--pages 5] [--page-size 50]
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加backend目录到路径
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from models.message import Message
+from services.blob_store import BlobStore, hydrate_message, offload_content, offload_payload
+
+
+def _make_messages(count: int, image_kb: int):
+    image_b64 = base64.b64encode(os.urandom(image_kb * 1024)).decode('ascii')
+    raw_result = {'content': [{'type': 'text', 'text': 'x' * 64 * 1024}]}
+    messages = []
+    for i in range(count):
+        has_media = i % 3 == 0
+        messages.append({
+            'message_id': f'msg_{i:05d}',
+            'session_id': 'bench',
+            'role': 'assistant' if i % 2 else 'user',
+            'content': f'第 {i} 条消息',
+            'ext': {'media': [{'type': 'image', 'mimeType': 'image/png', 'data': image_b64}]} if has_media else {},
+            'mcpdetail': {'raw_result': raw_result, 'logs': ['ok']} if i % 2 else None,
+        })
+    return messages
+
+
+def _to_rows(messages, store=None):
+    """模拟写库：返回 messages 行（JSON 文本列）"""
+    rows = []
+    for m in messages:
+        ext, mcpdetail, content = m['ext'], m['mcpdetail'], m['content']
+        if store is not None:
+            ext = offload_payload(ext, store=store)
+            mcpdetail = offload_payload(mcpdetail, store=store)
+            content = offload_content(content, store=store)
+        rows.append({
+            **m,
+            'content': content,
+            'ext': json.dumps(ext) if ext else None,
+            'mcpdetail': json.dumps(mcpdetail) if mcpdetail else None,
+        })
+    return rows
+
+
+def _load_page(rows):
+    """一次历史加载（MessageService.get_messages_paginated）：行 → Message → dict → 缓存序列化 → 读出"""
+    messages = [Message.from_db_row(r).to_dict() for r in rows]
+    cached = [json.dumps(m, ensure_ascii=False) for m in messages]
+    total = sum(len(c) for c in cached)
+    for c in cached:
+        json.loads(c)
+    return total
+
+
+def _open_messages(rows, store):
+    """逐条打开消息（GET /api/messages/<id>）：引用在此处才还原为内联数据"""
+    total = 0
+    for r in rows:
+        message = hydrate_message(Message.from_db_row(r).to_dict(), store=store)
+        total += len(json.dumps(message, ensure_ascii=False))
+    return total
+
+
+def _time(fn, rounds: int):
+    samples = []
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def run_offline(args):
+    messages = _make_messages(args.messages, args.image_kb)
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root)
+        inline_rows = _to_rows(messages)
+        blob_rows = _to_rows(messages, store)
+
+        inline_ms, inline_bytes = _time(lambda: _load_page(inline_rows), args.rounds)
+        blob_ms, blob_bytes = _time(lambda: _load_page(blob_rows), args.rounds)
+        open_ms, open_bytes = _time(lambda: _open_messages(blob_rows, store), args.rounds)
+
+        print(f"📊 {args.messages} 条消息 / 图片 {args.image_kb}KB / 中位数 {args.rounds} 轮")
+        print(f"  内联:      {inline_ms:8.2f} ms   {inline_bytes / 1024 / 1024:8.2f} MB")
+        print(f"  Blob 引用: {blob_ms:8.2f} ms   {blob_bytes / 1024 / 1024:8.2f} MB")
+        print(f"  逐条打开:  {open_ms:8.2f} ms   {open_bytes / 1024 / 1024:8.2f} MB（单条接口还原，仅供对照）")
+        print(f"  Blob 存储: {store.stats()}")
+
+
+def run_online(args):
+    import yaml
+    from database import get_mysql_connection, init_mysql
+    from models.message import MessageRepository
+
+    with open(backend_dir / 'config.yaml', 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    success, error = init_mysql(config)
+    if not success:
+        print(f"❌ 数据库初始化失败: {error}")
+        return
+
+    repo = MessageRepository(get_mysql_connection)
+
+    def _walk_pages():
+        before = None
+        total_bytes = 0
+        for _ in range(args.pages):
+            rows, has_more = repo.find_page(args.session, limit=args.page_size, before=before)
+            total_bytes += sum(len(json.dumps(r, default=str, ensure_ascii=False)) for r in rows)
+            if not rows or not has_more:
+                break
+            before = rows[-1]['message_id']
+        return total_bytes
+
+    ms, total_bytes = _time(_walk_pages, args.rounds)
+    print(f"📊 会话 {args.session}: {args.pages} 页 × {args.page_size} 条，中位数 {ms:.2f} ms，"
+          f"载荷 {total_bytes / 1024 / 1024:.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史消息加载基准（内联大字段 vs Blob 引用）')
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--image-kb', type=int, default=512)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--session', help='对真实会话做在线基准（迁移前后各运行一次）')
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--page-size', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.session:
+        run_online(args)
+    else:
+        run_offline(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,8 @@ from pathlib import Path
 # MySQL连接池相关
 mysql_pool = None
 mysql_config = None
+# 只读副本连接池（可选，mysql.replica.enabled 时创建）
+mysql_read_pool = None
 
 # Redis相关
 redis_client = None
@@ -24,7 +26,7 @@ def init_mysql(config: dict) -> Tuple[bool, Optional[str]]:
     Returns:
         (success: bool, error_message: Optional[str])
     """
-    global mysql_pool, mysql_config
+    global mysql_pool, mysql_config, mysql_read_pool
 
     mysql_config = config.get("mysql", {})
 
@@ -78,32 +80,38 @@ def init_mysql(config: dict) -> Tuple[bool, Optional[str]]:
         # 创建连接池
         print(f"Creating MySQL connection pool (size={pool_size})...")
 
-        mysql_pool = PooledDB(
-            creator=pymysql,  # 使用pymysql作为数据库连接库
-            maxconnections=pool_size,  # 连接池最大连接数
-            mincached=2,  # 初始化时至少创建的空闲连接
-            maxcached=5,  # 连接池中最多闲置的连接数
-            maxshared=0,  # 不共享连接（0表示每个线程独立连接）
-            blocking=True,  # 连接池满时阻塞等待，而不是报错
-            maxusage=None,  # 单个连接最多被重复使用的次数（None表示无限制）
-            setsession=[],  # 开始会话前执行的命令列表
-            ping=1,  # ping MySQL服务端，检查连接是否可用（0=不ping，1=默认ping，2=乐观ping，4=悲观ping）
-            host=host,
-            port=port,
-            user=user,
-            password=password,
-            database=database,
-            charset=charset,
-            autocommit=True,
-            connect_timeout=10,
-            read_timeout=30,
-            write_timeout=30,
+        mysql_pool = _create_pool(
+            PooledDB, pymysql, mysql_config, "primary",
+            host=host, port=port, user=user, password=password,
+            database=database, charset=charset, pool_size=pool_size,
         )
 
         print(f"✓ MySQL connection pool created successfully (pool_size={pool_size})")
 
-        # 创建表
-        create_tables()
+        # 只读副本连接池（读写分离）
+        replica = mysql_config.get("replica") or {}
+        if replica.get("enabled", False):
+            replica_size = replica.get("pool_size", pool_size)
+            try:
+                mysql_read_pool = _create_pool(
+                    PooledDB, pymysql, {**mysql_config, **replica}, "replica",
+                    host=replica.get("host", host),
+                    port=replica.get("port", port),
+                    user=replica.get("user", user),
+                    password=replica.get("password", password),
+                    database=replica.get("database", database),
+                    charset=charset,
+                    pool_size=replica_size,
+                )
+                print(f"✓ MySQL replica pool created at {replica.get('host', host)} (pool_size={replica_size})")
+            except Exception as e:
+                mysql_read_pool = None
+                print(f"⚠️ MySQL replica pool unavailable, reads fall back to primary: {e}")
+
+        # 执行数据库迁移（已是最新版本时只做一次版本查询）
+        if not mysql_config.get("skip_migrations", False):
+            from migrations import run_migrations
+            run_migrations(get_mysql_connection)
 
         return True, None
 
@@ -125,8 +133,61 @@ def init_mysql(config: dict) -> Tuple[bool, Optional[str]]:
         return False, error_msg
 
 
+
+def _create_pool(
+    pooled_db_cls,
+    creator,
+    cfg: dict,
+    name: str,
+    host: str,
+    port: int,
+    user: str,
+    password: str,
+    database: str,
+    charset: str,
+    pool_size: int,
+):
+    """创建带监控的 PooledDB（见 utils.db_pool.InstrumentedPool）"""
+    from utils.db_pool import InstrumentedPool
+
+    raw_pool = pooled_db_cls(
+        creator=creator,  # 使用pymysql作为数据库连接库
+        maxconnections=pool_size,  # 连接池最大连接数
+        mincached=2,  # 初始化时至少创建的空闲连接
+        maxcached=5,  # 连接池中最多闲置的连接数（运行时按峰值自适应调整）
+        maxshared=0,  # 不共享连接（0表示每个线程独立连接）
+        blocking=True,  # 连接池满时阻塞等待（等待上限由 InstrumentedPool 控制）
+        maxusage=None,  # 单个连接最多被重复使用的次数（None表示无限制）
+        setsession=[],  # 开始会话前执行的命令列表
+        ping=1,  # ping MySQL服务端，检查连接是否可用（0=不ping，1=默认ping，2=乐观ping，4=悲观ping）
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        database=database,
+        charset=charset,
+        autocommit=True,
+        connect_timeout=10,
+        read_timeout=30,
+        write_timeout=30,
+    )
+    return InstrumentedPool(
+        raw_pool,
+        name=name,
+        max_connections=pool_size,
+        checkout_timeout=cfg.get("pool_timeout", 10),
+        slow_query_ms=cfg.get("slow_query_ms", 500),
+        leak_threshold=cfg.get("leak_threshold", 60),
+    )
+
+
 def create_tables():
-    """创建必要的数据库表"""
+    """
+    创建必要的数据库表
+
+    作为 v1 基线迁移由 migrations.run_migrations 执行一次；
+    之后的表结构变更请在 migrations/versions.py 中追加迁移步骤，不要再往这里添加。
+    """
     conn = get_mysql_connection()
     if not conn:
         return
@@ -1049,6 +1110,7 @@ def create_tables():
             INDEX `idx_sender_id` (`sender_id`),
             INDEX `idx_created_at` (`created_at`),
             INDEX `idx_session_created` (`session_id`, `created_at`),
+            INDEX `idx_session_created_msg` (`session_id`, `created_at`, `message_id`),
             FOREIGN KEY (`session_id`) REFERENCES `sessions`(`session_id`) ON DELETE CASCADE
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='消息表';
         """
@@ -1596,13 +1658,17 @@ def check_connections() -> Tuple[bool, bool]:
     return mysql_ok, redis_ok
 
 
-def get_mysql_connection():
+def get_mysql_connection(read_only: bool = False):
     """
     从连接池获取MySQL连接
 
+    Args:
+        read_only: 只读查询；配置了副本池时从副本获取，否则回退主库。
+            副本有复制延迟，刚写入的数据可能读不到：写后立即回读的路径以及会写入缓存的读取不要使用
+
     Returns:
         MySQL连接对象，使用完毕后需要调用 close() 归还到连接池
-        如果MySQL未启用或连接池不可用则返回None
+        如果MySQL未启用、连接池不可用或池耗尽等待超时则返回None
     """
     global mysql_pool, mysql_config
 
@@ -1613,13 +1679,15 @@ def get_mysql_connection():
         print("[MySQL Pool] Connection pool is not initialized")
         return None
 
+    pool = mysql_read_pool if (read_only and mysql_read_pool is not None) else mysql_pool
     try:
         # 从连接池获取连接
         # DBUtils 的 PooledDB 会自动：
         # 1. 检查连接是否有效（如果 ping=1）
         # 2. 如果连接失效，自动创建新连接
         # 3. 管理连接的生命周期
-        conn = mysql_pool.connection()
+        # InstrumentedPool 额外记录等待/占用耗时，并在池耗尽超时时返回 None
+        conn = pool.connection()
         return conn
 
     except Exception as e:
@@ -1630,6 +1698,19 @@ def get_mysql_connection():
         return None
 
 
+def get_pool_metrics() -> dict:
+    """
+    获取连接池监控指标（主库 + 只读副本）
+
+    Returns:
+        {'primary': {...}, 'replica': {...} | None}
+    """
+    return {
+        "primary": mysql_pool.snapshot() if mysql_pool is not None else None,
+        "replica": mysql_read_pool.snapshot() if mysql_read_pool is not None else None,
+    }
+
+
 def get_redis_client():
     """获取Redis客户端"""
     return redis_client
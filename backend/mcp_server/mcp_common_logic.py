@@ -4,11 +4,17 @@ MCP 服务器通用逻辑
 """
 
 import json
+import logging
 import re
 import time
 import requests
 from typing import Optional, Dict, Any
 from database import get_mysql_connection, get_oauth_token, is_token_expired, refresh_oauth_token, get_oauth_config
+from utils.cancellation import CancellationToken, CancelledError, current_cancel_token
+from utils.log_pipeline import get_category_logger, log_event, preview
+
+# 工具调用热路径日志（队列异步写出，见 utils/log_pipeline）
+_mcp_log = get_category_logger("mcp")
 
 # 连接池：为每个 MCP URL 维护一个 Session
 _mcp_sessions: Dict[str, requests.Session] = {}
@@ -48,7 +54,7 @@ def get_mcp_session(mcp_url: str) -> requests.Session:
         # 设置默认超时（增加到120秒以支持慢速MCP服务器）
         session.timeout = 120
         _mcp_sessions[normalized_url] = session
-        print(f"[MCP Common] Created new session for {normalized_url[:50]}...")
+        log_event(_mcp_log, logging.DEBUG, "Created MCP session", url=normalized_url)
     return _mcp_sessions[normalized_url]
 
 
@@ -69,12 +75,12 @@ def invalidate_mcp_connection(mcp_url: str):
         except Exception:
             pass
         del _mcp_sessions[normalized_url]
-        print(f"[MCP Common] 🗑️ Removed session for {normalized_url[:50]}...")
+        log_event(_mcp_log, logging.DEBUG, "Removed MCP session", url=normalized_url)
     
     # 2. 清除 Session ID
     if normalized_url in _mcp_session_ids:
         del _mcp_session_ids[normalized_url]
-        print(f"[MCP Common] 🗑️ Removed session-id for {normalized_url[:50]}...")
+        log_event(_mcp_log, logging.DEBUG, "Removed mcp-session-id", url=normalized_url)
     
     # 3. 清除相关缓存
     cache_keys_to_remove = [k for k in _response_cache.keys() if normalized_url in k]
@@ -83,7 +89,7 @@ def invalidate_mcp_connection(mcp_url: str):
         if key in _cache_timestamps:
             del _cache_timestamps[key]
     if cache_keys_to_remove:
-        print(f"[MCP Common] 🗑️ Cleared {len(cache_keys_to_remove)} cache entries for {normalized_url[:50]}...")
+        log_event(_mcp_log, logging.DEBUG, "Cleared cached responses", url=normalized_url, entries=len(cache_keys_to_remove))
     
     # 4. 更新健康状态
     _mcp_health_status[normalized_url] = {
@@ -110,7 +116,7 @@ def reset_mcp_connection(mcp_url: str):
     if normalized_url in _mcp_health_status:
         _mcp_health_status[normalized_url]['error_count'] = 0
     
-    print(f"[MCP Common] 🔄 Reset connection for {normalized_url[:50]}...")
+    log_event(_mcp_log, logging.INFO, "Reset MCP connection", url=normalized_url)
 
 
 def is_mcp_healthy(mcp_url: str) -> bool:
@@ -150,7 +156,7 @@ def mark_mcp_healthy(mcp_url: str):
         'error_count': 0,
         'last_error': None,
     }
-    print(f"[MCP Common] ✅ Marked {normalized_url[:50]}... as healthy")
+    log_event(_mcp_log, logging.DEBUG, "Marked MCP healthy", url=normalized_url)
 
 
 def mark_mcp_unhealthy(mcp_url: str, error: str):
@@ -171,7 +177,7 @@ def mark_mcp_unhealthy(mcp_url: str, error: str):
         'error_count': error_count,
         'last_error': error,
     }
-    print(f"[MCP Common] ❌ Marked {normalized_url[:50]}... as unhealthy (error #{error_count}): {error[:100]}")
+    log_event(_mcp_log, logging.WARNING, "Marked MCP unhealthy", url=normalized_url, error_count=error_count, error=preview(error))
 
 
 def check_and_recover_mcp(mcp_url: str, headers: Dict[str, str] = None) -> bool:
@@ -196,16 +202,16 @@ def check_and_recover_mcp(mcp_url: str, headers: Dict[str, str] = None) -> bool:
         # 准备 headers（可能需要添加 OAuth token 等）
         headers = prepare_mcp_headers(normalized_url, headers, headers)
     
-    print(f"[MCP Common] 🔍 Checking health of {normalized_url[:50]}...")
+    log_event(_mcp_log, logging.DEBUG, "Checking MCP health", url=normalized_url)
     
     # 尝试获取工具列表（这会自动处理重连）
     tools_response = get_mcp_tools_list(normalized_url, headers, use_cache=False, auto_reconnect=True)
     
     if tools_response and 'result' in tools_response:
-        print(f"[MCP Common] ✅ MCP {normalized_url[:50]}... is healthy")
+        log_event(_mcp_log, logging.DEBUG, "MCP health check passed", url=normalized_url)
         return True
     else:
-        print(f"[MCP Common] ❌ MCP {normalized_url[:50]}... health check failed")
+        log_event(_mcp_log, logging.WARNING, "MCP health check failed", url=normalized_url)
         return False
 
 
@@ -251,7 +257,7 @@ def get_cached_response(cache_key: str) -> Optional[Dict[str, Any]]:
         del _cache_timestamps[cache_key]
         return None
     
-    print(f"[MCP Common] ✅ Using cached response for {cache_key[:50]}...")
+    log_event(_mcp_log, logging.DEBUG, "Using cached response", key=cache_key)
     return _response_cache[cache_key]
 
 def set_cached_response(cache_key: str, response: Dict[str, Any]):
@@ -264,7 +270,7 @@ def set_cached_response(cache_key: str, response: Dict[str, Any]):
     """
     _response_cache[cache_key] = response
     _cache_timestamps[cache_key] = time.time()
-    print(f"[MCP Common] ✅ Cached response for {cache_key[:50]}...")
+    log_event(_mcp_log, logging.DEBUG, "Cached response", key=cache_key)
 
 
 def _get_cached_server_config(cache_key: str) -> Optional[Dict[str, Any]]:
@@ -353,7 +359,7 @@ def get_mcp_server_config(target_url: str) -> Optional[Dict[str, Any]]:
             _set_cached_server_config(cache_key, config)
             return config
     except Exception as db_error:
-        print(f"[MCP Common] Warning: Failed to load server config from DB: {db_error}")
+        log_event(_mcp_log, logging.WARNING, "Failed to load server config from DB", url=target_url, error=db_error)
         return None
 
 
@@ -389,7 +395,7 @@ def prepare_mcp_headers(target_url: str, request_headers: Dict[str, str], base_h
         normalized_target_url = (target_url or '').strip().rstrip('/')
         if 'mcp-session-id' not in headers and normalized_target_url in _mcp_session_ids:
             headers['mcp-session-id'] = _mcp_session_ids[normalized_target_url]
-            print(f"[MCP Common] Reusing cached mcp-session-id for {normalized_target_url[:40]}...")
+            log_event(_mcp_log, logging.DEBUG, "Reusing cached mcp-session-id", url=normalized_target_url)
     except Exception:
         pass
     
@@ -402,7 +408,7 @@ def prepare_mcp_headers(target_url: str, request_headers: Dict[str, str], base_h
         normalized_target_url = (target_url or '').strip().rstrip('/')
         server_type = ext.get('server_type')
         if server_type in ('notion', 'http_oauth'):  # Notion / 通用 HTTP OAuth MCP（MCP OAuth 2.1）
-            print(f"[MCP Common] Checking OAuth token for {server_type} server...")
+            log_event(_mcp_log, logging.DEBUG, "Checking OAuth token", url=normalized_target_url, server_type=server_type)
 
             # 获取 OAuth token
             token_info = get_oauth_token_for_server(normalized_target_url, (target_url or '').strip())
@@ -411,46 +417,44 @@ def prepare_mcp_headers(target_url: str, request_headers: Dict[str, str], base_h
                 access_token = token_info.get('access_token')
                 if access_token:
                     headers['Authorization'] = f"Bearer {access_token}"
-                    print(f"[MCP Common] Using OAuth token: {access_token[:20]}...")
+                    log_event(_mcp_log, logging.DEBUG, "Using OAuth token", url=normalized_target_url)
 
         # 从 metadata.headers 中获取配置的请求头
         if isinstance(metadata, dict) and 'headers' in metadata:
             config_headers = metadata['headers']
             if isinstance(config_headers, dict):
-                print(f"[MCP Common] Applying headers from server config")
+                log_event(_mcp_log, logging.DEBUG, "Applying headers from server config", headers=",".join(config_headers))
                 for header_name, header_value in config_headers.items():
                     # Authorization header 优先使用 OAuth token（如果存在）
                     if header_name == 'Authorization' and 'Authorization' in headers:
-                        print(f"[MCP Common] Skipping DB Authorization header, using OAuth token")
+                        log_event(_mcp_log, logging.DEBUG, "Skipping DB Authorization header, using OAuth token")
                         continue
 
                     # 如果客户端没有发送该 header，使用数据库中的配置
                     if header_name not in request_headers or not request_headers.get(header_name):
                         headers[header_name] = header_value
-                        print(f"[MCP Common] Added header from DB config: {header_name}")
+                        log_event(_mcp_log, logging.DEBUG, "Added header from DB config", header=header_name)
                     else:
-                        print(f"[MCP Common] Client already sent {header_name}, using client value")
+                        log_event(_mcp_log, logging.DEBUG, "Client header overrides DB config", header=header_name)
     
     # 转发客户端的 Authorization header（客户端优先）
     if 'Authorization' in request_headers:
         headers['Authorization'] = request_headers.get('Authorization')
-        auth_preview = headers['Authorization'][:30] + '...' if len(headers['Authorization']) > 30 else headers['Authorization']
-        print(f"[MCP Common] Using Authorization header from client: {auth_preview}")
+        log_event(_mcp_log, logging.DEBUG, "Using Authorization header", source="client")
     elif 'Authorization' in headers:
-        auth_preview = headers['Authorization'][:30] + '...' if len(headers['Authorization']) > 30 else headers['Authorization']
-        print(f"[MCP Common] Using Authorization header from DB config: {auth_preview}")
+        log_event(_mcp_log, logging.DEBUG, "Using Authorization header", source="config")
     
     # 转发 Notion-Version 等自定义 headers
     if 'Notion-Version' in request_headers:
         headers['Notion-Version'] = request_headers.get('Notion-Version')
-        print(f"[MCP Common] Forwarding Notion-Version header from client")
+        log_event(_mcp_log, logging.DEBUG, "Forwarding client header", header="Notion-Version")
     
     # 转发其他自定义 headers
     custom_header_prefixes = ['x-', 'X-']
     for header_name in request_headers.keys():
         if any(header_name.startswith(prefix) for prefix in custom_header_prefixes):
             headers[header_name] = request_headers.get(header_name)
-            print(f"[MCP Common] Forwarding custom header: {header_name}")
+            log_event(_mcp_log, logging.DEBUG, "Forwarding client header", header=header_name)
     
     return headers
 
@@ -474,13 +478,13 @@ def get_oauth_token_for_server(normalized_url: str, original_url: str) -> Option
     
     # 如果没找到，尝试带尾随斜杠的版本
     if not token_info and original_url != normalized_url:
-        print(f"[MCP Common] Trying with trailing slash: {original_url}")
+        log_event(_mcp_log, logging.DEBUG, "OAuth token lookup with trailing slash", url=original_url)
         token_info = get_oauth_token(original_url)
     
     if token_info:
         # 检查 token 是否过期
         if is_token_expired(token_info):
-            print(f"[MCP Common] Token expired, attempting refresh...")
+            log_event(_mcp_log, logging.INFO, "OAuth token expired, refreshing", url=normalized_url)
             
             # 尝试刷新 token
             oauth_config = get_oauth_config(f"refresh_{normalized_url}")
@@ -489,14 +493,14 @@ def get_oauth_token_for_server(normalized_url: str, original_url: str) -> Option
                 oauth_config = get_oauth_config(f"refresh_{original_url}")
             
             if not oauth_config:
-                print(f"[MCP Common] OAuth config not found for refresh, skipping refresh")
+                log_event(_mcp_log, logging.WARNING, "OAuth config not found for refresh", url=normalized_url)
             else:
                 new_token_info = refresh_oauth_token(normalized_url, token_info, oauth_config)
                 if new_token_info:
                     token_info = new_token_info
-                    print(f"[MCP Common] ✅ Token refreshed successfully")
+                    log_event(_mcp_log, logging.INFO, "OAuth token refreshed", url=normalized_url)
                 else:
-                    print(f"[MCP Common] ⚠️ Token refresh failed, using expired token")
+                    log_event(_mcp_log, logging.WARNING, "OAuth token refresh failed, using expired token", url=normalized_url)
     
     return token_info
 
@@ -520,16 +524,16 @@ def initialize_mcp_session(target_url: str, headers: Dict[str, str], auto_reconn
     # 🔑 初始化时清理旧的 session-id，因为我们要建立新的 session
     # 这避免了使用缓存的失效 session-id 导致 404 错误
     if 'mcp-session-id' in headers:
-        print(f"[MCP Common] 🗑️ Clearing old mcp-session-id before initialize")
+        log_event(_mcp_log, logging.DEBUG, "Clearing mcp-session-id before initialize", url=normalized_url)
         del headers['mcp-session-id']
     if normalized_url in _mcp_session_ids:
         del _mcp_session_ids[normalized_url]
-        print(f"[MCP Common] 🗑️ Cleared cached session-id for {normalized_url[:50]}...")
+        log_event(_mcp_log, logging.DEBUG, "Cleared cached mcp-session-id", url=normalized_url)
     
     for attempt in range(max_attempts):
         try:
             if attempt > 0:
-                print(f"[MCP Common] 🔄 Retry initialize attempt {attempt + 1}/{max_attempts} for {normalized_url[:50]}...")
+                log_event(_mcp_log, logging.INFO, "Retrying initialize", url=normalized_url, attempt=attempt + 1, max_attempts=max_attempts)
                 # 重试前清理旧连接
                 invalidate_mcp_connection(normalized_url)
                 # 移除 headers 中的旧 session-id
@@ -552,13 +556,10 @@ def initialize_mcp_session(target_url: str, headers: Dict[str, str], auto_reconn
                 }
             }
             
-            print(f"[MCP Common] Initializing session with {target_url}")
-            print(f"[MCP Common]   Request headers: {headers}")
-            print(f"[MCP Common]   Request body: {init_request}")
+            log_event(_mcp_log, logging.DEBUG, "Initializing session", url=target_url, headers=",".join(headers))
             # 使用连接池，较短的超时（初始化应该很快）
             session = get_mcp_session(target_url)
             response = session.post(target_url, json=init_request, headers=headers, timeout=10)
-            print(f"[MCP Common]   Response status: {response.status_code}")
             
             if response.ok:
                 # 续传 mcp-session-id（很多 streamable-http server 需要）
@@ -569,7 +570,7 @@ def initialize_mcp_session(target_url: str, headers: Dict[str, str], auto_reconn
                         _mcp_session_ids[normalized_url] = sid
                     except Exception:
                         pass
-                    print(f"[MCP Common] ✅ Received mcp-session-id: {sid[:12]}...")
+                    log_event(_mcp_log, logging.DEBUG, "Received mcp-session-id", url=normalized_url, session=sid[:12])
 
                 # 兼容：initialize 可能返回 SSE
                 content_type = (response.headers.get('Content-Type') or '').lower()
@@ -580,35 +581,36 @@ def initialize_mcp_session(target_url: str, headers: Dict[str, str], auto_reconn
 
                 # 成功，标记为健康
                 mark_mcp_healthy(normalized_url)
-                print(f"[MCP Common] ✅ Session initialized successfully")
+                log_event(_mcp_log, logging.INFO, "Session initialized", url=normalized_url)
                 return init_response
             else:
                 # 详细错误诊断
                 last_error = f"HTTP {response.status_code}: {response.text[:200]}"
-                print(f"[MCP Common] ❌ Failed to initialize session: {response.status_code}")
-                print(f"[MCP Common]   Response headers: {dict(response.headers)}")
-                print(f"[MCP Common]   Response body: {response.text[:500]}")
-                print(f"[MCP Common]   Request headers sent: {headers}")
+                log_event(
+                    _mcp_log, logging.WARNING, "Initialize failed",
+                    url=normalized_url, status=response.status_code, body=preview(response.text),
+                    headers=",".join(headers),
+                )
                 continue
                 
         except requests.exceptions.Timeout:
             last_error = "Timeout"
-            print(f"[MCP Common] ❌ Initialize timeout: {target_url}")
+            log_event(_mcp_log, logging.WARNING, "Initialize timeout", url=target_url)
             continue
         except requests.exceptions.ConnectionError as e:
             last_error = f"Connection error: {e}"
-            print(f"[MCP Common] ❌ Connection error: {e}")
+            log_event(_mcp_log, logging.WARNING, "Connection error", url=target_url, error=e)
             # 连接错误时清理旧连接
             invalidate_mcp_connection(normalized_url)
             continue
         except Exception as e:
             last_error = str(e)
-            print(f"[MCP Common] ❌ Error initializing session: {e}")
+            log_event(_mcp_log, logging.ERROR, "Error initializing session", url=target_url, error=e)
             continue
     
     # 所有重试都失败，标记为不健康
     mark_mcp_unhealthy(normalized_url, last_error or "Unknown error")
-    print(f"[MCP Common] ❌ All {max_attempts} initialize attempts failed for {normalized_url[:50]}...")
+    log_event(_mcp_log, logging.ERROR, "All initialize attempts failed", url=normalized_url, attempts=max_attempts, error=last_error)
     return None
 
 
@@ -632,19 +634,18 @@ def send_mcp_notification(target_url: str, method: str, params: Dict[str, Any],
             'params': params
         }
         
-        print(f"[MCP Common] Sending notification: {method}")
+        log_event(_mcp_log, logging.DEBUG, "Sending notification", url=target_url, method=method)
         # 使用连接池，较短的超时（通知不需要响应）
         session = get_mcp_session(target_url)
         response = session.post(target_url, json=notification, headers=headers, timeout=5)
         
         if response.ok:
-            print(f"[MCP Common] ✅ Notification sent successfully")
             return True
         else:
-            print(f"[MCP Common] ❌ Failed to send notification: {response.status_code}")
+            log_event(_mcp_log, logging.WARNING, "Notification failed", url=target_url, method=method, status=response.status_code)
             return False
     except Exception as e:
-        print(f"[MCP Common] ❌ Error sending notification: {e}")
+        log_event(_mcp_log, logging.ERROR, "Error sending notification", url=target_url, method=method, error=e)
         return False
 
 
@@ -672,7 +673,7 @@ def get_mcp_tools_list(target_url: str, headers: Dict[str, str], use_cache: bool
     
     # 检查健康状态
     if not is_mcp_healthy(normalized_url):
-        print(f"[MCP Common] ⚠️ MCP {normalized_url[:50]}... marked as unhealthy, will try to reconnect")
+        log_event(_mcp_log, logging.INFO, "MCP marked unhealthy, reconnecting", url=normalized_url)
         # 清理旧连接，准备重新建立
         reset_mcp_connection(normalized_url)
     
@@ -690,7 +691,7 @@ def get_mcp_tools_list(target_url: str, headers: Dict[str, str], use_cache: bool
             }
             
             if attempt > 0:
-                print(f"[MCP Common] 🔄 Retry attempt {attempt + 1}/{max_attempts} for {normalized_url[:50]}...")
+                log_event(_mcp_log, logging.INFO, "Retrying tools/list", url=normalized_url, attempt=attempt + 1, max_attempts=max_attempts)
                 # 重试前清理旧连接和 session-id
                 invalidate_mcp_connection(normalized_url)
                 # 移除 headers 中的旧 session-id
@@ -699,7 +700,7 @@ def get_mcp_tools_list(target_url: str, headers: Dict[str, str], use_cache: bool
                 # 短暂等待
                 time.sleep(0.5 * attempt)
             
-            print(f"[MCP Common] Getting tools list from {target_url}")
+            log_event(_mcp_log, logging.DEBUG, "Getting tools list", url=target_url)
             # 使用连接池，中等超时（工具列表应该较快）
             session = get_mcp_session(target_url)
             response = session.post(target_url, json=tools_request, headers=headers, timeout=15)
@@ -713,7 +714,7 @@ def get_mcp_tools_list(target_url: str, headers: Dict[str, str], use_cache: bool
                         _mcp_session_ids[normalized_url] = sid
                     except Exception:
                         pass
-                    print(f"[MCP Common] ✅ Updated mcp-session-id: {sid[:12]}...")
+                    log_event(_mcp_log, logging.DEBUG, "Updated mcp-session-id", url=normalized_url, session=sid[:12])
 
                 # 兼容：tools/list 可能返回 SSE（proxy 会转换，但这里直接调用 server 时要自己解析）
                 content_type = (response.headers.get('Content-Type') or '').lower()
@@ -729,40 +730,41 @@ def get_mcp_tools_list(target_url: str, headers: Dict[str, str], use_cache: bool
                     # 缓存响应
                     if use_cache:
                         set_cached_response(cache_key, tools_response)
-                    print(f"[MCP Common] ✅ Tools list retrieved successfully")
+                    log_event(_mcp_log, logging.DEBUG, "Tools list retrieved", url=normalized_url)
                     return tools_response
                 else:
                     # 响应无效，可能是 session 问题
                     last_error = f"Invalid response: {str(tools_response)[:200]}"
-                    print(f"[MCP Common] ❌ Invalid tools list response: {last_error}")
+                    log_event(_mcp_log, logging.WARNING, "Invalid tools list response", url=normalized_url, response=preview(str(tools_response)))
                     continue
             else:
                 # HTTP 错误
                 last_error = f"HTTP {response.status_code}: {response.text[:200]}"
-                print(f"[MCP Common] ❌ Failed to get tools list: {response.status_code}")
-                print(f"[MCP Common]   Response headers: {dict(response.headers)}")
-                print(f"[MCP Common]   Response body: {response.text[:500]}")
-                print(f"[MCP Common]   Request headers sent: {headers}")
+                log_event(
+                    _mcp_log, logging.WARNING, "tools/list failed",
+                    url=normalized_url, status=response.status_code, body=preview(response.text),
+                    headers=",".join(headers),
+                )
                 continue
                 
         except requests.exceptions.Timeout:
             last_error = "Timeout"
-            print(f"[MCP Common] ❌ Tools list timeout: {target_url}")
+            log_event(_mcp_log, logging.WARNING, "tools/list timeout", url=target_url)
             continue
         except requests.exceptions.ConnectionError as e:
             last_error = f"Connection error: {e}"
-            print(f"[MCP Common] ❌ Connection error: {e}")
+            log_event(_mcp_log, logging.WARNING, "Connection error", url=target_url, error=e)
             # 连接错误时清理旧连接
             invalidate_mcp_connection(normalized_url)
             continue
         except Exception as e:
             last_error = str(e)
-            print(f"[MCP Common] ❌ Error getting tools list: {e}")
+            log_event(_mcp_log, logging.ERROR, "Error getting tools list", url=target_url, error=e)
             continue
     
     # 所有重试都失败，标记为不健康
     mark_mcp_unhealthy(normalized_url, last_error or "Unknown error")
-    print(f"[MCP Common] ❌ All {max_attempts} attempts failed for {normalized_url[:50]}...")
+    log_event(_mcp_log, logging.ERROR, "All tools/list attempts failed", url=normalized_url, attempts=max_attempts, error=last_error)
     return None
 
 
@@ -826,36 +828,61 @@ def parse_mcp_jsonrpc_response(data: str) -> Optional[Dict[str, Any]]:
 
         # 验证 JSON-RPC 格式
         if not isinstance(response_data, dict):
-            print(f"[MCP Parse] Invalid response format: not a dict")
+            log_event(_mcp_log, logging.WARNING, "Invalid JSON-RPC response: not an object")
             return None
 
         if response_data.get('jsonrpc') != '2.0':
-            print(f"[MCP Parse] Invalid JSON-RPC version: {response_data.get('jsonrpc')}")
+            log_event(_mcp_log, logging.WARNING, "Invalid JSON-RPC version", version=response_data.get('jsonrpc'))
             return None
 
         # 检查是否有错误
         if 'error' in response_data:
             error = response_data['error']
-            print(f"[MCP Parse] Error in response: {error.get('code', 'unknown')} - {error.get('message', 'unknown error')}")
+            log_event(
+                _mcp_log, logging.INFO, "JSON-RPC error response",
+                code=error.get('code', 'unknown'), error=error.get('message', 'unknown error'),
+            )
             return response_data
 
         # 检查是否有结果
         if 'result' not in response_data:
-            print(f"[MCP Parse] No result in response")
+            log_event(_mcp_log, logging.WARNING, "JSON-RPC response has no result")
             return None
 
         return response_data
 
     except json.JSONDecodeError as e:
-        print(f"[MCP Parse] ❌ JSON decode error: {e}")
-        print(f"[MCP Parse] Raw data: {data[:200]}...")
+        log_event(_mcp_log, logging.WARNING, "JSON-RPC decode error", error=e, raw=preview(data))
         return None
     except Exception as e:
-        print(f"[MCP Parse] ❌ Error parsing response: {e}")
+        log_event(_mcp_log, logging.ERROR, "Error parsing JSON-RPC response", error=e)
         return None
 
 
-def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool_args: Dict[str, Any], add_log=None, max_retries: int = 3) -> Dict[str, Any]:
+def _backoff(token: Optional[CancellationToken], wait_time: float) -> None:
+    """重试退避：有取消令牌时可被打断"""
+    if token is None:
+        time.sleep(wait_time)
+    else:
+        token.wait(wait_time)
+
+
+def _read_body(response: requests.Response, token: Optional[CancellationToken]) -> bytes:
+    """读取响应体；读取期间取消令牌触发时关闭连接并抛出 CancelledError"""
+    if token is None:
+        return response.content
+    unregister = token.on_cancel(response.close)
+    try:
+        return response.content
+    except Exception:
+        token.raise_if_cancelled()
+        raise
+    finally:
+        unregister()
+
+
+def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool_args: Dict[str, Any], add_log=None, max_retries: int = 3,
+                  cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
     """
     调用 MCP 工具（带重试机制）
     
@@ -866,35 +893,33 @@ def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool
         tool_args: 工具参数
         add_log: 日志回调函数（可选）
         max_retries: 最大重试次数（默认3次）
+        cancel_token: 取消令牌（默认取当前上下文绑定的令牌）；触发后不再重试，
+            正在读取的响应连接立即关闭
         
     Returns:
         结构化结果：
         - 成功: {"success": True, "data": ..., "tool_name": ...}
         - 网络错误: {"success": False, "error_type": "network", "error": ..., "http_code": ...}
         - 业务错误: {"success": False, "error_type": "business", "error": ..., "error_code": ...}
+        - 已取消: {"success": False, "error_type": "cancelled", "error": ...}
     """
-    # ANSI 颜色码
-    BLUE = '\033[94m'
-    GREEN = '\033[92m'
-    YELLOW = '\033[93m'
-    RED = '\033[91m'
-    RESET = '\033[0m'
-    BOLD = '\033[1m'
-    
-    print(f"{BLUE}{BOLD}[MCP TOOL] ========== call_mcp_tool 开始 =========={RESET}")
-    print(f"{BLUE}[MCP TOOL] 工具: {tool_name}{RESET}")
-    print(f"{BLUE}[MCP TOOL] URL: {target_url[:60]}...{RESET}")
-    print(f"{BLUE}[MCP TOOL] 参数 keys: {list(tool_args.keys())}{RESET}")
-    
+    started = time.time()
     last_error = None
+    token = cancel_token or current_cancel_token()
     
     # 保存已有的 mcp-session-id，防止被覆盖
     existing_session_id = headers.get('mcp-session-id')
-    print(f"{BLUE}[MCP TOOL] Session ID: {existing_session_id[:16] if existing_session_id else 'None'}...{RESET}")
+    log_event(
+        _mcp_log, logging.INFO, "call_mcp_tool 开始",
+        tool=tool_name, url=target_url, arg_keys=",".join(tool_args.keys()),
+        session=existing_session_id[:16] if existing_session_id else None,
+    )
     
     for attempt in range(max_retries):
-        print(f"{YELLOW}[MCP TOOL] 尝试 {attempt + 1}/{max_retries}{RESET}")
         try:
+            if token is not None:
+                token.raise_if_cancelled()
+
             # 准备请求头（包括OAuth token等）
             # 注意：传入 headers 的副本作为 base_headers，确保已有字段（如 session_id）不丢失
             prepared_headers = prepare_mcp_headers(target_url, headers, headers.copy())
@@ -902,7 +927,7 @@ def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool
             # 确保 session_id 被保留（防止 prepare_mcp_headers 覆盖）
             if existing_session_id and 'mcp-session-id' not in prepared_headers:
                 prepared_headers['mcp-session-id'] = existing_session_id
-                print(f"[MCP Common] Restored mcp-session-id: {existing_session_id[:12]}...")
+                log_event(_mcp_log, logging.DEBUG, "Restored mcp-session-id", tool=tool_name, session=existing_session_id[:12])
             
             # 构建工具调用请求
             tool_request = {
@@ -925,24 +950,20 @@ def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool
             elif add_log and attempt > 0:
                 add_log(f"重试调用MCP工具: {tool_name} (尝试 {attempt + 1}/{max_retries})")
             
-            # 发送请求前打印调试信息
-            print(f"{BLUE}[MCP TOOL] 发送 POST 请求...{RESET}")
-            print(f"{BLUE}[MCP TOOL]   URL: {target_url}{RESET}")
-            print(f"{BLUE}[MCP TOOL]   Session ID: {prepared_headers.get('mcp-session-id', 'N/A')[:20]}...{RESET}")
-            
             # 发送请求（使用连接池）
             # 工具调用可能需要较长时间，特别是涉及浏览器操作时，使用较长的超时
             # 对于涉及页面加载的操作，需要等待页面完全加载，超时设置为 60 秒
             session = get_mcp_session(target_url)
             tool_timeout = 60  # 60秒超时，确保页面加载完成
-            print(f"{YELLOW}[MCP TOOL]   → 发送中 (timeout={tool_timeout}s，等待页面加载)...{RESET}")
-            response = session.post(target_url, json=tool_request, headers=prepared_headers, timeout=tool_timeout)
+            # stream=True：拿到响应头后再读取响应体，读取期间可被取消令牌关闭
+            response = session.post(target_url, json=tool_request, headers=prepared_headers, timeout=tool_timeout, stream=True)
+            body = _read_body(response, token)
             
-            # 打印响应状态
-            status_color = GREEN if response.ok else RED
-            print(f"{status_color}[MCP TOOL]   ← 响应: HTTP {response.status_code}{RESET}")
-            print(f"{BLUE}[MCP TOOL]   Content-Type: {response.headers.get('Content-Type', 'N/A')}{RESET}")
-            print(f"{BLUE}[MCP TOOL]   响应长度: {len(response.text)} 字符{RESET}")
+            log_event(
+                _mcp_log, logging.DEBUG if response.ok else logging.WARNING, "tools/call 响应",
+                tool=tool_name, attempt=attempt + 1, http=response.status_code,
+                content_type=response.headers.get('Content-Type'), bytes=len(body or b''),
+            )
             
             if not response.ok:
                 # 判断是否可重试
@@ -954,7 +975,7 @@ def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool
                     wait_time = 2 ** attempt
                     if add_log:
                         add_log(f"⚠️ 可重试错误，{wait_time}秒后重试: {error_msg}")
-                    time.sleep(wait_time)
+                    _backoff(token, wait_time)
                     last_error = error_msg
                     continue
                 else:
@@ -993,7 +1014,7 @@ def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool
                 if fallback_text:
                     if add_log:
                         add_log("⚠️ SSE 响应 JSON 解析失败，已提取原始文本交给 LLM 继续处理")
-                    print(f"[MCP TOOL] ⚠️ SSE 解析失败，使用原始文本回退（{len(fallback_text)} 字符）")
+                    log_event(_mcp_log, logging.WARNING, "SSE 解析失败，使用原始文本回退", tool=tool_name, chars=len(fallback_text))
                     return {
                         "success": True,
                         "data": fallback_text,
@@ -1029,7 +1050,7 @@ def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool
                     wait_time = min(5 + (2 ** attempt), 15)  # 至少等待5秒，最多15秒
                     if add_log:
                         add_log(f"⚠️ 检测到 Execution context 错误，等待 {wait_time} 秒后重试（页面可能需要更多时间加载）")
-                    time.sleep(wait_time)
+                    _backoff(token, wait_time)
                     last_error = f"{error_code} - {error_msg}"
                     continue
                 elif is_retryable and attempt < max_retries - 1:
@@ -1037,7 +1058,7 @@ def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool
                     wait_time = 2 ** attempt
                     if add_log:
                         add_log(f"⚠️ 可重试错误，{wait_time}秒后重试: {error_code} - {error_msg}")
-                    time.sleep(wait_time)
+                    _backoff(token, wait_time)
                     last_error = f"{error_code} - {error_msg}"
                     continue
                 else:
@@ -1089,9 +1110,11 @@ def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool
                 else:
                     extracted_data = content
             
-            print(f"{GREEN}{BOLD}[MCP TOOL] ✅ 工具调用成功{RESET}")
-            print(f"{GREEN}[MCP TOOL]   提取的文本长度: {len(extracted_text) if extracted_text else 0}{RESET}")
-            print(f"{GREEN}[MCP TOOL] ========== call_mcp_tool 完成 =========={RESET}")
+            log_event(
+                _mcp_log, logging.INFO, "call_mcp_tool 完成",
+                tool=tool_name, attempts=attempt + 1, text_chars=len(extracted_text or ''),
+                duration_ms=int((time.time() - started) * 1000),
+            )
             return {
                 "success": True,
                 "data": extracted_data,
@@ -1100,18 +1123,33 @@ def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool
                 "tool_name": tool_name,
             }
                 
+        except CancelledError as e:
+            if add_log:
+                add_log(f"⏹️ MCP工具调用已取消: {tool_name}")
+            log_event(
+                _mcp_log, logging.INFO, "call_mcp_tool 已取消",
+                tool=tool_name, attempts=attempt + 1, reason=str(e),
+                duration_ms=int((time.time() - started) * 1000),
+            )
+            return {
+                "success": False,
+                "error_type": "cancelled",
+                "error": f"已取消: {str(e)}",
+                "tool_name": tool_name,
+            }
+                
         except requests.exceptions.Timeout as e:
             if attempt < max_retries - 1:
                 wait_time = 2 ** attempt
                 if add_log:
                     add_log(f"⚠️ 请求超时，{wait_time}秒后重试")
-                time.sleep(wait_time)
+                _backoff(token, wait_time)
                 last_error = str(e)
                 continue
             else:
                 if add_log:
                     add_log(f"❌ MCP工具调用超时: {str(e)}")
-                print(f"[MCP Common] ❌ Timeout calling tool {tool_name}: {e}")
+                log_event(_mcp_log, logging.ERROR, "Timeout calling tool", tool=tool_name, error=e)
                 return {
                     "success": False,
                     "error_type": "network",
@@ -1124,13 +1162,13 @@ def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool
                 wait_time = 2 ** attempt
                 if add_log:
                     add_log(f"⚠️ 连接错误，{wait_time}秒后重试: {str(e)}")
-                time.sleep(wait_time)
+                _backoff(token, wait_time)
                 last_error = str(e)
                 continue
             else:
                 if add_log:
                     add_log(f"❌ MCP工具连接错误: {str(e)}")
-                print(f"[MCP Common] ❌ Connection error calling tool {tool_name}: {e}")
+                log_event(_mcp_log, logging.ERROR, "Connection error calling tool", tool=tool_name, error=e)
                 return {
                     "success": False,
                     "error_type": "network",
@@ -1142,9 +1180,7 @@ def call_mcp_tool(target_url: str, headers: Dict[str, str], tool_name: str, tool
             # 其他错误通常不可重试
             if add_log:
                 add_log(f"❌ MCP工具调用异常: {str(e)}")
-            print(f"[MCP Common] ❌ Error calling tool {tool_name}: {e}")
-            import traceback
-            traceback.print_exc()
+            _mcp_log.error("Error calling tool %s: %s", tool_name, e, exc_info=True)
             return {
                 "success": False,
                 "error_type": "unknown",
@@ -1271,7 +1307,7 @@ def _parse_sse_text_to_jsonrpc(sse_text: str) -> Optional[Dict[str, Any]]:
 
         return last_with_result_or_error if last_with_result_or_error is not None else last_any_jsonrpc
     except Exception as e:
-        print(f"[MCP Common] ⚠️ Failed to parse SSE as JSON-RPC: {e}")
+        log_event(_mcp_log, logging.WARNING, "Failed to parse SSE as JSON-RPC", error=e)
         return None
 
 def validate_tools_list_response(response_data: Dict[str, Any]) -> bool:
@@ -1294,22 +1330,22 @@ def validate_tools_list_response(response_data: Dict[str, Any]) -> bool:
         
         tools = result.get('tools')
         if not isinstance(tools, list):
-            print(f"[MCP Parse] Warning: 'tools' is not a list: {type(tools)}")
+            log_event(_mcp_log, logging.WARNING, "tools/list result.tools is not a list", type=type(tools).__name__)
             return False
         
         # 验证每个工具的基本结构
         for i, tool in enumerate(tools):
             if not isinstance(tool, dict):
-                print(f"[MCP Parse] Warning: Tool {i} is not a dict")
+                log_event(_mcp_log, logging.WARNING, "tools/list entry is not an object", index=i)
                 continue
             if 'name' not in tool:
-                print(f"[MCP Parse] Warning: Tool {i} missing 'name' field")
+                log_event(_mcp_log, logging.WARNING, "tools/list entry missing name", index=i)
         
-        print(f"[MCP Parse] ✅ Valid tools/list response with {len(tools)} tools")
+        log_event(_mcp_log, logging.DEBUG, "Valid tools/list response", tools=len(tools))
         return True
         
     except Exception as e:
-        print(f"[MCP Parse] ❌ Error validating tools/list response: {e}")
+        log_event(_mcp_log, logging.ERROR, "Error validating tools/list response", error=e)
         return False
 
 
@@ -1339,9 +1375,9 @@ def parse_sse_event(event_type: str, data: str) -> Optional[Dict[str, Any]]:
                     return response
             return response
         else:
-            print(f"[MCP Parse] Unknown event type: {event_type}")
+            log_event(_mcp_log, logging.DEBUG, "Unknown SSE event type", event_type=event_type)
             return None
     except Exception as e:
-        print(f"[MCP Parse] ❌ Error parsing SSE event: {e}")
+        log_event(_mcp_log, logging.ERROR, "Error parsing SSE event", error=e)
         return None
 
@@ -0,0 +1,256 @@
+"""
+消息大字段迁移脚本
+将历史 messages.content / ext / mcpdetail / tool_calls 中的 base64 媒体与超大字段，
+以及 message_executions.logs / raw_result 移入 Blob 存储（uploads/blobs），行内只保留引用。
+
+可重复执行：已迁移的行不再超过阈值，会被自动跳过。
+可回滚：--revert 将行内引用还原为原始内联内容（Blob 文件保留，不删除）。
+
+用法:
+    python migrate_message_blobs.py [--dry-run] [--batch-size 200] [--threshold 16384]
+    python migrate_message_blobs.py --revert [--dry-run] [--batch-size 200]
+"""
+
+import argparse
+import json
+import sys
+import yaml
+from pathlib import Path
+
+# 添加backend目录到路径
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from database import get_mysql_connection, init_mysql, init_redis
+from services.blob_store import (
+    BLOB_URL_PREFIX, OFFLOAD_THRESHOLD, get_blob_store, hydrate_column, hydrate_message,
+    offload_column, offload_content, offload_payload,
+)
+
+_MESSAGE_JSON_COLUMNS = ('ext', 'mcpdetail', 'tool_calls')
+
+
+def _init_db() -> bool:
+    config_path = backend_dir / 'config.yaml'
+    if not config_path.exists():
+        print("ℹ️  未找到 config.yaml，跳过迁移")
+        return False
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    if not config.get('mysql', {}).get('enabled', False):
+        print("ℹ️  MySQL 未启用，跳过迁移")
+        return False
+    from database import mysql_pool
+    if mysql_pool is None:
+        print("🔄 正在初始化数据库连接...")
+        success, error = init_mysql(config)
+        if not success:
+            print(f"❌ 数据库初始化失败: {error}")
+            return False
+    if config.get('redis', {}).get('enabled', False):
+        init_redis(config)
+    return True
+
+
+def _offload_json_text(text, threshold):
+    if not isinstance(text, str) or len(text) <= threshold:
+        return text
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return offload_column(text, threshold)
+    return json.dumps(offload_payload(value, threshold))
+
+
+def migrate_messages(conn, batch_size: int, threshold: int, dry_run: bool) -> set:
+    """按 message_id 顺序分批扫描超过阈值的行，返回受影响的 session_id"""
+    cursor = conn.cursor()
+    last_id = ''
+    migrated = 0
+    sessions = set()
+    saved_bytes = 0
+    length_filter = ' OR '.join(f"LENGTH({c}) > %s" for c in ('content',) + _MESSAGE_JSON_COLUMNS)
+    while True:
+        cursor.execute(f"""
+            SELECT message_id, session_id, content, ext, mcpdetail, tool_calls
+            FROM messages
+            WHERE message_id > %s AND ({length_filter})
+            ORDER BY message_id
+            LIMIT %s
+        """, (last_id,) + (threshold,) * 4 + (batch_size,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for message_id, session_id, content, ext, mcpdetail, tool_calls in rows:
+            last_id = message_id
+            before = [content, ext, mcpdetail, tool_calls]
+            after = [offload_content(content, threshold)] + [
+                _offload_json_text(v, threshold) for v in (ext, mcpdetail, tool_calls)
+            ]
+            if after == before:
+                continue
+            saved_bytes += sum(len(b or '') - len(a or '') for b, a in zip(before, after))
+            migrated += 1
+            sessions.add(session_id)
+            if not dry_run:
+                cursor.execute("""
+                    UPDATE messages SET content = %s, ext = %s, mcpdetail = %s, tool_calls = %s
+                    WHERE message_id = %s
+                """, tuple(after) + (message_id,))
+        if not dry_run:
+            conn.commit()
+        print(f"  … messages 已处理至 {last_id}，累计迁移 {migrated} 行")
+    cursor.close()
+    print(f"  ✅ messages: 迁移 {migrated} 行，行内减少 {saved_bytes / 1024 / 1024:.1f} MB")
+    return sessions
+
+
+def migrate_executions(conn, batch_size: int, threshold: int, dry_run: bool) -> int:
+    cursor = conn.cursor()
+    last_id = ''
+    migrated = 0
+    while True:
+        cursor.execute("""
+            SELECT execution_id, logs, raw_result
+            FROM message_executions
+            WHERE execution_id > %s AND (LENGTH(logs) > %s OR LENGTH(raw_result) > %s)
+            ORDER BY execution_id
+            LIMIT %s
+        """, (last_id, threshold, threshold, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for execution_id, logs, raw_result in rows:
+            last_id = execution_id
+            migrated += 1
+            if not dry_run:
+                cursor.execute(
+                    "UPDATE message_executions SET logs = %s, raw_result = %s WHERE execution_id = %s",
+                    (offload_column(logs, threshold), offload_column(raw_result, threshold), execution_id),
+                )
+        if not dry_run:
+            conn.commit()
+    cursor.close()
+    print(f"  ✅ message_executions: 迁移 {migrated} 行")
+    return migrated
+
+
+def revert_messages(conn, batch_size: int, dry_run: bool) -> set:
+    """migrate_messages 的逆操作：含 Blob 引用 / 地址的行还原为内联内容，返回受影响的 session_id"""
+    cursor = conn.cursor()
+    last_id = ''
+    reverted = 0
+    sessions = set()
+    ref_filter = ' OR '.join(f"{c} LIKE %s" for c in ('content',) + _MESSAGE_JSON_COLUMNS)
+    patterns = (f"%{BLOB_URL_PREFIX}%", '%"$blob"%', '%"$blob"%', '%"$blob"%')
+    # 媒体项移出后只剩 url + blob 字段，ext 额外按地址匹配
+    ref_filter += " OR ext LIKE %s"
+    patterns += (f"%{BLOB_URL_PREFIX}%",)
+    while True:
+        cursor.execute(f"""
+            SELECT message_id, session_id, content, ext, mcpdetail, tool_calls
+            FROM messages
+            WHERE message_id > %s AND ({ref_filter})
+            ORDER BY message_id
+            LIMIT %s
+        """, (last_id,) + patterns + (batch_size,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for message_id, session_id, content, ext, mcpdetail, tool_calls in rows:
+            last_id = message_id
+            before = {'content': content, 'ext': ext, 'mcpdetail': mcpdetail, 'tool_calls': tool_calls}
+            after = hydrate_message(dict(before))
+            if after == before:
+                continue
+            reverted += 1
+            sessions.add(session_id)
+            if not dry_run:
+                cursor.execute("""
+                    UPDATE messages SET content = %s, ext = %s, mcpdetail = %s, tool_calls = %s
+                    WHERE message_id = %s
+                """, (after['content'], after['ext'], after['mcpdetail'], after['tool_calls'], message_id))
+        if not dry_run:
+            conn.commit()
+        print(f"  … messages 已处理至 {last_id}，累计还原 {reverted} 行")
+    cursor.close()
+    print(f"  ✅ messages: 还原 {reverted} 行")
+    return sessions
+
+
+def revert_executions(conn, batch_size: int, dry_run: bool) -> int:
+    cursor = conn.cursor()
+    last_id = ''
+    reverted = 0
+    while True:
+        cursor.execute("""
+            SELECT execution_id, logs, raw_result
+            FROM message_executions
+            WHERE execution_id > %s AND (logs LIKE %s OR raw_result LIKE %s)
+            ORDER BY execution_id
+            LIMIT %s
+        """, (last_id, '{"$blob"%', '{"$blob"%', batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for execution_id, logs, raw_result in rows:
+            last_id = execution_id
+            reverted += 1
+            if not dry_run:
+                cursor.execute(
+                    "UPDATE message_executions SET logs = %s, raw_result = %s WHERE execution_id = %s",
+                    (hydrate_column(logs), hydrate_column(raw_result), execution_id),
+                )
+        if not dry_run:
+            conn.commit()
+    cursor.close()
+    print(f"  ✅ message_executions: 还原 {reverted} 行")
+    return reverted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='将消息大字段迁移到 Blob 存储')
+    parser.add_argument('--dry-run', action='store_true', help='只统计，不写库（Blob 文件仍会写入）')
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--threshold', type=int, default=OFFLOAD_THRESHOLD)
+    parser.add_argument('--revert', action='store_true', help='回滚：将 Blob 引用还原为行内内容')
+    args = parser.parse_args()
+
+    if not _init_db():
+        return False
+    conn = get_mysql_connection()
+    if not conn:
+        print("❌ 无法获取数据库连接")
+        return False
+    try:
+        if args.revert:
+            print("🔄 正在还原 messages 大字段...")
+            sessions = revert_messages(conn, args.batch_size, args.dry_run)
+            print("🔄 正在还原 message_executions 大字段...")
+            revert_executions(conn, args.batch_size, args.dry_run)
+        else:
+            print("🔄 正在迁移 messages 大字段...")
+            sessions = migrate_messages(conn, args.batch_size, args.threshold, args.dry_run)
+            print("🔄 正在迁移 message_executions 大字段...")
+            migrate_executions(conn, args.batch_size, args.threshold, args.dry_run)
+            print(f"📦 Blob 存储: {get_blob_store().stats()}")
+        # Redis 消息缓存中仍是迁移前的内容，失效后按新行重新加载
+        if sessions and not args.dry_run:
+            from services.message_cache_service import get_message_cache_service
+            cache = get_message_cache_service()
+            for session_id in sessions:
+                cache.invalidate_session_cache(session_id)
+            print(f"  ✅ 已失效 {len(sessions)} 个会话的消息缓存")
+        return True
+    except Exception as e:
+        import traceback
+        print(f"❌ 迁移失败: {e}")
+        traceback.print_exc()
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
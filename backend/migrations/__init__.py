@@ -0,0 +1,22 @@
+"""
+版本化数据库迁移
+
+启动时只做一次版本查询（SELECT MAX(version) FROM schema_migrations），
+已是最新版本时直接返回；否则在 MySQL 咨询锁（GET_LOCK）下按顺序执行未应用的迁移，
+多个 worker 同时启动时只有一个会真正执行 DDL。
+
+新增表结构变更时，在 migrations/versions.py 的 MIGRATIONS 末尾追加一个步骤即可。
+"""
+
+from .runner import Migration, add_column, add_index, get_schema_version, run_migrations
+from .versions import MIGRATIONS, LATEST_VERSION
+
+__all__ = [
+    'Migration',
+    'MIGRATIONS',
+    'LATEST_VERSION',
+    'add_column',
+    'add_index',
+    'get_schema_version',
+    'run_migrations',
+]
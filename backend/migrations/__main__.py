@@ -0,0 +1,57 @@
+"""
+命令行执行迁移（部署时在启动 worker 之前运行一次）
+
+用法:
+    python -m migrations            # 执行未应用的迁移
+    python -m migrations --status   # 只查看当前版本
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import yaml
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from database import get_mysql_connection, init_mysql  # noqa: E402
+from migrations import LATEST_VERSION, get_schema_version  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='数据库迁移')
+    parser.add_argument('--status', action='store_true', help='只查看当前版本，不执行迁移')
+    args = parser.parse_args()
+
+    with open(backend_dir / 'config.yaml', 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    # init_mysql 在创建连接池后会执行迁移
+    if not args.status:
+        success, error = init_mysql(config)
+        if not success:
+            print(f"❌ {error}")
+            return 1
+    else:
+        success, error = init_mysql({**config, 'mysql': {**config.get('mysql', {}), 'skip_migrations': True}})
+        if not success:
+            print(f"❌ {error}")
+            return 1
+
+    conn = get_mysql_connection()
+    if not conn:
+        print("❌ MySQL not available")
+        return 1
+    cursor = conn.cursor()
+    try:
+        current = get_schema_version(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+    print(f"Schema version: v{current} (latest v{LATEST_VERSION})")
+    return 0 if current >= LATEST_VERSION else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
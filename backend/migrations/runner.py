@@ -0,0 +1,154 @@
+"""
+迁移执行器
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence
+
+# MySQL 错误码
+_ER_NO_SUCH_TABLE = 1146
+_ER_DUP_FIELDNAME = 1060
+_ER_DUP_KEYNAME = 1061
+
+LOCK_NAME = 'chatee:schema_migrations'
+
+_CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS `schema_migrations` (
+    `version` INT NOT NULL PRIMARY KEY COMMENT '迁移版本号',
+    `name` VARCHAR(200) NOT NULL COMMENT '迁移名称',
+    `duration_ms` INT DEFAULT NULL COMMENT '执行耗时（毫秒）',
+    `applied_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '应用时间'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='数据库迁移记录表';
+"""
+
+
+@dataclass(frozen=True)
+class Migration:
+    """一个迁移步骤：apply(cursor) 中执行 DDL / 数据修复，必须可重复执行"""
+
+    version: int
+    name: str
+    apply: Callable[[Any], None]
+
+
+def _error_code(e: Exception) -> Optional[int]:
+    args = getattr(e, 'args', None)
+    if args and isinstance(args[0], int):
+        return args[0]
+    return None
+
+
+def add_column(cursor, table: str, column: str, definition: str) -> None:
+    """添加列；列已存在时忽略（不查询 information_schema）"""
+    try:
+        cursor.execute(f"ALTER TABLE `{table}` ADD COLUMN `{column}` {definition}")
+        print(f"  ✓ Column '{column}' added to '{table}'")
+    except Exception as e:
+        if _error_code(e) != _ER_DUP_FIELDNAME:
+            raise
+
+
+def add_index(cursor, table: str, name: str, columns: Sequence[str]) -> None:
+    """添加索引；同名索引已存在时忽略"""
+    cols = ', '.join(f'`{c}`' for c in columns)
+    try:
+        cursor.execute(f"CREATE INDEX `{name}` ON `{table}` ({cols})")
+        print(f"  ✓ Index '{name}' added to '{table}'")
+    except Exception as e:
+        if _error_code(e) != _ER_DUP_KEYNAME:
+            raise
+
+
+def get_schema_version(cursor) -> int:
+    """当前已应用的最高版本；迁移表不存在时为 0"""
+    try:
+        cursor.execute("SELECT MAX(`version`) FROM `schema_migrations`")
+        row = cursor.fetchone()
+    except Exception as e:
+        if _error_code(e) == _ER_NO_SUCH_TABLE:
+            return 0
+        raise
+    return int(row[0] or 0) if row else 0
+
+
+def _validate(migrations: Sequence[Migration]) -> None:
+    versions = [m.version for m in migrations]
+    if versions != sorted(set(versions)):
+        raise ValueError(f"Migration versions must be unique and ascending: {versions}")
+
+
+def run_migrations(
+    get_connection: Callable[[], Any],
+    migrations: Optional[Sequence[Migration]] = None,
+    lock_timeout: int = 300,
+) -> List[int]:
+    """
+    执行未应用的迁移
+
+    Args:
+        get_connection: 获取数据库连接的函数（整个过程使用同一连接，咨询锁绑定在该会话上）
+        migrations: 迁移列表（默认 versions.MIGRATIONS）
+        lock_timeout: 等待其他 worker 释放迁移锁的秒数
+
+    Returns:
+        本次应用的版本号列表
+
+    Raises:
+        RuntimeError: 获取迁移锁超时
+    """
+    if migrations is None:
+        from .versions import MIGRATIONS
+        migrations = MIGRATIONS
+    _validate(migrations)
+    latest = migrations[-1].version if migrations else 0
+
+    conn = get_connection()
+    if not conn:
+        return []
+
+    cursor = conn.cursor()
+    try:
+        # 快速路径：一次查询确认已是最新版本
+        current = get_schema_version(cursor)
+        if current >= latest:
+            if current > latest:
+                print(f"[Migrations] ⚠️ Database schema v{current} is newer than code (v{latest})")
+            else:
+                print(f"[Migrations] Schema is up to date (v{current})")
+            return []
+
+        print(f"[Migrations] Schema v{current} -> v{latest}, waiting for migration lock...")
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, lock_timeout))
+        row = cursor.fetchone()
+        if not row or row[0] != 1:
+            raise RuntimeError(f"Timed out waiting for migration lock '{LOCK_NAME}'")
+
+        try:
+            cursor.execute(_CREATE_MIGRATIONS_TABLE)
+            # 持锁后重新读取：其他 worker 可能已完成迁移
+            current = get_schema_version(cursor)
+            applied = []
+            for migration in migrations:
+                if migration.version <= current:
+                    continue
+                print(f"[Migrations] Applying v{migration.version} {migration.name}...")
+                start = time.perf_counter()
+                migration.apply(cursor)
+                duration_ms = int((time.perf_counter() - start) * 1000)
+                cursor.execute(
+                    "INSERT INTO `schema_migrations` (`version`, `name`, `duration_ms`) VALUES (%s, %s, %s)",
+                    (migration.version, migration.name, duration_ms),
+                )
+                conn.commit()
+                applied.append(migration.version)
+                print(f"[Migrations] ✓ v{migration.version} {migration.name} ({duration_ms} ms)")
+            if not applied:
+                print(f"[Migrations] Schema already migrated by another worker (v{current})")
+            return applied
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
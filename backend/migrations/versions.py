@@ -0,0 +1,121 @@
+"""
+迁移步骤（按版本号递增追加，已发布的步骤不要修改）
+"""
+
+from .runner import Migration, add_column, add_index
+
+
+def _baseline(cursor):
+    """v1: 历史建表逻辑（CREATE TABLE IF NOT EXISTS + 逐列补齐），对已有库可重复执行"""
+    from database import create_tables
+    create_tables()
+
+
+def _messages_keyset_index(cursor):
+    """v2: keyset 分页的覆盖索引；分页子查询只扫描该索引，不读取 LONGTEXT 行"""
+    add_index(cursor, 'messages', 'idx_session_created_msg', ('session_id', 'created_at', 'message_id'))
+
+
+def _research_documents_content_hash(cursor):
+    """v3: research_documents.content_hash，重复上传时跳过内容未变的文件"""
+    add_column(cursor, 'research_documents', 'content_hash',
+               "CHAR(64) DEFAULT NULL COMMENT '内容 sha256' AFTER `content_text`")
+
+
+def _media_jobs(cursor):
+    """v4: media_jobs，服务端编排的媒体生成任务（进程重启后恢复轮询）"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `media_jobs` (
+            `id` INT AUTO_INCREMENT PRIMARY KEY,
+            `job_id` VARCHAR(100) NOT NULL UNIQUE COMMENT '任务ID',
+            `provider` VARCHAR(50) NOT NULL COMMENT 'gemini / runway',
+            `task_id` VARCHAR(500) NOT NULL COMMENT '供应商任务ID / operation 名称',
+            `media_type` VARCHAR(20) NOT NULL DEFAULT 'video' COMMENT 'image / video',
+            `status` VARCHAR(20) NOT NULL DEFAULT 'running' COMMENT 'running / downloading / succeeded / failed',
+            `provider_status` VARCHAR(50) DEFAULT NULL COMMENT '供应商原始状态',
+            `prompt` TEXT DEFAULT NULL,
+            `model` VARCHAR(200) DEFAULT NULL,
+            `config_id` VARCHAR(100) DEFAULT NULL,
+            `topic_id` VARCHAR(100) DEFAULT NULL COMMENT '完成事件推送的 Topic',
+            `output_id` VARCHAR(100) DEFAULT NULL COMMENT '媒体产出ID（media_outputs.output_id）',
+            `error` TEXT DEFAULT NULL,
+            `attempts` INT NOT NULL DEFAULT 0 COMMENT '已查询次数',
+            `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+            `finished_at` DATETIME DEFAULT NULL,
+            INDEX `idx_mj_status` (`status`),
+            INDEX `idx_mj_created_at` (`created_at`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='媒体生成任务'
+    """)
+
+
+def _mcp_market_incremental_sync(cursor):
+    """v5: MCP 市场增量同步（页面级 ETag / Last-Modified / sitemap lastmod 状态 + 源同步游标）"""
+    add_column(cursor, 'mcp_market_sources', 'sync_cursor',
+               "JSON DEFAULT NULL COMMENT '进行中的同步游标（中断后续传）' AFTER `last_sync_at`")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `mcp_market_page_state` (
+            `source_id` VARCHAR(150) NOT NULL COMMENT '市场源ID',
+            `url_hash` CHAR(40) NOT NULL COMMENT 'sha1(url)',
+            `url` TEXT NOT NULL,
+            `etag` VARCHAR(255) DEFAULT NULL,
+            `last_modified` VARCHAR(64) DEFAULT NULL COMMENT 'Last-Modified 响应头',
+            `lastmod` VARCHAR(64) DEFAULT NULL COMMENT 'sitemap <lastmod>',
+            `item_id` VARCHAR(255) DEFAULT NULL COMMENT '解析出的条目（无则为 NULL）',
+            `fetched_at` BIGINT DEFAULT NULL COMMENT '上次抓取时间戳(秒)',
+            PRIMARY KEY (`source_id`, `url_hash`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='MCP 市场页面抓取状态'
+    """)
+
+
+
+def _summaries_agent_id(cursor):
+    """v6: summaries.agent_id，Actor 后台记忆摘要按 (会话, Agent) 持久化与恢复"""
+    add_column(cursor, 'summaries', 'agent_id',
+               "VARCHAR(100) DEFAULT NULL COMMENT 'Actor 记忆摘要所属 Agent（手动总结为 NULL）' AFTER `session_id`")
+    add_index(cursor, 'summaries', 'idx_summaries_session_agent', ('session_id', 'agent_id', 'created_at'))
+
+
+def _media_jobs_download_lease(cursor):
+    """v7: media_jobs 下载租约；启动恢复只重置租约已过期的 downloading 任务"""
+    add_column(cursor, 'media_jobs', 'lease_owner',
+               "VARCHAR(200) DEFAULT NULL COMMENT '下载租约持有进程' AFTER `attempts`")
+    add_column(cursor, 'media_jobs', 'heartbeat_at',
+               "DATETIME DEFAULT NULL COMMENT '下载租约最近续约时间' AFTER `lease_owner`")
+
+
+def _research_ingest_jobs(cursor):
+    """v8: research_ingest_jobs，上传后台入库任务（含文件清单与租约，进程重启后接管重跑）"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `research_ingest_jobs` (
+            `job_id` VARCHAR(64) NOT NULL PRIMARY KEY COMMENT '任务ID',
+            `session_id` VARCHAR(100) NOT NULL COMMENT '会话ID',
+            `status` VARCHAR(20) NOT NULL DEFAULT 'queued' COMMENT 'queued / running / done / failed',
+            `total` INT NOT NULL DEFAULT 0,
+            `processed` INT NOT NULL DEFAULT 0,
+            `indexed` INT NOT NULL DEFAULT 0,
+            `skipped` INT NOT NULL DEFAULT 0,
+            `failed` INT NOT NULL DEFAULT 0,
+            `error` TEXT DEFAULT NULL,
+            `files` JSON NOT NULL COMMENT '待入库文件 [{path, rel_path, source_id}]',
+            `lease_owner` VARCHAR(200) DEFAULT NULL COMMENT '租约持有进程',
+            `heartbeat_at` DATETIME DEFAULT NULL COMMENT '租约最近续约时间',
+            `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+            `finished_at` DATETIME DEFAULT NULL,
+            INDEX `idx_rij_status` (`status`),
+            INDEX `idx_rij_session` (`session_id`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Research 上传入库任务'
+    """)
+
+
+MIGRATIONS = [
+    Migration(1, 'baseline', _baseline),
+    Migration(2, 'messages_keyset_index', _messages_keyset_index),
+    Migration(3, 'research_documents_content_hash', _research_documents_content_hash),
+    Migration(4, 'media_jobs', _media_jobs),
+    Migration(5, 'mcp_market_incremental_sync', _mcp_market_incremental_sync),
+    Migration(6, 'summaries_agent_id', _summaries_agent_id),
+    Migration(7, 'media_jobs_download_lease', _media_jobs_download_lease),
+    Migration(8, 'research_ingest_jobs', _research_ingest_jobs),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
@@ -359,6 +359,9 @@ def backfill_discord_sessions_default_llm(get_connection) -> int:
         )
         n = cur.rowcount
         conn.commit()
+        if n:
+            from services.repository_cache import get_repository_cache
+            get_repository_cache().invalidate_all()
         cur.close()
         conn.close()
         if n:
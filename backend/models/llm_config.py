@@ -208,6 +208,9 @@ class LLMConfigRepository:
             conn.commit()
             cursor.close()
             conn.close()
+            # Agent 配置缓存联表了 llm_configs，配置变更时整体失效
+            from services.repository_cache import get_repository_cache
+            get_repository_cache().invalidate_all()
             return True
         except Exception as e:
             import traceback
@@ -237,6 +240,8 @@ class LLMConfigRepository:
             affected = cursor.rowcount
             cursor.close()
             conn.close()
+            from services.repository_cache import get_repository_cache
+            get_repository_cache().invalidate_all()
             return affected > 0
         except Exception as e:
             print(f"[LLMConfigRepository] Error deleting: {e}")
@@ -8,6 +8,8 @@ from typing import Optional, Dict, Any, List
 import json
 import base64
 
+from utils.db import DatabaseUnavailableError
+
 
 @dataclass
 class Message:
@@ -109,20 +111,69 @@ class Message:
 
             return _inner(obj, 0)
 
+        # 大字段（base64 媒体、MCP 原始结果）移入 Blob 存储，行内只保留引用
+        from services.blob_store import offload_content, offload_payload
+
+        def _offloaded_json(obj: Any) -> Optional[str]:
+            if not obj:
+                return None
+            return json.dumps(offload_payload(_json_safe(obj)))
+
         return {
             'message_id': self.message_id,
             'session_id': self.session_id,
             'role': self.role,
-            'content': self.content,
+            'content': offload_content(self.content),
             'thinking': self.thinking,
-            'tool_calls': json.dumps(_json_safe(self.tool_calls)) if self.tool_calls else None,
+            'tool_calls': _offloaded_json(self.tool_calls),
             'token_count': self.token_count,
             'acc_token': self.acc_token,
-            'ext': json.dumps(_json_safe(self.ext)) if self.ext else None,
-            'mcpdetail': json.dumps(_json_safe(self.mcpdetail)) if self.mcpdetail else None,
+            'ext': _offloaded_json(self.ext),
+            'mcpdetail': _offloaded_json(self.mcpdetail),
         }
 
 
+# ==================== Keyset 分页游标 ====================
+
+# 分页时可按需延迟加载的大字段（LONGTEXT / JSON）
+HEAVY_MESSAGE_COLUMNS = ('thinking', 'tool_calls', 'ext', 'mcpdetail')
+
+# 始终返回的基础字段
+BASE_MESSAGE_COLUMNS = ('message_id', 'session_id', 'role', 'content', 'token_count', 'acc_token', 'created_at')
+
+# 允许出现在分页 SELECT 中的列（列名会拼入 SQL，必须白名单校验）
+_PAGE_COLUMNS = frozenset(BASE_MESSAGE_COLUMNS + HEAVY_MESSAGE_COLUMNS + (
+    'sender_id', 'sender_type', 'mentions', 'reply_to_message_id', 'is_raise_hand',
+))
+
+
+def encode_message_cursor(created_at: Optional[datetime], message_id: str) -> Optional[str]:
+    """将 (created_at, message_id) 编码为不透明游标"""
+    if not message_id:
+        return None
+    ts = created_at.isoformat() if isinstance(created_at, datetime) else (created_at or '')
+    raw = f"{ts}|{message_id}".encode('utf-8')
+    return 'c1.' + base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_message_cursor(token: Optional[str]) -> Optional[tuple]:
+    """
+    解码游标
+
+    Returns:
+        (created_at, message_id)；不是合法游标时返回 None（调用方可按旧版 message_id 处理）
+    """
+    if not token or not token.startswith('c1.'):
+        return None
+    try:
+        body = token[3:]
+        raw = base64.urlsafe_b64decode(body + '=' * (-len(body) % 4)).decode('utf-8')
+        ts, message_id = raw.split('|', 1)
+        return datetime.fromisoformat(ts), message_id
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
 class MessageRepository:
     """消息数据仓库"""
     
@@ -131,46 +182,119 @@ class MessageRepository:
     
     def find_by_session(self, session_id: str, limit: int = 100, 
                         before: str = None) -> List[Message]:
-        """获取会话消息列表"""
+        """获取会话消息列表（before 为 message_id 或游标，按 (created_at, message_id) keyset 分页）"""
+        try:
+            rows, _ = self.find_page(session_id, limit=limit, before=before)
+        except (KeyError, DatabaseUnavailableError):
+            return []
+        # 反转顺序，使最早的消息在前
+        return [Message.from_db_row(row) for row in reversed(rows)]
+
+    def resolve_cursor(self, cursor, session_id: str, before: Optional[str]) -> Optional[tuple]:
+        """
+        将 before 解析为 keyset 键 (created_at, message_id)
+
+        新版不透明游标直接解码；旧版 message_id 需要一次主键查询（兼容旧前端）。
+        Returns:
+            键元组；before 为空返回 None；message_id 不存在时抛出 KeyError
+        """
+        if not before:
+            return None
+        key = decode_message_cursor(before)
+        if key is not None:
+            return key
+        cursor.execute(
+            "SELECT created_at, message_id FROM messages WHERE message_id = %s AND session_id = %s",
+            (before, session_id),
+        )
+        row = cursor.fetchone()
+        if not row:
+            raise KeyError(before)
+        if isinstance(row, dict):
+            return row['created_at'], row['message_id']
+        return row[0], row[1]
+
+    def find_page(self, session_id: str, limit: int = 20, before: Optional[str] = None,
+                  columns: Optional[List[str]] = None, presence: Optional[List[str]] = None,
+                  offset: int = 0) -> tuple:
+        """
+        按 (created_at, message_id) 倒序取一页消息
+
+        先在覆盖索引 idx_session_created_msg 上定位本页主键（只读索引，与翻页深度无关），
+        再按主键回表读取所需列，避免扫描/传输前面各页的 LONGTEXT 内容。
+
+        Args:
+            session_id: 会话 ID
+            limit: 本页条数
+            before: 游标或 message_id（取其之前的消息）；为空时取最新
+            columns: 需要读取的列；None 表示全部列（SELECT *）
+            presence: 不读取内容、只返回 has_<列> 标记的大字段（延迟加载）
+            offset: 兼容传统 page/page_size 分页（仍在窄索引上跳过）
+
+        Returns:
+            (rows 倒序列表, has_more)；rows 多取一条用于判断 has_more 后已截断
+
+        Raises:
+            KeyError: before 是不存在的 message_id
+            ValueError: columns / presence 含未知列名
+            DatabaseUnavailableError: 无数据库连接或查询失败（不能当作「没有更多历史」返回空页）
+        """
+        unknown = (set(columns or ()) | set(presence or ())) - _PAGE_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown message columns: {sorted(unknown)}")
+
         conn = self.get_connection()
         if not conn:
-            return []
-        
+            raise DatabaseUnavailableError("MySQL not available")
+
         try:
             import pymysql
             cursor = conn.cursor(pymysql.cursors.DictCursor)
-            
-            if before:
-                sql = """
-                    SELECT * FROM messages 
-                    WHERE session_id = %s AND created_at < (
-                        SELECT created_at FROM messages WHERE message_id = %s
-                    )
-                    ORDER BY created_at DESC
-                    LIMIT %s
-                """
-                cursor.execute(sql, (session_id, before, limit))
-            else:
-                sql = """
-                    SELECT * FROM messages 
-                    WHERE session_id = %s
-                    ORDER BY created_at DESC
-                    LIMIT %s
-                """
-                cursor.execute(sql, (session_id, limit))
-            
-            rows = cursor.fetchall()
+            try:
+                key = self.resolve_cursor(cursor, session_id, before)
+            except KeyError:
+                cursor.close()
+                conn.close()
+                raise
+
+            select_cols = 'm.*' if columns is None else ', '.join(f'm.`{c}`' for c in columns)
+            for col in presence or []:
+                # 判空只读取行内的外部存储指针，不读取 LONGTEXT 内容
+                select_cols += f', (m.`{col}` IS NOT NULL) AS `has_{col}`'
+            where = 'session_id = %s'
+            params: list = [session_id]
+            if key is not None:
+                where += ' AND (created_at < %s OR (created_at = %s AND message_id < %s))'
+                params.extend([key[0], key[0], key[1]])
+            params.extend([limit + 1, offset])
+
+            cursor.execute(
+                f"""
+                SELECT {select_cols}
+                FROM messages m
+                INNER JOIN (
+                    SELECT id FROM messages
+                    WHERE {where}
+                    ORDER BY created_at DESC, message_id DESC
+                    LIMIT %s OFFSET %s
+                ) pg ON pg.id = m.id
+                ORDER BY m.created_at DESC, m.message_id DESC
+                """,
+                params,
+            )
+            rows = list(cursor.fetchall())
             cursor.close()
             conn.close()
-            
-            # 反转顺序，使最早的消息在前
-            messages = [Message.from_db_row(row) for row in reversed(rows)]
-            return messages
+
+            has_more = len(rows) > limit
+            return rows[:limit], has_more
+        except KeyError:
+            raise
         except Exception as e:
-            print(f"[MessageRepository] Error finding by session: {e}")
+            print(f"[MessageRepository] Error finding page: {e}")
             if conn:
                 conn.close()
-            return []
+            raise DatabaseUnavailableError(str(e)) from e
     
     def find_by_id(self, message_id: str) -> Optional[Message]:
         """根据 ID 获取消息"""
@@ -164,7 +164,18 @@ class SessionRepository:
             return []
     
     def find_by_id(self, session_id: str) -> Optional[Session]:
-        """根据 ID 获取会话"""
+        """根据 ID 获取会话（读穿缓存，见 services.repository_cache）"""
+        from services.repository_cache import get_repository_cache, ENTITY_SESSION
+
+        row = get_repository_cache().get_or_load(
+            ENTITY_SESSION, session_id, lambda: self._load_row(session_id)
+        )
+        if row:
+            return Session.from_db_row(row)
+        return None
+
+    def _load_row(self, session_id: str) -> Optional[dict]:
+        """从数据库读取 sessions 行"""
         conn = self.get_connection()
         if not conn:
             return None
@@ -176,10 +187,7 @@ class SessionRepository:
             row = cursor.fetchone()
             cursor.close()
             conn.close()
-            
-            if row:
-                return Session.from_db_row(row)
-            return None
+            return row
         except Exception as e:
             print(f"[SessionRepository] Error finding by id: {e}")
             if conn:
@@ -225,6 +233,8 @@ class SessionRepository:
             conn.commit()
             cursor.close()
             conn.close()
+            from services.repository_cache import invalidate_session
+            invalidate_session(session.session_id, cascade=session.session_type == 'agent')
             return True
         except Exception as e:
             print(f"[SessionRepository] Error saving: {e}")
@@ -245,6 +255,8 @@ class SessionRepository:
             affected = cursor.rowcount
             cursor.close()
             conn.close()
+            from services.repository_cache import invalidate_session
+            invalidate_session(session_id)
             return affected > 0
         except Exception as e:
             print(f"[SessionRepository] Error deleting: {e}")
@@ -277,10 +289,19 @@ class SessionRepository:
     # ==================== 参与者管理 ====================
     
     def get_participants(self, session_id: str) -> List[dict]:
-        """获取会话参与者列表"""
+        """获取会话参与者列表（读穿缓存）"""
+        from services.repository_cache import get_repository_cache, ENTITY_PARTICIPANTS
+
+        participants = get_repository_cache().get_or_load(
+            ENTITY_PARTICIPANTS, session_id, lambda: self._load_participants(session_id)
+        )
+        return [dict(p) for p in participants] if participants else []
+
+    def _load_participants(self, session_id: str) -> Optional[List[dict]]:
+        """从数据库读取参与者列表（查询失败返回 None，不写入缓存）"""
         conn = self.get_connection()
         if not conn:
-            return []
+            return None
         
         try:
             import pymysql
@@ -313,7 +334,7 @@ class SessionRepository:
             print(f"[SessionRepository] Error getting participants: {e}")
             if conn:
                 conn.close()
-            return []
+            return None
     
     def add_participant(self, session_id: str, participant_id: str, 
                         participant_type: str = 'agent', role: str = 'member') -> bool:
@@ -332,6 +353,8 @@ class SessionRepository:
             conn.commit()
             cursor.close()
             conn.close()
+            from services.repository_cache import invalidate_participants
+            invalidate_participants(session_id)
             return True
         except Exception as e:
             print(f"[SessionRepository] Error adding participant: {e}")
@@ -354,6 +377,8 @@ class SessionRepository:
             conn.commit()
             cursor.close()
             conn.close()
+            from services.repository_cache import invalidate_participants
+            invalidate_participants(session_id)
             return True
         except Exception as e:
             print(f"[SessionRepository] Error removing participant: {e}")
@@ -5,7 +5,8 @@ This module defines the ActionChain system for tracking and coordinating
 agent actions across topics. It supports:
 - Standard action types for agent behaviors
 - Chain-based action sequences with progress tracking
-- Redis persistence for cross-agent handoff
+- Redis persistence for cross-agent handoff (append-only step log, compact
+  encoding, shorter TTL once a chain has finished)
 - Event callbacks for frontend Processing component updates
 """
 
@@ -15,11 +16,16 @@ import uuid
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field, asdict
 from enum import Enum
-from typing import Any, Dict, List, Optional, Callable, TYPE_CHECKING
+from typing import Any, Dict, List, Optional, Callable, Tuple, TYPE_CHECKING, Union
 
 if TYPE_CHECKING:
     from services.topic_service import TopicService
 
+try:
+    import msgpack
+except ImportError:  # optional: compact JSON is used instead
+    msgpack = None
+
 
 # =============================================================================
 # Action Type Enumeration
@@ -252,6 +258,13 @@ class ActionChain:
     
     # Redis TTL in seconds (1 hour, though execution expected in minutes)
     REDIS_TTL: int = 3600
+    # Finished chains are only kept around for late readers / handoff replies
+    FINISHED_TTL: int = 600
+    
+    # Encoded step records / meta last written by ActionChainStore (delta saves)
+    _persisted: Dict[Any, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
+    # Last progress event published (delta progress events)
+    _progress_sent: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
     
     def add_step(self, action_type: AgentActionType, 
                  description: str = '',
@@ -328,6 +341,55 @@ class ActionChain:
             'progress_text': f'{completed}/{len(self.steps)}',
         }
     
+    @property
+    def is_finished(self) -> bool:
+        """Whether the chain reached a terminal status."""
+        return self.status in (ActionStepStatus.COMPLETED, ActionStepStatus.ERROR,
+                               ActionStepStatus.INTERRUPTED)
+    
+    def get_progress_delta(self) -> Optional[Dict[str, Any]]:
+        """
+        Get progress changes since the previous call, for progress events.
+        
+        The full current step is only included when the chain moves to a new
+        step; afterwards only the step fields that changed are sent as
+        ``step_delta``.
+        
+        Returns:
+            Dict with chain counters plus ``current_step`` or ``step_delta``,
+            or None if nothing changed since the last call
+        """
+        current = self.get_current()
+        step = current.to_dict() if current else None
+        snapshot = {
+            'current_index': self.current_index,
+            'total_steps': len(self.steps),
+            'status': self.status.value,
+            'step': step,
+        }
+        previous = self._progress_sent
+        if previous == snapshot:
+            return None
+        self._progress_sent = snapshot
+        
+        delta: Dict[str, Any] = {
+            'chain_id': self.chain_id,
+            'current_index': self.current_index,
+            'total_steps': len(self.steps),
+            'status': self.status.value,
+            'current_step': None,
+            'step_delta': None,
+        }
+        if previous is None or previous['current_index'] != self.current_index or not previous['step']:
+            delta['current_step'] = step
+        elif step:
+            delta['step_delta'] = {
+                k: v for k, v in step.items() if previous['step'].get(k) != v
+            } or None
+            if delta['step_delta'] is not None:
+                delta['step_delta']['step_id'] = step['step_id']
+        return delta
+    
     def mark_interrupted(self, reason: str = 'user_interrupt') -> None:
         """Mark chain as interrupted."""
         self.status = ActionStepStatus.INTERRUPTED
@@ -378,6 +440,65 @@ class ActionChain:
         )
 
 
+# =============================================================================
+# Compact Step Encoding
+# =============================================================================
+
+# Short keys for persisted step records (None / empty values are omitted)
+_STEP_KEYS = {
+    'step_id': 'i',
+    'action_type': 'a',
+    'params': 'p',
+    'result': 'r',
+    'interrupt': 'x',
+    'status': 's',
+    'description': 'd',
+    'started_at': 't0',
+    'completed_at': 't1',
+    'error_message': 'e',
+    'mcp_server_id': 'ms',
+    'mcp_tool_name': 'mt',
+    'target_agent_id': 'ta',
+    'target_topic_id': 'tt',
+}
+_STEP_FIELDS = {short: name for name, short in _STEP_KEYS.items()}
+
+CODEC_JSON = 'json'
+CODEC_MSGPACK = 'msgpack'
+
+
+def encode_step(index: int, step: ActionStep, codec: str = CODEC_JSON) -> Union[str, bytes]:
+    """
+    Encode one step as a compact log record.
+    
+    Args:
+        index: Position of the step in its chain
+        step: Step to encode
+        codec: 'json' (compact JSON text) or 'msgpack' (binary; needs a
+            Redis client created without decode_responses)
+    """
+    record: Dict[str, Any] = {'n': index}
+    for name, value in step.to_dict().items():
+        if value is None or value == {} or value == '' or value is False:
+            continue
+        record[_STEP_KEYS[name]] = value
+    if codec == CODEC_MSGPACK and msgpack is not None:
+        return msgpack.packb(record, use_bin_type=True)
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+def decode_step(raw: Union[str, bytes]) -> Tuple[int, ActionStep]:
+    """Decode a log record produced by encode_step()."""
+    if isinstance(raw, bytes) and not raw.startswith(b'{'):
+        if msgpack is None:
+            raise ValueError('msgpack record found but msgpack is not installed')
+        record = msgpack.unpackb(raw, raw=False)
+    else:
+        record = json.loads(raw)
+    index = record.pop('n')
+    return index, ActionStep.from_dict({_STEP_FIELDS[k]: v for k, v in record.items()})
+
+
 # =============================================================================
 # Redis Persistence Helper
 # =============================================================================
@@ -386,25 +507,69 @@ class ActionChainStore:
     """
     Redis-based storage for ActionChains.
     
-    Provides methods to save, load, and manage ActionChains in Redis
-    with automatic TTL handling.
+    Layout per chain:
+    - ``action_chain:{id}:meta`` hash: chain fields except steps
+    - ``action_chain:{id}:log`` list: append-only step records; the last
+      record for an index wins when loading
+    
+    save() only writes the meta fields and steps that changed since the chain
+    was last saved or loaded, so persisting a step update costs O(step)
+    rather than rewriting the whole chain. The log is compacted once it grows
+    past COMPACT_FACTOR records per step. Running chains expire after
+    ActionChain.REDIS_TTL, finished ones after ActionChain.FINISHED_TTL.
     """
     
     KEY_PREFIX = 'action_chain:'
-    INTERRUPT_PREFIX = 'interrupt:'
+    COMPACT_FACTOR = 4
     
-    def __init__(self, redis_client):
+    def __init__(self, redis_client, codec: Optional[str] = None):
         """
         Initialize the store with a Redis client.
         
         Args:
             redis_client: Redis client instance from redis_client.py
+            codec: 'json' or 'msgpack'; by default msgpack is used when it is
+                installed and the client returns raw bytes. The app's shared
+                client decodes responses, so chains are stored as compact JSON
+                there and msgpack stays an optional dependency.
         """
         self._redis = redis_client
+        self.codec = codec or self._default_codec(redis_client)
+        if self.codec == CODEC_MSGPACK and msgpack is None:
+            self.codec = CODEC_JSON
+        # Bytes written by the last save() (step records + meta values)
+        self.last_write_bytes = 0
+    
+    @staticmethod
+    def _default_codec(redis_client) -> str:
+        if msgpack is None or redis_client is None:
+            return CODEC_JSON
+        try:
+            decodes = redis_client.connection_pool.connection_kwargs.get('decode_responses', False)
+        except AttributeError:
+            return CODEC_JSON
+        return CODEC_JSON if decodes else CODEC_MSGPACK
+    
+    def _keys(self, chain_id: str) -> Tuple[str, str]:
+        base = f'{self.KEY_PREFIX}{chain_id}'
+        return f'{base}:meta', f'{base}:log'
+    
+    @staticmethod
+    def _meta(chain: ActionChain) -> Dict[str, str]:
+        return {
+            'name': chain.name,
+            'current_index': str(chain.current_index),
+            'status': chain.status.value,
+            'origin_agent_id': chain.origin_agent_id or '',
+            'origin_topic_id': chain.origin_topic_id or '',
+            'created_at': repr(chain.created_at),
+            'updated_at': repr(chain.updated_at),
+            'step_count': str(len(chain.steps)),
+        }
     
     def save(self, chain: ActionChain) -> bool:
         """
-        Save an ActionChain to Redis.
+        Save an ActionChain to Redis (only what changed since the last save).
         
         Args:
             chain: ActionChain to save
@@ -415,9 +580,52 @@ class ActionChainStore:
         if not self._redis:
             return False
             
-        key = f'{self.KEY_PREFIX}{chain.chain_id}'
+        meta_key, log_key = self._keys(chain.chain_id)
+        persisted = chain._persisted
         try:
-            self._redis.setex(key, chain.REDIS_TTL, chain.to_json())
+            meta = self._meta(chain)
+            old_meta = persisted.get('meta') or {}
+            meta_delta = {k: v for k, v in meta.items() if old_meta.get(k) != v}
+            
+            records = []
+            encoded: Dict[int, Any] = {}
+            for index, step in enumerate(chain.steps):
+                record = encode_step(index, step, self.codec)
+                encoded[index] = record
+                if persisted.get(index) != record:
+                    records.append(record)
+            
+            ttl = chain.FINISHED_TTL if chain.is_finished else chain.REDIS_TTL
+            log_len = persisted.get('log_len', 0) + len(records)
+            compact = log_len > self.COMPACT_FACTOR * max(len(chain.steps), 8)
+            if compact:
+                # Rewrite the log with one record per step
+                records = [encoded[i] for i in range(len(chain.steps))]
+                log_len = len(records)
+            
+            pipe = self._redis.pipeline(transaction=compact)
+            if compact:
+                pipe.delete(log_key)
+            if meta_delta:
+                pipe.hset(meta_key, mapping=meta_delta)
+            if records:
+                pipe.rpush(log_key, *records)
+            if meta_delta or records or persisted.get('ttl') != ttl:
+                pipe.expire(meta_key, ttl)
+                if log_len:
+                    pipe.expire(log_key, ttl)
+            pipe.execute()
+            
+            self.last_write_bytes = (
+                sum(len(r) for r in records)
+                + sum(len(k) + len(v) for k, v in meta_delta.items())
+            )
+            persisted.update(encoded)
+            for index in [k for k in persisted if isinstance(k, int) and k >= len(chain.steps)]:
+                del persisted[index]
+            persisted['meta'] = meta
+            persisted['log_len'] = log_len
+            persisted['ttl'] = ttl
             return True
         except Exception as e:
             print(f'[ActionChainStore] Failed to save chain {chain.chain_id}: {e}')
@@ -436,12 +644,47 @@ class ActionChainStore:
         if not self._redis:
             return None
             
-        key = f'{self.KEY_PREFIX}{chain_id}'
+        meta_key, log_key = self._keys(chain_id)
         try:
-            data = self._redis.get(key)
-            if data:
-                return ActionChain.from_json(data)
-            return None
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.hgetall(meta_key)
+            pipe.lrange(log_key, 0, -1)
+            pipe.ttl(meta_key)
+            meta, log, ttl = pipe.execute()
+            if not meta:
+                # Chains written before the step log existed
+                data = self._redis.get(f'{self.KEY_PREFIX}{chain_id}')
+                return ActionChain.from_json(data) if data else None
+            
+            meta = {
+                (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+                for k, v in meta.items()
+            }
+            step_count = int(meta.get('step_count', 0))
+            steps: Dict[int, ActionStep] = {}
+            records: Dict[int, Any] = {}
+            for raw in log:
+                index, step = decode_step(raw)
+                if index < step_count:
+                    steps[index] = step
+                    records[index] = raw
+            
+            chain = ActionChain(
+                chain_id=chain_id,
+                name=meta.get('name', ''),
+                steps=[steps.get(i) or ActionStep() for i in range(step_count)],
+                current_index=int(meta.get('current_index', 0)),
+                status=ActionStepStatus(meta.get('status', 'pending')),
+                origin_agent_id=meta.get('origin_agent_id') or None,
+                origin_topic_id=meta.get('origin_topic_id') or None,
+                created_at=float(meta.get('created_at', time.time())),
+                updated_at=float(meta.get('updated_at', time.time())),
+            )
+            chain._persisted.update(records)
+            chain._persisted['meta'] = meta
+            chain._persisted['log_len'] = len(log)
+            chain._persisted['ttl'] = chain.FINISHED_TTL if chain.is_finished else chain.REDIS_TTL
+            return chain
         except Exception as e:
             print(f'[ActionChainStore] Failed to load chain {chain_id}: {e}')
             return None
@@ -451,68 +694,13 @@ class ActionChainStore:
         if not self._redis:
             return False
             
-        key = f'{self.KEY_PREFIX}{chain_id}'
+        meta_key, log_key = self._keys(chain_id)
         try:
-            self._redis.delete(key)
+            self._redis.delete(meta_key, log_key, f'{self.KEY_PREFIX}{chain_id}')
             return True
         except Exception as e:
             print(f'[ActionChainStore] Failed to delete chain {chain_id}: {e}')
             return False
-    
-    def set_interrupt(self, topic_id: str, agent_id: str, ttl: int = 60) -> bool:
-        """
-        Set interrupt flag for an agent in a topic.
-        
-        Args:
-            topic_id: Topic ID
-            agent_id: Agent ID to interrupt
-            ttl: Time-to-live for interrupt flag (default 60s)
-            
-        Returns:
-            True if set successfully
-        """
-        if not self._redis:
-            return False
-            
-        key = f'{self.INTERRUPT_PREFIX}{topic_id}:{agent_id}'
-        try:
-            self._redis.setex(key, ttl, '1')
-            return True
-        except Exception as e:
-            print(f'[ActionChainStore] Failed to set interrupt: {e}')
-            return False
-    
-    def check_interrupt(self, topic_id: str, agent_id: str) -> bool:
-        """
-        Check if interrupt flag is set for an agent.
-        
-        Args:
-            topic_id: Topic ID
-            agent_id: Agent ID to check
-            
-        Returns:
-            True if interrupt flag is set
-        """
-        if not self._redis:
-            return False
-            
-        key = f'{self.INTERRUPT_PREFIX}{topic_id}:{agent_id}'
-        try:
-            return self._redis.get(key) is not None
-        except Exception:
-            return False
-    
-    def clear_interrupt(self, topic_id: str, agent_id: str) -> bool:
-        """Clear interrupt flag for an agent."""
-        if not self._redis:
-            return False
-            
-        key = f'{self.INTERRUPT_PREFIX}{topic_id}:{agent_id}'
-        try:
-            self._redis.delete(key)
-            return True
-        except Exception:
-            return False
 
 
 # =============================================================================
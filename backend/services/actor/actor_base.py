@@ -14,6 +14,8 @@ Actor 基类
 
 from __future__ import annotations
 
+import copy
+import functools
 import json
 import logging
 import queue
@@ -23,11 +25,19 @@ import time
 import traceback
 import uuid
 from abc import ABC, abstractmethod
-from typing import Any, Callable, Dict, Generator, List, Optional, TYPE_CHECKING
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple, TYPE_CHECKING
 
 from database import get_mysql_connection, get_redis_client
 from token_counter import estimate_messages_tokens, get_model_max_tokens
 from models.llm_config import LLMConfigRepository
+from utils.cancellation import (
+    CancellationToken,
+    bind_cancel_token,
+    cancel_token,
+    current_cancel_token,
+    reset_token,
+)
+from utils.log_pipeline import get_category_logger, log_event, preview
 
 from .actor_state import ActorState
 from .iteration_context import (
@@ -39,6 +49,8 @@ from .iteration_context import (
 )
 from .actions import Action, ActionResult, ResponseDecision, ActionType
 from .capability_registry import CapabilityRegistry
+from .prompt_segments import SegmentedPrompt, memo_block
+from .phase_graph import PhaseGraph, PhaseRun, SpeculativeStream, apply_side_effect
 from .action_chain import (
     ActionChain,
     ActionStep,
@@ -52,6 +64,11 @@ from .action_chain import (
 
 logger = logging.getLogger(__name__)
 
+# 逐消息热路径日志（队列异步写出，分类级别与预览采样见 utils/log_pipeline）
+_actor_log = get_category_logger("actor")
+_mcp_log = get_category_logger("mcp")
+_llm_log = get_category_logger("llm")
+
 
 class ActorBase(ABC):
     """
@@ -75,6 +92,10 @@ class ActorBase(ABC):
     DEFAULT_MAX_ITERATIONS = 10
     DEFAULT_MCP_TIMEOUT_MS = 60000
     MEMORY_BUDGET_THRESHOLD = 0.8
+    # 后台摘要的软阈值：早于硬阈值触发，摘要通常在真正超限前就绪
+    MEMORY_SOFT_THRESHOLD = 0.6
+    # 工具可选时在 MCP 路由完成前推测性地开始主 LLM 流（路由命中工具则丢弃）
+    SPECULATIVE_REPLY = True
 
     def __init__(self, agent_id: str):
         """
@@ -99,6 +120,11 @@ class ActorBase(ABC):
         self.is_running = False
         self._thread: Optional[threading.Thread] = None
         self._active_channels: set = set()
+        # 当前一轮处理的取消令牌（打断由 ActorManager 直接触发，见 utils/cancellation）
+        self._cancel_token: Optional[CancellationToken] = None
+        # 每个 topic 的打断代数与原因：入队时记录代数，出队换令牌时代数已变说明入队后被打断过
+        self._interrupts: Dict[str, Tuple[int, str]] = {}
+        self._interrupts_lock = threading.Lock()
 
         # Redis
         self._redis_client = get_redis_client()
@@ -160,6 +186,7 @@ class ActorBase(ABC):
             # 3. 加载历史消息
             limit = history_limit or self.DEFAULT_HISTORY_LIMIT
             self.state.load_history(topic_id, limit=limit)
+            self._restore_summary(topic_id)
 
             # 4. 订阅 Pub/Sub
             self._subscribe_pubsub(topic_id)
@@ -180,20 +207,43 @@ class ActorBase(ABC):
 
         # 如果有触发消息，立即处理
         if trigger_message:
-            self.mailbox.put(
-                {
-                    "type": "new_message",
-                    "topic_id": topic_id,
-                    "data": trigger_message,
-                }
-            )
+            self.on_event(topic_id, {"type": "new_message", "data": trigger_message})
 
     def _load_config(self):
-        """加载 Agent 配置（从数据库）"""
+        """加载 Agent 配置（读穿缓存，未命中时查数据库）"""
+        from services.repository_cache import get_repository_cache, ENTITY_AGENT_CONFIG
+
+        row = get_repository_cache().get_or_load(
+            ENTITY_AGENT_CONFIG, self.agent_id, self._fetch_config_row
+        )
+        if not row:
+            logger.warning(f"[ActorBase:{self.agent_id}] No agent info found")
+            return
+
+        row = copy.deepcopy(row)  # 缓存条目共享，避免运行中修改污染缓存
+        self.info = row
+        self._config = {
+            "model": row.get("config_model"),
+            "provider": row.get("provider"),
+            "api_url": row.get("api_url"),
+            "api_key": row.get("api_key"),
+            "llm_config_id": row.get("llm_config_id"),
+            "system_prompt": row.get("system_prompt"),
+            "name": row.get("name"),
+            "avatar": row.get("avatar"),
+            "ext": row.get("ext"),
+        }
+        logger.info(
+            f"[ActorBase:{self.agent_id}] Config loaded: {row.get('name')} "
+            f"(LLM: {row.get('llm_config_id')}, Provider: {row.get('provider')})"
+        )
+
+    def _fetch_config_row(self) -> Optional[Dict[str, Any]]:
+        """从数据库读取 Agent 配置行（联表 llm_configs，ext 已解析）"""
         conn = get_mysql_connection()
         if not conn:
             logger.warning(f"[ActorBase:{self.agent_id}] No database connection")
-            return
+            return None
 
         try:
             import pymysql
@@ -223,29 +273,12 @@ class ActorBase(ABC):
                         row["ext"] = {}
                 elif not ext:
                     row["ext"] = {}
-
-                self.info = row
-                self._config = {
-                    "model": row.get("config_model"),
-                    "provider": row.get("provider"),
-                    "api_url": row.get("api_url"),
-                    "api_key": row.get("api_key"),
-                    "llm_config_id": row.get("llm_config_id"),
-                    "system_prompt": row.get("system_prompt"),
-                    "name": row.get("name"),
-                    "avatar": row.get("avatar"),
-                    "ext": row.get("ext"),
-                }
-                logger.info(
-                    f"[ActorBase:{self.agent_id}] Config loaded: {row.get('name')} "
-                    f"(LLM: {row.get('llm_config_id')}, Provider: {row.get('provider')})"
-                )
-            else:
-                logger.warning(f"[ActorBase:{self.agent_id}] No agent info found")
+            return row
         except Exception as e:
             logger.error(f"[ActorBase:{self.agent_id}] Error loading config: {e}")
             if conn:
                 conn.close()
+            return None
 
     def reload_config(self):
         """从数据库重新加载 Agent 配置（含 system_prompt），人设更新后调用以使运行中 Actor 生效。"""
@@ -268,50 +301,13 @@ class ActorBase(ABC):
         self._register_builtin_tools()
 
     def _load_skill_packs(self):
-        """加载 Agent 的技能包"""
-        conn = get_mysql_connection()
-        if not conn:
-            return
-
+        """加载 Agent 的技能包（共享技能目录，命中缓存时不查 MySQL）"""
         try:
-            import pymysql
-
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            cursor.execute(
-                """
-                SELECT sp.skill_pack_id, sp.name, sp.summary, sp.process_steps
-                FROM skill_packs sp
-                INNER JOIN skill_pack_assignments spa ON sp.skill_pack_id = spa.skill_pack_id
-                WHERE spa.target_session_id = %s
-                ORDER BY spa.created_at DESC
-            """,
-                (self.agent_id,),
-            )
-            skill_packs = cursor.fetchall()
-            cursor.close()
-            conn.close()
+            from services.actor.skill_catalog import get_skill_catalog
 
+            skill_packs = get_skill_catalog().get_agent_skill_packs(self.agent_id)
             for sp in skill_packs:
-                # 解析 process_steps
-                steps = []
-                try:
-                    ps = sp.get("process_steps")
-                    if isinstance(ps, str):
-                        steps = json.loads(ps)
-                    elif isinstance(ps, list):
-                        steps = ps
-                except Exception:
-                    logger.warning(
-                        f"[ActorBase:{self.agent_id}] Failed to parse process_steps for skill pack {sp.get('skill_pack_id')}"
-                    )
-                    steps = []
-
-                self.capabilities.register_skill(
-                    skill_id=sp.get("skill_pack_id"),
-                    name=sp.get("name", ""),
-                    description=sp.get("summary", ""),
-                    steps=steps,
-                )
+                self._register_skill_pack(sp)
 
             if skill_packs:
                 logger.info(
@@ -319,8 +315,16 @@ class ActorBase(ABC):
                 )
         except Exception as e:
             logger.error(f"[ActorBase:{self.agent_id}] Error loading skill packs: {e}")
-            if conn:
-                conn.close()
+
+    def _register_skill_pack(self, sp: Dict[str, Any]):
+        """技能目录条目 → CapabilityRegistry"""
+        self.capabilities.register_skill(
+            skill_id=sp.get("skill_pack_id"),
+            name=sp.get("name", ""),
+            description=sp.get("summary", ""),
+            trigger_keywords=sp.get("trigger_keywords") or [],
+            steps=sp.get("process_steps") or [],
+        )
 
     def _load_single_skill(self, skill_id: str):
         """
@@ -328,72 +332,28 @@ class ActorBase(ABC):
 
         用途：
         - 当前迭代 ext.skill_packs 中包含的 Skill，可能尚未通过 _load_skill_packs 预加载
-        - 按 skill_pack_id 从 DB 查询并注册到 CapabilityRegistry
+        - 按 skill_pack_id 从共享技能目录读取并注册到 CapabilityRegistry
         """
-        conn = get_mysql_connection()
-        if not conn:
-            logger.warning(
-                f"[ActorBase:{self.agent_id}] Cannot load single skill {skill_id}: no DB connection"
-            )
-            return None
-
         try:
-            import pymysql
+            from services.actor.skill_catalog import get_skill_catalog
 
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            cursor.execute(
-                """
-                SELECT sp.skill_pack_id, sp.name, sp.summary, sp.process_steps
-                FROM skill_packs sp
-                WHERE sp.skill_pack_id = %s
-                LIMIT 1
-            """,
-                (skill_id,),
-            )
-            row = cursor.fetchone()
-            cursor.close()
-            conn.close()
-
-            if not row:
+            sp = get_skill_catalog().get_skill_pack(skill_id)
+            if not sp:
                 logger.warning(
                     f"[ActorBase:{self.agent_id}] Skill pack not found for id={skill_id}"
                 )
                 return None
 
-            # 解析 process_steps
-            steps = []
-            try:
-                ps = row.get("process_steps")
-                if isinstance(ps, str):
-                    steps = json.loads(ps) or []
-                elif isinstance(ps, list):
-                    steps = ps
-            except Exception:
-                logger.warning(
-                    f"[ActorBase:{self.agent_id}] Failed to parse process_steps for skill {skill_id}"
-                )
-                steps = []
-
-            self.capabilities.register_skill(
-                skill_id=row.get("skill_pack_id"),
-                name=row.get("name", ""),
-                description=row.get("summary", ""),
-                steps=steps,
-            )
-
-            skill = self.capabilities.get_skill(row.get("skill_pack_id"))
+            self._register_skill_pack(sp)
+            skill = self.capabilities.get_skill(sp.get("skill_pack_id"))
             logger.info(
-                f"[ActorBase:{self.agent_id}] Loaded single skill pack {skill_id} ({row.get('name')})"
+                f"[ActorBase:{self.agent_id}] Loaded single skill pack {skill_id} ({sp.get('name')})"
             )
             return skill
         except Exception as e:
             logger.error(
                 f"[ActorBase:{self.agent_id}] Error loading single skill pack {skill_id}: {e}"
             )
-            try:
-                conn.close()
-            except Exception:
-                pass
             return None
 
     def _register_builtin_tools(self):
@@ -430,10 +390,55 @@ class ActorBase(ABC):
         logger.info(f"[ActorBase:{self.agent_id}] Worker thread started")
 
     def stop(self):
-        """停止 Actor"""
+        """停止 Actor（进行中的 LLM 流 / MCP 请求随令牌中止）"""
         self.is_running = False
+        if self._cancel_token is not None:
+            self._cancel_token.cancel("stopped")
         logger.info(f"[ActorBase:{self.agent_id}] Stopped")
 
+    def interrupt(self, topic_id: str, reason: str = "user_interrupt"):
+        """
+        打断该 topic 上进行中的处理（由 ActorManager 监听线程调用）
+
+        取消 (topic, agent) 令牌：流式循环在下一个分片前退出，进行中的 HTTP 请求被关闭；
+        同时丢弃 mailbox 中该 topic 尚未处理的 new_message。Actor 本身、配置与历史保留。
+
+        先推进打断代数再取消令牌：消息已出队、尚未换新令牌时到达的打断，由 _begin_turn
+        比较代数补上（令牌取消与排队消息丢弃都覆盖不到这个窗口）。
+        """
+        with self._interrupts_lock:
+            generation = self._interrupts.get(topic_id, (0, reason))[0] + 1
+            self._interrupts[topic_id] = (generation, reason)
+        cancelled = cancel_token(topic_id, self.agent_id, reason)
+
+        # 经 Queue API 取出全部排队事件，丢弃该 topic 的 new_message，其余按原顺序放回
+        kept = []
+        dropped = 0
+        while True:
+            try:
+                event = self.mailbox.get_nowait()
+            except queue.Empty:
+                break
+            if event.get("type") == "new_message" and event.get("topic_id") == topic_id:
+                dropped += 1
+            else:
+                kept.append(event)
+            self.mailbox.task_done()
+        for event in kept:
+            self.mailbox.put(event)
+        log_event(
+            _actor_log, logging.INFO, "处理被打断",
+            agent=self.agent_id, topic=topic_id, reason=reason,
+            in_flight=cancelled, dropped=dropped,
+        )
+
+    def _turn_cancelled(self) -> bool:
+        """当前这一轮处理是否已被打断（或 Actor 已停止）；内存读，无 Redis 往返"""
+        if not self.is_running:
+            return True
+        token = current_cancel_token()
+        return token is not None and token.cancelled
+
     def get_status(self) -> Dict[str, Any]:
         """
         获取当前 Actor 状态（用于 Actor 池监控）
@@ -487,11 +492,18 @@ class ActorBase(ABC):
                 topic_id = event.get("topic_id") or self.topic_id
 
                 if event_type == "new_message":
-                    self._handle_new_message(topic_id, event.get("data", {}))
+                    # 出队即换新令牌：记忆摘要、响应决策（可能调用 LLM）期间的打断同样生效
+                    token = self._begin_turn(topic_id, event.get("interrupt_generation"))
+                    with bind_cancel_token(token):
+                        self._handle_new_message(topic_id, event.get("data", {}))
                 elif event_type == "messages_rolled_back":
                     self._handle_rollback_event(topic_id, event.get("data", {}))
                 elif event_type == "topic_participants_updated":
                     self._handle_participants_updated(topic_id, event.get("data", {}))
+                elif event_type == "topic_updated":
+                    from .response_arbiter import get_response_arbiter
+
+                    get_response_arbiter().forget_topic(topic_id)
 
                 self.mailbox.task_done()
             except Exception as e:
@@ -499,16 +511,20 @@ class ActorBase(ABC):
                 traceback.print_exc()
 
     def on_event(self, topic_id: str, event: Dict[str, Any]):
-        """接收来自 Topic 的事件，放入 mailbox 队列"""
-        event["topic_id"] = topic_id
-        self.mailbox.put(event)
+        """接收来自 Topic 的事件，放入 mailbox 队列（复制一份：同一事件会分发给多个 Actor）"""
+        with self._interrupts_lock:
+            generation = self._interrupts.get(topic_id, (0, None))[0]
+        self.mailbox.put({**event, "topic_id": topic_id, "interrupt_generation": generation})
 
     # ========== 记忆管理 ==========
 
-    def _check_memory_budget(self) -> bool:
+    def _check_memory_budget(self, threshold: Optional[float] = None) -> bool:
         """
         检查记忆是否超过模型上下文的阈值
 
+        Args:
+            threshold: 阈值（默认 MEMORY_SOFT_THRESHOLD，提前触发后台摘要）
+
         Returns:
             True 表示超过预算，需要摘要
         """
@@ -516,39 +532,50 @@ class ActorBase(ABC):
         if not model:
             return False
 
-        return self.state.check_memory_budget(model, self.MEMORY_BUDGET_THRESHOLD)
+        return self.state.check_memory_budget(
+            model, threshold if threshold is not None else self.MEMORY_SOFT_THRESHOLD
+        )
 
     def _summarize_memory(self):
         """
-        记忆总结
+        记忆总结（后台执行，立即返回）
 
-        当历史消息累计接近上下文阈值时，自动生成摘要并替换旧消息。
+        历史消息累计超过软阈值时提交增量摘要任务，保留最后 24 条原文；
+        摘要完成后原子替换 state.summary，并持久化到 summaries 表 / Redis。
+        """
+        from .memory_summarizer import get_memory_summarizer
+
+        if not self._config.get("llm_config_id"):
+            return None
+        return get_memory_summarizer().schedule(self, keep_recent=24, min_batch=12)
+
+    def _generate_summary(
+        self, previous: Optional[str], messages: List[Dict[str, Any]]
+    ) -> Optional[str]:
+        """
+        调用 LLM 生成增量摘要（在后台摘要线程执行）
+
+        Args:
+            previous: 已有摘要（首次为 None）
+            messages: summary_until 之后待并入摘要的消息
+
+        Returns:
+            新摘要；无可摘要内容或配置缺失时返回 None
         """
         llm_config_id = self._config.get("llm_config_id")
         if not llm_config_id:
-            return
+            return None
 
         # 直接使用 Repository 获取配置
         repository = LLMConfigRepository(get_mysql_connection)
         config = repository.find_by_id(llm_config_id)
         if not config:
-            return
+            return None
         model = config.model or "gpt-4"
 
-        history = self.state.history
-        if not isinstance(history, list) or len(history) < 20:
-            return
-
-        # 保留最后 24 条原文，其余进摘要
-        keep_tail = 24
-        older = history[:-keep_tail]
-        if len(older) < 12:
-            return
-
         # 构建摘要输入
         lines = []
-        last_id = None
-        for m in older[-80:]:
+        for m in messages:
             if not isinstance(m, dict):
                 continue
             role = m.get("role")
@@ -558,10 +585,9 @@ class ActorBase(ABC):
             if len(content) > 1200:
                 content = content[:1200] + "…"
             lines.append(f"{role}: {content}")
-            last_id = m.get("message_id") or last_id
 
         if not lines:
-            return
+            return None
 
         system = (
             "你是一个对话摘要器。请把以下对话浓缩成可供后续继续对话的「记忆摘要」。\n"
@@ -571,72 +597,50 @@ class ActorBase(ABC):
             "- 输出中文，控制在 400~800 字。\n"
             "- 只输出摘要正文，不要标题。"
         )
-        user = "\n".join(lines)
-
-        try:
-            print(
-                f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 记忆摘要 LLM 调用 =========={self.RESET}"
-            )
-            print(f"{self.CYAN}[Actor Mode] Agent: {self.agent_id}{self.RESET}")
-            print(
-                f"{self.CYAN}[Actor Mode] Provider: {config.provider}, Model: {model}{self.RESET}"
-            )
-            print(f"{self.CYAN}[Actor Mode] Config ID: {llm_config_id}{self.RESET}")
-
-            # 直接使用 Provider SDK
-            from services.providers import create_provider
-            from services.providers.base import LLMMessage
+        if previous:
+            system += "\n- 输入包含「已有摘要」与其后的新对话，请把新对话合并进摘要，输出完整的新摘要。"
+            user = f"【已有摘要】\n{previous}\n\n【新对话】\n" + "\n".join(lines)
+        else:
+            user = "\n".join(lines)
 
-            # 打印提示词
-            system_preview = system[:300] + "..." if len(system) > 300 else system
-            user_preview = user[:500] + "..." if len(user) > 500 else user
-            print(
-                f"{self.CYAN}[Actor Mode] SYSTEM 提示词 ({len(system)} 字符): {system_preview}{self.RESET}"
-            )
-            print(
-                f"{self.CYAN}[Actor Mode] USER 提示词 ({len(user)} 字符): {user_preview}{self.RESET}"
-            )
+        from services.providers import create_provider
+        from services.providers.base import LLMMessage
 
-            provider = create_provider(
-                provider_type=config.provider,
-                api_key=config.api_key,
-                api_url=config.api_url,
-                model=model,
-            )
-
-            llm_messages = [
+        log_event(
+            _llm_log, logging.INFO, "后台记忆摘要",
+            agent=self.agent_id, provider=config.provider, model=model,
+            new_messages=len(lines), incremental=bool(previous),
+        )
+        provider = create_provider(
+            provider_type=config.provider,
+            api_key=config.api_key,
+            api_url=config.api_url,
+            model=model,
+        )
+        response = provider.chat(
+            [
                 LLMMessage(role="system", content=system),
                 LLMMessage(role="user", content=user),
             ]
-
-            print(
-                f"{self.CYAN}[Actor Mode] 调用 Provider SDK 进行记忆摘要...{self.RESET}"
+        )
+        summary = (response.content or "").strip()
+        if summary:
+            logger.info(
+                f"[ActorBase:{self.agent_id}] Memory summarized ({len(summary)} chars)"
             )
-            response = provider.chat(llm_messages)
-            summary = (response.content or "").strip()
-            if summary:
-                self.state.summary = summary
-                self.state.summary_until = last_id
-                print(
-                    f"{self.CYAN}[Actor Mode] ✅ 记忆摘要完成，摘要长度: {len(summary)} 字符{self.RESET}"
-                )
-                print(
-                    f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 记忆摘要 LLM 调用完成 =========={self.RESET}\n"
-                )
+        return summary or None
+
+    def _restore_summary(self, topic_id: str):
+        """激活时恢复持久化的记忆摘要（避免重启后重新计算）"""
+        from .memory_summarizer import get_memory_summarizer
+
+        try:
+            if get_memory_summarizer().restore(self.agent_id, topic_id, self.state):
                 logger.info(
-                    f"[ActorBase:{self.agent_id}] Memory summarized ({len(summary)} chars)"
-                )
-            else:
-                print(f"{self.CYAN}[Actor Mode] ⚠️ 记忆摘要为空{self.RESET}")
-                print(
-                    f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 记忆摘要 LLM 调用完成 =========={self.RESET}\n"
+                    f"[ActorBase:{self.agent_id}] Restored memory summary until {self.state.summary_until}"
                 )
         except Exception as e:
-            print(f"{self.CYAN}[Actor Mode] ❌ 记忆摘要失败: {str(e)}{self.RESET}")
-            print(
-                f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 记忆摘要 LLM 调用完成 =========={self.RESET}\n"
-            )
-            logger.error(f"[ActorBase:{self.agent_id}] Summarize failed: {e}")
+            logger.error(f"[ActorBase:{self.agent_id}] Restore summary failed: {e}")
 
     # ========== 消息处理（迭代器模式）==========
 
@@ -673,16 +677,13 @@ class ActorBase(ABC):
             return
 
         logger.info(f"[ActorBase:{self.agent_id}] Received: {content[:50]}...")
-        if ext.get("auto_trigger") and ext.get("retry"):
-            print(
-                f"{self.CYAN}{self.BOLD}[ActorBase] 📥 收到重试消息，开始处理...{self.RESET}"
-            )
-        else:
-            print(
-                f"{self.CYAN}{self.BOLD}[ActorBase] 📥 收到新消息，开始处理...{self.RESET}"
-            )
+        log_event(
+            _actor_log, logging.INFO, "收到消息，开始处理",
+            agent=self.agent_id, topic=topic_id, message_id=msg_data.get("message_id"),
+            retry=bool(ext.get("auto_trigger") and ext.get("retry")),
+        )
 
-        # 4. 检查记忆预算
+        # 4. 检查记忆预算（超过软阈值时提交后台摘要，不阻塞回复）
         if self._check_memory_budget():
             self._summarize_memory()
 
@@ -714,6 +715,38 @@ class ActorBase(ABC):
             msg_data: 消息数据
             decision: 响应决策（可选）
         """
+        # 沿用 _run 出队时为本轮创建的令牌；直接调用时换新令牌，之前的打断不影响本轮
+        token = current_cancel_token()
+        if token is None or token is not self._cancel_token:
+            token = self._begin_turn(topic_id)
+        with bind_cancel_token(token):
+            self._process_message(topic_id, msg_data, decision)
+
+    def _begin_turn(self, topic_id: str, interrupt_generation: Optional[int] = None) -> CancellationToken:
+        """
+        新一轮处理开始：换新取消令牌并记录为当前轮的令牌
+
+        Args:
+            topic_id: 话题 ID
+            interrupt_generation: 消息入队时的打断代数；之后该 topic 被打断过时新令牌立即取消
+        """
+        token = reset_token(topic_id, self.agent_id)
+        self._cancel_token = token
+        if interrupt_generation is not None:
+            # 先换令牌再比较代数（interrupt() 先推进代数再取消令牌），两者之间到达的打断不会漏掉
+            with self._interrupts_lock:
+                generation, reason = self._interrupts.get(topic_id, (0, None))
+            if generation > interrupt_generation:
+                token.cancel(reason or "user_interrupt")
+        return token
+
+    def _process_message(
+        self,
+        topic_id: str,
+        msg_data: Dict[str, Any],
+        decision: ResponseDecision = None,
+    ):
+        """process_message 的主体（已绑定本轮取消令牌）"""
         message_id = msg_data.get("message_id")
         reply_message_id = f"msg_{uuid.uuid4().hex[:8]}"
 
@@ -723,35 +756,8 @@ class ActorBase(ABC):
         ctx.topic_id = topic_id
         ctx.reply_message_id = reply_message_id
 
-        # 获取话题类型，用于决定是否使用用户选择的模型
-        from services.topic_service import get_topic_service
-
-        topic = get_topic_service().get_topic(topic_id)
-        session_type = topic.get("session_type") if topic else None
-
-        # 提取用户选择的模型信息
-        # 重要：仅在 agent 私聊模式下允许用户覆盖模型
-        # topic_general 话题群中，每个Agent应使用自己的默认模型
-        ext = msg_data.get("ext", {}) or {}
-
-        if session_type == "agent":
-            # 私聊模式：允许用户选择模型覆盖Agent默认
-            if ext.get("user_llm_config_id"):
-                ctx.user_selected_llm_config_id = ext["user_llm_config_id"]
-                print(
-                    f"[ActorBase:{self.agent_id}] 私聊模式，用户选择了LLM配置ID: {ctx.user_selected_llm_config_id}"
-                )
-            elif msg_data.get("model"):
-                ctx.user_selected_model = msg_data["model"]
-                print(
-                    f"[ActorBase:{self.agent_id}] 私聊模式，用户选择了模型: {ctx.user_selected_model}"
-                )
-        else:
-            # topic_general 或其他模式：使用Agent自己的默认模型
-            agent_default_model = self._config.get("llm_config_id")
-            print(
-                f"[ActorBase:{self.agent_id}] 话题群模式，使用Agent默认模型: {agent_default_model}"
-            )
+        # 相互独立的 I/O 阶段并行执行（查话题类型 → 查 LLM 配置；规划行动）
+        run = self._start_phases(ctx, topic_id, msg_data)
 
         # 添加激活步骤
         ctx.add_step(
@@ -782,6 +788,36 @@ class ActorBase(ABC):
                 self._stats.get("messages_processed", 0) + 1
             )
         try:
+            run.wait(ProcessPhase.RESOLVE_SESSION)
+
+            # 工具可选时，在规划（MCP 路由）完成前推测性地开始主 LLM 流
+            prepared = None
+            speculative = None
+            if self._can_speculate(msg_data):
+                prepared = self._prepare_reply(ctx, run.wait(ProcessPhase.LOAD_LLM_TOOL))
+                if not isinstance(prepared, ActionResult) and not (
+                    prepared["is_thinking_model"] or prepared["is_image_gen_model"]
+                ):
+                    speculative = SpeculativeStream(
+                        lambda: self._stream_llm_response(
+                            prepared["messages"],
+                            llm_config_id=prepared["llm_config_id"],
+                            ctx=ctx,
+                        )
+                    )
+
+            planned = run.wait(ProcessPhase.PLAN_ACTIONS)
+            if speculative is not None and planned:
+                speculative.abandon()
+                speculative = None
+                log_event(
+                    _actor_log, logging.INFO, "规划出行动，放弃推测生成",
+                    agent=self.agent_id, actions=len(planned),
+                )
+            if speculative is None:
+                # 未采用推测结果：迭代后按最新上下文（含工具结果）重新构建消息
+                prepared = None
+
             # 迭代处理
             iteration_start = time.time()
             while not ctx.is_complete and ctx.iteration < ctx.max_iterations:
@@ -792,8 +828,8 @@ class ActorBase(ABC):
                     ctx, f"开始第 {ctx.iteration} 轮迭代...", log_type="step"
                 )
 
-                # 执行单轮迭代
-                self._iterate(ctx)
+                # 执行单轮迭代（首轮使用并行阶段已规划的行动）
+                self._iterate(ctx, planned if ctx.iteration == 1 else None)
 
                 # 检查打断
                 if self._check_interruption(ctx):
@@ -801,6 +837,12 @@ class ActorBase(ABC):
                     self._log_execution(ctx, "处理被打断", log_type="info")
                     break
 
+            if ctx.is_interrupted:
+                # 前端已收到 agent_interrupt_ack，不再生成回复
+                if speculative is not None:
+                    speculative.abandon()
+                return
+
             iteration_duration = int((time.time() - iteration_start) * 1000)
             self._log_execution(
                 ctx,
@@ -811,7 +853,23 @@ class ActorBase(ABC):
 
             # 生成最终回复
             self._log_execution(ctx, "开始生成回复...", log_type="thinking")
-            self._generate_final_response(ctx)
+            if prepared is None:
+                prepared = self._prepare_reply(ctx, run.wait(ProcessPhase.LOAD_LLM_TOOL))
+            self._generate_final_response(ctx, prepared=prepared, speculative=speculative)
+
+            run.drain()
+            ctx.phase_timings = run.timings
+            if ctx.first_chunk_at is not None and _actor_log.isEnabledFor(logging.INFO):
+                log_event(
+                    _actor_log, logging.INFO, "首字",
+                    agent=self.agent_id,
+                    ttft_ms=int((ctx.first_chunk_at - run.started) * 1000),
+                    speculative=speculative is not None,
+                    phases=", ".join(
+                        f"{name}={t['duration_ms']}ms@{t['started_ms']}"
+                        for name, t in ctx.phase_timings.items()
+                    ),
+                )
 
         except Exception as e:
             with self._stats_lock:
@@ -821,18 +879,107 @@ class ActorBase(ABC):
             ctx.mark_error(str(e))
             self._handle_process_error(ctx, e)
 
-    def _iterate(self, ctx: IterationContext):
+    def _start_phases(
+        self, ctx: IterationContext, topic_id: str, msg_data: Dict[str, Any]
+    ) -> PhaseRun:
+        """
+        启动消息处理的并行阶段
+
+        - resolve_session: 查话题类型，私聊模式下应用用户选择的模型
+        - load_llm_tool: 确定并读取本轮 LLM 配置（依赖 resolve_session）
+        - plan_actions: 首轮行动规划（Skill 加载、MCP 路由），与上面两者并行
+
+        各阶段的 running / completed 事件附带 started_ms / duration_ms；事件在本线程
+        run.wait() / run.drain() 时投递，ctx 只由 Actor 线程修改。
+        """
+
+        def on_event(phase: str, status: str, data: Dict[str, Any]):
+            ctx.record_phase(phase, status, **data)
+            self._publish_process_event(ctx, phase, status, data)
+
+        graph = PhaseGraph(on_event=on_event)
+        graph.add(
+            ProcessPhase.RESOLVE_SESSION,
+            lambda: self._resolve_session_model(ctx, topic_id, msg_data),
+        )
+        graph.add(
+            ProcessPhase.LOAD_LLM_TOOL,
+            lambda: self._resolve_reply_llm_config(ctx),
+            deps=(ProcessPhase.RESOLVE_SESSION,),
+        )
+        graph.add(ProcessPhase.PLAN_ACTIONS, lambda: self._plan_actions(ctx))
+        return graph.start()
+
+    def _resolve_session_model(
+        self, ctx: IterationContext, topic_id: str, msg_data: Dict[str, Any]
+    ) -> Optional[str]:
+        """获取话题类型，用于决定是否使用用户选择的模型；返回 session_type"""
+        from services.topic_service import get_topic_service
+
+        topic = get_topic_service().get_topic(topic_id)
+        session_type = topic.get("session_type") if topic else None
+
+        # 提取用户选择的模型信息
+        # 重要：仅在 agent 私聊模式下允许用户覆盖模型
+        # topic_general 话题群中，每个Agent应使用自己的默认模型
+        ext = msg_data.get("ext", {}) or {}
+
+        if session_type == "agent":
+            # 私聊模式：允许用户选择模型覆盖Agent默认
+            if ext.get("user_llm_config_id"):
+                ctx.user_selected_llm_config_id = ext["user_llm_config_id"]
+                log_event(
+                    _actor_log, logging.DEBUG, "私聊模式，用户选择了 LLM 配置",
+                    agent=self.agent_id, config_id=ctx.user_selected_llm_config_id,
+                )
+            elif msg_data.get("model"):
+                ctx.user_selected_model = msg_data["model"]
+                log_event(
+                    _actor_log, logging.DEBUG, "私聊模式，用户选择了模型",
+                    agent=self.agent_id, model=ctx.user_selected_model,
+                )
+        else:
+            # topic_general 或其他模式：使用Agent自己的默认模型
+            log_event(
+                _actor_log, logging.DEBUG, "话题群模式，使用 Agent 默认模型",
+                agent=self.agent_id, config_id=self._config.get("llm_config_id"),
+            )
+        return session_type
+
+    def _can_speculate(self, msg_data: Dict[str, Any]) -> bool:
+        """
+        是否可以推测性地提前开始主 LLM 流
+
+        用户显式选择了 Skill 或 MCP 时工具是必需的，不推测；仅自动路由时工具可选，
+        路由结果为空（多数消息）即可直接采用推测结果。
+        """
+        if not self.SPECULATIVE_REPLY:
+            return False
+        ext = msg_data.get("ext", {}) or {}
+        return not any(
+            ext.get(k)
+            for k in (
+                "skill_packs",
+                "mcp_servers",
+                "selectedMcpServerIds",
+                "selected_mcp_server_ids",
+                "tool_call",
+            )
+        )
+
+    def _iterate(self, ctx: IterationContext, planned: Optional[List[ActionStep]] = None):
         """
         单轮迭代 - 思考→规划→执行→观察
 
         Args:
             ctx: 迭代上下文
+            planned: 已提前规划好的行动（首轮由并行阶段给出），为 None 时现场规划
         """
         # 1. 规划下一步行动
         self._log_execution(ctx, "规划行动...", log_type="thinking")
 
         plan_start = time.time()
-        actions = self._plan_actions(ctx)
+        actions = self._plan_actions(ctx) if planned is None else planned
         ctx.planned_actions = actions
         plan_duration = int((time.time() - plan_start) * 1000)
 
@@ -861,6 +1008,9 @@ class ActorBase(ABC):
             duration=plan_duration,
         )
 
+        if self._turn_cancelled():
+            return
+
         # 3. 执行第一个行动
         action = actions[0]
         action_desc = self._get_action_description(action)
@@ -971,23 +1121,17 @@ class ActorBase(ABC):
         """
         start_time = time.time()
 
-        # 📋 打印 ActionStep 详细信息
-        print(f"\n{'=' * 60}")
-        print(f"🎯 [ActionStep] Agent: {self.agent_id}")
-        print(f"   ├─ Step ID: {step.step_id}")
-        print(f"   ├─ Action Type: {step.action_type.value}")
-        print(f"   ├─ Description: {step.description}")
-        if step.mcp_server_id:
-            print(f"   ├─ MCP Server: {step.mcp_server_id}")
-        if step.mcp_tool_name:
-            print(f"   ├─ MCP Tool: {step.mcp_tool_name}")
-        if step.target_agent_id:
-            print(f"   ├─ Target Agent: {step.target_agent_id}")
+        log_event(
+            _actor_log, logging.INFO, "ActionStep",
+            agent=self.agent_id, step_id=step.step_id, action=step.action_type.value,
+            description=step.description, mcp_server=step.mcp_server_id, mcp_tool=step.mcp_tool_name,
+            target_agent=step.target_agent_id, status=step.status.value,
+        )
         if step.params:
-            params_str = json.dumps(step.params, ensure_ascii=False, indent=6)[:200]
-            print(f"   ├─ Params: {params_str}...")
-        print(f"   └─ Status: {step.status.value}")
-        print(f"{'=' * 60}")
+            log_event(
+                _actor_log, logging.DEBUG, "ActionStep 参数", sample="preview",
+                agent=self.agent_id, step_id=step.step_id, params=preview(step.params, 200),
+            )
 
         try:
             action_type = step.action_type
@@ -1069,27 +1213,17 @@ class ActorBase(ABC):
 
         topic_service = get_topic_service()
 
-        # 📋 打印 ActionChain Step 执行信息
-        chain_info = (
-            f"Chain: {ctx.action_chain_id}" if ctx.action_chain_id else "No Chain"
+        log_event(
+            _actor_log, logging.INFO, "ActionChain Step",
+            agent=self.agent_id, chain_id=ctx.action_chain_id, step_index=ctx.chain_step_index,
+            step_id=step.step_id, action=step.action_type.value, description=step.description,
+            mcp_server=step.mcp_server_id, mcp_tool=step.mcp_tool_name, target_agent=step.target_agent_id,
         )
-        print(f"\n{'─' * 60}")
-        print(f"⚡ [ActionChain Step] Agent: {self.agent_id}")
-        print(f"   ├─ {chain_info}")
-        print(f"   ├─ Step Index: {ctx.chain_step_index}")
-        print(f"   ├─ Step ID: {step.step_id}")
-        print(f"   ├─ Action Type: {step.action_type.value}")
-        print(f"   ├─ Description: {step.description}")
-        if step.mcp_server_id:
-            print(f"   ├─ MCP Server: {step.mcp_server_id}")
-        if step.mcp_tool_name:
-            print(f"   ├─ MCP Tool: {step.mcp_tool_name}")
-        if step.target_agent_id:
-            print(f"   ├─ Target Agent: {step.target_agent_id}")
         if step.params:
-            params_str = json.dumps(step.params, ensure_ascii=False)[:150]
-            print(f"   └─ Params: {params_str}...")
-        print(f"{'─' * 60}")
+            log_event(
+                _actor_log, logging.DEBUG, "ActionChain Step 参数", sample="preview",
+                agent=self.agent_id, step_id=step.step_id, params=preview(step.params, 150),
+            )
 
         # 调用 do_before 回调
         step.do_before(topic_service, ctx.topic_id, self.agent_id)
@@ -1148,16 +1282,16 @@ class ActorBase(ABC):
         # 更新步骤结果
         step.result = result_data
 
-        # 📋 打印执行结果
-        status_icon = "✅" if success else "❌"
-        print(f"\n{status_icon} [ActionStep Result] {step.action_type.value}")
-        print(f"   ├─ Step ID: {step.step_id}")
-        print(f"   ├─ Success: {success}")
-        if error_msg:
-            print(f"   ├─ Error: {error_msg}")
+        log_event(
+            _actor_log, logging.INFO if success else logging.WARNING, "ActionStep Result",
+            agent=self.agent_id, step_id=step.step_id, action=step.action_type.value,
+            success=success, error=error_msg,
+        )
         if result_data:
-            result_str = json.dumps(result_data, ensure_ascii=False)[:200]
-            print(f"   └─ Result: {result_str}...")
+            log_event(
+                _actor_log, logging.DEBUG, "ActionStep 结果", sample="preview",
+                agent=self.agent_id, step_id=step.step_id, result=preview(result_data, 200),
+            )
 
         # 调用 do_after 回调
         step.do_after(
@@ -1284,9 +1418,6 @@ class ActorBase(ABC):
                     logger.info(
                         f"[ActorBase:{self.agent_id}] 检测到参数错误，触发新一轮迭代以修复参数"
                     )
-                    print(
-                        f"{self.YELLOW}[ActorBase] 🔄 检测到参数错误，触发新一轮迭代以修复参数{self.RESET}"
-                    )
                     return True
 
                 # 其他类型的错误，不继续
@@ -1330,14 +1461,16 @@ class ActorBase(ABC):
             if result:
                 return result["config_id"]
             else:
-                print(
-                    f"{self.YELLOW}[MCP DEBUG] 未找到模型 '{model_name}' 对应的配置，使用后备配置{self.RESET}"
+                log_event(
+                    _mcp_log, logging.WARNING, "未找到模型对应的配置，使用后备配置",
+                    model=model_name, fallback=fallback_config_id,
                 )
                 return fallback_config_id
 
         except Exception as e:
-            print(
-                f"{self.RED}[MCP DEBUG] 查找模型配置失败: {e}，使用后备配置{self.RESET}"
+            log_event(
+                _mcp_log, logging.ERROR, "查找模型配置失败，使用后备配置",
+                model=model_name, fallback=fallback_config_id, error=e,
             )
             return fallback_config_id
 
@@ -1388,7 +1521,7 @@ class ActorBase(ABC):
         """
         检查是否被打断
 
-        检查 Redis 中断标记或 ActionChain 中断信号
+        检查本轮取消令牌（ActorManager 收到打断后直接触发，内存读，无 Redis 往返）
 
         Args:
             ctx: 迭代上下文
@@ -1396,26 +1529,13 @@ class ActorBase(ABC):
         Returns:
             True 表示被打断
         """
-        # 1. 检查 Redis 中断标记
-        if self.topic_id:
-            from services.topic_service import get_topic_service
-
-            try:
-                topic_service = get_topic_service()
-                if topic_service.check_interrupt(self.topic_id, self.agent_id):
-                    logger.info(
-                        f"[ActorBase:{self.agent_id}] Interrupted via Redis flag"
-                    )
-                    # 清除中断标记
-                    topic_service.clear_interrupt(self.topic_id, self.agent_id)
-                    return True
-            except Exception as e:
-                logger.warning(
-                    f"[ActorBase:{self.agent_id}] Failed to check interrupt: {e}"
-                )
-
-        # 2. 检查 mailbox 是否有新消息（打断信号）
-        # 这里简单实现，子类可重写
+        if self._turn_cancelled():
+            token = current_cancel_token()
+            logger.info(
+                f"[ActorBase:{self.agent_id}] Interrupted: "
+                f"{(token.reason if token else None) or 'stopped'}"
+            )
+            return True
         return False
 
     def _check_inherited_chain(
@@ -1498,23 +1618,18 @@ class ActorBase(ABC):
         ctx.inherited_chain = False
         ctx.chain_step_index = 0
 
-        # 📋 打印 ActionChain 创建信息
-        print(f"\n{'🔗' * 20}")
-        print(f"🔗 [ActionChain Created]")
-        print(f"   ├─ Chain ID: {chain.chain_id}")
-        print(f"   ├─ Name: {chain.name}")
-        print(f"   ├─ Origin Agent: {chain.origin_agent_id}")
-        print(f"   ├─ Origin Topic: {chain.origin_topic_id}")
-        print(f"   └─ Status: {chain.status.value}")
-        print(f"{'🔗' * 20}\n")
-
-        logger.info(f"[ActorBase:{self.agent_id}] Created ActionChain {chain.chain_id}")
+        log_event(
+            _actor_log, logging.INFO, "ActionChain Created",
+            agent=self.agent_id, chain_id=chain.chain_id, name=chain.name,
+            origin_agent=chain.origin_agent_id, origin_topic=chain.origin_topic_id,
+            status=chain.status.value,
+        )
 
         return chain
 
     def _save_action_chain(self, chain: ActionChain) -> bool:
         """
-        保存 ActionChain 到 Redis
+        保存 ActionChain 到 Redis（只追加变化的步骤记录与元数据字段）
 
         Args:
             chain: ActionChain 对象
@@ -1527,14 +1642,17 @@ class ActorBase(ABC):
 
     def _publish_chain_progress(self, ctx: IterationContext, chain: ActionChain):
         """
-        发布 ActionChain 进度事件
-        被 stop 的 Actor 不再推送。
+        发布 ActionChain 进度事件（增量：切换步骤时带完整 current_step，之后只带变化字段 step_delta；
+        无变化时不发布）
+        被 stop / 打断的 Actor 不再推送。
         """
-        if not self.is_running:
+        if self._turn_cancelled():
+            return
+        progress = chain.get_progress_delta()
+        if progress is None:
             return
         from services.topic_service import get_topic_service
 
-        progress = chain.get_progress()
         get_topic_service().publish_action_chain_progress(
             topic_id=ctx.topic_id,
             agent_id=self.agent_id,
@@ -1543,6 +1661,7 @@ class ActorBase(ABC):
             total_steps=progress["total_steps"],
             status=progress["status"],
             current_step=progress["current_step"],
+            step_delta=progress["step_delta"],
         )
 
     # ========== 消息处理流程（新增）==========
@@ -1728,7 +1847,8 @@ class ActorBase(ABC):
             )
             import pymysql
 
-            conn = get_mysql_connection()
+            # 服务器地址极少变更，容忍副本延迟
+            conn = get_mysql_connection(read_only=True)
             if not conn:
                 return []
 
@@ -1816,8 +1936,10 @@ class ActorBase(ABC):
                 keep_recent = 5
 
                 if len(history) > keep_recent:
-                    # 估算所有历史消息的 token
-                    all_history_tokens = estimate_messages_tokens(history, model)
+                    # 估算摘要未覆盖的历史消息的 token
+                    all_history_tokens = self.state.history.tokens_after(
+                        self.state.summary_until, model
+                    )
 
                     if all_history_tokens > available_tokens:
                         # 需要 summary
@@ -1825,26 +1947,27 @@ class ActorBase(ABC):
                             f"[ActorBase:{self.agent_id}] Token budget exceeded, triggering summary"
                         )
 
-                        # 调用 summary（保留最近 5 条）
+                        # 后台摘要（保留最近 5 条）；本轮不等待，使用已有摘要 + 摘要之后的消息
                         self._summarize_memory_with_keep(keep_recent)
 
-                        # 使用 summary + 最近消息
-                        if self.state.summary:
+                        # 摘要与其覆盖位置取一致快照（后台摘要可能随时替换）
+                        summary, summary_until = self.state.memory_snapshot()
+                        if summary:
                             history_msgs.append(
                                 {
                                     "role": "system",
-                                    "content": f"【对话摘要】\n{self.state.summary}",
+                                    "content": f"【对话摘要】\n{summary}",
                                 }
                             )
 
-                        # 添加最近的消息
-                        recent_msgs = self.state.get_recent_history(
-                            max_messages=keep_recent,
-                            max_total_chars=8000,
-                            max_per_message_chars=2400,
-                            include_summary=False,
+                        # 摘要之后的消息从最新往前填满剩余预算（不能只取最近 5 条：
+                        # 新摘要完成前，摘要与最近 5 条之间的消息不在任何一处）
+                        remaining = available_tokens - estimate_messages_tokens(history_msgs, model)
+                        history_msgs.extend(
+                            self.state.get_history_after(
+                                summary_until, model, max_tokens=remaining, max_per_message_chars=2400
+                            )
                         )
-                        history_msgs.extend(recent_msgs)
                     else:
                         # 不需要 summary，直接使用历史
                         history_msgs = self.state.get_recent_history(
@@ -1891,124 +2014,16 @@ class ActorBase(ABC):
 
     def _summarize_memory_with_keep(self, keep_recent: int = 5):
         """
-        记忆总结，保留最近 N 条消息
+        记忆总结，保留最近 N 条消息（后台执行，立即返回）
 
         Args:
             keep_recent: 保留的最近消息数量
         """
-        llm_config_id = self._config.get("llm_config_id")
-        if not llm_config_id:
-            return
-
-        # 直接使用 Repository 获取配置
-        repository = LLMConfigRepository(get_mysql_connection)
-        config = repository.find_by_id(llm_config_id)
-        if not config:
-            return
-        model = config.model or "gpt-4"
-
-        history = self.state.history
-        if not isinstance(history, list) or len(history) <= keep_recent:
-            return
-
-        # 保留最后 N 条原文，其余进摘要
-        older = history[:-keep_recent]
-        if len(older) < 5:  # 至少需要 5 条才进行摘要
-            return
+        from .memory_summarizer import get_memory_summarizer
 
-        # 构建摘要输入
-        lines = []
-        last_id = None
-        for m in older[-80:]:  # 最多处理 80 条
-            if not isinstance(m, dict):
-                continue
-            role = m.get("role")
-            content = (m.get("content") or "").strip()
-            if role not in ("user", "assistant") or not content:
-                continue
-            if len(content) > 1200:
-                content = content[:1200] + "…"
-            lines.append(f"{role}: {content}")
-            last_id = m.get("message_id") or last_id
-
-        if not lines:
-            return
-
-        system = (
-            "你是一个对话摘要器。请把以下对话浓缩成可供后续继续对话的「记忆摘要」。\n"
-            "要求：\n"
-            "- 保留关键事实、用户偏好、已做决定、待办事项等。\n"
-            "- 去掉寒暄与重复。\n"
-            "- 输出中文，控制在 400~800 字。\n"
-            "- 只输出摘要正文，不要标题。"
-        )
-        user = "\n".join(lines)
-
-        try:
-            print(
-                f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 记忆摘要（保留 {keep_recent} 条）LLM 调用 =========={self.RESET}"
-            )
-            print(f"{self.CYAN}[Actor Mode] Agent: {self.agent_id}{self.RESET}")
-            print(
-                f"{self.CYAN}[Actor Mode] Provider: {config.provider}, Model: {model}{self.RESET}"
-            )
-            print(f"{self.CYAN}[Actor Mode] Config ID: {llm_config_id}{self.RESET}")
-            print(f"{self.CYAN}[Actor Mode] 保留最近消息数: {keep_recent}{self.RESET}")
-
-            # 直接使用 Provider SDK
-            from services.providers import create_provider
-            from services.providers.base import LLMMessage
-
-            # 打印提示词
-            system_preview = system[:300] + "..." if len(system) > 300 else system
-            user_preview = user[:500] + "..." if len(user) > 500 else user
-            print(
-                f"{self.CYAN}[Actor Mode] SYSTEM 提示词 ({len(system)} 字符): {system_preview}{self.RESET}"
-            )
-            print(
-                f"{self.CYAN}[Actor Mode] USER 提示词 ({len(user)} 字符): {user_preview}{self.RESET}"
-            )
-
-            provider = create_provider(
-                provider_type=config.provider,
-                api_key=config.api_key,
-                api_url=config.api_url,
-                model=model,
-            )
-
-            llm_messages = [
-                LLMMessage(role="system", content=system),
-                LLMMessage(role="user", content=user),
-            ]
-
-            print(
-                f"{self.CYAN}[Actor Mode] 调用 Provider SDK 进行记忆摘要...{self.RESET}"
-            )
-            response = provider.chat(llm_messages)
-            summary = (response.content or "").strip()
-            if summary:
-                self.state.summary = summary
-                self.state.summary_until = last_id
-                print(
-                    f"{self.CYAN}[Actor Mode] ✅ 记忆摘要完成，摘要长度: {len(summary)} 字符{self.RESET}"
-                )
-                print(
-                    f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 记忆摘要 LLM 调用完成 =========={self.RESET}\n"
-                )
-                logger.info(
-                    f"[ActorBase:{self.agent_id}] Memory summarized with keep_recent={keep_recent} ({len(summary)} chars)"
-                )
-            else:
-                print(f"{self.CYAN}[Actor Mode] ⚠️ 记忆摘要为空{self.RESET}")
-                print(
-                    f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 记忆摘要 LLM 调用完成 =========={self.RESET}\n"
-                )
-        except Exception as e:
-            print(f"{self.CYAN}[Actor Mode] ❌ 记忆摘要失败: {str(e)}{self.RESET}")
-            print(
-                f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 记忆摘要 LLM 调用完成 =========={self.RESET}\n"
-            )
-            logger.error(f"[ActorBase:{self.agent_id}] Summarize with keep failed: {e}")
+        if not self._config.get("llm_config_id"):
+            return None
+        return get_memory_summarizer().schedule(self, keep_recent=keep_recent, min_batch=5)
 
     def _classify_msg_type(self, ctx: IterationContext) -> str:
         """
@@ -2373,16 +2388,13 @@ class ActorBase(ABC):
                 )
                 return False
 
-            print(
-                f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 消息处理决策 LLM 调用 =========={self.RESET}"
+            log_event(
+                _llm_log, logging.INFO, "消息处理决策 LLM 调用",
+                agent=self.agent_id, provider=config_obj.provider, model=config_obj.model,
+                config_id=llm_config_id,
             )
-            print(f"{self.CYAN}[Actor Mode] Agent: {self.agent_id}{self.RESET}")
-            print(
-                f"{self.CYAN}[Actor Mode] Provider: {config_obj.provider}, Model: {config_obj.model}{self.RESET}"
-            )
-            print(f"{self.CYAN}[Actor Mode] Config ID: {llm_config_id}{self.RESET}")
 
-            # 转换消息格式并打印提示词
+            # 转换消息格式并记录提示词预览（采样）
             llm_messages = []
             for msg in llm_input:
                 role = msg.get("role", "user")
@@ -2392,15 +2404,13 @@ class ActorBase(ABC):
                         role=role,
                         content=content,
                         media=msg.get("media"),
+                        cache_breakpoints=msg.get("cache_breakpoints"),
                     )
                 )
 
-                # 打印提示词（只打印前 500 字符，避免过长）
-                content_preview = (
-                    content[:500] + "..." if len(content) > 500 else content
-                )
-                print(
-                    f"{self.CYAN}[Actor Mode] {role.upper()} 提示词 ({len(content)} 字符): {content_preview}{self.RESET}"
+                log_event(
+                    _llm_log, logging.DEBUG, "决策提示词", sample="preview",
+                    agent=self.agent_id, role=role, chars=len(content or ""), preview=preview(content),
                 )
 
             # 创建 Provider 并调用
@@ -2412,10 +2422,6 @@ class ActorBase(ABC):
             )
 
             # 非流式调用，获取决策
-            print(
-                f"{self.CYAN}[Actor Mode] 调用 Provider SDK 进行消息处理决策...{self.RESET}"
-            )
-
             # 添加决策步骤通知前端
             model = config_obj.model or "unknown"
             provider_route = (
@@ -2462,12 +2468,7 @@ class ActorBase(ABC):
             response = provider.chat(llm_messages)
             content = (response.content or "").strip()
 
-            print(
-                f"{self.CYAN}[Actor Mode] ✅ 决策完成，返回内容长度: {len(content)} 字符{self.RESET}"
-            )
-            print(
-                f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 消息处理决策 LLM 调用完成 =========={self.RESET}\n"
-            )
+            log_event(_llm_log, logging.INFO, "决策完成", agent=self.agent_id, chars=len(content))
 
             # 3. 解析 LLM 决策
             decision, decision_data = self._parse_llm_decision(content, ctx)
@@ -2626,7 +2627,7 @@ class ActorBase(ABC):
 ```
 """
 
-        messages.append({"role": "system", "content": system_prompt})
+        messages.append(self._system_message(ctx, system_prompt))
 
         # 2. 历史消息（添加权重提示）
         if ctx.history_messages:
@@ -3078,9 +3079,6 @@ class ActorBase(ABC):
                     logger.info(
                         f"[ActorBase:{self.agent_id}] 检测到参数错误，自动触发新一轮迭代以修复参数"
                     )
-                    print(
-                        f"{self.CYAN}{self.BOLD}[ActorBase] 🔄 检测到参数错误，自动触发新一轮迭代以修复参数{self.RESET}"
-                    )
 
                     # 发送包含错误信息的消息，让 LLM 分析并重新调用工具
                     retry_msg_id = get_topic_service().send_message(
@@ -3099,8 +3097,10 @@ class ActorBase(ABC):
                         },
                     )
 
-                    print(
-                        f"{self.CYAN}{self.BOLD}[ActorBase] 📤 发布重试消息 (message_id: {retry_msg_id.get('message_id') if retry_msg_id else 'N/A'}){self.RESET}"
+                    log_event(
+                        _actor_log, logging.INFO, "发布重试消息",
+                        agent=self.agent_id, topic=topic_id,
+                        message_id=retry_msg_id.get("message_id") if retry_msg_id else None,
                     )
 
                     ctx.update_phase(status="completed", action="retry_triggered")
@@ -3117,9 +3117,6 @@ class ActorBase(ABC):
                     logger.info(
                         f"[ActorBase:{self.agent_id}] Retry message sent for parameter error"
                     )
-                    print(
-                        f"{self.CYAN}{self.BOLD}[ActorBase] ✅ 重试消息已发布，等待处理...{self.RESET}"
-                    )
                     return True  # 已触发重试，返回成功
 
             # 1.3. 如果工具调用结果返回后，有 action_plan 需要继续执行
@@ -3449,7 +3446,7 @@ class ActorBase(ABC):
     ):
         """
         发布处理流程事件
-        被 stop 的 Actor 不再推送。
+        被 stop / 打断的 Actor 不再推送。
 
         Args:
             ctx: 迭代上下文
@@ -3457,7 +3454,7 @@ class ActorBase(ABC):
             status: 状态
             data: 附加数据
         """
-        if not self.is_running:
+        if self._turn_cancelled():
             return
         try:
             from services.topic_service import get_topic_service
@@ -3500,12 +3497,7 @@ class ActorBase(ABC):
         server_id = step.mcp_server_id
         tool_name = step.mcp_tool_name or ""
 
-        print(
-            f"{self.CYAN}{self.BOLD}[MCP DEBUG] ========== 开始 MCP 调用 =========={self.RESET}"
-        )
-        print(
-            f"{self.CYAN}[MCP DEBUG] Agent: {self.agent_id}, Server: {server_id}{self.RESET}"
-        )
+        log_event(_mcp_log, logging.INFO, "开始 MCP 调用", agent=self.agent_id, server=server_id)
 
         # 获取 MCP 服务器名称
         mcp_server_name = server_id  # 默认使用 ID
@@ -3526,7 +3518,7 @@ class ActorBase(ABC):
                 if row and row.get("name"):
                     mcp_server_name = row["name"]
         except Exception as e:
-            print(f"{self.YELLOW}[MCP DEBUG] 获取 MCP 名称失败: {e}{self.RESET}")
+            log_event(_mcp_log, logging.WARNING, "获取 MCP 名称失败", server=server_id, error=e)
 
         # 添加处理步骤（包含参数信息和轮次信息）
         ctx.add_step(
@@ -3547,8 +3539,6 @@ class ActorBase(ABC):
             detail=f"工具: {step.mcp_tool_name or 'auto'}",
         )
 
-        print(f"{self.GREEN}[MCP DEBUG] 开始 MCP 调用{self.RESET}")
-
         try:
             from services.mcp_execution_service import execute_mcp_with_llm
             from mcp_server.mcp_common_logic import (
@@ -3563,22 +3553,14 @@ class ActorBase(ABC):
             user_selected_model = ctx.user_selected_model
             session_llm_config_id = self._config.get("llm_config_id")
 
-            # 打印用户选择信息（只有当用户真正选择了时才显示）
-            if user_selected_llm_config_id:
-                print(
-                    f"{self.CYAN}[MCP DEBUG] 用户选择LLM配置ID: {user_selected_llm_config_id}{self.RESET}"
-                )
-            if user_selected_model:
-                print(
-                    f"{self.CYAN}[MCP DEBUG] 用户选择模型: {user_selected_model}{self.RESET}"
-                )
-
-            print(
-                f"{self.CYAN}[MCP DEBUG] Agent默认配置ID: {session_llm_config_id}{self.RESET}"
+            log_event(
+                _mcp_log, logging.DEBUG, "MCP LLM 配置候选",
+                agent=self.agent_id, user_config_id=user_selected_llm_config_id,
+                user_model=user_selected_model, default_config_id=session_llm_config_id,
             )
 
-            # 查询并显示配置ID对应的模型信息
-            if user_selected_llm_config_id or session_llm_config_id:
+            # 查询配置ID对应的模型信息（仅用于调试日志，DEBUG 未启用时不查库）
+            if (user_selected_llm_config_id or session_llm_config_id) and _mcp_log.isEnabledFor(logging.DEBUG):
                 config_id_to_check = (
                     user_selected_llm_config_id or session_llm_config_id
                 )
@@ -3601,17 +3583,18 @@ class ActorBase(ABC):
                         cursor.close()
                         conn.close()
                         if config_info:
-                            print(
-                                f"{self.CYAN}[MCP DEBUG] 配置ID {config_id_to_check} 对应: Provider={config_info.get('provider')}, Model={config_info.get('model')}, Name={config_info.get('name')}{self.RESET}"
+                            log_event(
+                                _mcp_log, logging.DEBUG, "MCP LLM 配置",
+                                config_id=config_id_to_check, provider=config_info.get("provider"),
+                                model=config_info.get("model"), name=config_info.get("name"),
                             )
                         else:
-                            print(
-                                f"{self.YELLOW}[MCP DEBUG] ⚠️ 配置ID {config_id_to_check} 在数据库中不存在{self.RESET}"
+                            log_event(
+                                _mcp_log, logging.WARNING, "LLM 配置ID 在数据库中不存在",
+                                config_id=config_id_to_check,
                             )
                 except Exception as e:
-                    print(
-                        f"{self.YELLOW}[MCP DEBUG] ⚠️ 查询配置信息失败: {e}{self.RESET}"
-                    )
+                    log_event(_mcp_log, logging.WARNING, "查询配置信息失败", config_id=config_id_to_check, error=e)
 
             # 确定最终使用的LLM配置
             # 优先级：用户选择的配置ID（且与默认不同） > 用户选择的模型 > Agent默认配置
@@ -3622,33 +3605,31 @@ class ActorBase(ABC):
             ):
                 # 用户直接选择了配置ID，且与默认配置不同，说明是主动选择
                 final_llm_config_id = user_selected_llm_config_id
-                print(
-                    f"{self.GREEN}[MCP DEBUG] ✅ 使用用户选择的LLM配置ID: {final_llm_config_id}{self.RESET}"
-                )
+                log_event(_mcp_log, logging.INFO, "使用用户选择的 LLM 配置", config_id=final_llm_config_id)
             elif user_selected_model:
                 # 用户选择了特定模型，尝试找到对应的配置
                 final_llm_config_id = self._find_llm_config_for_model(
                     user_selected_model, session_llm_config_id
                 )
                 if final_llm_config_id != session_llm_config_id:
-                    print(
-                        f"{self.GREEN}[MCP DEBUG] ✅ 找到用户选择模型的配置: {final_llm_config_id}{self.RESET}"
+                    log_event(
+                        _mcp_log, logging.INFO, "使用用户选择模型的配置",
+                        model=user_selected_model, config_id=final_llm_config_id,
                     )
                 else:
-                    print(
-                        f"{self.YELLOW}[MCP DEBUG] ⚠️ 未找到用户选择模型的配置，使用Agent默认配置: {final_llm_config_id}{self.RESET}"
+                    log_event(
+                        _mcp_log, logging.WARNING, "未找到用户选择模型的配置，使用 Agent 默认配置",
+                        model=user_selected_model, config_id=final_llm_config_id,
                     )
             else:
                 # 用户没有选择模型，使用Agent的默认配置
                 final_llm_config_id = session_llm_config_id
                 if final_llm_config_id:
-                    print(
-                        f"{self.CYAN}[MCP DEBUG] 使用Agent默认配置: {final_llm_config_id}{self.RESET}"
-                    )
+                    log_event(_mcp_log, logging.DEBUG, "使用 Agent 默认配置", config_id=final_llm_config_id)
                 else:
                     # Agent没有配置默认模型，返回错误
                     error_msg = f"Agent {self.agent_id} 未配置默认LLM模型，且用户未选择模型。请在Agent配置中设置默认LLM模型。"
-                    print(f"{self.RED}[MCP DEBUG] ❌ {error_msg}{self.RESET}")
+                    log_event(_mcp_log, logging.ERROR, error_msg, agent=self.agent_id)
                     return ActionResult(
                         action_type="chat",
                         success=False,
@@ -3661,8 +3642,9 @@ class ActorBase(ABC):
 
             user_content = ctx.original_message.get("content", "")
 
-            print(
-                f"{self.CYAN}[MCP DEBUG] User Content: {user_content[:100]}...{self.RESET}"
+            log_event(
+                _mcp_log, logging.DEBUG, "MCP 用户请求", sample="preview",
+                agent=self.agent_id, content=preview(user_content, 100),
             )
 
             # 性能优化：移除 _get_mcp_tools_description 调用
@@ -3671,9 +3653,6 @@ class ActorBase(ABC):
 
             # 直接构建带历史上下文的输入（不重复获取工具列表）
             history_context = self._build_mcp_context(ctx)
-            print(
-                f"{self.CYAN}[MCP DEBUG] 历史上下文长度: {len(history_context) if history_context else 0} 字符{self.RESET}"
-            )
 
             input_parts = []
             # 工具列表由 execute_mcp_with_llm 内部获取，不需要在这里添加
@@ -3683,20 +3662,14 @@ class ActorBase(ABC):
 
             input_text = "\n\n".join(input_parts)
 
-            print(
-                f"{self.CYAN}[MCP DEBUG] 最终输入长度: {len(input_text)} 字符{self.RESET}"
-            )
-            logger.info(
-                f"[ActorBase:{self.agent_id}] MCP call with tools desc and context: {len(input_text)} chars"
-            )
-
             # 获取 Agent 的人设作为系统提示词
             agent_persona = self._config.get("system_prompt", "")
-            print(
-                f"{self.CYAN}[MCP DEBUG] Agent 人设长度: {len(agent_persona) if agent_persona else 0} 字符{self.RESET}"
+            log_event(
+                _mcp_log, logging.INFO, "调用 execute_mcp_with_llm",
+                agent=self.agent_id, server=server_id, config_id=final_llm_config_id,
+                history_chars=len(history_context or ""), input_chars=len(input_text),
+                persona_chars=len(agent_persona or ""),
             )
-
-            print(f"{self.YELLOW}[MCP DEBUG] 调用 execute_mcp_with_llm...{self.RESET}")
             msg_ext = (ctx.original_message or {}).get("ext", {}) or {}
             enable_tool_calling = msg_ext.get("use_tool_calling", True)
 
@@ -3720,43 +3693,31 @@ class ActorBase(ABC):
                 topic_id=ctx.topic_id
                 or self.topic_id,  # 传递 topic_id 以发送执行日志到前端
             )
-            print(f"{self.GREEN}[MCP DEBUG] execute_mcp_with_llm 返回{self.RESET}")
-            print(
-                f"{self.CYAN}[MCP DEBUG] Result keys: {list(result.keys()) if result else 'None'}{self.RESET}"
-            )
-
             duration_ms = int((time.time() - start_time) * 1000)
-            print(f"{self.CYAN}[MCP DEBUG] 耗时: {duration_ms}ms{self.RESET}")
 
             if result.get("error"):
                 error_msg = result.get("error")
-                print(f"{self.RED}[MCP DEBUG] ❌ 检测到错误: {error_msg}{self.RESET}")
+                dbg = result.get("debug") or {}
+                log_event(
+                    _mcp_log, logging.WARNING, "execute_mcp_with_llm 返回错误",
+                    agent=self.agent_id, server=server_id, duration_ms=duration_ms, error=error_msg,
+                    parse_error=dbg.get("llm_parse_error") if isinstance(dbg, dict) else None,
+                )
                 llm_resp = result.get("llm_response")
                 if llm_resp:
-                    preview = str(llm_resp).replace("\n", "\\n")[:600]
-                    print(
-                        f"{self.YELLOW}[MCP DEBUG] LLM 原始输出预览: {preview}{self.RESET}"
-                    )
-                dbg = result.get("debug") or {}
-                if isinstance(dbg, dict) and dbg.get("llm_parse_error"):
-                    print(
-                        f"{self.YELLOW}[MCP DEBUG] JSON 解析失败原因: {dbg.get('llm_parse_error')}{self.RESET}"
+                    log_event(
+                        _mcp_log, logging.DEBUG, "LLM 原始输出", sample="preview",
+                        agent=self.agent_id, output=preview(llm_resp, 600),
                     )
 
                 # 检查是否有详细的错误信息
                 results_list = result.get("results", [])
-                print(
-                    f"{self.YELLOW}[MCP DEBUG] Results 列表长度: {len(results_list)}{self.RESET}"
-                )
 
                 error_details = []
                 for r in results_list:
                     if r.get("error"):
                         error_type = r.get("error_type", "unknown")
                         tool_name = r.get("tool", "unknown")
-                        print(
-                            f"{self.RED}[MCP DEBUG]   - 工具 {tool_name} 错误类型: {error_type}{self.RESET}"
-                        )
                         if error_type == "network":
                             error_details.append(
                                 f"[网络错误] {tool_name}: {r.get('error')}"
@@ -3773,7 +3734,6 @@ class ActorBase(ABC):
                 detailed_error = (
                     "\n".join(error_details) if error_details else error_msg
                 )
-                print(f"{self.RED}[MCP DEBUG] 详细错误: {detailed_error}{self.RESET}")
 
                 # 检查是否是参数错误（用于触发 ReAct 自修复）
                 is_param_error = False
@@ -3808,20 +3768,16 @@ class ActorBase(ABC):
 请分析上述错误信息，找出缺失或错误的参数，然后重新调用工具并传递正确的参数。
 """
                     ctx.append_tool_result(f"MCP:{server_id}", error_context)
-                    print(
-                        f"{self.YELLOW}[MCP DEBUG] 🔄 参数错误已添加到工具结果，将触发新一轮迭代{self.RESET}"
-                    )
 
                 ctx.update_last_step(
                     status="error",
                     error=detailed_error,
                 )
 
-                print(
-                    f"{self.YELLOW}[MCP DEBUG] ⚠️ MCP 调用失败，{'将触发 ReAct 自修复' if is_param_error else '不继续迭代'}{self.RESET}"
-                )
-                print(
-                    f"{self.RED}[MCP DEBUG] ========== MCP 调用失败 =========={self.RESET}"
+                log_event(
+                    _mcp_log, logging.WARNING, "MCP 调用失败",
+                    agent=self.agent_id, server=server_id, tool=step.mcp_tool_name or "auto",
+                    react_retry=is_param_error, error=preview(detailed_error),
                 )
                 return ActionResult.error_result(
                     action_type="mcp",
@@ -3834,19 +3790,13 @@ class ActorBase(ABC):
             tool_text = result.get("tool_text", "")
             summary = result.get("summary", "")
 
-            print(f"{self.GREEN}[MCP DEBUG] ✅ 无顶层错误{self.RESET}")
-            print(
-                f"{self.CYAN}[MCP DEBUG] Summary: {summary[:100] if summary else 'None'}...{self.RESET}"
-            )
-            print(
-                f"{self.CYAN}[MCP DEBUG] Tool text 长度: {len(tool_text) if tool_text else 0}{self.RESET}"
+            log_event(
+                _mcp_log, logging.DEBUG, "MCP 结果摘要", sample="preview",
+                agent=self.agent_id, summary=preview(summary, 100), tool_text_chars=len(tool_text or ""),
             )
 
             # 检查是否有部分工具失败（但整体没报错）
             results_list = result.get("results", [])
-            print(
-                f"{self.CYAN}[MCP DEBUG] Results 数量: {len(results_list)}{self.RESET}"
-            )
 
             partial_errors = []
             for i, r in enumerate(results_list):
@@ -3856,18 +3806,13 @@ class ActorBase(ABC):
                     partial_errors.append(
                         f"{tool_name}({error_type}): {r.get('error')}"
                     )
-                    print(
-                        f"{self.YELLOW}[MCP DEBUG]   [{i}] {tool_name}: ❌ 错误 - {r.get('error')[:50]}{self.RESET}"
-                    )
-                else:
-                    print(
-                        f"{self.GREEN}[MCP DEBUG]   [{i}] {tool_name}: ✅ 成功{self.RESET}"
-                    )
 
             if partial_errors:
                 tool_text += f"\n\n⚠️ 部分工具执行失败:\n" + "\n".join(partial_errors)
-                print(
-                    f"{self.YELLOW}[MCP DEBUG] 有 {len(partial_errors)} 个工具失败{self.RESET}"
+                log_event(
+                    _mcp_log, logging.WARNING, "部分 MCP 工具失败",
+                    agent=self.agent_id, server=server_id, failed=len(partial_errors),
+                    errors=preview(partial_errors),
                 )
 
             # 构建完成消息
@@ -3900,16 +3845,11 @@ class ActorBase(ABC):
                 if ctx.mcp_media is None:
                     ctx.mcp_media = []
                 ctx.mcp_media.extend(mcp_media)
-                print(
-                    f"{self.GREEN}[MCP DEBUG] ✅ 提取到 {len(mcp_media)} 个媒体文件{self.RESET}"
+                log_event(
+                    _mcp_log, logging.INFO, "提取到 MCP 媒体文件",
+                    agent=self.agent_id, count=len(mcp_media),
+                    mime_types=",".join(str(img.get("mimeType", "unknown")) for img in mcp_media),
                 )
-                for img in mcp_media:
-                    img_type = img.get("type", "unknown")
-                    img_mime = img.get("mimeType", "unknown")
-                    img_size = len(str(img.get("data", "")))
-                    print(
-                        f"{self.CYAN}[MCP DEBUG]   - {img_type} ({img_mime}), 大小: {img_size} 字符{self.RESET}"
-                    )
 
             # 追加工具结果
             if tool_text:
@@ -3925,12 +3865,12 @@ class ActorBase(ABC):
                         detail=log_entry.get("detail"),
                         duration=log_entry.get("duration"),
                     )
-                print(
-                    f"{self.CYAN}[MCP DEBUG] 合并了 {len(mcp_structured_logs)} 条结构化日志到 ctx.execution_logs{self.RESET}"
-                )
 
-            print(
-                f"{self.GREEN}{self.BOLD}[MCP DEBUG] ========== MCP 调用成功 =========={self.RESET}"
+            log_event(
+                _mcp_log, logging.INFO, "MCP 调用成功",
+                agent=self.agent_id, server=server_id, duration_ms=duration_ms,
+                tools_ok=success_count, tools_failed=failed_count,
+                structured_logs=len(mcp_structured_logs or []),
             )
             return ActionResult.success_result(
                 action_type="mcp",
@@ -3941,14 +3881,10 @@ class ActorBase(ABC):
             )
 
         except Exception as e:
-            import traceback
-
             duration_ms = int((time.time() - start_time) * 1000)
-            print(f"{self.RED}{self.BOLD}[MCP DEBUG] ❌❌❌ 异常: {str(e)}{self.RESET}")
-            print(f"{self.RED}[MCP DEBUG] Traceback:{self.RESET}")
-            traceback.print_exc()
-            print(
-                f"{self.RED}[MCP DEBUG] ========== MCP 调用异常 =========={self.RESET}"
+            _mcp_log.error(
+                "MCP 调用异常: %s", e, exc_info=True,
+                extra={"fields": {"agent": self.agent_id, "server": server_id, "duration_ms": duration_ms}},
             )
             ctx.update_last_step(status="error", error=str(e))
             return ActionResult.error_result(
@@ -4006,15 +3942,15 @@ class ActorBase(ABC):
             # 获取工具列表
             tools_response = get_mcp_tools_list(server_url, headers, use_cache=True)
             if not tools_response or "result" not in tools_response:
-                print(f"{self.YELLOW}[MCP DEBUG] ⚠️ 获取工具列表失败{self.RESET}")
+                log_event(_mcp_log, logging.WARNING, "获取工具列表失败", server=server_id)
                 return ""
 
             tools = tools_response["result"].get("tools", [])
             if not tools:
-                print(f"{self.YELLOW}[MCP DEBUG] ⚠️ 工具列表为空{self.RESET}")
+                log_event(_mcp_log, logging.WARNING, "工具列表为空", server=server_id)
                 return ""
 
-            print(f"{self.GREEN}[MCP DEBUG] 获取到 {len(tools)} 个工具{self.RESET}")
+            log_event(_mcp_log, logging.DEBUG, "获取到工具列表", server=server_id, count=len(tools))
 
             # 格式化工具描述（包含完整信息）
             lines = []
@@ -4022,8 +3958,6 @@ class ActorBase(ABC):
                 name = t.get("name", "")
                 desc = t.get("description", "")
                 if name:
-                    # 打印每个工具
-                    print(f"{self.CYAN}[MCP DEBUG]   {i}. {name}{self.RESET}")
                     lines.append(
                         f"{i}. 【{name}】: {desc}" if desc else f"{i}. 【{name}】"
                     )
@@ -4051,11 +3985,7 @@ class ActorBase(ABC):
             return ""
 
         # 取最近的历史消息（不包括当前消息）
-        recent = (
-            self.state.history[-max_history:]
-            if len(self.state.history) > max_history
-            else self.state.history
-        )
+        recent = self.state.history.tail(max_history)
 
         lines = []
         for msg in recent:
@@ -4337,7 +4267,7 @@ class ActorBase(ABC):
             content: 内容
             ext: 扩展数据
         """
-        if not self.is_running:
+        if self._turn_cancelled():
             return
         from services.topic_service import get_topic_service
 
@@ -4384,7 +4314,7 @@ class ActorBase(ABC):
     ):
         """
         发送执行日志到前端
-        被 stop 的 Actor 不再推送。
+        被 stop / 打断的 Actor 不再推送。
 
         Args:
             ctx: 迭代上下文
@@ -4393,7 +4323,7 @@ class ActorBase(ABC):
             detail: 详细信息
             duration: 耗时（毫秒）
         """
-        if not self.is_running:
+        if self._turn_cancelled():
             return
         from services.topic_service import get_topic_service
 
@@ -4430,23 +4360,13 @@ class ActorBase(ABC):
         m = model.lower()
         return "image" in m or "image-preview" in m or "image-generation" in m
 
-    def _generate_final_response(self, ctx: IterationContext):
+    def _resolve_reply_llm_config(self, ctx: IterationContext):
         """
-        生成最终回复
+        确定生成回复使用的 LLM 配置（优先用户选择，其次 session 默认）并读取
 
-        Args:
-            ctx: 迭代上下文
+        Returns:
+            (final_llm_config_id, config_obj)；缺少配置时返回失败的 ActionResult
         """
-        from services.topic_service import get_topic_service
-
-        topic_id = ctx.topic_id or self.topic_id
-        message_id = ctx.reply_message_id
-        in_reply_to = ctx.original_message.get("message_id")
-
-        # 优先使用用户选择的配置
-
-        # ========== 先确定 LLM 配置，再构建消息 ==========
-        # 确定使用的 LLM 配置（优先用户选择，其次 session 默认）
         session_llm_config_id = self._config.get("llm_config_id")
 
         # 如果 user_selected_llm_config_id 与 session_llm_config_id 相同，说明用户没有主动选择，使用默认配置
@@ -4455,8 +4375,9 @@ class ActorBase(ABC):
             and ctx.user_selected_llm_config_id != session_llm_config_id
         ):
             final_llm_config_id = ctx.user_selected_llm_config_id
-            print(
-                f"{self.GREEN}[ActorBase:{self.agent_id}] 生成回复：使用用户选择的LLM配置ID: {final_llm_config_id}{self.RESET}"
+            log_event(
+                _llm_log, logging.INFO, "生成回复：使用用户选择的 LLM 配置",
+                agent=self.agent_id, config_id=final_llm_config_id,
             )
         elif ctx.user_selected_model:
             # 用户选择了模型名称，查找对应的配置ID
@@ -4464,26 +4385,27 @@ class ActorBase(ABC):
                 ctx.user_selected_model, session_llm_config_id
             )
             if final_llm_config_id != session_llm_config_id:
-                print(
-                    f"{self.GREEN}[ActorBase:{self.agent_id}] 生成回复：找到用户选择模型的配置: {final_llm_config_id}{self.RESET}"
+                log_event(
+                    _llm_log, logging.INFO, "生成回复：使用用户选择模型的配置",
+                    agent=self.agent_id, model=ctx.user_selected_model, config_id=final_llm_config_id,
                 )
             else:
-                print(
-                    f"{self.YELLOW}[ActorBase:{self.agent_id}] 生成回复：未找到用户选择模型的配置，使用Session默认配置: {final_llm_config_id}{self.RESET}"
+                log_event(
+                    _llm_log, logging.WARNING, "生成回复：未找到用户选择模型的配置，使用默认配置",
+                    agent=self.agent_id, model=ctx.user_selected_model, config_id=final_llm_config_id,
                 )
         else:
             # 用户没有选择模型，使用Agent的默认配置
             final_llm_config_id = session_llm_config_id
             if final_llm_config_id:
-                print(
-                    f"{self.CYAN}[ActorBase:{self.agent_id}] 生成回复：使用Agent默认配置: {final_llm_config_id}{self.RESET}"
+                log_event(
+                    _llm_log, logging.DEBUG, "生成回复：使用 Agent 默认配置",
+                    agent=self.agent_id, config_id=final_llm_config_id,
                 )
             else:
                 # Agent没有配置默认模型，返回错误
                 error_msg = f"Agent {self.agent_id} 未配置默认LLM模型，且用户未选择模型。请在Agent配置中设置默认LLM模型。"
-                print(
-                    f"{self.RED}[ActorBase:{self.agent_id}] ❌ {error_msg}{self.RESET}"
-                )
+                log_event(_llm_log, logging.ERROR, error_msg, agent=self.agent_id)
                 return ActionResult(
                     action_type="chat",
                     success=False,
@@ -4508,6 +4430,22 @@ class ActorBase(ABC):
                     "process_steps": ctx.to_process_steps_dict(),
                 },
             )
+        return final_llm_config_id, config_obj
+
+    def _prepare_reply(self, ctx: IterationContext, resolved) -> Any:
+        """
+        构建生成回复所需的消息列表
+
+        Args:
+            resolved: _resolve_reply_llm_config 的返回值
+
+        Returns:
+            dict(llm_config_id, config_obj, provider, model, messages, is_image_gen_model,
+            is_thinking_model)；配置缺失时原样返回失败的 ActionResult
+        """
+        if isinstance(resolved, ActionResult):
+            return resolved
+        final_llm_config_id, config_obj = resolved
 
         provider = config_obj.provider or "unknown"
         model = config_obj.model or "unknown"
@@ -4515,8 +4453,9 @@ class ActorBase(ABC):
         # 判断是否是图片生成模型
         is_image_gen_model = self._is_image_generation_model(model)
         if is_image_gen_model:
-            print(
-                f"{self.CYAN}[ActorBase:{self.agent_id}] 🖼️ 检测到图片生成模型: {model}，将跳过历史消息{self.RESET}"
+            log_event(
+                _llm_log, logging.INFO, "图片生成模型，跳过历史消息",
+                agent=self.agent_id, model=model,
             )
 
         # ========== 构建消息列表（传递是否是图片生成模型） ==========
@@ -4533,8 +4472,49 @@ class ActorBase(ABC):
             f"roles: {[m.get('role') for m in messages]}, is_image_gen={is_image_gen_model}"
         )
 
-        # 判断是否是思考模型（会输出思考过程的模型）
-        is_thinking_model = self._check_is_thinking_model(provider, model)
+        return {
+            "llm_config_id": final_llm_config_id,
+            "config_obj": config_obj,
+            "provider": provider,
+            "model": model,
+            "messages": messages,
+            "is_image_gen_model": is_image_gen_model,
+            # 判断是否是思考模型（会输出思考过程的模型）
+            "is_thinking_model": self._check_is_thinking_model(provider, model),
+        }
+
+    def _generate_final_response(
+        self,
+        ctx: IterationContext,
+        prepared: Any = None,
+        speculative: Optional[SpeculativeStream] = None,
+    ):
+        """
+        生成最终回复
+
+        Args:
+            ctx: 迭代上下文
+            prepared: _prepare_reply 的结果（None 时现场解析配置并构建消息）
+            speculative: 已提前开始的推测生成流（与 prepared 对应），直接采用其输出
+        """
+        from services.topic_service import get_topic_service
+
+        topic_id = ctx.topic_id or self.topic_id
+        message_id = ctx.reply_message_id
+        in_reply_to = ctx.original_message.get("message_id")
+
+        # ========== 先确定 LLM 配置，再构建消息 ==========
+        if prepared is None:
+            prepared = self._prepare_reply(ctx, self._resolve_reply_llm_config(ctx))
+        if isinstance(prepared, ActionResult):
+            return prepared
+
+        final_llm_config_id = prepared["llm_config_id"]
+        config_obj = prepared["config_obj"]
+        provider = prepared["provider"]
+        model = prepared["model"]
+        messages = prepared["messages"]
+        is_thinking_model = prepared["is_thinking_model"]
 
         # supplier=计费/Token 归属，provider=兼容路由（SDK/REST 调用方式）
         supplier = getattr(config_obj, "supplier", None) or provider
@@ -4579,15 +4559,23 @@ class ActorBase(ABC):
             },
         )
 
-        # 流式生成
+        # 流式生成（推测流已在后台开始时直接消费其缓冲）
         full_content = ""
+        if speculative is not None:
+            chunks = speculative.commit()
+        else:
+            chunks = self._stream_llm_response(
+                messages, llm_config_id=final_llm_config_id, ctx=ctx
+            )
 
         try:
-            for chunk in self._stream_llm_response(
-                messages, llm_config_id=final_llm_config_id, ctx=ctx
-            ):
-                if not self.is_running:
+            for chunk in chunks:
+                if self._turn_cancelled():
+                    if speculative is not None:
+                        speculative.abandon()
                     break
+                if ctx.first_chunk_at is None:
+                    ctx.first_chunk_at = time.perf_counter()
                 full_content += chunk
                 get_topic_service()._publish_event(
                     topic_id,
@@ -4603,8 +4591,8 @@ class ActorBase(ABC):
                     },
                 )
 
-            # 被 stop 的 Actor 不再推送、写库，老线程无脑回收
-            if self.is_running:
+            # 被 stop / 打断的轮次不再推送、写库（前端已收到 agent_interrupt_ack）
+            if not self._turn_cancelled():
                 ctx.update_last_step(
                     status="completed",
                     is_final_iteration=not ctx.should_continue,
@@ -4670,11 +4658,11 @@ class ActorBase(ABC):
         try:
             from services.topic_service import get_topic_service
 
-            topic = get_topic_service().get_topic(topic_id)
-            if not topic or topic.get("session_type") != "topic_general":
+            topic = get_topic_service().repository.find_by_id(topic_id)
+            if not topic or topic.session_type != "topic_general":
                 return None
 
-            ext = topic.get("ext", {}) or {}
+            ext = topic.ext or {}
             if isinstance(ext, str):
                 try:
                     ext = json.loads(ext)
@@ -4685,97 +4673,91 @@ class ActorBase(ABC):
             if not sop_id:
                 return None
 
-            # 从数据库获取SOP内容（包含执行步骤）
-            conn = get_mysql_connection()
-            if not conn:
-                return None
+            # 获取SOP内容（包含执行步骤，共享技能目录）
+            from services.actor.skill_catalog import get_skill_catalog
 
-            try:
-                import pymysql
+            row = get_skill_catalog().get_skill_pack(sop_id)
+            if row:
+                return memo_block("topic_sop", row, lambda: self._render_topic_sop(row))
+            return None
+        except Exception as e:
+            logger.error(f"[ActorBase:{self.agent_id}] Error getting topic SOP: {e}")
+            return None
 
-                cursor = conn.cursor(pymysql.cursors.DictCursor)
-                cursor.execute(
-                    """
-                    SELECT name, summary, process_steps FROM skill_packs WHERE skill_pack_id = %s
-                """,
-                    (sop_id,),
-                )
-                row = cursor.fetchone()
-                cursor.close()
-                conn.close()
+    @staticmethod
+    def _render_topic_sop(row: Dict[str, Any]) -> str:
+        """SOP 行 → 提示词文本"""
+        sop_lines = [f"【{row.get('name', 'SOP')}】"]
+        if row.get("summary"):
+            sop_lines.append(f"说明: {row.get('summary')}")
 
-                if row:
-                    sop_lines = [f"【{row.get('name', 'SOP')}】"]
-                    if row.get("summary"):
-                        sop_lines.append(f"说明: {row.get('summary')}")
-
-                    # 解析并添加执行步骤
-                    process_steps = row.get("process_steps")
-                    if process_steps:
-                        steps = []
-                        if isinstance(process_steps, str):
-                            try:
-                                steps = json.loads(process_steps)
-                            except:
-                                pass
-                        elif isinstance(process_steps, list):
-                            steps = process_steps
-
-                        if steps:
-                            sop_lines.append("\n执行流程:")
-                            for i, step in enumerate(steps, 1):
-                                step_name = step.get(
-                                    "name", step.get("title", f"步骤{i}")
-                                )
-                                step_desc = step.get(
-                                    "description", step.get("content", "")
-                                )
-                                step_tool = step.get("tool", step.get("mcp_server", ""))
+        # 解析并添加执行步骤
+        process_steps = row.get("process_steps")
+        if process_steps:
+            steps = []
+            if isinstance(process_steps, str):
+                try:
+                    steps = json.loads(process_steps)
+                except:
+                    pass
+            elif isinstance(process_steps, list):
+                steps = process_steps
+
+            if steps:
+                sop_lines.append("\n执行流程:")
+                for i, step in enumerate(steps, 1):
+                    step_name = step.get(
+                        "name", step.get("title", f"步骤{i}")
+                    )
+                    step_desc = step.get(
+                        "description", step.get("content", "")
+                    )
+                    step_tool = step.get("tool", step.get("mcp_server", ""))
 
-                                step_line = f"  {i}. {step_name}"
-                                if step_desc:
-                                    step_line += f"\n     描述: {step_desc}"
-                                if step_tool:
-                                    step_line += f"\n     工具: {step_tool}"
-                                sop_lines.append(step_line)
+                    step_line = f"  {i}. {step_name}"
+                    if step_desc:
+                        step_line += f"\n     描述: {step_desc}"
+                    if step_tool:
+                        step_line += f"\n     工具: {step_tool}"
+                    sop_lines.append(step_line)
 
-                    return "\n".join(sop_lines)
-                return None
-            except Exception as e:
-                logger.error(f"[ActorBase:{self.agent_id}] Error loading SOP: {e}")
-                if conn:
-                    conn.close()
-                return None
-        except Exception as e:
-            logger.error(f"[ActorBase:{self.agent_id}] Error getting topic SOP: {e}")
-            return None
+        return "\n".join(sop_lines)
 
     def _build_system_prompt(self, ctx: IterationContext) -> str:
-        """构建 system prompt"""
-        system_prompt = self._config.get("system_prompt", "你是一个AI助手。")
+        """
+        构建 system prompt
 
-        # 添加能力描述
-        cap_desc = self.capabilities.get_capability_description()
-        if cap_desc:
-            system_prompt += f"\n\n{cap_desc}"
+        按段组装（见 prompt_segments）：人设、能力、话题 SOP、技能等稳定段在前，
+        历史条数提示、工具提示等易变段在后，使前缀在多轮对话间保持字节一致，
+        可命中 Provider 侧的提示词缓存。布局（缓存断点、前缀哈希）记录到 ctx.prompt_layout。
+        """
+        prompt = SegmentedPrompt()
+        prompt.add("persona", self._config.get("system_prompt", "你是一个AI助手。"))
+
+        # 添加能力描述（人设 + 能力为最稳定的部分，单独设置缓存断点）
+        prompt.add(
+            "capabilities",
+            self.capabilities.get_capability_description(),
+            breakpoint=True,
+        )
+
+        # 注入话题级SOP（仅对 topic_general 生效）
+        topic_id = ctx.topic_id or self.topic_id
+        if topic_id:
+            sop_text = self._get_topic_current_sop(topic_id)
+            if sop_text:
+                prompt.add(
+                    "topic_sop",
+                    f"【当前话题SOP（标准作业流程）】\n请严格按照以下流程处理用户请求：\n{sop_text}",
+                )
+                logger.info(
+                    f"[ActorBase:{self.agent_id}] Injected topic SOP into system prompt"
+                )
 
         # ========== Skill 注入策略 ==========
-        # 1) 已激活 Skill：本轮显式选中的技能，提供完整 SOP 步骤，并强调必须遵守
         active_skills = getattr(ctx, "active_skills", None) or []
-        if active_skills:
-            system_prompt += "\n\n【本轮已激活的技能包】\n"
-            system_prompt += (
-                "用户已在本轮对话中主动选中了以下技能包，请在处理本轮请求时优先按照这些技能的流程执行：\n"
-            )
-            for skill in active_skills:
-                try:
-                    system_prompt += "\n" + skill.to_sop_text()
-                    system_prompt += "\n【要求】当用户问题与该技能相关时，必须严格按上述步骤执行；如步骤中包含 MCP 或工具调用，请结合这些能力完成任务。"
-                except Exception:
-                    # 防御性：单个 skill 文本异常不影响整体
-                    continue
 
-        # 2) 可用但未激活的 Skill：仅提供目录列表（名称 + 摘要），供模型参考
+        # 1) 可用但未激活的 Skill：仅提供目录列表（名称 + 摘要），供模型参考
         available_skills = []
         try:
             available_skills = self.capabilities.get_available_skills()
@@ -4786,46 +4768,66 @@ class ActorBase(ABC):
             s for s in available_skills if s not in active_skills  # 简单引用比较即可
         ]
         if passive_skills:
-            system_prompt += "\n\n【可用的其他技能包目录】\n"
-            system_prompt += (
+            catalog = (
+                "【可用的其他技能包目录】\n"
                 "以下是当前会话中可用但未被用户显式激活的技能包，仅供你理解用户长期偏好和能力边界：\n"
             )
             for skill in passive_skills:
                 try:
-                    system_prompt += "\n- " + skill.to_description(include_steps=False)
+                    catalog += "\n- " + skill.to_description(include_steps=False)
                 except Exception:
                     continue
+            prompt.add("skill_catalog", catalog)
 
-        # 注入话题级SOP（仅对 topic_general 生效）
-        topic_id = ctx.topic_id or self.topic_id
-        if topic_id:
-            sop_text = self._get_topic_current_sop(topic_id)
-            if sop_text:
-                system_prompt += f"\n\n【当前话题SOP（标准作业流程）】\n请严格按照以下流程处理用户请求：\n{sop_text}"
-                logger.info(
-                    f"[ActorBase:{self.agent_id}] Injected topic SOP into system prompt"
-                )
+        # 2) 已激活 Skill：本轮显式选中的技能，提供完整 SOP 步骤，并强调必须遵守
+        #    （随用户选择变化，放在稳定段最后，不影响前面各段的缓存）
+        if active_skills:
+            active = "【本轮已激活的技能包】\n"
+            active += (
+                "用户已在本轮对话中主动选中了以下技能包，请在处理本轮请求时优先按照这些技能的流程执行：\n"
+            )
+            for skill in active_skills:
+                try:
+                    active += "\n" + skill.to_sop_text()
+                    active += "\n【要求】当用户问题与该技能相关时，必须严格按上述步骤执行；如步骤中包含 MCP 或工具调用，请结合这些能力完成任务。"
+                except Exception:
+                    # 防御性：单个 skill 文本异常不影响整体
+                    continue
+            prompt.add("active_skills", active)
 
-        # 添加历史消息利用提示
+        # 添加历史消息利用提示（条数每条消息都变，属于易变段）
         history_count = len(self.state.history)
         if history_count > 0:
-            system_prompt += (
-                f"\n\n[对话历史] 你与用户已有 {history_count} 条对话记录。请注意：\n"
-            )
-            system_prompt += "1. 仔细阅读历史消息，理解对话的上下文和背景\n"
-            system_prompt += "2. 用户可能引用之前的内容，请结合历史回答\n"
-            system_prompt += "3. 历史中可能包含重要信息，请充分利用\n"
-            system_prompt += "4. 保持对话的连贯性，避免重复已经提供过的信息"
+            hint = f"[对话历史] 你与用户已有 {history_count} 条对话记录。请注意：\n"
+            hint += "1. 仔细阅读历史消息，理解对话的上下文和背景\n"
+            hint += "2. 用户可能引用之前的内容，请结合历史回答\n"
+            hint += "3. 历史中可能包含重要信息，请充分利用\n"
+            hint += "4. 保持对话的连贯性，避免重复已经提供过的信息"
+            prompt.add("history_hint", hint, stable=False)
 
         # 工具结果不再放入 system_prompt，而是作为对话消息注入
         # 只在 system_prompt 中添加简短提示
         if ctx.tool_results_text:
-            system_prompt += (
-                "\n\n【工具执行】工具已自动执行完毕，结果会在对话中提供。"
-                "请仔细阅读工具执行结果，然后用自然语言直接回答用户。"
+            prompt.add(
+                "tool_hint",
+                "【工具执行】工具已自动执行完毕，结果会在对话中提供。"
+                "请仔细阅读工具执行结果，然后用自然语言直接回答用户。",
+                stable=False,
             )
 
-        return system_prompt
+        layout = prompt.render()
+        ctx.prompt_layout = layout
+        return layout.text
+
+    @staticmethod
+    def _system_message(ctx: IterationContext, system_prompt: str) -> Dict[str, Any]:
+        """system 消息；内容仍以本轮分段布局的稳定前缀开头时附带缓存断点"""
+        msg = {"role": "system", "content": system_prompt}
+        layout = getattr(ctx, "prompt_layout", None)
+        hints = layout.cache_hints(system_prompt) if layout else None
+        if hints:
+            msg["cache_breakpoints"] = hints
+        return msg
 
     def _build_llm_messages(
         self,
@@ -4842,7 +4844,7 @@ class ActorBase(ABC):
             is_image_generation_model: 是否是图片生成模型
                 - 图片生成模型不携带历史消息，只携带系统提示词、当前消息和上一张图的 thoughtSignature
         """
-        messages = [{"role": "system", "content": system_prompt}]
+        messages = [self._system_message(ctx, system_prompt)]
 
         # 获取 thoughtSignature 开关配置
         orig_ext = (ctx.original_message or {}).get("ext", {}) or {}
@@ -5026,7 +5028,12 @@ class ActorBase(ABC):
         llm_config_id: str = None,
         ctx: Optional["IterationContext"] = None,
     ) -> Generator[str, None, None]:
-        """流式调用 LLM"""
+        """
+        流式调用 LLM
+
+        对 Actor / ctx 的修改（思考日志、回复媒体、响应元数据）经 apply_side_effect 执行：
+        作为推测流运行时延后到 commit，被放弃的推测不影响本轮状态。
+        """
         from services.providers import create_provider, LLMMessage
 
         # 如果指定了 llm_config_id，使用指定的配置；否则使用 session 默认配置
@@ -5048,17 +5055,12 @@ class ActorBase(ABC):
             api_url = self._config.get("api_url")
             model = self._config.get("model")
 
-        print(
-            f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 流式生成回复 LLM 调用 =========={self.RESET}"
-        )
-        print(f"{self.CYAN}[Actor Mode] Agent: {self.agent_id}{self.RESET}")
-        print(
-            f"{self.CYAN}[Actor Mode] Provider: {provider}, Model: {model}{self.RESET}"
+        log_event(
+            _llm_log, logging.INFO, "流式生成回复 LLM 调用",
+            agent=self.agent_id, provider=provider, model=model, config_id=llm_config_id,
         )
-        if llm_config_id:
-            print(f"{self.CYAN}[Actor Mode] Config ID: {llm_config_id}{self.RESET}")
 
-        # 转换消息格式并打印提示词
+        # 转换消息格式并记录提示词预览（采样）
         llm_messages = []
         for msg in messages:
             role = msg.get("role", "user")
@@ -5068,13 +5070,13 @@ class ActorBase(ABC):
                     role=role,
                     content=content,
                     media=msg.get("media"),
+                    cache_breakpoints=msg.get("cache_breakpoints"),
                 )
             )
 
-            # 打印提示词（只打印前 500 字符，避免过长）
-            content_preview = content[:500] + "..." if len(content) > 500 else content
-            print(
-                f"{self.CYAN}[Actor Mode] {role.upper()} 提示词 ({len(content)} 字符): {content_preview}{self.RESET}"
+            log_event(
+                _llm_log, logging.DEBUG, "提示词", sample="preview",
+                agent=self.agent_id, role=role, chars=len(content or ""), preview=preview(content),
             )
 
         # 获取签名开关、metadata（含用户本条消息的覆盖，如联网搜索）
@@ -5100,8 +5102,9 @@ class ActorBase(ABC):
         override = orig_ext.get("user_llm_metadata_override") or {}
         provider_extra.update(override)
         if override.get("enableGoogleSearch") is not None:
-            print(
-                f"{self.CYAN}[Actor Mode] 用户本条消息启用联网搜索: {bool(override.get('enableGoogleSearch'))}{self.RESET}"
+            log_event(
+                _llm_log, logging.INFO, "用户本条消息覆盖联网搜索",
+                agent=self.agent_id, enable_google_search=bool(override.get("enableGoogleSearch")),
             )
 
         # 创建 Provider（传递签名开关与 metadata，如 enableGoogleSearch）
@@ -5114,7 +5117,6 @@ class ActorBase(ABC):
         )
 
         # 流式调用
-        print(f"{self.CYAN}[Actor Mode] 调用 Provider SDK 进行流式生成...{self.RESET}")
         stream = llm_provider.chat_stream(llm_messages)
         chunk_count = 0
         total_length = 0
@@ -5132,12 +5134,13 @@ class ActorBase(ABC):
 
                     # 实时发送思考内容到前端
                     if ctx and len(thinking_buffer) > 0:
-                        self._send_execution_log(
+                        apply_side_effect(functools.partial(
+                            self._send_execution_log,
                             ctx,
                             "思考中...",
                             log_type="thinking",
                             detail=thinking_buffer,
-                        )
+                        ))
                     continue  # 不 yield 思考内容，只发送日志
 
                 # 正常内容
@@ -5147,33 +5150,47 @@ class ActorBase(ABC):
                 yield chunk
             except StopIteration as e:
                 resp = getattr(e, "value", None)
-                media = getattr(resp, "media", None) if resp else None
-                if media:
-                    self._pending_reply_media = media
-
-                # 存储LLM响应元数据到上下文
-                if ctx and resp:
-                    ctx.set_llm_response_metadata(
-                        usage=getattr(resp, "usage", None),
-                        finish_reason=getattr(resp, "finish_reason", None),
-                        raw_response=getattr(resp, "raw", None),
-                    )
-                    # 将最终的完整思考内容写入步骤（用于持久化）
-                    thinking = getattr(resp, "thinking", None) or thinking_buffer
-                    if thinking and isinstance(thinking, str) and thinking.strip():
-                        ctx.update_last_step(thinking=thinking)
-                        # 始终添加到执行日志（用于持久化），并发送最终版本
-                        self._log_execution(
-                            ctx, "思考完成", log_type="thinking", detail=thinking
-                        )
+                apply_side_effect(functools.partial(
+                    self._apply_stream_result, resp, ctx, thinking_buffer
+                ))
+                log_event(
+                    _llm_log, logging.INFO, "流式生成完成",
+                    agent=self.agent_id, chunks=chunk_count, chars=total_length,
+                )
+                break
 
-                print(
-                    f"{self.CYAN}[Actor Mode] ✅ 流式生成完成，共 {chunk_count} 个 chunk，总长度: {total_length} 字符{self.RESET}"
+    def _apply_stream_result(
+        self, resp: Any, ctx: Optional["IterationContext"], thinking_buffer: str
+    ) -> None:
+        """流结束后把回复媒体、响应元数据与完整思考内容写入 Actor / ctx"""
+        media = getattr(resp, "media", None) if resp else None
+        if media:
+            self._pending_reply_media = media
+
+        # 存储LLM响应元数据到上下文
+        if ctx and resp:
+            ctx.set_llm_response_metadata(
+                usage=getattr(resp, "usage", None),
+                finish_reason=getattr(resp, "finish_reason", None),
+                raw_response=getattr(resp, "raw", None),
+            )
+            prompt_cache = (ctx.final_ext.get("llmResponse") or {}).get("prompt_cache")
+            if prompt_cache:
+                log_event(
+                    _llm_log, logging.INFO, "提示词缓存命中",
+                    agent=self.agent_id,
+                    cached_tokens=prompt_cache["cached_tokens"],
+                    prompt_tokens=prompt_cache["prompt_tokens"],
+                    cached_ratio=round(prompt_cache["cached_ratio"], 3),
                 )
-                print(
-                    f"{self.CYAN}{self.BOLD}[Actor Mode] ========== 流式生成回复 LLM 调用完成 =========={self.RESET}\n"
+            # 将最终的完整思考内容写入步骤（用于持久化）
+            thinking = getattr(resp, "thinking", None) or thinking_buffer
+            if thinking and isinstance(thinking, str) and thinking.strip():
+                ctx.update_last_step(thinking=thinking)
+                # 始终添加到执行日志（用于持久化），并发送最终版本
+                self._log_execution(
+                    ctx, "思考完成", log_type="thinking", detail=thinking
                 )
-                break
 
     # ========== 消息操作 ==========
 
@@ -5208,10 +5225,9 @@ class ActorBase(ABC):
         """
         # 找到目标消息的前一条
         prev_id = None
-        for i, m in enumerate(self.state.history):
-            if m.get("message_id") == target_message_id and i > 0:
-                prev_id = self.state.history[i - 1].get("message_id")
-                break
+        pos = self.state.history.position(target_message_id)
+        if pos:
+            prev_id = self.state.history[pos - 1].get("message_id")
 
         if prev_id:
             self._handle_rollback(topic_id, prev_id)
@@ -5231,12 +5247,13 @@ class ActorBase(ABC):
         if to_message_id:
             self.state.clear_after(to_message_id)
 
-        # 如果摘要失效，清除
-        if self.state.summary_until:
-            history_ids = {m.get("message_id") for m in self.state.history}
-            if self.state.summary_until not in history_ids:
-                self.state.summary = None
-                self.state.summary_until = None
+        # 如果摘要失效，清除（含持久化副本）
+        if self.state.summary_until and self.state.summary_until not in self.state.history:
+            self.state.clear_summary()
+        if to_message_id and not self.state.summary_until:
+            from .memory_summarizer import get_memory_summarizer
+
+            get_memory_summarizer().invalidate(self.agent_id, topic_id)
 
     def _handle_participants_updated(self, topic_id: str, data: Dict[str, Any]):
         """处理参与者更新事件"""
@@ -5250,7 +5267,7 @@ class ActorBase(ABC):
         decision: ResponseDecision,
     ):
         """处理沉默决策。被 stop 的 Actor 不再推送。"""
-        if not self.is_running:
+        if self._turn_cancelled():
             return
         from services.topic_service import get_topic_service
 
@@ -5307,7 +5324,7 @@ class ActorBase(ABC):
 
     def _handle_process_error(self, ctx: IterationContext, error: Exception):
         """处理处理错误。被 stop 的 Actor 不再推送。"""
-        if not self.is_running:
+        if self._turn_cancelled():
             return
         from services.topic_service import get_topic_service
 
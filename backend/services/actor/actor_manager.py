@@ -7,8 +7,9 @@ Actor 管理器
 职责：
 - 维护 topic → agent 映射（channel → [agent_id, ...]），按 DB 解析并按需激活/销毁
 - Redis 全局监听 topic:*（psubscribe），收到 new_message 时若无订阅者则 _ensure_topic_handled 激活
-- 收到 actor_manager:interrupt（前端打断，独立通道）时：解绑并销毁旧 Actor，激活全新 Actor 并重新绑定 topic
-- 被终止的 Actor 不再向 topic 推送（Actor 内 is_running 守卫），前端不关心其输出；新消息由新 Actor 接管、独立队列；老线程仅 stop 后无脑回收
+- 收到 actor_manager:interrupt（前端打断，独立通道）时：直接触发该 (topic, agent) 的进程内取消令牌
+  （utils/cancellation），正在进行的 LLM 流 / MCP 请求在下一个分片前中止并关闭 HTTP 连接；
+  Actor 实例、配置与历史保留，仅丢弃该 topic 尚未处理的排队消息
 - 事件分发；deactivate_agent / deactivate_topic 用于显式取消订阅或销毁
 """
 
@@ -18,9 +19,10 @@ import json
 import logging
 import threading
 import time
-from typing import Dict, List, TYPE_CHECKING
+from typing import Dict, List, Optional, TYPE_CHECKING
 
 from database import get_redis_client, get_mysql_connection
+from utils.cancellation import discard_token
 
 if TYPE_CHECKING:
     from .actor_base import ActorBase
@@ -105,10 +107,20 @@ class ActorManager:
         - session_type=agent：该 topic 即私聊的 agent_id，返回 [topic_id]
         - session_type=topic_general：返回该话题下 participant_type=agent 的 participant_id 列表
         - 其他或查库失败：返回 []
+        结果经 repository_cache 缓存，参与者增删 / 会话修改时失效。
         """
+        from services.repository_cache import get_repository_cache, ENTITY_TOPIC_AGENTS
+
+        agent_ids = get_repository_cache().get_or_load(
+            ENTITY_TOPIC_AGENTS, topic_id, lambda: self._load_agent_ids_for_topic(topic_id)
+        )
+        return list(agent_ids) if agent_ids else []
+
+    def _load_agent_ids_for_topic(self, topic_id: str) -> Optional[List[str]]:
+        """从 DB 读取 topic 的负责 Agent（查库失败返回 None，不缓存）"""
         conn = get_mysql_connection()
         if not conn:
-            return []
+            return None
         try:
             import pymysql
             cursor = conn.cursor(pymysql.cursors.DictCursor)
@@ -147,7 +159,7 @@ class ActorManager:
                 conn.close()
             except Exception:
                 pass
-            return []
+            return None
 
     def _ensure_topic_handled(self, topic_id: str) -> None:
         """
@@ -173,19 +185,22 @@ class ActorManager:
 
     def _on_interrupt(self, topic_id: str, channel: str, data: dict) -> None:
         """
-        前端打断：解绑 topic 与当前 Actor 的映射、将旧 Actor 标记为待销毁并停止，
-        再激活全新 Actor 并重新绑定 topic。随后发布 agent_interrupt_ack 供前端展示「处理已终止」。
+        前端打断：在监听线程内直接取消该 (topic, agent) 的令牌，Actor 保留（不重建、不重新加载历史），
+        下一条 new_message 仍由它处理。随后发布 agent_interrupt_ack 供前端展示「处理已终止」。
         """
         agent_id = data.get("agent_id")
         reason = data.get("reason", "user_interrupt")
         if not agent_id:
             logger.warning("[ActorManager] interrupt missing agent_id, skip")
             return
-        # 1. 解绑并销毁旧 Actor（stop_actor=True 会 remove_actor，旧线程退出）
-        self.deactivate_agent(agent_id, topic_id, stop_actor=True)
-        # 2. 激活全新 Actor 并重新绑定 topic（下一轮 new_message 或已订阅的客户端由新 Actor 处理）
-        self._ensure_topic_handled(topic_id)
-        # 3. 通知前端：处理已终止，可立即输入下一条
+        # 1. 取消进行中的处理（LLM 流 / MCP 请求随令牌中止），丢弃该 topic 的排队消息
+        actor = self.get_actor(agent_id)
+        if actor is not None and actor.is_running:
+            actor.interrupt(topic_id, reason)
+        else:
+            # 本进程没有运行中的 Actor：确保 topic 有人接管
+            self._ensure_topic_handled(topic_id)
+        # 2. 通知前端：处理已终止，可立即输入下一条
         try:
             from services.topic_service import get_topic_service
             get_topic_service()._publish_event(
@@ -195,7 +210,7 @@ class ActorManager:
             )
         except Exception as e:
             logger.warning(f"[ActorManager] Failed to publish agent_interrupt_ack: {e}")
-        logger.info(f"[ActorManager] Interrupt handled: topic={topic_id}, agent={agent_id}, new actor bound")
+        logger.info(f"[ActorManager] Interrupt handled: topic={topic_id}, agent={agent_id}")
 
     def remove_actor(self, agent_id: str):
         """移除 Actor（停止并从池中删除）"""
@@ -366,6 +381,7 @@ class ActorManager:
             if not self._channel_to_agents[channel]:
                 del self._channel_to_agents[channel]
         actor._active_channels.discard(channel)
+        discard_token(topic_id, agent_id)
         logger.info(f"[ActorManager] Deactivated agent {agent_id} from topic {topic_id}")
         if stop_actor:
             self.remove_actor(agent_id)
@@ -383,6 +399,7 @@ class ActorManager:
             actor = self.get_actor(agent_id)
             if actor:
                 actor._active_channels.discard(channel)
+            discard_token(topic_id, agent_id)
             if stop_actors and actor:
                 self.remove_actor(agent_id)
         logger.info(f"[ActorManager] Deactivated topic {topic_id} (agents: {agent_ids})")
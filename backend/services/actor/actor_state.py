@@ -12,11 +12,14 @@ Actor 状态管理
 from __future__ import annotations
 
 import re
-from datetime import datetime
-from typing import Any, Dict, List, Optional, Set
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
 from token_counter import estimate_messages_tokens, get_model_max_tokens
 from services.message_service import get_message_service
+from services.blob_store import hydrate_media
+
+from .history_window import HistoryWindow, RecentIdSet
 
 
 class ActorState:
@@ -25,12 +28,13 @@ class ActorState:
     def __init__(self, topic_id: str = None):
         self.topic_id = topic_id
         
-        # 历史消息（轻量结构，不含 ext/media 等大字段）
-        self.history: List[Dict[str, Any]] = []
+        # 历史消息（轻量结构，不含 ext/media 等大字段；按时间有序，见 HistoryWindow）
+        self._history = HistoryWindow()
         
-        # 记忆摘要
-        self.summary: Optional[str] = None
-        self.summary_until: Optional[str] = None  # 摘要覆盖到的最后消息 ID
+        # 记忆摘要：(摘要, 摘要覆盖到的最后消息 ID)，作为一个元组整体替换，
+        # 后台摘要线程写入时 Actor 线程不会读到新旧混合的状态
+        self._memory: Tuple[Optional[str], Optional[str]] = (None, None)
+        self._memory_lock = threading.Lock()
         
         # 参与者信息
         self.participants: List[Dict[str, Any]] = []
@@ -41,11 +45,19 @@ class ActorState:
         self._last_media_message_id: Optional[str] = None
         self._media_cache: Dict[str, List[Dict[str, Any]]] = {}  # message_id -> media list
         
-        # 已处理消息 ID 集合（去重）
-        self._processed_ids: Set[str] = set()
-        
-        # 配置
+        # 已处理消息 ID（去重，按加入顺序淘汰）
         self._max_processed_ids = 1000
+        self._processed_ids = RecentIdSet(self._max_processed_ids)
+    
+    @property
+    def history(self) -> HistoryWindow:
+        return self._history
+    
+    @history.setter
+    def history(self, items):
+        # state.history += [...] 会以窗口自身回写
+        if items is not self._history:
+            self._history.reset(items or [])
     
     def load_history(self, topic_id: str, limit: int = 100) -> List[Dict[str, Any]]:
         """
@@ -106,7 +118,7 @@ class ActorState:
                 break
         
         # 转换为轻量结构
-        self.history = []
+        items: List[Dict[str, Any]] = []
         for m in all_msgs[-limit:]:
             if not isinstance(m, dict):
                 continue
@@ -142,7 +154,9 @@ class ActorState:
                 if not history_item.get('content'):
                     history_item['content'] = f'[图片×{media_count}]'
             
-            self.history.append(history_item)
+            items.append(history_item)
+        
+        self.history = items
         
         logger.info(f"[ActorState] Loaded {len(self.history)} messages for topic {topic_id}")
         if self.history:
@@ -157,9 +171,57 @@ class ActorState:
         
         return self.history
     
+    # ========== 记忆摘要 ==========
+
+    @property
+    def summary(self) -> Optional[str]:
+        return self._memory[0]
+
+    @summary.setter
+    def summary(self, value: Optional[str]):
+        with self._memory_lock:
+            self._memory = (value, self._memory[1])
+
+    @property
+    def summary_until(self) -> Optional[str]:
+        return self._memory[1]
+
+    @summary_until.setter
+    def summary_until(self, value: Optional[str]):
+        with self._memory_lock:
+            self._memory = (self._memory[0], value)
+
+    def memory_snapshot(self) -> Tuple[Optional[str], Optional[str]]:
+        """(summary, summary_until) 的一致快照"""
+        return self._memory
+
+    def set_summary(self, summary: Optional[str], until: Optional[str]):
+        with self._memory_lock:
+            self._memory = (summary, until)
+
+    def replace_summary(self, expected_until: Optional[str], summary: str, until: str) -> bool:
+        """
+        比较并交换：仅当当前 summary_until 仍为 expected_until 时替换
+
+        Returns:
+            是否替换成功（摘要期间被回退清除或被其他结果替换时返回 False）
+        """
+        with self._memory_lock:
+            if self._memory[1] != expected_until:
+                return False
+            self._memory = (summary, until)
+            return True
+
+    def clear_summary(self):
+        self.set_summary(None, None)
+
+    def unsummarized_history(self) -> List[Dict[str, Any]]:
+        """summary_until 之后的历史（摘要未覆盖的部分）"""
+        return self._history.after(self.summary_until)
+
     def estimate_tokens(self, model: str) -> int:
         """
-        估算当前记忆的 token 数
+        估算当前记忆的 token 数（摘要 + 摘要未覆盖的历史，前缀和 O(1)）
         
         Args:
             model: 模型名称
@@ -167,17 +229,14 @@ class ActorState:
         Returns:
             估算的 token 数
         """
-        msgs = [
-            {'role': m.get('role', 'user'), 'content': m.get('content', '')}
-            for m in self.history
-            if m.get('content')
-        ]
+        # 已被摘要覆盖的消息不再计入（否则摘要后预算仍然超限）
+        tokens = self._history.tokens_after(self.summary_until, model)
         
         # 加上摘要的 token
         if self.summary:
-            msgs.insert(0, {'role': 'system', 'content': self.summary})
+            tokens += estimate_messages_tokens([{'role': 'system', 'content': self.summary}], model)
         
-        return estimate_messages_tokens(msgs, model)
+        return tokens
     
     def check_memory_budget(self, model: str, threshold: float = 0.8) -> bool:
         """
@@ -204,10 +263,8 @@ class ActorState:
         message_id = msg.get('message_id')
         
         # 去重检查：如果消息已存在于历史中，不重复添加
-        if message_id:
-            existing_ids = {h.get('message_id') for h in self.history if h.get('message_id')}
-            if message_id in existing_ids:
-                return  # 跳过重复消息
+        if message_id and message_id in self._history:
+            return  # 跳过重复消息
         
         has_media = False
         media_count = 0
@@ -244,7 +301,8 @@ class ActorState:
             if not history_item.get('content'):
                 history_item['content'] = f'[图片×{media_count}]'
         
-        self.history.append(history_item)
+        # 按时间有序写入（乱序到达时插入到对应位置）
+        self._history.append(history_item)
     
     def clear_after(self, message_id: str):
         """
@@ -253,19 +311,10 @@ class ActorState:
         Args:
             message_id: 目标消息 ID，该消息之后的所有消息将被删除
         """
-        idx = next(
-            (i for i, m in enumerate(self.history) if m.get('message_id') == message_id),
-            None
-        )
-        if idx is not None:
-            self.history = self.history[:idx + 1]  # 保留目标消息本身
-            
+        if self._history.truncate_after(message_id):  # 保留目标消息本身
             # 如果摘要覆盖范围已不在历史中，清除摘要
-            if self.summary_until:
-                history_ids = {m.get('message_id') for m in self.history}
-                if self.summary_until not in history_ids:
-                    self.summary = None
-                    self.summary_until = None
+            if self.summary_until and self.summary_until not in self._history:
+                self.clear_summary()
     
     def is_processed(self, message_id: str) -> bool:
         """
@@ -283,14 +332,9 @@ class ActorState:
         if message_id in self._processed_ids:
             return True
         
+        # 超过上限时按加入顺序淘汰最早的一半
         self._processed_ids.add(message_id)
         
-        # 限制集合大小
-        if len(self._processed_ids) > self._max_processed_ids:
-            # 移除最早的一半
-            keep_count = self._max_processed_ids // 2
-            self._processed_ids = set(list(self._processed_ids)[-keep_count:])
-        
         return False
     
     def get_recent_history(
@@ -321,44 +365,15 @@ class ActorState:
                 'content': '【对话摘要（自动生成）】\n' + self.summary.strip(),
             })
         
-        # 排序历史（按时间）
-        sorted_history = self._sort_history_by_time(self.history)
-        
-        # 取最近 N 条
-        tail = sorted_history[-max_messages:] if max_messages > 0 else []
+        # 取最近 N 条（历史已按时间有序，只遍历窗口内的消息）
+        tail = self._history.tail(max_messages)
         
         # 筛选 user/assistant 消息
         msgs: List[Dict[str, Any]] = []
         for m in tail:
-            if not isinstance(m, dict):
-                continue
-            
-            role = (m.get('role') or '').strip()
-            if role not in ('user', 'assistant'):
-                continue
-            
-            content = self._clean_content(m.get('content', ''))
-            
-            # 如果有媒体占位符但内容为空，添加提示
-            if m.get('has_media') and not content:
-                media_count = m.get('media_count', 1)
-                content = f'[图片×{media_count}]'
-            
-            if not content:
-                continue
-            
-            # 截断单条消息
-            if len(content) > max_per_message_chars:
-                content = content[:max_per_message_chars] + '…'
-            
-            msg_item = {'role': role, 'content': content}
-            
-            # 保留媒体占位符信息，供后续按需获取
-            if m.get('has_media'):
-                msg_item['has_media'] = True
-                msg_item['message_id'] = m.get('message_id')
-            
-            msgs.append(msg_item)
+            msg_item = self._to_llm_message(m, max_per_message_chars)
+            if msg_item is not None:
+                msgs.append(msg_item)
         
         # 总字符预算
         total = sum(len(x.get('content', '')) for x in msgs)
@@ -377,26 +392,72 @@ class ActorState:
         result.extend(msgs)
         return result
     
-    def _sort_history_by_time(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """按时间排序历史消息"""
-        def _sort_key(m: dict) -> float:
-            try:
-                v = (m or {}).get('created_at')
-                if isinstance(v, (int, float)):
-                    return float(v)
-                if isinstance(v, str) and v:
-                    try:
-                        return datetime.fromisoformat(v.replace('Z', '+00:00')).timestamp()
-                    except Exception:
-                        return 0.0
-                return 0.0
-            except Exception:
-                return 0.0
+    def get_history_after(
+        self,
+        message_id: Optional[str],
+        model: str,
+        max_tokens: int,
+        max_per_message_chars: int = 2400,
+    ) -> List[Dict[str, Any]]:
+        """
+        摘要未覆盖的历史（message_id 之后），从最新往前装入 token 预算（不含摘要本身）
+
+        后台摘要尚未完成时，摘要之后的消息都只能由这里提供，按固定条数截取会丢掉中间的部分。
+        至少保留最新一条。
+
+        Args:
+            message_id: 摘要覆盖到的消息（memory_snapshot() 的 summary_until）；None 表示全部历史
+            model: 模型名称（估算 token）
+            max_tokens: token 预算
+            max_per_message_chars: 单条消息字符上限
+
+        Returns:
+            消息列表（从早到晚，适合发送给 LLM）
+        """
+        msgs: List[Dict[str, Any]] = []
+        used = 0
+        for m in reversed(self._history.after(message_id)):
+            msg_item = self._to_llm_message(m, max_per_message_chars)
+            if msg_item is None:
+                continue
+            tokens = estimate_messages_tokens([msg_item], model)
+            if msgs and used + tokens > max_tokens:
+                break
+            used += tokens
+            msgs.append(msg_item)
+        msgs.reverse()
+        return msgs
+    
+    def _to_llm_message(self, m: Any, max_per_message_chars: int) -> Optional[Dict[str, Any]]:
+        """历史条目 → LLM 消息；非 user/assistant 或内容为空时返回 None"""
+        if not isinstance(m, dict):
+            return None
         
-        try:
-            return sorted([m for m in history if isinstance(m, dict)], key=_sort_key)
-        except Exception:
-            return history
+        role = (m.get('role') or '').strip()
+        if role not in ('user', 'assistant'):
+            return None
+        
+        content = self._clean_content(m.get('content', ''))
+        
+        # 如果有媒体占位符但内容为空，添加提示
+        if m.get('has_media') and not content:
+            media_count = m.get('media_count', 1)
+            content = f'[图片×{media_count}]'
+        
+        if not content:
+            return None
+        
+        # 截断单条消息
+        if len(content) > max_per_message_chars:
+            content = content[:max_per_message_chars] + '…'
+        
+        msg_item = {'role': role, 'content': content}
+        
+        # 保留媒体占位符信息，供后续按需获取
+        if m.get('has_media'):
+            msg_item['has_media'] = True
+            msg_item['message_id'] = m.get('message_id')
+        return msg_item
     
     def _clean_content(self, content: str) -> str:
         """清理消息内容"""
@@ -408,8 +469,8 @@ class ActorState:
         # 去掉工具提示前缀
         t = re.sub(r"^\[你已获得工具使用权：.*?\]\s*", "", t).strip()
         
-        # 去掉 data:image markdown
-        t = re.sub(r"!\[[^\]]*\]\(data:image\/[^)]+\)", "", t)
+        # 去掉 data:image markdown（含写库时移入 Blob 存储、已替换为 /api/blobs/ 地址的图片）
+        t = re.sub(r"!\[[^\]]*\]\((?:data:image\/|/api/blobs/)[^)]+\)", "", t)
         
         return t.strip()
     
@@ -477,9 +538,9 @@ class ActorState:
         if not message_id:
             return None
         
-        # 1. 检查缓存
+        # 1. 检查缓存（缓存中保存的是 Blob 引用，返回前还原 base64）
         if message_id in self._media_cache:
-            return self._media_cache[message_id]
+            return hydrate_media(self._media_cache[message_id])
         
         # 2. 从数据库加载
         try:
@@ -491,7 +552,7 @@ class ActorState:
                 if isinstance(media, list) and media:
                     # 缓存并返回
                     self._media_cache[message_id] = media
-                    return media
+                    return hydrate_media(media)
         except Exception:
             pass
         
@@ -12,12 +12,14 @@ from __future__ import annotations
 import json
 import logging
 import time
-from typing import Any, Dict, List, Optional
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Tuple
 
 from ..actor_base import ActorBase
 from ..actions import Action, ActionResult, ResponseDecision
 from ..action_chain import ActionStep, create_mcp_step
 from ..iteration_context import IterationContext
+from ..response_arbiter import MENTION_SCORE, get_response_arbiter
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +41,7 @@ class ChatAgent(ActorBase):
         2. 私聊模式：直接回复
         3. Agent 会话（普通模式）：直接回复
         4. Agent 会话（人格模式）：智能决策
-        5. 多人话题：智能决策
+        5. 多人话题：本地预筛，仅排名靠前的 Agent 升级为 LLM 决策
         
         Args:
             topic_id: 话题 ID
@@ -48,6 +50,14 @@ class ChatAgent(ActorBase):
         Returns:
             响应决策
         """
+        started = time.perf_counter()
+        decision, stage = self._decide_response(topic_id, msg_data)
+        get_response_arbiter().record(topic_id, stage, (time.perf_counter() - started) * 1000)
+        return decision
+    
+    def _decide_response(self, topic_id: str, msg_data: Dict[str, Any]):
+        """_should_respond 的决策主体，返回 (决策, 阶段 local / cache / llm)"""
+        arbiter = get_response_arbiter()
         sender_type = msg_data.get('sender_type')
         content = msg_data.get('content', '') or ''
         mentions = msg_data.get('mentions', []) or []
@@ -55,20 +65,18 @@ class ChatAgent(ActorBase):
         
         # 1. 被 @ 提及：必须回复
         if self.agent_id in mentions:
-            return ResponseDecision.reply('被 @ 提及，必须回复')
+            return ResponseDecision.reply('被 @ 提及，必须回复'), 'local'
         
         # 2. MCP 错误自动触发：功能已禁用
         # if ext.get('auto_trigger') and ext.get('mcp_error'):
         #     return ResponseDecision.reply('MCP 错误自动触发，需要处理')
         
-        # 获取会话类型
-        from services.topic_service import get_topic_service
-        topic = get_topic_service().get_topic(topic_id) or {}
-        session_type = topic.get('session_type')
+        # 获取会话类型（短时缓存，不再每条消息 get_topic）
+        session_type = arbiter.session_type(topic_id, lambda: self._load_session_type(topic_id))
         
         # 2. 私聊模式：直接回复
         if session_type == 'private_chat':
-            return ResponseDecision.reply('私聊模式', needs_thinking=False)
+            return ResponseDecision.reply('私聊模式', needs_thinking=False), 'local'
         
         # 3. Agent 会话
         if session_type == 'agent':
@@ -78,7 +86,7 @@ class ChatAgent(ActorBase):
             
             # 普通模式：直接回复
             if response_mode == 'normal':
-                return ResponseDecision.reply('Agent 普通模式', needs_thinking=False)
+                return ResponseDecision.reply('Agent 普通模式', needs_thinking=False), 'local'
             
             # 人格模式：继续决策
         
@@ -86,20 +94,69 @@ class ChatAgent(ActorBase):
         if sender_type == 'agent':
             # 如果对方在问 @human，保持沉默
             if '@human' in content:
-                return ResponseDecision.silent('对方在请求人类协助')
-            return ResponseDecision.silent('其他 Agent 的消息')
-        
-        # 5. 用户消息：智能决策
-        if self._is_question(content):
-            # 问题：更倾向回复
-            return self._llm_intent_decision(
-                topic_id, msg_data, default_action='reply'
-            )
-        else:
-            # 陈述：默认沉默
-            return self._llm_intent_decision(
-                topic_id, msg_data, default_action='silent'
+                return ResponseDecision.silent('对方在请求人类协助'), 'local'
+            return ResponseDecision.silent('其他 Agent 的消息'), 'local'
+        
+        is_question = self._is_question(content)
+        
+        # 5. Agent 会话人格模式：单 Agent，无需预筛
+        if session_type == 'agent':
+            return self._escalate_decision(topic_id, msg_data, 'reply' if is_question else 'silent')
+        
+        # 6. 用户消息：本地预筛（点名 / 能力匹配，话题内只取前 TOP_K 个候选）
+        agents = self._topic_agents()
+        ranking = arbiter.rank(topic_id, msg_data.get('message_id'), content, mentions, agents)
+        mine = next((r for r in ranking if r[0] == self.agent_id), None)
+        if mine and mine[1] >= MENTION_SCORE:
+            return ResponseDecision.reply(f'本地判定：{mine[2]}'), 'local'
+        
+        # 问题：无人匹配时仍需有人回答；陈述：无人匹配则全部沉默
+        shortlist = arbiter.shortlist(
+            topic_id, msg_data.get('message_id'), content, mentions, agents,
+            include_unmatched=is_question,
+        )
+        if self.agent_id not in shortlist:
+            reason = mine[2] if mine else '不在话题参与者中'
+            return ResponseDecision.silent(f'本地预筛：{reason}，未进入前 {len(shortlist) or arbiter.top_k} 名候选'), 'local'
+        
+        # 7. 候选 Agent：LLM 决策（问题更倾向回复，陈述默认沉默）
+        return self._escalate_decision(topic_id, msg_data, 'reply' if is_question else 'silent')
+    
+    def _load_session_type(self, topic_id: str) -> Optional[str]:
+        from services.topic_service import get_topic_service
+        topic = get_topic_service().get_topic(topic_id) or {}
+        return topic.get('session_type')
+    
+    def _topic_agents(self) -> Dict[str, Tuple[str, str]]:
+        """话题内 Agent：agent_id -> (名字, 能力描述)，包含自己"""
+        agents: Dict[str, Tuple[str, str]] = {}
+        for p in self.state.participants:
+            if p.get('participant_type') != 'agent':
+                continue
+            aid = p.get('participant_id')
+            if aid:
+                agents[aid] = (p.get('name') or '', self.state.agent_abilities.get(aid, ''))
+        if self.agent_id not in agents:
+            agents[self.agent_id] = (
+                self.info.get('name', ''),
+                (self._config.get('system_prompt') or '')[:80],
             )
+        return agents
+    
+    def _escalate_decision(self, topic_id: str, msg_data: Dict[str, Any], default_action: str):
+        """LLM 决策（相同内容命中决策缓存时不再调用）"""
+        if not self._config.get('llm_config_id'):
+            return ResponseDecision(action=default_action), 'local'
+        
+        arbiter = get_response_arbiter()
+        content = msg_data.get('content', '') or ''
+        cached = arbiter.cached_decision(self.agent_id, topic_id, content, default_action)
+        if cached is not None:
+            return replace(cached), 'cache'
+        
+        decision = self._llm_intent_decision(topic_id, msg_data, default_action=default_action)
+        arbiter.remember_decision(self.agent_id, topic_id, content, default_action, replace(decision))
+        return decision, 'llm'
     
     def _is_question(self, text: str) -> bool:
         """判断是否是问题"""
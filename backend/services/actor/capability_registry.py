@@ -11,7 +11,9 @@ from __future__ import annotations
 
 import logging
 from dataclasses import dataclass, field
-from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+from typing import Any, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from .skill_catalog import KeywordMatcher
 
 if TYPE_CHECKING:
     from .actions import Action
@@ -146,6 +148,8 @@ class CapabilityRegistry:
         
         # 缓存
         self._capability_description_cache: Optional[str] = None
+        # Skill 触发词自动机与对应的 Skill 顺序（技能变化后在下次匹配时重新编译）
+        self._skill_matcher: Optional[Tuple[KeywordMatcher, List[SkillCapability]]] = None
     
     # ==================== MCP 管理 ====================
     
@@ -284,12 +288,23 @@ class CapabilityRegistry:
         if not text:
             return None
         
-        text_lower = text.lower()
-        for skill in self._skills.values():
-            for keyword in skill.trigger_keywords:
-                if keyword.lower() in text_lower:
-                    return skill
-        return None
+        # 多个 Skill 命中时返回注册顺序最靠前的（与逐个检查的语义一致）
+        matcher, order = self._get_skill_matcher()
+        index = matcher.first(text)
+        return order[index] if index is not None else None
+    
+    def _get_skill_matcher(self) -> Tuple[KeywordMatcher, List[SkillCapability]]:
+        """编译（或复用）Skill 触发词自动机"""
+        compiled = self._skill_matcher
+        if compiled is None:
+            order = list(self._skills.values())
+            matcher = KeywordMatcher(
+                (keyword, index)
+                for index, skill in enumerate(order)
+                for keyword in skill.trigger_keywords
+            )
+            compiled = self._skill_matcher = (matcher, order)
+        return compiled
     
     # ==================== 内置工具管理 ====================
     
@@ -450,6 +465,7 @@ class CapabilityRegistry:
     def _invalidate_cache(self):
         """清除缓存"""
         self._capability_description_cache = None
+        self._skill_matcher = None
     
     # ==================== 批量加载 ====================
     
@@ -0,0 +1,291 @@
+"""
+历史消息窗口
+
+ActorState 原先用 list 存历史，每次 get_recent_history 都对全部历史逐条 datetime.fromisoformat
+再整体排序；append_history 每次重建全部 message_id 集合做去重；estimate_tokens 每条消息都对全部历史
+重新估算 token。
+
+HistoryWindow:
+- 按时间有序的 deque，时间戳在写入时解析一次（乱序到达的消息按时间插入，极少发生）
+- message_id → 位置索引，去重 / 定位 O(1)
+- 字符数与 token 数（按模型惰性建立）的前缀和，任意后缀的预算 O(1) 得出
+- 兼容 list 的只读用法（len / 迭代 / 下标 / 切片），构建上下文只与窗口大小相关
+
+RecentIdSet: 按插入顺序淘汰的有界去重集合。
+"""
+
+from __future__ import annotations
+
+import bisect
+from collections import OrderedDict, deque
+from datetime import datetime
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+from token_counter import estimate_messages_tokens
+
+# 超过该条数时从最旧端淘汰（早期内容由记忆摘要覆盖）
+DEFAULT_MAXLEN = 2000
+
+# 同时维护 token 前缀和的模型数上限
+_MAX_TOKEN_MODELS = 4
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """created_at → 秒级时间戳；无法解析返回 None"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def _item_tokens(item: Dict[str, Any], model: str) -> int:
+    return estimate_messages_tokens(
+        [{'role': item.get('role', 'user'), 'content': item.get('content', '')}], model
+    ) if item.get('content') else 0
+
+
+class HistoryWindow:
+    """
+    有序历史窗口
+
+    Example:
+        window = HistoryWindow()
+        window.reset(items)                 # 加载（一次排序）
+        window.append(item)                 # 追加（已存在的 message_id 忽略）
+        window.tail(10)                     # 最近 10 条
+        window.tokens_after(until, model)   # summary_until 之后的 token 数
+    """
+
+    def __init__(self, items: Iterable[Dict[str, Any]] = (), maxlen: int = DEFAULT_MAXLEN):
+        self.maxlen = maxlen
+        self._items: Deque[Dict[str, Any]] = deque()
+        self._ts: Deque[float] = deque()
+        # 累计值（含已淘汰部分）；后缀和 = 末尾累计 - 起点之前的累计
+        self._chars: Deque[int] = deque()
+        self._chars_base = 0
+        self._tokens: Dict[str, Deque[int]] = {}
+        self._tokens_base: Dict[str, int] = {}
+        # message_id → 绝对序号；位置 = 序号 - _offset
+        self._seq: Dict[str, int] = {}
+        self._offset = 0
+        self.reset(items)
+
+    # ==================== 写入 ====================
+
+    def reset(self, items: Iterable[Dict[str, Any]]) -> None:
+        """整体替换（按时间稳定排序一次）"""
+        entries = []
+        last_ts = 0.0
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            ts = parse_timestamp(item.get('created_at'))
+            # 缺少时间的消息保持原位置
+            last_ts = ts if ts is not None else last_ts
+            entries.append((last_ts, item))
+        entries.sort(key=lambda e: e[0])
+        entries = entries[-self.maxlen:] if self.maxlen else entries
+
+        self._items = deque(item for _, item in entries)
+        self._ts = deque(ts for ts, _ in entries)
+        self._tokens.clear()
+        self._tokens_base.clear()
+        self._rebuild()
+
+    def append(self, item: Dict[str, Any]) -> bool:
+        """
+        追加一条消息
+
+        Returns:
+            False 表示 message_id 已存在（未追加）
+        """
+        message_id = item.get('message_id')
+        if message_id and message_id in self._seq:
+            return False
+        ts = parse_timestamp(item.get('created_at'))
+        last_ts = self._ts[-1] if self._ts else 0.0
+        if ts is not None and ts < last_ts:
+            # 乱序到达：按时间插入后重建索引与前缀和
+            pos = bisect.bisect_right(self._ts, ts)
+            self._items.insert(pos, item)
+            self._ts.insert(pos, ts)
+            self._rebuild()
+            self._evict()
+            return True
+
+        self._items.append(item)
+        self._ts.append(ts if ts is not None else last_ts)
+        seq = self._offset + len(self._items) - 1
+        if message_id:
+            self._seq[message_id] = seq
+        self._chars.append(self._chars_total() + len(item.get('content') or ''))
+        for model, cum in self._tokens.items():
+            cum.append((cum[-1] if cum else self._tokens_base[model]) + _item_tokens(item, model))
+        self._evict()
+        return True
+
+    def extend(self, items: Iterable[Dict[str, Any]]) -> None:
+        for item in items:
+            self.append(item)
+
+    def __iadd__(self, items: Iterable[Dict[str, Any]]) -> 'HistoryWindow':
+        self.extend(items)
+        return self
+
+    def truncate_after(self, message_id: str) -> bool:
+        """删除 message_id 之后的消息（保留其本身）；未找到返回 False"""
+        pos = self.position(message_id)
+        if pos is None:
+            return False
+        while len(self._items) > pos + 1:
+            removed = self._items.pop()
+            self._ts.pop()
+            self._chars.pop()
+            for cum in self._tokens.values():
+                cum.pop()
+            if removed.get('message_id'):
+                self._seq.pop(removed['message_id'], None)
+        return True
+
+    def _evict(self) -> None:
+        while self.maxlen and len(self._items) > self.maxlen:
+            removed = self._items.popleft()
+            self._ts.popleft()
+            self._chars_base = self._chars.popleft()
+            for model, cum in self._tokens.items():
+                self._tokens_base[model] = cum.popleft()
+            if removed.get('message_id'):
+                self._seq.pop(removed['message_id'], None)
+            self._offset += 1
+
+    def _rebuild(self) -> None:
+        self._offset = 0
+        self._seq = {}
+        self._chars = deque()
+        self._chars_base = 0
+        running = 0
+        for i, item in enumerate(self._items):
+            if item.get('message_id'):
+                self._seq[item['message_id']] = i
+            running += len(item.get('content') or '')
+            self._chars.append(running)
+        for model in list(self._tokens):
+            self._build_tokens(model)
+
+    def _build_tokens(self, model: str) -> Deque[int]:
+        running = 0
+        cum: Deque[int] = deque()
+        for item in self._items:
+            running += _item_tokens(item, model)
+            cum.append(running)
+        if model not in self._tokens and len(self._tokens) >= _MAX_TOKEN_MODELS:
+            oldest = next(iter(self._tokens))
+            del self._tokens[oldest]
+            del self._tokens_base[oldest]
+        self._tokens[model] = cum
+        self._tokens_base[model] = 0
+        return cum
+
+    def _chars_total(self) -> int:
+        return self._chars[-1] if self._chars else self._chars_base
+
+    # ==================== 读取 ====================
+
+    def position(self, message_id: Optional[str]) -> Optional[int]:
+        """message_id 在窗口中的位置；不存在返回 None"""
+        if not message_id:
+            return None
+        seq = self._seq.get(message_id)
+        return None if seq is None else seq - self._offset
+
+    def __contains__(self, message_id: object) -> bool:
+        return message_id in self._seq
+
+    def tail(self, n: int) -> List[Dict[str, Any]]:
+        """最近 n 条（从早到晚），只遍历 n 条"""
+        if n <= 0:
+            return []
+        return list(islice(reversed(self._items), n))[::-1]
+
+    def after(self, message_id: Optional[str]) -> List[Dict[str, Any]]:
+        """message_id 之后的消息；message_id 不在窗口中时返回全部"""
+        pos = self.position(message_id)
+        start = 0 if pos is None else pos + 1
+        return list(islice(self._items, start, None))
+
+    def chars_after(self, message_id: Optional[str]) -> int:
+        pos = self.position(message_id)
+        before = self._chars_base if pos is None else self._chars[pos]
+        return self._chars_total() - before
+
+    def tokens_after(self, message_id: Optional[str], model: str) -> int:
+        """message_id 之后（不在窗口中时为全部）消息的 token 估算，前缀和 O(1)"""
+        cum = self._tokens.get(model)
+        if cum is None:
+            cum = self._build_tokens(model)
+        base = self._tokens_base[model]
+        total = cum[-1] if cum else base
+        pos = self.position(message_id)
+        return total - (base if pos is None else cum[pos])
+
+    # ==================== list 兼容 ====================
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._items)
+
+    def __reversed__(self) -> Iterator[Dict[str, Any]]:
+        return reversed(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._items))
+            if step == 1:
+                return list(islice(self._items, start, stop))
+            return list(self._items)[index]
+        return self._items[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, HistoryWindow):
+            other = list(other)
+        return list(self._items) == other
+
+    def __repr__(self) -> str:
+        return f"HistoryWindow({len(self._items)} items)"
+
+
+class RecentIdSet:
+    """
+    有界去重集合：超过上限时淘汰最早加入的一半（原实现 set(list(...)) 保留的是任意一半）
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        self.maxlen = maxlen
+        self._ids: OrderedDict = OrderedDict()
+
+    def add(self, item: str) -> None:
+        self._ids[item] = None
+        if len(self._ids) > self.maxlen:
+            for _ in range(len(self._ids) - self.maxlen // 2):
+                self._ids.popitem(last=False)
+
+    def discard(self, item: str) -> None:
+        self._ids.pop(item, None)
+
+    def __contains__(self, item: object) -> bool:
+        return item in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
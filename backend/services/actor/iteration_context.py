@@ -11,6 +11,7 @@
 
 from __future__ import annotations
 
+import itertools
 import time
 from dataclasses import dataclass, field
 from uuid import uuid4
@@ -37,6 +38,8 @@ class ProcessPhase:
     MSG_PRE_DEAL = 'msg_pre_deal'
     MSG_DEAL = 'msg_deal'
     POST_MSG_DEAL = 'post_msg_deal'
+    RESOLVE_SESSION = 'resolve_session'
+    PLAN_ACTIONS = 'plan_actions'
 
 
 class LLMDecision:
@@ -45,6 +48,206 @@ class LLMDecision:
     COMPLETE = 'complete'    # 处理完毕
 
 
+# 全局单调递增的步骤修订号：任一步骤变更后，上下文级视图缓存的键随之变化
+_step_revisions = itertools.count(1)
+
+
+class MediaRef:
+    """
+    媒体引用
+
+    步骤结果中的图片 / 音视频只登记 id 与类型，payload（通常是 base64）不复制，
+    物化视图时才从结果中的源条目读取。
+    """
+
+    __slots__ = ('media_id', 'kind', 'mime_type', '_source', '_key')
+
+    def __init__(self, kind: str, mime_type: Optional[str], source: Dict[str, Any], key: str):
+        self.media_id = f"media-{uuid4().hex[:12]}"
+        self.kind = kind
+        self.mime_type = mime_type
+        self._source = source
+        self._key = key
+
+    @property
+    def data(self) -> Any:
+        """媒体 payload（惰性读取）"""
+        return self._source.get(self._key)
+
+    def to_image(self) -> Dict[str, Any]:
+        """processMessages 中的图片格式"""
+        return {'mimeType': self.mime_type, 'data': self.data, 'mediaId': self.media_id}
+
+    def to_media(self) -> Dict[str, Any]:
+        """agent_ext_content.mcpResults[].extractedMedia 中的媒体格式"""
+        return {'type': self.kind, 'mimeType': self.mime_type, 'data': self.data, 'mediaId': self.media_id}
+
+
+def scan_media_refs(result: Any) -> List[MediaRef]:
+    """从 MCP result（content 列表）中登记媒体引用，不复制 payload"""
+    refs: List[MediaRef] = []
+    if not result or not isinstance(result, dict):
+        return refs
+    content = None
+    if isinstance(result.get('result'), dict):
+        content = result['result'].get('content')
+    if content is None:
+        content = result.get('content')
+    if not isinstance(content, list):
+        return refs
+    for item in content:
+        if not isinstance(item, dict):
+            continue
+        item_type = item.get('type')
+        if item_type == 'image':
+            data = item.get('data')
+            if isinstance(data, str) and data:
+                mime_type = item.get('mimeType') or item.get('mime_type') or 'image/png'
+                refs.append(MediaRef('image', mime_type, item, 'data'))
+        elif item_type in ('video', 'audio'):
+            key = 'data' if item.get('data') else 'url'
+            if item.get(key):
+                refs.append(MediaRef(item_type, item.get('mimeType') or item.get('mime_type'), item, key))
+    return refs
+
+
+_UNSET = object()
+
+
+class StepRecord:
+    """
+    处理步骤记录（__slots__）
+
+    兼容原先的 dict 用法（step['status']、step.get()、in、update()），常用字段用 slot 存储，
+    其余字段放在 extra。每次修改递增修订号并清空该步骤的派生视图缓存
+    （processSteps 字典 / processMessages / 思维链节点 / MCP 结果）。
+    """
+
+    __slots__ = (
+        'step_id', 'type', 'timestamp', 'status', 'thinking', 'duration', 'error', 'result',
+        'extra', 'revision', '_media', '_views',
+    )
+
+    # 用 slot 存储的字段（按输出顺序）
+    FIELDS = ('step_id', 'type', 'timestamp', 'status', 'thinking', 'duration', 'error', 'result')
+    _FIELD_SET = frozenset(FIELDS)
+
+    def __init__(self, **values: Any):
+        self.extra: Dict[str, Any] = {}
+        self._media: Optional[List[MediaRef]] = None
+        self._views: Dict[str, Any] = {}
+        self.revision = next(_step_revisions)
+        for key, value in values.items():
+            self._set(key, value)
+
+    def _set(self, key: str, value: Any) -> None:
+        if key in self._FIELD_SET:
+            object.__setattr__(self, key, value)
+            if key == 'result':
+                self._media = None
+        else:
+            self.extra[key] = value
+
+    def _touch(self) -> None:
+        self.revision = next(_step_revisions)
+        if self._views:
+            self._views = {}
+
+    # ---- dict 兼容接口 ----
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELD_SET:
+            value = getattr(self, key, _UNSET)
+            if value is _UNSET:
+                raise KeyError(key)
+            return value
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._set(key, value)
+        self._touch()
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._FIELD_SET:
+            return getattr(self, key, _UNSET) is not _UNSET
+        return key in self.extra
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._FIELD_SET:
+            value = getattr(self, key, _UNSET)
+            return default if value is _UNSET else value
+        return self.extra.get(key, default)
+
+    def update(self, values: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        for key, value in {**(values or {}), **kwargs}.items():
+            self._set(key, value)
+        self._touch()
+
+    def pop(self, key: str, default: Any = _UNSET) -> Any:
+        if key in self:
+            value = self[key]
+            if key in self._FIELD_SET:
+                object.__delattr__(self, key)
+                if key == 'result':
+                    self._media = None
+            else:
+                del self.extra[key]
+            self._touch()
+            return value
+        if default is _UNSET:
+            raise KeyError(key)
+        return default
+
+    def keys(self) -> List[str]:
+        return [k for k in self.FIELDS if getattr(self, k, _UNSET) is not _UNSET] + list(self.extra)
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, StepRecord):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"StepRecord({self.to_dict()!r})"
+
+    # ---- 派生数据 ----
+
+    @property
+    def media(self) -> List[MediaRef]:
+        """结果中的媒体引用（result 变更前只扫描一次）"""
+        if self._media is None:
+            self._media = scan_media_refs(self.get('result'))
+        return self._media
+
+    def cached(self, name: str, builder) -> Any:
+        """按名称缓存派生视图，直到本步骤下次修改"""
+        view = self._views.get(name, _UNSET)
+        if view is _UNSET:
+            view = self._views[name] = builder(self)
+        return view
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为普通 dict（可 JSON 序列化；缓存到下次修改）"""
+        view = self._views.get('dict')
+        if view is None:
+            view = {k: getattr(self, k) for k in self.FIELDS if getattr(self, k, _UNSET) is not _UNSET}
+            view.update(self.extra)
+            self._views['dict'] = view
+        return view
+
+
 @dataclass
 class IterationContext:
     """迭代上下文"""
@@ -66,8 +269,8 @@ class IterationContext:
     planned_actions: List['Action'] = field(default_factory=list)
     executed_results: List['ActionResult'] = field(default_factory=list)
 
-    # 处理步骤（供前端显示 processSteps）
-    process_steps: List[Dict[str, Any]] = field(default_factory=list)
+    # 处理步骤（供前端显示 processSteps；StepRecord 兼容 dict 访问）
+    process_steps: List['StepRecord'] = field(default_factory=list)
 
     # 状态标记
     is_complete: bool = False
@@ -99,6 +302,9 @@ class IterationContext:
     # Agent ID（用于日志）
     _agent_id: Optional[str] = None
 
+    # 派生视图缓存（processSteps / processMessages / 思维链 / MCP 结果），键为步骤修订号
+    _views: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+
     # ========== 新增：执行日志收集 ==========
     
     # 执行日志列表（用于保存到消息的 ext.log 中）
@@ -151,6 +357,12 @@ class IterationContext:
     # System prompt 和历史消息（准备好的上下文）
     system_prompt: Optional[str] = None
     history_messages: Optional[List[Dict[str, Any]]] = None
+    # 分段 system prompt 布局（缓存断点 + 稳定前缀哈希，见 prompt_segments）
+    prompt_layout: Optional[Any] = None
+    
+    # 并行阶段耗时（PhaseGraph.timings）与首个输出分片时间（perf_counter）
+    phase_timings: Dict[str, Any] = field(default_factory=dict)
+    first_chunk_at: Optional[float] = None
     
     # 消息类型分类结果
     msg_type: Optional[str] = None  # MessageType 中的值
@@ -207,13 +419,13 @@ class IterationContext:
         Returns:
             添加的步骤对象
         """
-        step = {
-            'step_id': kwargs.pop('step_id', None) or uuid4().hex,
-            'type': step_type,
-            'timestamp': int(time.time() * 1000),
-            'status': status,
+        step = StepRecord(
+            step_id=kwargs.pop('step_id', None) or uuid4().hex,
+            type=step_type,
+            timestamp=int(time.time() * 1000),
+            status=status,
             **kwargs,
-        }
+        )
         if thinking:
             step['thinking'] = thinking
 
@@ -241,14 +453,16 @@ class IterationContext:
         step = self.process_steps[-1]
         old_status = step.get('status')
 
+        updates: Dict[str, Any] = {}
         if status:
-            step['status'] = status
+            updates['status'] = status
 
         # 计算耗时
         if status in ('completed', 'error') and 'timestamp' in step:
-            step['duration'] = int(time.time() * 1000) - step['timestamp']
+            updates['duration'] = int(time.time() * 1000) - step['timestamp']
 
-        step.update(kwargs)
+        updates.update(kwargs)
+        step.update(updates)
 
         # 记录状态变更日志
         if status and status != old_status:
@@ -360,14 +574,70 @@ class IterationContext:
         """通知前端步骤变更"""
         if self._step_callback:
             try:
-                self._step_callback(self, step)
+                self._step_callback(self, self._step_dict(step))
             except Exception as e:
                 agent_prefix = f"[IterationContext:{self._agent_id}]" if self._agent_id else "[IterationContext]"
                 print(f"{agent_prefix} 步骤回调失败: {e}")
 
+    # ========== 派生视图缓存 ==========
+    #
+    # 每次同步消息 / 发布处理事件都要生成 processSteps、processMessages、思维链与 MCP 结果。
+    # 单个步骤的视图缓存在 StepRecord 上（步骤修改时失效），整张列表按
+    # (步骤数, 最大修订号) 缓存；直接追加的普通 dict 步骤无法感知修改，不缓存。
+
+    @staticmethod
+    def _step_dict(step: Any) -> Dict[str, Any]:
+        return step.to_dict() if isinstance(step, StepRecord) else step
+
+    def _views_key(self, *extra: Any) -> Optional[tuple]:
+        revision = 0
+        for step in self.process_steps:
+            if not isinstance(step, StepRecord):
+                return None
+            if step.revision > revision:
+                revision = step.revision
+        return (id(self.process_steps), len(self.process_steps), revision) + extra
+
+    def _step_views(self, name: str, builder, *key_extra: Any) -> List[Any]:
+        """
+        逐步骤构建视图列表并缓存
+
+        Args:
+            name: 视图名称
+            builder: (step) -> 视图条目，返回 None 表示跳过该步骤
+            key_extra: 影响视图的其他上下文字段
+        """
+        key = self._views_key(*key_extra)
+        if key is not None:
+            cached = self._views.get(name)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        items = []
+        for step in self.process_steps:
+            if isinstance(step, StepRecord):
+                item = step.cached(name, builder) if not key_extra else step.cached((name,) + key_extra, builder)
+            elif isinstance(step, dict):
+                item = builder(step)
+            else:
+                continue
+            if item is not None:
+                items.append(item)
+        if key is not None:
+            self._views[name] = (key, items)
+        return items
+
+    def get_media(self, media_id: str) -> Optional[MediaRef]:
+        """按 mediaId 查找步骤结果中的媒体引用（payload 通过 ref.data 读取）"""
+        for step in self.process_steps:
+            if isinstance(step, StepRecord):
+                for ref in step.media:
+                    if ref.media_id == media_id:
+                        return ref
+        return None
+
     def to_process_steps_dict(self) -> List[Dict[str, Any]]:
         """转换为 processSteps 格式（供前端）"""
-        return self.process_steps.copy()
+        return list(self._step_views('process_steps', self._step_dict))
 
     def _extract_media_images(self, result: Any) -> List[Dict[str, Any]]:
         """从 MCP result 中提取图片媒体（仅 image）"""
@@ -393,41 +663,44 @@ class IterationContext:
                 images.append({'mimeType': mime_type, 'data': data})
         return images
 
+    def _step_images(self, step: Any) -> List[Dict[str, Any]]:
+        if isinstance(step, StepRecord):
+            return [ref.to_image() for ref in step.media if ref.kind == 'image']
+        return self._extract_media_images(step.get('result'))
+
+    def _build_process_message(self, step: Any) -> Dict[str, Any]:
+        step_type = step.get('type', 'unknown')
+        title = (
+            step.get('toolName')
+            or (step.get('workflowInfo') or {}).get('name')
+            or step.get('action')
+            or step_type
+        )
+        images = self._step_images(step)
+        if len(images) > 1:
+            content_type = 'images'
+            image = None
+        elif len(images) == 1:
+            content_type = 'image'
+            image = images[0]
+        else:
+            content_type = 'text'
+            image = None
+        content = step.get('thinking') or step.get('error')
+        return {
+            'type': step_type,
+            'contentType': content_type,
+            'timestamp': step.get('timestamp', int(time.time() * 1000)),
+            'title': title,
+            'content': content,
+            'image': image,
+            'images': images if len(images) > 1 else None,
+            'meta': self._step_dict(step),
+        }
+
     def to_process_messages(self) -> List[Dict[str, Any]]:
         """转换为 processMessages 格式（新协议）"""
-        messages: List[Dict[str, Any]] = []
-        for step in self.process_steps:
-            if not isinstance(step, dict):
-                continue
-            step_type = step.get('type', 'unknown')
-            title = (
-                step.get('toolName')
-                or (step.get('workflowInfo') or {}).get('name')
-                or step.get('action')
-                or step_type
-            )
-            images = self._extract_media_images(step.get('result'))
-            if len(images) > 1:
-                content_type = 'images'
-                image = None
-            elif len(images) == 1:
-                content_type = 'image'
-                image = images[0]
-            else:
-                content_type = 'text'
-                image = None
-            content = step.get('thinking') or step.get('error')
-            messages.append({
-                'type': step_type,
-                'contentType': content_type,
-                'timestamp': step.get('timestamp', int(time.time() * 1000)),
-                'title': title,
-                'content': content,
-                'image': image,
-                'images': images if len(images) > 1 else None,
-                'meta': step,
-            })
-        return messages
+        return list(self._step_views('process_messages', self._build_process_message))
 
     def _json_safe(self, obj: Any, max_depth: int = 8):
         """
@@ -494,8 +767,29 @@ class IterationContext:
             if raw_response:
                 # raw 可能包含 bytes/复杂对象，必须清洗，否则会导致 ext 持久化失败
                 llm_metadata['raw_response'] = self._json_safe(raw_response)
+            prompt_cache = self._prompt_cache_stats(usage)
+            if prompt_cache:
+                llm_metadata['prompt_cache'] = prompt_cache
             self.final_ext['llmResponse'] = llm_metadata
 
+    def _prompt_cache_stats(self, usage: Optional[Dict[str, int]]) -> Optional[Dict[str, Any]]:
+        """提示词缓存命中统计（usage 含 cached_tokens 时）"""
+        if not usage or usage.get('cached_tokens') is None:
+            return None
+        prompt_tokens = int(usage.get('prompt_tokens') or 0)
+        cached_tokens = int(usage.get('cached_tokens') or 0)
+        stats = {
+            'cached_tokens': cached_tokens,
+            'prompt_tokens': prompt_tokens,
+            'cached_ratio': round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+        }
+        if usage.get('cache_creation_tokens'):
+            stats['cache_creation_tokens'] = int(usage['cache_creation_tokens'])
+        prefix_hash = getattr(self.prompt_layout, 'prefix_hash', None)
+        if prefix_hash:
+            stats['prefix_hash'] = prefix_hash
+        return stats
+
     def build_ext_data(self) -> Dict[str, Any]:
         """
         构建扩展数据（用于消息存储）
@@ -591,82 +885,81 @@ class IterationContext:
                 },
             })
         
-        for step in self.process_steps:
-            if not isinstance(step, dict):
-                continue
-            
-            step_type = step.get('type', 'unknown')
-            
-            # 映射到思维节点类型
-            mind_type = self._map_step_to_mind_type(step_type)
-            
-            node = {
-                'id': step.get('step_id', f"node-{step.get('timestamp', int(time.time() * 1000))}"),
-                'type': mind_type,
-                'timestamp': step.get('timestamp', int(time.time() * 1000)),
-                'status': step.get('status', 'completed'),
-                'title': step.get('toolName') or step.get('action') or step_type,
-                'content': step.get('thinking'),
-                'duration': step.get('duration'),
+        nodes.extend(self._step_views('mind_nodes', self._build_mind_node, self.max_iterations))
+        return nodes
+
+    def _build_mind_node(self, step: Any) -> Dict[str, Any]:
+        """单个步骤的思维链节点"""
+        step_type = step.get('type', 'unknown')
+
+        # 映射到思维节点类型
+        mind_type = self._map_step_to_mind_type(step_type)
+        
+        node = {
+            'id': step.get('step_id', f"node-{step.get('timestamp', int(time.time() * 1000))}"),
+            'type': mind_type,
+            'timestamp': step.get('timestamp', int(time.time() * 1000)),
+            'status': step.get('status', 'completed'),
+            'title': step.get('toolName') or step.get('action') or step_type,
+            'content': step.get('thinking'),
+            'duration': step.get('duration'),
+        }
+        
+        # MCP 相关信息
+        if step.get('mcpServer') or step.get('toolName'):
+            node['mcp'] = {
+                'server': step.get('mcpServer'),
+                'serverName': step.get('mcpServerName'),
+                'toolName': step.get('toolName'),
+                'arguments': step.get('arguments'),
+                # 注意：不在思维链中包含完整result，避免数据冗余
             }
-            
-            # MCP 相关信息
-            if step.get('mcpServer') or step.get('toolName'):
-                node['mcp'] = {
-                    'server': step.get('mcpServer'),
-                    'serverName': step.get('mcpServerName'),
-                    'toolName': step.get('toolName'),
-                    'arguments': step.get('arguments'),
-                    # 注意：不在思维链中包含完整result，避免数据冗余
-                }
-            
-            # 迭代相关信息
-            if step.get('iteration') is not None:
-                node['iteration'] = {
-                    'round': step.get('iteration'),
-                    'maxRounds': step.get('max_iterations', self.max_iterations),
-                    'isFinal': step.get('is_final_iteration', False),
-                }
-            
-            # 决策相关信息
-            if step.get('action'):
-                node['decision'] = {
-                    'action': step.get('action'),
-                    'reason': step.get('thinking'),
-                }
-            
-            # LLM模型信息（如果步骤中包含）
-            if step.get('llm_provider') or step.get('llm_model') or step.get('llm_config_id'):
-                node['llm'] = {
-                    'provider': step.get('llm_provider'),
-                    'supplier': step.get('llm_supplier'),
-                    'model': step.get('llm_model'),
-                    'config_id': step.get('llm_config_id'),
-                }
-                # 如果有模型信息，在title或content中显示
-                if step.get('llm_model'):
-                    model = step.get('llm_model')
-                    provider = step.get('llm_provider', 'unknown')
-                    # supplier=计费/Token 归属，provider=兼容路由
-                    supplier = step.get('llm_supplier') or provider
-                    model_info = f"{model} (供应商: {supplier})"
-                    if supplier != provider:
-                        model_info += f" (兼容: {provider})"
-                    if not node.get('content') or '模型' not in node.get('content', ''):
-                        # 如果content中没有模型信息，添加到content开头
-                        original_content = node.get('content', '')
-                        if original_content:
-                            node['content'] = f"[使用模型: {model_info}]\n{original_content}"
-                        else:
-                            node['content'] = f"使用模型: {model_info}"
-            
-            # 错误信息
-            if step.get('error'):
-                node['error'] = step.get('error')
-            
-            nodes.append(node)
         
-        return nodes
+        # 迭代相关信息
+        if step.get('iteration') is not None:
+            node['iteration'] = {
+                'round': step.get('iteration'),
+                'maxRounds': step.get('max_iterations', self.max_iterations),
+                'isFinal': step.get('is_final_iteration', False),
+            }
+        
+        # 决策相关信息
+        if step.get('action'):
+            node['decision'] = {
+                'action': step.get('action'),
+                'reason': step.get('thinking'),
+            }
+        
+        # LLM模型信息（如果步骤中包含）
+        if step.get('llm_provider') or step.get('llm_model') or step.get('llm_config_id'):
+            node['llm'] = {
+                'provider': step.get('llm_provider'),
+                'supplier': step.get('llm_supplier'),
+                'model': step.get('llm_model'),
+                'config_id': step.get('llm_config_id'),
+            }
+            # 如果有模型信息，在title或content中显示
+            if step.get('llm_model'):
+                model = step.get('llm_model')
+                provider = step.get('llm_provider', 'unknown')
+                # supplier=计费/Token 归属，provider=兼容路由
+                supplier = step.get('llm_supplier') or provider
+                model_info = f"{model} (供应商: {supplier})"
+                if supplier != provider:
+                    model_info += f" (兼容: {provider})"
+                if not node.get('content') or '模型' not in node.get('content', ''):
+                    # 如果content中没有模型信息，添加到content开头
+                    original_content = node.get('content', '')
+                    if original_content:
+                        node['content'] = f"[使用模型: {model_info}]\n{original_content}"
+                    else:
+                        node['content'] = f"使用模型: {model_info}"
+        
+        # 错误信息
+        if step.get('error'):
+            node['error'] = step.get('error')
+        
+        return node
     
     def _map_step_to_mind_type(self, step_type: str) -> str:
         """映射处理步骤类型到思维节点类型"""
@@ -689,41 +982,41 @@ class IterationContext:
         从 process_steps 中提取 MCP 调用结果
         用于填充 agent_ext_content.mcpResults
         """
-        results = []
-        for step in self.process_steps:
-            if not isinstance(step, dict):
-                continue
-            
-            step_type = step.get('type', '')
-            if step_type not in ('mcp_call', 'mcp_selection', 'tool_call'):
-                continue
-            
-            if not step.get('mcpServer') and not step.get('toolName'):
-                continue
-            
-            result_data = step.get('result')
-            
-            mcp_result = {
-                'serverId': step.get('mcpServer', ''),
-                'serverName': step.get('mcpServerName', ''),
-                'toolName': step.get('toolName', ''),
-                'arguments': step.get('arguments'),
-                'result': result_data,
-                'status': step.get('status', 'completed'),
-                'duration': step.get('duration'),
-            }
-            
-            if step.get('error'):
-                mcp_result['errorMessage'] = step.get('error')
-            
-            # 提取媒体
+        return list(self._step_views('mcp_results', self._build_mcp_result))
+
+    def _build_mcp_result(self, step: Any) -> Optional[Dict[str, Any]]:
+        """单个步骤的 MCP 结果（非 MCP 步骤返回 None）"""
+        step_type = step.get('type', '')
+        if step_type not in ('mcp_call', 'mcp_selection', 'tool_call'):
+            return None
+        
+        if not step.get('mcpServer') and not step.get('toolName'):
+            return None
+        
+        result_data = step.get('result')
+        
+        mcp_result = {
+            'serverId': step.get('mcpServer', ''),
+            'serverName': step.get('mcpServerName', ''),
+            'toolName': step.get('toolName', ''),
+            'arguments': step.get('arguments'),
+            'result': result_data,
+            'status': step.get('status', 'completed'),
+            'duration': step.get('duration'),
+        }
+        
+        if step.get('error'):
+            mcp_result['errorMessage'] = step.get('error')
+        
+        # 提取媒体（StepRecord 复用已登记的媒体引用）
+        if isinstance(step, StepRecord):
+            extracted_media = [ref.to_media() for ref in step.media]
+        else:
             extracted_media = self._extract_media_from_result(result_data)
-            if extracted_media:
-                mcp_result['extractedMedia'] = extracted_media
-            
-            results.append(mcp_result)
+        if extracted_media:
+            mcp_result['extractedMedia'] = extracted_media
         
-        return results
+        return mcp_result
     
     def _extract_media_from_result(self, result: Any) -> List[Dict[str, Any]]:
         """从 MCP 结果中提取媒体资源"""
@@ -809,6 +1102,21 @@ class IterationContext:
         
         self.event_states[phase].update(data)
     
+    def record_phase(self, phase: str, status: str, **data):
+        """
+        记录并行阶段的状态（不修改 current_phase，供 PhaseGraph 回调使用）
+
+        Args:
+            phase: 处理阶段
+            status: 状态（running/completed/error/skipped）
+            **data: 阶段数据（started_ms / duration_ms 等）
+        """
+        state = self.event_states.setdefault(phase, {'timestamp': int(time.time() * 1000)})
+        state['status'] = status
+        if 'duration_ms' in data:
+            state['duration'] = data['duration_ms']
+        state.update(data)
+    
     def get_phase_data(self, phase: str) -> Optional[Dict[str, Any]]:
         """获取阶段数据"""
         return self.event_states.get(phase)
@@ -861,7 +1169,7 @@ class IterationContext:
             'msg_type': self.msg_type,
             'llm_decision': self.llm_decision,
             'event_states': self.event_states,
-            'process_steps': self.process_steps,
+            'process_steps': self.to_process_steps_dict(),
             'is_complete': self.is_complete,
             'error': self.error,
         }
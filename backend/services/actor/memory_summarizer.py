@@ -0,0 +1,263 @@
+"""
+后台记忆摘要
+
+原先记忆预算超限时 _summarize_memory 在 Actor 工作线程上同步调用 provider.chat，用户的下一条回复
+要等一整轮摘要；摘要只存在内存里，进程重启后丢失并重新计算。
+
+这里把摘要移到后台线程池:
+- 软阈值（默认上下文的 60%）提前触发，回复路径从不等待摘要
+- 增量摘要：已有摘要 + summary_until 之后的新消息 → 新摘要（每轮最多处理 MAX_BATCH 条）
+- 完成后对 ActorState 做比较并交换（摘要基线在此期间被回退清除 / 替换则丢弃结果）
+- 结果持久化到 summaries 表（带 agent_id）与 Redis，Actor 激活时恢复
+- 同一 (agent, topic) 同时只有一个摘要任务
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from token_counter import estimate_messages_tokens
+
+_TAG = "[MemorySummary]"
+
+# 每轮增量摘要最多处理的消息数（更早的剩余部分留给下一轮）
+MAX_BATCH = 80
+
+# Redis 缓存时间（秒）；过期后从 summaries 表恢复
+REDIS_TTL = 7 * 24 * 3600
+
+
+def _redis_key(agent_id: str, topic_id: str) -> str:
+    return f"actor:summary:{topic_id}:{agent_id}"
+
+
+def select_batch(
+    history: List[Dict[str, Any]],
+    summary_until: Optional[str],
+    keep_recent: int,
+    max_batch: int = MAX_BATCH,
+) -> List[Dict[str, Any]]:
+    """
+    取出待摘要的消息：summary_until 之后、最近 keep_recent 条之前的部分（最早的 max_batch 条）
+
+    summary_until 不在历史中（如被截断）时从头开始。
+    """
+    start = 0
+    if summary_until:
+        for i, m in enumerate(history):
+            if m.get("message_id") == summary_until:
+                start = i + 1
+                break
+    end = len(history) - keep_recent
+    if end <= start:
+        return []
+    return history[start:end][:max_batch]
+
+
+class MemorySummarizer:
+    """
+    后台摘要调度
+
+    Example:
+        summarizer = get_memory_summarizer()
+        summarizer.schedule(actor, keep_recent=24)            # 不阻塞
+        summarizer.restore(actor.agent_id, topic_id, actor.state)  # 激活时恢复
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        get_connection: Optional[Callable] = None,
+        get_redis: Optional[Callable] = None,
+    ):
+        """
+        Args:
+            max_workers: 并发摘要任务数
+            get_connection: 获取 MySQL 连接的函数（默认 database.get_mysql_connection）
+            get_redis: 获取 Redis 客户端的函数（默认 database.get_redis_client）
+        """
+        if get_connection is None or get_redis is None:
+            from database import get_mysql_connection, get_redis_client
+
+            get_connection = get_connection or get_mysql_connection
+            get_redis = get_redis or get_redis_client
+        self._get_connection = get_connection
+        self._get_redis = get_redis
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="memory-summary")
+        self._inflight: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    # ==================== 调度 ====================
+
+    def schedule(self, actor, keep_recent: int = 24, min_batch: int = 5):
+        """
+        提交后台摘要任务（在 Actor 线程调用，立即返回）
+
+        Args:
+            actor: ActorBase 实例（提供 agent_id / topic_id / state / _generate_summary）
+            keep_recent: 保留不摘要的最近消息数
+            min_batch: 新消息少于该数量时不摘要
+
+        Returns:
+            Future；未提交（无需摘要或已有任务在执行）时返回 None
+        """
+        key = (actor.agent_id, actor.topic_id)
+        state = actor.state
+        summary, until = state.memory_snapshot()
+        batch = select_batch(state.history, until, keep_recent)
+        if len(batch) < min_batch:
+            return None
+        with self._lock:
+            if key in self._inflight:
+                return None
+            self._inflight.add(key)
+        return self._executor.submit(self._run, actor, key, summary, until, batch)
+
+    def is_running(self, agent_id: str, topic_id: str) -> bool:
+        with self._lock:
+            return (agent_id, topic_id) in self._inflight
+
+    def _run(self, actor, key, previous: Optional[str], until: Optional[str], batch: List[Dict[str, Any]]) -> bool:
+        try:
+            summary = actor._generate_summary(previous, batch)
+            if not summary:
+                return False
+            last_id = next((m.get("message_id") for m in reversed(batch) if m.get("message_id")), None)
+            if not last_id:
+                return False
+            # 摘要期间消息被回退删除：结果基于已不存在的消息，丢弃
+            if last_id not in actor.state.history:
+                print(f"{_TAG} {key[0]}@{key[1]}: messages rolled back during summarization, discarded")
+                return False
+            if not actor.state.replace_summary(until, summary, last_id):
+                print(f"{_TAG} {key[0]}@{key[1]}: summary baseline changed, discarded")
+                return False
+            print(f"{_TAG} {key[0]}@{key[1]}: summarized {len(batch)} message(s) → {len(summary)} chars")
+            # 按提交时的 (agent, topic) 落库：摘要期间 Actor 可能已切换到其他话题
+            agent_id, topic_id = key
+            self._persist(agent_id, topic_id, summary, last_id, batch, actor._config.get("model"))
+            return True
+        except Exception as e:
+            print(f"{_TAG} {key[0]}@{key[1]}: summarization failed: {e}")
+            return False
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+
+    # ==================== 持久化 ====================
+
+    def _persist(self, agent_id: str, topic_id: str, summary: str, until: str,
+                 batch: List[Dict[str, Any]], model: Optional[str]) -> None:
+        rc = self._get_redis()
+        if rc:
+            try:
+                rc.setex(_redis_key(agent_id, topic_id), REDIS_TTL,
+                         json.dumps({"summary": summary, "summary_until": until}, ensure_ascii=False))
+            except Exception as e:
+                print(f"{_TAG} Redis write failed: {e}")
+
+        conn = self._get_connection()
+        if not conn:
+            return
+        model = model or "gpt-4"
+        try:
+            tokens_before = estimate_messages_tokens(
+                [{"role": m.get("role", "user"), "content": m.get("content") or ""} for m in batch], model
+            )
+            tokens_after = estimate_messages_tokens([{"role": "system", "content": summary}], model)
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO summaries (summary_id, session_id, agent_id, summary_content, last_message_id,
+                                       token_count_before, token_count_after)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """,
+                (f"sum_{uuid.uuid4().hex[:16]}", topic_id, agent_id, summary, until, tokens_before, tokens_after),
+            )
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            print(f"{_TAG} Failed to persist summary: {e}")
+        finally:
+            conn.close()
+
+    def load(self, agent_id: str, topic_id: str) -> Optional[Tuple[str, str]]:
+        """读取最近一次摘要 (summary, summary_until)：Redis → summaries 表"""
+        rc = self._get_redis()
+        if rc:
+            try:
+                raw = rc.get(_redis_key(agent_id, topic_id))
+                if raw:
+                    data = json.loads(raw)
+                    return data["summary"], data["summary_until"]
+            except Exception as e:
+                print(f"{_TAG} Redis read failed: {e}")
+
+        conn = self._get_connection()
+        if not conn:
+            return None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT summary_content, last_message_id FROM summaries
+                WHERE session_id = %s AND agent_id = %s
+                ORDER BY created_at DESC, id DESC LIMIT 1
+                """,
+                (topic_id, agent_id),
+            )
+            row = cursor.fetchone()
+            cursor.close()
+        except Exception as e:
+            print(f"{_TAG} Failed to load summary: {e}")
+            return None
+        finally:
+            conn.close()
+        if not row:
+            return None
+        if isinstance(row, dict):
+            return row["summary_content"], row["last_message_id"]
+        return row[0], row[1]
+
+    def restore(self, agent_id: str, topic_id: str, state) -> bool:
+        """
+        激活时恢复持久化的摘要；summary_until 不在已加载历史中（已回退删除）时不恢复
+        """
+        loaded = self.load(agent_id, topic_id)
+        if not loaded or not loaded[1]:
+            return False
+        summary, until = loaded
+        if until not in state.history:
+            return False
+        state.set_summary(summary, until)
+        return True
+
+    def invalidate(self, agent_id: str, topic_id: str) -> None:
+        """摘要失效（消息回退）时清除 Redis 副本；表中记录在恢复时按 summary_until 校验"""
+        rc = self._get_redis()
+        if rc:
+            try:
+                rc.delete(_redis_key(agent_id, topic_id))
+            except Exception:
+                pass
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+_summarizer: Optional[MemorySummarizer] = None
+_init_lock = threading.Lock()
+
+
+def get_memory_summarizer() -> MemorySummarizer:
+    """获取全局摘要调度器"""
+    global _summarizer
+    if _summarizer is None:
+        with _init_lock:
+            if _summarizer is None:
+                _summarizer = MemorySummarizer()
+    return _summarizer
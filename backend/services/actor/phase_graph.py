@@ -0,0 +1,349 @@
+"""
+消息处理阶段 DAG
+
+process_message 原先严格串行：查话题类型 → 规划行动（Skill 加载、MCP 路由）→ 查 LLM 配置 → 构建
+上下文 → 流式生成。其中查话题、查配置、规划行动是互不依赖的 I/O，串行执行时首字延迟是它们之和。
+
+PhaseGraph:
+- 显式声明依赖，依赖满足的阶段立即提交到共享线程池并行执行
+- 每个阶段发布 running / completed / error 处理事件，附带耗时（duration_ms）与相对起点（started_ms）；
+  事件先入队，由调用 wait() / drain() 的 Actor 线程投递，回调里读写 IterationContext 不会与
+  Actor 线程并发
+- 必需阶段失败时依赖它的阶段跳过，wait() 抛出原异常；optional 阶段失败不阻塞下游
+
+SpeculativeStream: 工具可选时先在后台开始主 LLM 流并缓冲输出，规划结果确定无需工具后
+commit() 继续消费（已缓冲的部分立即可用），需要工具则 abandon() 丢弃。生成过程中对 Actor /
+上下文的修改经 apply_side_effect() 登记，只在 commit() 消费到时执行，放弃的推测不留痕迹。
+推测流整段占用一个线程，使用独立线程池，不与阶段争抢工作线程。
+"""
+
+from __future__ import annotations
+
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from utils.cancellation import CancellationToken, bind_cancel_token, current_cancel_token
+
+# 阶段状态
+PENDING = 'pending'
+RUNNING = 'running'
+COMPLETED = 'completed'
+ERROR = 'error'
+SKIPPED = 'skipped'
+
+_WAKE = object()  # 事件队列中的唤醒标记（阶段 future 已设置）
+
+_executor: Optional[ThreadPoolExecutor] = None
+_stream_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_phase_executor() -> ThreadPoolExecutor:
+    """所有 Actor 共享的阶段线程池"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="actor-phase")
+    return _executor
+
+
+def get_stream_executor() -> ThreadPoolExecutor:
+    """推测流线程池（一个流占用一个线程直到生成结束，与阶段线程池分开）"""
+    global _stream_executor
+    if _stream_executor is None:
+        with _executor_lock:
+            if _stream_executor is None:
+                _stream_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="actor-stream")
+    return _stream_executor
+
+
+class PhaseError(RuntimeError):
+    """依赖的阶段失败，本阶段未执行"""
+
+
+class _Phase:
+    __slots__ = ('name', 'fn', 'deps', 'optional', 'status', 'future', 'started', 'duration_ms', 'error')
+
+    def __init__(self, name: str, fn: Callable[[], Any], deps: Iterable[str], optional: bool):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.optional = optional
+        self.status = PENDING
+        self.future: Future = Future()
+        self.started: Optional[float] = None
+        self.duration_ms: Optional[int] = None
+        self.error: Optional[BaseException] = None
+
+
+class PhaseGraph:
+    """
+    阶段依赖图
+
+    Example:
+        graph = PhaseGraph(on_event=lambda phase, status, data: ...)
+        graph.add('session', load_session)
+        graph.add('llm_config', load_config, deps=('session',))
+        graph.add('plan', plan_actions)
+        run = graph.start()
+        actions = run.wait('plan')
+    """
+
+    def __init__(
+        self,
+        executor: Optional[ThreadPoolExecutor] = None,
+        on_event: Optional[Callable[[str, str, Dict[str, Any]], None]] = None,
+    ):
+        """
+        Args:
+            executor: 执行阶段的线程池（默认共享池）
+            on_event: 阶段状态回调 (phase, status, data)，用于发布处理事件；
+                在调用 PhaseRun.wait() / drain() 的线程中执行，而不是阶段所在的池线程
+        """
+        self._executor = executor
+        self._on_event = on_event
+        self._phases: Dict[str, _Phase] = {}
+
+    def add(self, name: str, fn: Callable[[], Any], deps: Iterable[str] = (), optional: bool = False) -> 'PhaseGraph':
+        """添加阶段；依赖必须已添加（保证无环）"""
+        if name in self._phases:
+            raise ValueError(f"duplicate phase: {name}")
+        deps = tuple(deps)
+        missing = [d for d in deps if d not in self._phases]
+        if missing:
+            raise ValueError(f"phase {name} depends on unknown phase(s): {missing}")
+        self._phases[name] = _Phase(name, fn, deps, optional)
+        return self
+
+    def start(self) -> 'PhaseRun':
+        """提交所有无依赖的阶段，其余在依赖完成时提交；立即返回"""
+        run = PhaseRun(self._phases, self._executor or get_phase_executor(), self._on_event)
+        run._schedule_ready()
+        return run
+
+
+class PhaseRun:
+    """一次阶段图执行"""
+
+    def __init__(self, phases: Dict[str, _Phase], executor: ThreadPoolExecutor, on_event):
+        self._phases = phases
+        self._executor = executor
+        self._on_event = on_event
+        self._lock = threading.Lock()
+        self._events: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.started = time.perf_counter()
+
+    def _emit(self, phase: _Phase, status: str, data: Optional[Dict[str, Any]] = None) -> None:
+        if self._on_event is not None:
+            self._events.put((phase.name, status, data or {}))
+
+    def _wake(self) -> None:
+        """阶段 future 已设置：唤醒 wait() 中等待事件的线程"""
+        self._events.put(_WAKE)
+
+    def _deliver(self, event) -> None:
+        if event is _WAKE:
+            return
+        name, status, data = event
+        try:
+            self._on_event(name, status, data)
+        except Exception as e:
+            print(f"[PhaseGraph] event callback failed for {name}: {e}")
+
+    def drain(self) -> None:
+        """在当前线程投递已入队的阶段事件（不阻塞）"""
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                return
+            self._deliver(event)
+
+    def _schedule_ready(self) -> None:
+        to_submit: List[_Phase] = []
+        to_skip: List[_Phase] = []
+        with self._lock:
+            for phase in self._phases.values():
+                if phase.status != PENDING:
+                    continue
+                deps = [self._phases[d] for d in phase.deps]
+                if any(d.status in (PENDING, RUNNING) for d in deps):
+                    continue
+                failed = [d.name for d in deps if d.status in (ERROR, SKIPPED) and not d.optional]
+                if failed:
+                    phase.status = SKIPPED
+                    phase.error = PhaseError(f"phase {phase.name} skipped: dependency failed ({', '.join(failed)})")
+                    to_skip.append(phase)
+                else:
+                    phase.status = RUNNING
+                    to_submit.append(phase)
+        for phase in to_skip:
+            phase.future.set_exception(phase.error)
+            self._wake()
+        for phase in to_submit:
+            # 复制 contextvars（如本轮取消令牌），阶段在池线程中也能读到
+            self._executor.submit(contextvars.copy_context().run, self._execute, phase)
+        if to_skip:
+            self._schedule_ready()
+
+    def _execute(self, phase: _Phase) -> None:
+        phase.started = time.perf_counter()
+        started_ms = int((phase.started - self.started) * 1000)
+        self._emit(phase, RUNNING, {'started_ms': started_ms})
+        try:
+            result = phase.fn()
+        except BaseException as e:
+            phase.duration_ms = int((time.perf_counter() - phase.started) * 1000)
+            phase.error = e
+            with self._lock:
+                phase.status = ERROR
+            self._emit(phase, ERROR, {'error': str(e), 'started_ms': started_ms, 'duration_ms': phase.duration_ms})
+            phase.future.set_exception(e)
+        else:
+            phase.duration_ms = int((time.perf_counter() - phase.started) * 1000)
+            with self._lock:
+                phase.status = COMPLETED
+            self._emit(phase, COMPLETED, {'started_ms': started_ms, 'duration_ms': phase.duration_ms})
+            phase.future.set_result(result)
+        self._wake()
+        self._schedule_ready()
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> Any:
+        """
+        等待阶段完成并返回其结果；阶段失败时抛出原异常，依赖失败被跳过时抛出 PhaseError
+
+        等待期间在当前线程投递各阶段的事件（on_event 回调）。
+        """
+        future = self._phases[name].future
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not future.done():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise FutureTimeoutError()
+            try:
+                event = self._events.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            self._deliver(event)
+        self.drain()
+        return future.result()
+
+    def done(self, name: str) -> bool:
+        return self._phases[name].future.done()
+
+    def status(self, name: str) -> str:
+        return self._phases[name].status
+
+    @property
+    def timings(self) -> Dict[str, Dict[str, Any]]:
+        """各阶段 {status, started_ms, duration_ms}"""
+        out = {}
+        for name, phase in self._phases.items():
+            out[name] = {
+                'status': phase.status,
+                'started_ms': None if phase.started is None else int((phase.started - self.started) * 1000),
+                'duration_ms': phase.duration_ms,
+            }
+        return out
+
+
+_DONE = object()
+
+
+class _SideEffect:
+    __slots__ = ('fn',)
+
+    def __init__(self, fn: Callable[[], None]):
+        self.fn = fn
+
+
+_current_stream: contextvars.ContextVar[Optional['SpeculativeStream']] = contextvars.ContextVar(
+    'speculative_stream', default=None
+)
+
+
+def apply_side_effect(fn: Callable[[], None]) -> None:
+    """
+    执行生成过程中的副作用（写上下文元数据、暂存回复媒体、推送日志等）
+
+    在推测流中调用时不立即执行，按产出顺序排入缓冲，commit() 消费到时才执行；
+    推测被放弃则丢弃。非推测路径立即执行。
+    """
+    stream = _current_stream.get()
+    if stream is None:
+        fn()
+    elif not stream.abandoned:
+        stream._queue.put(_SideEffect(fn))
+
+
+class SpeculativeStream:
+    """
+    推测执行的流式输出
+
+    后台线程拉取生成器并缓冲；commit() 返回从头开始的完整输出迭代器（登记的副作用按顺序执行），
+    abandon() 取消推测流自己的令牌（Provider 随即关闭 HTTP 响应）并关闭生成器，已产生的输出与
+    副作用全部丢弃。本轮的取消令牌被触发时推测流一并取消。
+    """
+
+    def __init__(self, factory: Callable[[], Iterator[Any]], executor: Optional[ThreadPoolExecutor] = None):
+        self._queue: "queue.Queue" = queue.Queue()
+        self._abandoned = threading.Event()
+        self._token = CancellationToken()
+        parent = current_cancel_token()
+        self._unlink = parent.on_cancel(lambda: self._token.cancel(parent.reason or 'cancelled')) if parent else None
+        self.started = time.perf_counter()
+        self.first_chunk_ms: Optional[int] = None
+        (executor or get_stream_executor()).submit(contextvars.copy_context().run, self._pump, factory)
+
+    def _pump(self, factory: Callable[[], Iterator[Any]]) -> None:
+        gen = None
+        _current_stream.set(self)  # 在复制的上下文中设置，不影响提交方
+        try:
+            if self._abandoned.is_set():
+                return
+            with bind_cancel_token(self._token):
+                gen = factory()
+                for chunk in gen:
+                    if self._abandoned.is_set():
+                        break
+                    if self.first_chunk_ms is None:
+                        self.first_chunk_ms = int((time.perf_counter() - self.started) * 1000)
+                    self._queue.put(chunk)
+        except BaseException as e:
+            self._queue.put(e)
+        finally:
+            if gen is not None and self._abandoned.is_set():
+                try:
+                    gen.close()
+                except Exception:
+                    pass
+            if self._unlink is not None:
+                self._unlink()
+            self._queue.put(_DONE)
+
+    def commit(self) -> Iterator[Any]:
+        """采用推测结果：依次产出已缓冲与后续分片并执行登记的副作用；生成过程中的异常原样抛出"""
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _SideEffect):
+                item.fn()
+                continue
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def abandon(self) -> None:
+        """放弃推测结果：立即停止生成，已缓冲的输出与副作用不再执行"""
+        self._abandoned.set()
+        self._token.cancel('speculation_abandoned')
+
+    @property
+    def abandoned(self) -> bool:
+        return self._abandoned.is_set()
@@ -0,0 +1,177 @@
+"""
+分段 System Prompt
+
+原先 _build_system_prompt 把人设、能力描述、技能、话题 SOP 与「已有 N 条对话记录」拼成一个字符串，
+历史条数每条消息都变，提示词前缀永远不一致，Provider 侧的前缀缓存（Anthropic cache_control、
+OpenAI / DeepSeek 自动前缀缓存、Gemini 隐式缓存）无法命中。
+
+这里把提示词拆成段:
+- 稳定段（人设、能力、SOP、技能）排在前面，易变段（历史提示、工具提示）统一排到末尾
+- 每段按内容哈希记忆：相同内容的稳定前缀复用同一个字符串与 prefix_hash
+- render() 返回 PromptLayout，记录缓存断点（字符偏移），由 Provider 转换为各自的缓存标记
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Tuple
+
+SEPARATOR = "\n\n"
+
+# 记忆的稳定前缀 / 渲染块数量上限
+_MEMO_SIZE = 256
+
+
+@lru_cache(maxsize=1024)
+def block_digest(text: str) -> str:
+    """段内容哈希（按内容记忆）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class PromptSegment:
+    """提示词段"""
+    name: str
+    text: str
+    stable: bool = True
+    breakpoint: bool = False  # 该段之后设置缓存断点（稳定前缀末尾总是断点）
+
+    @property
+    def digest(self) -> str:
+        return block_digest(self.text)
+
+
+@dataclass(frozen=True)
+class PromptLayout:
+    """渲染结果：完整文本 + 缓存断点"""
+    text: str
+    breakpoints: Tuple[int, ...] = ()
+    prefix_hash: Optional[str] = None
+    segments: Tuple[str, ...] = field(default_factory=tuple)
+
+    @property
+    def stable_length(self) -> int:
+        return self.breakpoints[-1] if self.breakpoints else 0
+
+    def cache_hints(self, content: str) -> Optional[List[int]]:
+        """
+        content 仍以本布局的稳定前缀开头时返回断点列表（调用方可能在末尾追加内容），否则 None
+        """
+        if not self.breakpoints or not content.startswith(self.text[:self.stable_length]):
+            return None
+        return list(self.breakpoints)
+
+
+class _Memo:
+    """按键记忆的小型 LRU（线程安全）"""
+
+    def __init__(self, size: int = _MEMO_SIZE):
+        self._size = size
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_make(self, key, make: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        value = make()
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > self._size:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+_prefix_memo = _Memo()
+_block_memo = _Memo()
+
+
+def memo_block(name: str, source: Any, render: Callable[[], str]) -> str:
+    """
+    按源数据内容哈希记忆渲染结果（如 SOP 行 → SOP 文本）
+
+    Args:
+        name: 块名（区分不同渲染函数）
+        source: 渲染所依赖的数据（需可 JSON 序列化）
+        render: 渲染函数
+    """
+    raw = json.dumps(source, ensure_ascii=False, sort_keys=True, default=str)
+    return _block_memo.get_or_make((name, block_digest(raw)), render)
+
+
+class SegmentedPrompt:
+    """
+    分段构建 system prompt
+
+    Example:
+        prompt = SegmentedPrompt()
+        prompt.add("persona", persona)
+        prompt.add("capabilities", cap_desc, breakpoint=True)
+        prompt.add("history_hint", hint, stable=False)
+        layout = prompt.render()
+        layout.text, layout.breakpoints, layout.prefix_hash
+    """
+
+    def __init__(self):
+        self._segments: List[PromptSegment] = []
+
+    def add(self, name: str, text: Optional[str], stable: bool = True, breakpoint: bool = False) -> None:
+        """追加一段（空内容忽略）"""
+        if text:
+            self._segments.append(PromptSegment(name, text, stable, breakpoint))
+
+    @property
+    def segments(self) -> List[PromptSegment]:
+        return list(self._segments)
+
+    def render(self) -> PromptLayout:
+        """稳定段在前、易变段在后拼接；稳定段各自保持添加顺序"""
+        stable = [s for s in self._segments if s.stable]
+        volatile = [s for s in self._segments if not s.stable]
+
+        prefix, breakpoints, prefix_hash = self._render_prefix(stable)
+        tail = SEPARATOR.join(s.text for s in volatile)
+        if prefix and tail:
+            text = prefix + SEPARATOR + tail
+        else:
+            text = prefix or tail
+        return PromptLayout(
+            text=text,
+            breakpoints=breakpoints,
+            prefix_hash=prefix_hash,
+            segments=tuple(s.name for s in stable + volatile),
+        )
+
+    @staticmethod
+    def _render_prefix(stable: List[PromptSegment]) -> Tuple[str, Tuple[int, ...], Optional[str]]:
+        if not stable:
+            return "", (), None
+        key = tuple((s.digest, s.breakpoint) for s in stable)
+
+        def _make():
+            parts: List[str] = []
+            offsets: List[int] = []
+            length = 0
+            for i, seg in enumerate(stable):
+                if i:
+                    parts.append(SEPARATOR)
+                    length += len(SEPARATOR)
+                parts.append(seg.text)
+                length += len(seg.text)
+                if seg.breakpoint or i == len(stable) - 1:
+                    offsets.append(length)
+            prefix = "".join(parts)
+            return prefix, tuple(offsets), block_digest(prefix)
+
+        return _prefix_memo.get_or_make(key, _make)
+
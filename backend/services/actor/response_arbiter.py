@@ -0,0 +1,251 @@
+"""
+群聊响应决策的本地预筛
+
+多人话题中每个 Agent 收到用户消息后都会调用 get_topic（查库）并多半再发起一次决策 LLM 调用
+（reply / like / silent / delegate），5 个 Agent 的话题里一条用户消息要先付 5 次决策调用才有人开口。
+
+这里在 LLM 决策前加一层本地判定:
+- @ / 点名、关键词与 ActorState.agent_abilities 的重合度打分（不调用 LLM）
+- 话题级协调：同一条消息的候选排名只计算一次，只有排名前 TOP_K 的 Agent 升级为 LLM 决策，其余直接沉默
+- 决策缓存：同一 Agent 在同一话题对相同内容的 LLM 决策在 DECISION_TTL 内复用
+- session_type 短时缓存，替代每条消息一次的 get_topic
+- 按话题统计决策耗时与 LLM 调用次数（/api/actor-pool/decisions）
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from services.cache import LRUCache
+
+# 每条消息最多升级为 LLM 决策的 Agent 数
+TOP_K = 2
+
+# 点名 / 提及的得分（高于任何关键词得分）
+MENTION_SCORE = 100.0
+NAME_SCORE = 50.0
+
+# LLM 决策缓存时间（秒）
+DECISION_TTL = 600
+
+# session_type 缓存时间（秒）；切换话题类型后最多延迟这么久生效
+SESSION_TYPE_TTL = 60
+
+_ASCII_WORD = re.compile(r"[a-z0-9][a-z0-9_+#.-]+")
+_CJK_RUN = re.compile(r"[一-鿿]+")
+
+# 过于常见、不区分能力的词
+_STOP_TERMS = frozenset((
+    "你是", "一个", "助手", "我们", "你们", "他们", "可以", "什么", "怎么", "如何", "这个", "那个",
+    "the", "and", "you", "are", "for", "with", "what", "how",
+))
+
+
+def extract_terms(text: str) -> Set[str]:
+    """切分关键词：英文单词（≥2 字符）+ 中文二元组"""
+    if not text:
+        return set()
+    t = text.lower()
+    terms = set(_ASCII_WORD.findall(t))
+    for run in _CJK_RUN.findall(t):
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms - _STOP_TERMS
+
+
+def score_agent(
+    agent_id: str,
+    name: str,
+    ability: str,
+    content: str,
+    mentions: Sequence[str],
+    content_terms: Optional[Set[str]] = None,
+) -> Tuple[float, str]:
+    """
+    本地相关度打分
+
+    Returns:
+        (score, reason)；score 为 0 表示与该 Agent 无关
+    """
+    if agent_id in mentions:
+        return MENTION_SCORE, "被 @ 提及"
+    if name and content:
+        if f"@{name}" in content:
+            return MENTION_SCORE, "被 @ 点名"
+        if len(name) >= 2 and name in content:
+            return NAME_SCORE, "消息中提到名字"
+    ability_terms = extract_terms(ability)
+    if not ability_terms:
+        return 0.0, "无能力描述"
+    if content_terms is None:
+        content_terms = extract_terms(content)
+    hits = ability_terms & content_terms
+    if not hits:
+        return 0.0, "能力不相关"
+    # 长描述天然重合多，按描述规模开方归一
+    return round(10.0 * len(hits) / math.sqrt(len(ability_terms)), 3), f"能力匹配 {len(hits)} 个关键词"
+
+
+def _rotation(message_id: str, agent_id: str) -> str:
+    """无人匹配时的轮换顺序（同一消息各 Actor 结果一致，不同消息分散到不同 Agent）"""
+    return hashlib.md5(f"{message_id}:{agent_id}".encode("utf-8")).hexdigest()
+
+
+class ResponseArbiter:
+    """
+    话题级响应决策协调（进程内单例，同一话题的多个 Actor 共享）
+
+    Example:
+        arbiter = get_response_arbiter()
+        shortlist = arbiter.shortlist(topic_id, message_id, content, mentions, agents)
+        if self.agent_id not in shortlist:
+            return ResponseDecision.silent(...)
+    """
+
+    def __init__(self, top_k: int = TOP_K, decision_ttl: float = DECISION_TTL):
+        self.top_k = top_k
+        self._rankings: LRUCache = LRUCache(maxsize=512, ttl=300)
+        self._decisions: LRUCache = LRUCache(maxsize=2048, ttl=decision_ttl)
+        self._session_types: LRUCache = LRUCache(maxsize=1024, ttl=SESSION_TYPE_TTL)
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    # ==================== 话题类型 ====================
+
+    def session_type(self, topic_id: str, loader: Callable[[], Optional[str]]) -> Optional[str]:
+        """短时缓存的 session_type；loader 仅在未命中时调用"""
+        cached = self._session_types.get(topic_id)
+        if cached is not None:
+            return cached or None
+        value = loader()
+        self._session_types.set(topic_id, value or "")
+        return value
+
+    def forget_topic(self, topic_id: str) -> None:
+        self._session_types.delete(topic_id)
+
+    # ==================== 候选排名 ====================
+
+    def rank(
+        self,
+        topic_id: str,
+        message_id: str,
+        content: str,
+        mentions: Sequence[str],
+        agents: Dict[str, Tuple[str, str]],
+    ) -> List[Tuple[str, float, str]]:
+        """
+        对话题内所有 Agent 打分排序（同一条消息只计算一次）
+
+        Args:
+            agents: agent_id -> (name, ability)
+
+        Returns:
+            [(agent_id, score, reason), ...]，按得分降序；同分按消息轮换顺序
+        """
+        key = f"{topic_id}:{message_id}"
+        with self._lock:
+            ranking = self._rankings.get(key) if message_id else None
+            if ranking is not None:
+                return ranking
+            content_terms = extract_terms(content)
+            scored = []
+            for aid, (name, ability) in agents.items():
+                score, reason = score_agent(aid, name, ability, content, mentions, content_terms)
+                scored.append((aid, score, reason))
+            scored.sort(key=lambda s: (-s[1], _rotation(message_id or content, s[0])))
+            if message_id:
+                self._rankings.set(key, scored)
+            return scored
+
+    def shortlist(
+        self,
+        topic_id: str,
+        message_id: str,
+        content: str,
+        mentions: Sequence[str],
+        agents: Dict[str, Tuple[str, str]],
+        include_unmatched: bool = True,
+    ) -> List[str]:
+        """
+        升级为 LLM 决策的候选 Agent
+
+        Args:
+            include_unmatched: 无人匹配时是否仍按轮换顺序取前 top_k（问题类消息需要有人回答）
+        """
+        ranking = self.rank(topic_id, message_id, content, mentions, agents)
+        matched = [aid for aid, score, _ in ranking if score > 0]
+        if matched:
+            return matched[:self.top_k]
+        if include_unmatched:
+            return [aid for aid, _, _ in ranking[:self.top_k]]
+        return []
+
+    # ==================== 决策缓存 ====================
+
+    @staticmethod
+    def _decision_key(agent_id: str, topic_id: str, content: str, default_action: str) -> str:
+        digest = hashlib.sha1((content or "").strip().encode("utf-8")).hexdigest()[:16]
+        return f"{agent_id}:{topic_id}:{default_action}:{digest}"
+
+    def cached_decision(self, agent_id: str, topic_id: str, content: str, default_action: str) -> Optional[Any]:
+        return self._decisions.get(self._decision_key(agent_id, topic_id, content, default_action))
+
+    def remember_decision(self, agent_id: str, topic_id: str, content: str, default_action: str, decision: Any) -> None:
+        self._decisions.set(self._decision_key(agent_id, topic_id, content, default_action), decision)
+
+    # ==================== 统计 ====================
+
+    def record(self, topic_id: str, stage: str, elapsed_ms: float) -> None:
+        """
+        记录一次决策
+
+        Args:
+            stage: local（本地判定）/ cache（命中决策缓存）/ llm（调用了决策 LLM）
+        """
+        with self._lock:
+            s = self._stats.setdefault(topic_id or "", {
+                "decisions": 0, "local": 0, "cache": 0, "llm_calls": 0,
+                "latency_ms_total": 0.0, "llm_latency_ms_total": 0.0, "latency_ms_max": 0.0,
+            })
+            s["decisions"] += 1
+            s["llm_calls" if stage == "llm" else stage] += 1
+            s["latency_ms_total"] += elapsed_ms
+            s["latency_ms_max"] = max(s["latency_ms_max"], elapsed_ms)
+            if stage == "llm":
+                s["llm_latency_ms_total"] += elapsed_ms
+
+    def stats(self, topic_id: Optional[str] = None) -> Dict[str, Any]:
+        """按话题统计：决策数、本地 / 缓存 / LLM 各自次数、平均与最大耗时"""
+        with self._lock:
+            items = {k: dict(v) for k, v in self._stats.items() if topic_id is None or k == topic_id}
+        out = {}
+        for tid, s in items.items():
+            n = s["decisions"] or 1
+            out[tid] = {
+                "decisions": s["decisions"],
+                "local": s["local"],
+                "cache_hits": s["cache"],
+                "llm_calls": s["llm_calls"],
+                "avg_latency_ms": round(s["latency_ms_total"] / n, 2),
+                "avg_llm_latency_ms": round(s["llm_latency_ms_total"] / (s["llm_calls"] or 1), 2),
+                "max_latency_ms": round(s["latency_ms_max"], 2),
+            }
+        return out
+
+
+_arbiter: Optional[ResponseArbiter] = None
+_init_lock = threading.Lock()
+
+
+def get_response_arbiter() -> ResponseArbiter:
+    """获取全局响应决策协调器"""
+    global _arbiter
+    if _arbiter is None:
+        with _init_lock:
+            if _arbiter is None:
+                _arbiter = ResponseArbiter()
+    return _arbiter
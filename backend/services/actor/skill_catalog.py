@@ -0,0 +1,256 @@
+"""
+技能包目录与关键词匹配
+
+原先每个 Actor 激活 / 重载配置时都要查 MySQL 重新加载已分配的技能包（_load_skill_packs /
+_load_single_skill），find_skill_by_keyword 对每条消息逐个技能、逐个关键词做子串查找。
+
+SkillCatalog: 所有 Actor 共享的技能包目录
+- 技能包行（ENTITY_SKILL_PACK）与 Agent 的分配列表（ENTITY_AGENT_SKILLS）走 RepositoryCache，
+  版本化、L1 进程内 + L2 Redis，跨 Actor / 进程共享
+- 缓存的是解析后的条目（process_steps 已反序列化、触发词已规范化），同一版本只解析一次
+- 技能包增删改 / 分配 / 取消分配的路由调用 invalidate_skill_pack / invalidate_skill_assignments
+
+KeywordMatcher: Aho-Corasick 多模式匹配，每个 Agent 的 CapabilityRegistry 在技能变化后编译一次，
+匹配耗时只与消息长度（及命中数）相关，与技能 / 关键词数量无关。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from services.repository_cache import (
+    ENTITY_AGENT_SKILLS,
+    ENTITY_SKILL_PACK,
+    RepositoryCache,
+    get_repository_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 关键词自动机（大小写不敏感）
+
+    每个关键词带一个整数 payload（如技能注册顺序）；first() 返回文本中命中的最小 payload，
+    与「按顺序逐个检查、返回第一个命中」的语义一致。
+    """
+
+    __slots__ = ('_goto', '_fail', '_out', 'size')
+
+    def __init__(self, patterns: Iterable[Tuple[str, int]]):
+        """
+        Args:
+            patterns: (关键词, payload) 列表；空关键词忽略
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[Optional[int]] = [None]  # 该状态（含 fail 链）可输出的最小 payload
+        self.size = 0
+        for keyword, payload in patterns:
+            keyword = (keyword or '').lower()
+            if not keyword:
+                continue
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._out.append(None)
+                state = nxt
+            if self._out[state] is None or payload < self._out[state]:
+                self._out[state] = payload
+            self.size += 1
+        self._fail: List[int] = [0] * len(self._goto)
+        self._build()
+
+    def _build(self) -> None:
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                # 合并 fail 链上的输出（BFS 保证 fail 目标已处理）
+                inherited = out[fail[nxt]]
+                if inherited is not None and (out[nxt] is None or inherited < out[nxt]):
+                    out[nxt] = inherited
+
+    def first(self, text: str) -> Optional[int]:
+        """返回文本中命中关键词的最小 payload；无命中返回 None"""
+        if not text or not self.size:
+            return None
+        goto, fail, out = self._goto, self._fail, self._out
+        best: Optional[int] = None
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            hit = out[state]
+            if hit is not None and (best is None or hit < best):
+                best = hit
+                if best == 0:
+                    break
+        return best
+
+
+def _parse_json(value: Any, default: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8', errors='replace')
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except Exception:
+            return default
+    return default if value is None else value
+
+
+def normalize_skill_pack_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    skill_packs 行 → 目录条目
+
+    process_steps 反序列化为列表；触发词取 ext.trigger_keywords（字符串或列表）。
+    """
+    steps = _parse_json(row.get('process_steps'), [])
+    ext = _parse_json(row.get('ext'), {})
+    keywords = ext.get('trigger_keywords') if isinstance(ext, dict) else None
+    if isinstance(keywords, str):
+        keywords = [k.strip() for k in keywords.replace('，', ',').split(',')]
+    return {
+        'skill_pack_id': row.get('skill_pack_id'),
+        'name': row.get('name') or '',
+        'summary': row.get('summary') or '',
+        'process_steps': steps if isinstance(steps, list) else [],
+        'trigger_keywords': [k for k in (keywords or []) if isinstance(k, str) and k],
+    }
+
+
+def _fetch_skill_pack(skill_pack_id: str) -> Optional[Dict[str, Any]]:
+    from database import get_mysql_connection
+
+    conn = get_mysql_connection()
+    if not conn:
+        return None
+    try:
+        import pymysql
+
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute(
+            """
+            SELECT skill_pack_id, name, summary, process_steps, ext
+            FROM skill_packs WHERE skill_pack_id = %s
+            """,
+            (skill_pack_id,),
+        )
+        row = cursor.fetchone()
+        cursor.close()
+        return normalize_skill_pack_row(row) if row else None
+    except Exception as e:
+        logger.error(f"[SkillCatalog] Error loading skill pack {skill_pack_id}: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def _fetch_assignments(agent_id: str) -> Optional[List[str]]:
+    from database import get_mysql_connection
+
+    conn = get_mysql_connection()
+    if not conn:
+        return None
+    try:
+        import pymysql
+
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute(
+            """
+            SELECT skill_pack_id FROM skill_pack_assignments
+            WHERE target_session_id = %s
+            ORDER BY created_at DESC
+            """,
+            (agent_id,),
+        )
+        ids = [row['skill_pack_id'] for row in cursor.fetchall()]
+        cursor.close()
+        return ids
+    except Exception as e:
+        logger.error(f"[SkillCatalog] Error loading skill assignments for {agent_id}: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+class SkillCatalog:
+    """
+    共享技能包目录
+
+    Example:
+        catalog = get_skill_catalog()
+        for pack in catalog.get_agent_skill_packs(agent_id):
+            registry.register_skill(skill_id=pack['skill_pack_id'], ...)
+    """
+
+    def __init__(
+        self,
+        cache: Optional[RepositoryCache] = None,
+        fetch_skill_pack: Callable[[str], Optional[Dict[str, Any]]] = _fetch_skill_pack,
+        fetch_assignments: Callable[[str], Optional[List[str]]] = _fetch_assignments,
+    ):
+        """
+        Args:
+            cache: 版本化缓存（默认全局 RepositoryCache）
+            fetch_skill_pack: 回源读取单个技能包（返回目录条目）
+            fetch_assignments: 回源读取 Agent 已分配的技能包 ID（按分配时间倒序）
+        """
+        self._cache = cache
+        self._fetch_skill_pack = fetch_skill_pack
+        self._fetch_assignments = fetch_assignments
+
+    @property
+    def cache(self) -> RepositoryCache:
+        return self._cache or get_repository_cache()
+
+    def get_skill_pack(self, skill_pack_id: str) -> Optional[Dict[str, Any]]:
+        """单个技能包条目（不存在返回 None）"""
+        if not skill_pack_id:
+            return None
+        return self.cache.get_or_load(
+            ENTITY_SKILL_PACK, skill_pack_id, lambda: self._fetch_skill_pack(skill_pack_id)
+        )
+
+    def get_agent_skill_packs(self, agent_id: str) -> List[Dict[str, Any]]:
+        """Agent 已分配的技能包条目（按分配时间倒序；已删除的技能包跳过）"""
+        ids = self.cache.get_or_load(
+            ENTITY_AGENT_SKILLS, agent_id, lambda: self._fetch_assignments(agent_id)
+        ) or []
+        packs = []
+        for skill_pack_id in ids:
+            pack = self.get_skill_pack(skill_pack_id)
+            if pack:
+                packs.append(pack)
+        return packs
+
+
+_catalog: Optional[SkillCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_skill_catalog() -> SkillCatalog:
+    """获取全局技能包目录"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = SkillCatalog()
+    return _catalog
@@ -0,0 +1,360 @@
+"""
+内容寻址 Blob 存储
+
+将消息中的大字段（base64 媒体、MCP 原始结果、执行日志等）移出 MySQL 行，
+以 sha256 为文件名存放在 uploads/blobs/ab/cd/<sha256> 下：
+- 相同内容只存一份（去重）
+- 写入先落临时文件再原子 rename，并发写同一内容安全
+- 消息中只保留引用，按需通过 /api/blobs/<sha256> 懒加载（支持 Range）
+- 列表 / 历史读取（分页、Redis 缓存、Actor 历史）保持引用；只在载荷真正交给客户端
+  （单条消息接口）或 LLM（提示词构建、技能包总结）时经 hydrate_message / hydrate_media 还原
+
+引用格式:
+- 通用大字符串: {"$blob": "<sha256>", "size": 12345, "type": "text/plain; charset=utf-8"}
+- 媒体条目（ext.media / MCP content 中的 image/video/audio）:
+  去掉 data，补充 url=/api/blobs/<sha256>、blob=<sha256>、size
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+# 后端根目录（backend/）
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+BLOB_ROOT = BACKEND_ROOT / 'uploads' / 'blobs'
+
+# 超过该长度（字符数）的字段才会移入 Blob 存储
+OFFLOAD_THRESHOLD = 16 * 1024
+
+BLOB_URL_PREFIX = '/api/blobs/'
+
+TEXT_TYPE = 'text/plain; charset=utf-8'
+JSON_TYPE = 'application/json'
+
+_MEDIA_TYPES = frozenset(('image', 'video', 'audio'))
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+_DATA_URI_RE = re.compile(r'data:([\w.+-]+/[\w.+-]+);base64,([A-Za-z0-9+/=]+)')
+_BLOB_URL_RE = re.compile(re.escape(BLOB_URL_PREFIX) + r'([0-9a-f]{64})')
+
+
+def is_blob_ref(value: Any) -> bool:
+    """是否为 Blob 引用"""
+    return isinstance(value, dict) and isinstance(value.get('$blob'), str)
+
+
+def blob_url(digest: str) -> str:
+    return f"{BLOB_URL_PREFIX}{digest}"
+
+
+class BlobStore:
+    """
+    磁盘上的内容寻址存储
+
+    Example:
+        store = get_blob_store()
+        ref = store.put(b'...', 'image/png')
+        data = store.read_bytes(ref['$blob'])
+    """
+
+    def __init__(self, root: Union[str, Path] = BLOB_ROOT):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._stats = {'writes': 0, 'dedup': 0, 'bytes_written': 0, 'reads': 0, 'missing': 0}
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += n
+
+    def path_for(self, digest: str) -> Optional[Path]:
+        """返回 Blob 文件路径（digest 非法时返回 None，防止路径穿越）"""
+        if not isinstance(digest, str) or not _DIGEST_RE.match(digest):
+            return None
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def exists(self, digest: str) -> bool:
+        path = self.path_for(digest)
+        return bool(path and path.is_file())
+
+    def put(self, data: bytes, content_type: str = 'application/octet-stream') -> Dict[str, Any]:
+        """写入二进制内容，返回引用（内容已存在时直接复用）"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        ref = {'$blob': digest, 'size': len(data), 'type': content_type}
+
+        if path.is_file():
+            self._count('dedup')
+            return ref
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+        type_path = path.with_name(digest + '.type')
+        if not type_path.exists():
+            try:
+                type_path.write_text(content_type, encoding='utf-8')
+            except OSError:
+                pass
+
+        self._count('writes')
+        self._count('bytes_written', len(data))
+        return ref
+
+    def put_text(self, text: str, content_type: str = TEXT_TYPE) -> Dict[str, Any]:
+        return self.put(text.encode('utf-8'), content_type)
+
+    def read_bytes(self, digest: str) -> Optional[bytes]:
+        path = self.path_for(digest)
+        if not path or not path.is_file():
+            self._count('missing')
+            return None
+        self._count('reads')
+        return path.read_bytes()
+
+    def content_type(self, digest: str) -> str:
+        path = self.path_for(digest)
+        if path:
+            try:
+                return path.with_name(digest + '.type').read_text(encoding='utf-8').strip()
+            except OSError:
+                pass
+        return 'application/octet-stream'
+
+    def load(self, ref: Dict[str, Any]) -> Any:
+        """按引用读取内容：文本 / JSON 类型解码为 str，其余返回 bytes；缺失时返回 None"""
+        data = self.read_bytes(ref.get('$blob'))
+        if data is None:
+            return None
+        ctype = ref.get('type') or ''
+        if ctype.startswith('text/') or ctype.startswith(JSON_TYPE):
+            return data.decode('utf-8', errors='replace')
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+_blob_store: Optional[BlobStore] = None
+_init_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """获取全局 Blob 存储实例"""
+    global _blob_store
+    if _blob_store is None:
+        with _init_lock:
+            if _blob_store is None:
+                _blob_store = BlobStore()
+    return _blob_store
+
+
+# ==================== 写入：大字段移出 ====================
+
+def _strip_data_uri(data: str) -> tuple:
+    """拆分 data URI，返回 (mime, base64)；非 data URI 时 mime 为 None"""
+    if data.startswith('data:') and ';base64,' in data[:200]:
+        header, b64 = data.split(',', 1)
+        return header[5:].split(';', 1)[0], b64
+    return None, data
+
+
+def _offload_media_item(item: Dict[str, Any], store: BlobStore, threshold: int) -> Dict[str, Any]:
+    data = item.get('data')
+    if not isinstance(data, str) or len(data) <= threshold:
+        return item
+    mime, b64 = _strip_data_uri(data)
+    try:
+        raw = base64.b64decode(b64, validate=False)
+    except (binascii.Error, ValueError):
+        # 不是合法 base64（可能是 URL 或纯文本），按普通字符串处理
+        return {**item, 'data': store.put_text(data)}
+    mime = item.get('mimeType') or item.get('mime_type') or mime or 'application/octet-stream'
+    ref = store.put(raw, mime)
+    out = {k: v for k, v in item.items() if k != 'data'}
+    out.update({'url': blob_url(ref['$blob']), 'blob': ref['$blob'], 'size': ref['size']})
+    if not out.get('mimeType') and not out.get('mime_type'):
+        out['mimeType'] = mime
+    return out
+
+
+def offload_payload(value: Any, threshold: int = OFFLOAD_THRESHOLD, store: Optional[BlobStore] = None) -> Any:
+    """
+    递归地将结构中的大字段移入 Blob 存储（返回新结构，不修改入参）
+
+    - 媒体条目（type 为 image/video/audio 且带 base64 data）→ url + blob
+    - 其他超过阈值的字符串 → {"$blob": ...}
+    """
+    store = store or get_blob_store()
+
+    def _walk(x: Any) -> Any:
+        if isinstance(x, str):
+            return store.put_text(x) if len(x) > threshold else x
+        if isinstance(x, dict):
+            if is_blob_ref(x):
+                return x
+            if x.get('type') in _MEDIA_TYPES and 'data' in x:
+                x = _offload_media_item(x, store, threshold)
+            return {k: _walk(v) for k, v in x.items()}
+        if isinstance(x, (list, tuple)):
+            return [_walk(v) for v in x]
+        return x
+
+    return _walk(value)
+
+
+def offload_content(content: Optional[str], threshold: int = OFFLOAD_THRESHOLD,
+                    store: Optional[BlobStore] = None) -> Optional[str]:
+    """将正文中内联的大 data URI（如 markdown 图片）替换为 /api/blobs/<sha256>"""
+    if not content or len(content) <= threshold or 'base64,' not in content:
+        return content
+    store = store or get_blob_store()
+
+    def _replace(m: re.Match) -> str:
+        b64 = m.group(2)
+        if len(b64) <= threshold:
+            return m.group(0)
+        try:
+            raw = base64.b64decode(b64, validate=False)
+        except (binascii.Error, ValueError):
+            return m.group(0)
+        return blob_url(store.put(raw, m.group(1))['$blob'])
+
+    return _DATA_URI_RE.sub(_replace, content)
+
+
+def offload_column(text: Optional[str], threshold: int = OFFLOAD_THRESHOLD,
+                   content_type: str = JSON_TYPE, store: Optional[BlobStore] = None) -> Optional[str]:
+    """整列移出：超过阈值的 LONGTEXT 值替换为引用 JSON（用于 message_executions.raw_result/logs）"""
+    if not isinstance(text, str) or len(text) <= threshold:
+        return text
+    store = store or get_blob_store()
+    return json.dumps(store.put_text(text, content_type))
+
+
+# ==================== 读取：按需还原 ====================
+
+def hydrate_column(text: Optional[str], store: Optional[BlobStore] = None) -> Optional[str]:
+    """offload_column 的逆操作"""
+    if not isinstance(text, str) or not text.startswith('{"$blob"'):
+        return text
+    try:
+        ref = json.loads(text)
+    except ValueError:
+        return text
+    if not is_blob_ref(ref):
+        return text
+    loaded = (store or get_blob_store()).load(ref)
+    return loaded if loaded is not None else text
+
+
+def hydrate_payload(value: Any, store: Optional[BlobStore] = None, media: bool = True) -> Any:
+    """
+    offload_payload 的逆操作（返回新结构）；Blob 丢失时保留引用
+
+    media=False 时只还原 {"$blob"} 文本引用，媒体条目保留 url / blob（纯文本用途无需 base64）
+    """
+    store = store or get_blob_store()
+
+    def _walk(x: Any) -> Any:
+        if isinstance(x, dict):
+            if is_blob_ref(x):
+                loaded = store.load(x)
+                if loaded is None:
+                    print(f"[BlobStore] Missing blob {x.get('$blob')}")
+                    return x
+                return loaded if isinstance(loaded, str) else base64.b64encode(loaded).decode('ascii')
+            out = {k: _walk(v) for k, v in x.items()}
+            if media and x.get('blob') and 'data' not in x and x.get('type') in _MEDIA_TYPES:
+                raw = store.read_bytes(x['blob'])
+                if raw is not None:
+                    # 还原为移出前的结构：data 内联，去掉移出时补充的 blob / url
+                    out['data'] = base64.b64encode(raw).decode('ascii')
+                    digest = out.pop('blob')
+                    if out.get('url') == blob_url(digest):
+                        del out['url']
+            return out
+        if isinstance(x, list):
+            return [_walk(v) for v in x]
+        return x
+
+    return _walk(value)
+
+
+def hydrate_media(media: Optional[list], store: Optional[BlobStore] = None) -> Optional[list]:
+    """还原媒体列表中的 base64 data（供需要内联数据的 LLM 调用使用）"""
+    if not isinstance(media, list) or not media:
+        return media
+    if not any(isinstance(m, dict) and m.get('blob') and 'data' not in m for m in media):
+        return media
+    return hydrate_payload(media, store)
+
+
+def hydrate_content(content: Optional[str], store: Optional[BlobStore] = None) -> Optional[str]:
+    """offload_content 的逆操作：正文中的 /api/blobs/<sha256> 还原为 data URI；Blob 丢失时保留地址"""
+    if not isinstance(content, str) or BLOB_URL_PREFIX not in content:
+        return content
+    store = store or get_blob_store()
+
+    def _replace(m: re.Match) -> str:
+        raw = store.read_bytes(m.group(1))
+        if raw is None:
+            return m.group(0)
+        return f"data:{store.content_type(m.group(1))};base64,{base64.b64encode(raw).decode('ascii')}"
+
+    return _BLOB_URL_RE.sub(_replace, content)
+
+
+def _hydrate_json_field(value: Any, store: BlobStore, media: bool) -> Any:
+    if isinstance(value, str):
+        # 未解析的 JSON 列：只有含引用时才解析、还原后重新序列化
+        if '"$blob"' not in value and '"blob"' not in value:
+            return value
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            return value
+        if is_blob_ref(parsed):  # offload_column 整列移出
+            return hydrate_column(value, store)
+        return json.dumps(hydrate_payload(parsed, store, media), ensure_ascii=False)
+    if isinstance(value, (dict, list)):
+        return hydrate_payload(value, store, media)
+    return value
+
+
+def hydrate_message(message: Optional[Dict[str, Any]], store: Optional[BlobStore] = None,
+                    media: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    还原单条消息（就地修改并返回）；只用于交给客户端或 LLM 的载荷，列表与历史读取保持引用
+
+    content 中的 Blob 地址还原为 data URI，tool_calls / ext / mcpdetail 中的 {"$blob"} 引用与
+    媒体 url 还原为原始字符串 / base64 data。字段可以是已解析的对象，也可以是原始 JSON 文本。
+    media=False 时只还原文本引用，正文中的 Blob 地址与媒体条目保持原样。
+    """
+    if not isinstance(message, dict):
+        return message
+    store = store or get_blob_store()
+    if media and 'content' in message:
+        message['content'] = hydrate_content(message['content'], store)
+    for key in ('tool_calls', 'ext', 'mcpdetail'):
+        if message.get(key):
+            message[key] = _hydrate_json_field(message[key], store, media)
+    return message
@@ -0,0 +1,133 @@
+"""
+Discord 频道绑定索引
+
+回复转发监听原先 psubscribe("topic:*")，每个 Topic 的每条事件（含每个流式 chunk）都要解析绑定；
+旧缓存只记录命中，未绑定 Discord 的会话每个事件都会查一次 discord_channels。
+
+这里维护进程内的绑定索引:
+- 启动时一次性预加载全部绑定（linked_agent_id → channel_id）
+- 未命中的会话记入负缓存（negative_ttl 秒内不再查库）
+- 绑定 / 解绑 / 改绑后调用 DiscordService.notify_bindings_changed()：本进程立即重载，
+  并通过 Redis 频道 discord:bindings 通知其他进程重载
+- version 在每次变化时递增，监听线程据此只订阅已绑定会话的 topic:{session_id} 频道
+"""
+
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional, Set
+
+_TAG = "[Discord]"
+
+# 绑定变更通知频道
+BINDINGS_CHANNEL = "discord:bindings"
+
+# 本进程标识：收到自己发布的变更通知时不重复重载
+INSTANCE_ID = uuid.uuid4().hex[:12]
+
+
+class DiscordBindingIndex:
+    """
+    linked_agent_id(session_id) → Discord channel_id 索引（带负缓存）
+
+    Example:
+        index = DiscordBindingIndex(get_connection)
+        index.load()
+        channel_id = index.channel_for(session_id)  # 未绑定返回 None
+    """
+
+    def __init__(self, get_connection: Callable, negative_ttl: float = 300.0):
+        """
+        Args:
+            get_connection: 获取 MySQL 连接的函数
+            negative_ttl: 未绑定结果的缓存时间（秒）；绑定变更会立即清空负缓存，这里只是兜底
+        """
+        self._get_connection = get_connection
+        self.negative_ttl = negative_ttl
+        self._by_session: Dict[str, str] = {}
+        self._negative: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._loaded = False
+
+    def _repo(self):
+        from models.discord_channel import DiscordChannelRepository
+
+        return DiscordChannelRepository(self._get_connection)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def load(self) -> int:
+        """从数据库重载全部绑定；返回绑定会话数"""
+        by_session: Dict[str, str] = {}
+        # list_all 按 updated_at 倒序：同一会话绑定多个频道时保留最近更新的（与 find_by_linked_agent_id 命中一致）
+        for dc in self._repo().list_all():
+            by_session.setdefault(dc.linked_agent_id or dc.session_id, dc.channel_id)
+        with self._lock:
+            changed = by_session != self._by_session
+            self._by_session = by_session
+            self._negative.clear()
+            self._loaded = True
+            if changed:
+                self._version += 1
+        return len(by_session)
+
+    def channel_for(self, session_id: str) -> Optional[str]:
+        """解析会话绑定的频道；未绑定返回 None（结果进入负缓存）"""
+        now = time.time()
+        with self._lock:
+            channel_id = self._by_session.get(session_id)
+            if channel_id:
+                return channel_id
+            expires = self._negative.get(session_id)
+            if expires is not None and expires > now:
+                return None
+
+        binding = self._repo().find_by_linked_agent_id(session_id)
+        with self._lock:
+            if binding:
+                self._negative.pop(session_id, None)
+                if self._by_session.get(session_id) != binding.channel_id:
+                    self._by_session[session_id] = binding.channel_id
+                    self._version += 1
+                return binding.channel_id
+            self._negative[session_id] = now + self.negative_ttl
+            return None
+
+    def put(self, session_id: str, channel_id: str) -> None:
+        """登记新绑定（本进程刚创建的绑定，无需等待重载）"""
+        with self._lock:
+            self._negative.pop(session_id, None)
+            if self._by_session.get(session_id) != channel_id:
+                self._by_session[session_id] = channel_id
+                self._version += 1
+
+    def sessions(self) -> Set[str]:
+        """已绑定的会话 ID（监听线程据此订阅）"""
+        with self._lock:
+            return set(self._by_session)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_session.clear()
+            self._negative.clear()
+            self._loaded = False
+            self._version += 1
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+
+def publish_bindings_changed() -> None:
+    """通知其他进程重载绑定索引（Redis 不可用时忽略）"""
+    try:
+        from database import get_redis_client
+
+        rc = get_redis_client()
+        if rc:
+            rc.publish(BINDINGS_CHANNEL, INSTANCE_ID)
+    except Exception as e:
+        print(f"{_TAG} 绑定变更通知失败: {e}")
@@ -0,0 +1,309 @@
+"""
+Discord 出站调度
+
+原先每次发送 / 编辑都单独 run_coroutine_threadsafe 并同步等待结果；流式回复原地编辑很快撞上
+Discord 的按路由限频（每频道约 5 次 / 5 秒），discord.py 内部随之休眠，监听线程整体卡住。
+
+这里把出站操作交给 Bot 事件循环上的调度器:
+- 每个频道一个 FIFO 队列 + 一个排空协程，保证同频道消息顺序
+- 令牌桶限频：频道桶（默认 5 次 / 5 秒）+ 全局桶（默认 50 次 / 秒），发请求前先等令牌，
+  遇到 429 时按 retry_after 冻结频道桶并重试
+- 编辑合并：同一条消息排队中的编辑只保留最新内容（流式 chunk 不会排成长队）
+- 分段批量：超长回复的多个分段作为一个操作入队，连续发送
+- 记录排队延迟（入队到开始执行），stats() 返回 p50 / p95 / max
+
+调用方（Redis 监听线程）只在需要 message_id 时等待结果，编辑与普通发送均不阻塞；
+等待超时后用 cancel() 撤销尚未发出请求的操作，避免超时的占位消息之后仍被发出。
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+_TAG = "[Discord]"
+
+# 最多保留的排队延迟样本数
+LATENCY_SAMPLES = 500
+
+
+class _Bucket:
+    """令牌桶（仅在 Bot 事件循环线程内使用）"""
+
+    def __init__(self, capacity: int, per: float):
+        self.capacity = float(capacity)
+        self.rate = capacity / per
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def delay(self) -> float:
+        """距离可取到一个令牌还需等待的秒数"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def block(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+@dataclass
+class _Op:
+    """出站操作：send（parts 依次发送）或 edit（content 可被后续编辑覆盖）"""
+
+    kind: str
+    channel_id: int
+    parts: List[str] = field(default_factory=list)
+    message_id: Optional[int] = None
+    content: str = ""
+    many: bool = False
+    # 已出队但尚未发出请求时由 cancel() 置位，发出请求前检查
+    cancelled: bool = False
+    issued: bool = False
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: concurrent.futures.Future = field(default_factory=concurrent.futures.Future)
+
+
+class _OpCancelled(Exception):
+    """操作在发出请求前被撤销"""
+
+
+class DiscordOutbound:
+    """
+    Discord 出站调度器
+
+    Example:
+        outbound = DiscordOutbound(lambda: svc.bot, lambda: svc._loop)
+        future = outbound.send(channel_id, "💭 思考中...")
+        try:
+            msg_id = future.result(timeout=15)
+        except concurrent.futures.TimeoutError:
+            outbound.cancel(future)                           # 撤销仍在排队 / 等待限频的发送
+        outbound.edit(channel_id, msg_id, accumulated)       # 不等待，排队中的编辑会合并
+        outbound.send_many(channel_id, parts)                 # 分段批量发送
+    """
+
+    def __init__(
+        self,
+        get_client: Callable[[], Any],
+        get_loop: Callable[[], Optional[asyncio.AbstractEventLoop]],
+        channel_rate: int = 5,
+        channel_per: float = 5.0,
+        global_rate: int = 50,
+        global_per: float = 1.0,
+    ):
+        self._get_client = get_client
+        self._get_loop = get_loop
+        self.channel_rate = channel_rate
+        self.channel_per = channel_per
+        self._global = _Bucket(global_rate, global_per)
+        self._buckets: Dict[int, _Bucket] = {}
+        self._queues: Dict[int, Deque[_Op]] = {}
+        self._pending_edits: Dict[Tuple[int, int], _Op] = {}
+        self._running: Dict[int, _Op] = {}
+        self._draining: set = set()
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._stats = {"sent": 0, "edited": 0, "coalesced": 0, "rate_limited": 0, "failed": 0}
+
+    # ━━━━━━━━━━━━━━━━ 入队（任意线程） ━━━━━━━━━━━━━━━━
+
+    def send(self, channel_id: int, text: str) -> concurrent.futures.Future:
+        """发送一条消息；future 结果为 message_id（失败为 None）"""
+        return self._enqueue(_Op("send", channel_id, parts=[(text or "...")[:2000]]))
+
+    def send_many(self, channel_id: int, parts: List[str]) -> concurrent.futures.Future:
+        """连续发送多个分段；future 结果为 message_id 列表"""
+        parts = [p[:2000] for p in parts if p]
+        if not parts:
+            future: concurrent.futures.Future = concurrent.futures.Future()
+            future.set_result([])
+            return future
+        return self._enqueue(_Op("send", channel_id, parts=parts, many=True))
+
+    def edit(self, channel_id: int, message_id: int, content: str) -> concurrent.futures.Future:
+        """编辑消息；同一消息排队中的编辑合并为最新内容，future 结果为是否成功"""
+        content = (content or "")[:2000]
+        key = (channel_id, message_id)
+        with self._lock:
+            pending = self._pending_edits.get(key)
+            if pending is not None:
+                pending.content = content
+                self._stats["coalesced"] += 1
+                return pending.future
+        op = _Op("edit", channel_id, message_id=message_id, content=content)
+        return self._enqueue(op)
+
+    def cancel(self, future: concurrent.futures.Future) -> bool:
+        """
+        撤销 future 对应的操作：仍在排队的直接移除；已出队但还在等待限频令牌的在发出请求前放弃。
+        请求已经发出的无法撤销，返回 False。撤销成功时 future 处于 cancelled 状态。
+        """
+        with self._lock:
+            for channel_id, queue in self._queues.items():
+                for op in queue:
+                    if op.future is future:
+                        queue.remove(op)
+                        if op.kind == "edit":
+                            self._pending_edits.pop((channel_id, op.message_id), None)
+                        future.cancel()
+                        return True
+            for op in self._running.values():
+                if op.future is future and not op.issued:
+                    op.cancelled = True
+                    return True
+        return False
+
+    def _enqueue(self, op: _Op) -> concurrent.futures.Future:
+        loop = self._get_loop()
+        if loop is None or loop.is_closed():
+            op.future.set_result(None if op.kind == "send" else False)
+            return op.future
+        with self._lock:
+            self._queues.setdefault(op.channel_id, deque()).append(op)
+            if op.kind == "edit":
+                self._pending_edits[(op.channel_id, op.message_id)] = op
+            start = op.channel_id not in self._draining
+            if start:
+                self._draining.add(op.channel_id)
+        if start:
+            asyncio.run_coroutine_threadsafe(self._drain(op.channel_id), loop)
+        return op.future
+
+    # ━━━━━━━━━━━━━━━━ 执行（Bot 事件循环） ━━━━━━━━━━━━━━━━
+
+    async def _drain(self, channel_id: int):
+        while True:
+            with self._lock:
+                queue = self._queues.get(channel_id)
+                if not queue:
+                    self._queues.pop(channel_id, None)
+                    self._draining.discard(channel_id)
+                    return
+                op = queue.popleft()
+                if op.kind == "edit":
+                    # 出队后不再合并：之后的编辑重新排队，保证最终内容被发出
+                    self._pending_edits.pop((channel_id, op.message_id), None)
+                self._running[channel_id] = op
+            self._latencies.append(time.monotonic() - op.enqueued_at)
+            try:
+                result = await self._execute(op)
+            except _OpCancelled:
+                op.future.cancel()
+                continue
+            except Exception as e:
+                print(f"{_TAG} 出站失败 (channel={channel_id}, {op.kind}): {e}")
+                self._stats["failed"] += 1
+                result = None if op.kind == "send" else False
+            finally:
+                with self._lock:
+                    self._running.pop(channel_id, None)
+            if not op.future.done():
+                op.future.set_result(result)
+
+    async def _execute(self, op: _Op):
+        channel = await self._resolve_channel(op.channel_id)
+        if channel is None:
+            return None if op.kind == "send" else False
+        if op.kind == "edit":
+            await self._call(op, lambda: self._edit(channel, op.message_id, op.content))
+            self._stats["edited"] += 1
+            return True
+        ids = []
+        for part in op.parts:
+            msg = await self._call(op, lambda part=part: channel.send(part))
+            ids.append(msg.id)
+            self._stats["sent"] += 1
+        return ids if op.many else ids[0]
+
+    @staticmethod
+    async def _edit(channel, message_id: int, content: str):
+        # PartialMessage 直接 PATCH，省去一次 fetch_message
+        if hasattr(channel, "get_partial_message"):
+            return await channel.get_partial_message(message_id).edit(content=content)
+        msg = await channel.fetch_message(message_id)
+        return await msg.edit(content=content)
+
+    async def _call(self, op: _Op, make_request: Callable, retries: int = 3):
+        """等待频道桶与全局桶的令牌后发出请求；429 时冻结频道桶并重试；操作已撤销时不再发出"""
+        channel_id = op.channel_id
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            bucket = self._buckets[channel_id] = _Bucket(self.channel_rate, self.channel_per)
+        for attempt in range(retries + 1):
+            while True:
+                wait = max(bucket.delay(), self._global.delay())
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            with self._lock:
+                if op.cancelled:
+                    raise _OpCancelled()
+                op.issued = True
+            bucket.take()
+            self._global.take()
+            try:
+                return await make_request()
+            except Exception as e:
+                if getattr(e, "status", None) != 429 or attempt >= retries:
+                    raise
+                self._stats["rate_limited"] += 1
+                retry_after = float(getattr(e, "retry_after", None) or self.channel_per)
+                bucket.block(retry_after)
+
+    async def _resolve_channel(self, channel_id: int):
+        client = self._get_client()
+        if not client or client.is_closed():
+            return None
+        channel = client.get_channel(channel_id)
+        if channel is None:
+            # get_channel 仅从缓存读取；fetch_channel 走 API
+            try:
+                channel = await client.fetch_channel(channel_id)
+            except Exception:
+                print(f"{_TAG} 频道 {channel_id} 不可达")
+                return None
+        return channel
+
+    # ━━━━━━━━━━━━━━━━ 统计 ━━━━━━━━━━━━━━━━
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = sum(len(q) for q in self._queues.values())
+        samples = sorted(self._latencies)
+
+        def _pct(p: float) -> Optional[float]:
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 1)
+
+        return {
+            **self._stats,
+            "queued": queued,
+            "latency_ms": {"p50": _pct(0.5), "p95": _pct(0.95), "max": _pct(1.0)},
+        }
+
+    def clear(self) -> None:
+        """停止 Bot 时丢弃未执行的操作"""
+        with self._lock:
+            ops = [op for q in self._queues.values() for op in q]
+            self._queues.clear()
+            self._pending_edits.clear()
+            for op in self._running.values():
+                op.cancelled = True
+            self._draining.clear()
+        for op in ops:
+            if not op.future.done():
+                op.future.set_result(None if op.kind == "send" else False)
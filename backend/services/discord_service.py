@@ -4,10 +4,11 @@ Discord Bot 服务：桥接 Discord ↔ Chaya Actor 管道
 设计原则：
   - Bot 只是消息桥接器，不含业务逻辑
   - 每个频道绑定到已有 Agent，共享该 Agent 消息历史
-  - 通过 Redis Pub/Sub 异步接收 Actor 回复
+  - 通过 Redis Pub/Sub 异步接收 Actor 回复（只订阅已绑定会话的 topic 频道）
 """
 
 import asyncio
+import concurrent.futures
 import json
 import os
 import hashlib
@@ -16,6 +17,14 @@ import time
 import traceback
 from typing import Optional, Callable, Dict
 
+from services.discord_outbound import DiscordOutbound
+from services.discord_bindings import (
+    BINDINGS_CHANNEL,
+    INSTANCE_ID,
+    DiscordBindingIndex,
+    publish_bindings_changed,
+)
+
 _TAG = "[Discord]"
 
 
@@ -44,8 +53,8 @@ class DiscordService:
         self._get_connection: Optional[Callable] = None
         self._session_id_prefix = "dc"
         self._max_len = 1900
-        # linked_agent_id(session_id) → channel_id 内存缓存（避免 Redis 回复时每次查 DB）
-        self._session_to_channel: Dict[str, str] = {}
+        # linked_agent_id(session_id) → channel_id 绑定索引（预加载 + 负缓存，避免 Redis 回复时查 DB）
+        self._bindings = DiscordBindingIndex(self._connection)
         # 上次启动失败原因（如 Token 无效），供状态接口返回、前端展示
         self._last_error: Optional[str] = None
         self._owner_agent_id: Optional[str] = None
@@ -55,6 +64,11 @@ class DiscordService:
         # 流式编辑节流：最少间隔（秒），避免触发 Discord 限频（5 次/5 秒）
         self._stream_edit_interval = 2.0
         self._stream_chunk_threshold = 1200
+        # 出站调度（频道 / 全局限频 + 编辑合并），在 Bot 事件循环上执行
+        self._outbound = DiscordOutbound(lambda: self.bot, lambda: self._loop)
+
+    def _connection(self):
+        return self._get_connection() if self._get_connection else None
 
     @classmethod
     def get_instance(cls) -> "DiscordService":
@@ -70,6 +84,15 @@ class DiscordService:
         self._get_connection = get_connection
         self._session_id_prefix = self._config.get("session_id_prefix") or "dc"
         self._max_len = int(self._config.get("max_response_length") or 1900)
+        out_cfg = self._config.get("outbound") or {}
+        self._outbound = DiscordOutbound(
+            lambda: self.bot,
+            lambda: self._loop,
+            channel_rate=int(out_cfg.get("channel_rate", 5)),
+            channel_per=float(out_cfg.get("channel_per_seconds", 5)),
+            global_rate=int(out_cfg.get("global_rate", 50)),
+            global_per=float(out_cfg.get("global_per_seconds", 1)),
+        )
 
     # ━━━━━━━━━━━━━━━━ Token 持久化（前端录入后写入，重启可不依赖 config） ━━━━━━━━━━━━━━━━
 
@@ -226,7 +249,8 @@ class DiscordService:
                 pass
         self.bot = None
         self._loop = None
-        self._session_to_channel.clear()
+        self._bindings.clear()
+        self._outbound.clear()
         with self._stream_lock:
             self._stream_state.clear()
         self._last_error = None
@@ -245,6 +269,7 @@ class DiscordService:
         out["username"] = str(self.bot.user)
         out["guilds"] = len(self.bot.guilds) if self.bot.guilds else 0
         out["owner_agent_id"] = self._owner_agent_id
+        out["outbound"] = self._outbound.stats()
         return out
 
     def get_owner_agent_id(self) -> Optional[str]:
@@ -253,18 +278,19 @@ class DiscordService:
     # ━━━━━━━━━━━━━━━━ 缓存 ━━━━━━━━━━━━━━━━
 
     def _warm_cache(self):
-        """启动时加载所有绑定到内存缓存"""
+        """启动时预加载所有绑定到索引"""
         try:
-            from models.discord_channel import DiscordChannelRepository
-
-            repo = DiscordChannelRepository(self._get_connection)
-            for dc in repo.list_all(enabled_only=True):
-                cache_key = dc.linked_agent_id or dc.session_id
-                self._session_to_channel[cache_key] = dc.channel_id
-            print(f"{_TAG} 缓存预热: {len(self._session_to_channel)} 个频道绑定")
+            count = self._bindings.load()
+            print(f"{_TAG} 缓存预热: {count} 个会话绑定")
         except Exception as e:
             print(f"{_TAG} 缓存预热失败: {e}")
 
+    def notify_bindings_changed(self):
+        """绑定 / 解绑 / 改绑后调用：本进程重载索引，并通知其他进程"""
+        if self._running:
+            self._warm_cache()
+        publish_bindings_changed()
+
     # ━━━━━━━━━━━━━━━━ 收消息 ━━━━━━━━━━━━━━━━
 
     async def _on_message(self, message):
@@ -316,7 +342,8 @@ class DiscordService:
                     return
                 # 更新缓存（按绑定 agent 维度）
                 cache_key = binding.linked_agent_id or binding.session_id
-                self._session_to_channel[cache_key] = channel_id
+                self._bindings.put(cache_key, channel_id)
+                publish_bindings_changed()
                 print(f"{_TAG} ✓ 新绑定 #{channel_name} → {cache_key}")
 
             if not binding.enabled:
@@ -428,8 +455,21 @@ class DiscordService:
 
     # ━━━━━━━━━━━━━━━━ Redis 响应监听 ━━━━━━━━━━━━━━━━
 
+    def _sync_subscriptions(self, ps, subscribed: set) -> None:
+        """按绑定索引增减 topic:{session_id} 订阅（仅在监听线程内调用，pubsub 非线程安全）"""
+        wanted = {f"topic:{sid}" for sid in self._bindings.sessions()}
+        added, removed = wanted - subscribed, subscribed - wanted
+        if added:
+            ps.subscribe(*added)
+        if removed:
+            ps.unsubscribe(*removed)
+        subscribed.clear()
+        subscribed.update(wanted)
+        if added or removed:
+            print(f"{_TAG} Redis 订阅更新: {len(wanted)} 个会话 (+{len(added)} -{len(removed)})")
+
     def _redis_listener(self):
-        """后台线程：订阅 topic:dc_*，将 assistant 回复转发到 Discord"""
+        """后台线程：订阅已绑定会话的 topic:{session_id}，将 assistant 回复转发到 Discord"""
         # 等 Bot ready
         for _ in range(30):
             if self.bot and self.bot.user:
@@ -445,22 +485,40 @@ class DiscordService:
             print(f"{_TAG} Redis 不可用，响应监听已禁用")
             return
 
-        # 现在 Discord 直接绑定已有 agent，会话 ID 不再限定 dc_* 前缀
-        pattern = "topic:*"
+        if not self._bindings.loaded:
+            self._warm_cache()
+
+        # 只订阅绑定变更频道 + 已绑定会话的 topic 频道，未绑定会话的事件不会到达本进程
         ps = rc.pubsub()
-        ps.psubscribe(pattern)
-        print(f"{_TAG} Redis 监听已启动 pattern={pattern}")
+        ps.subscribe(BINDINGS_CHANNEL)
+        subscribed: set = set()
+        version = None
+        print(f"{_TAG} Redis 监听已启动")
 
         while self._running:
             try:
+                if version != self._bindings.version:
+                    version = self._bindings.version
+                    self._sync_subscriptions(ps, subscribed)
+
                 raw = ps.get_message(ignore_subscribe_messages=True, timeout=1.0)
-                if not raw or raw.get("type") != "pmessage":
+                if not raw or raw.get("type") != "message":
                     continue
 
-                # channel → session_id
                 ch = raw.get("channel")
                 if isinstance(ch, bytes):
                     ch = ch.decode("utf-8")
+
+                # 其他进程的绑定变更：重载索引，下一轮同步订阅
+                if ch == BINDINGS_CHANNEL:
+                    origin = raw.get("data")
+                    if isinstance(origin, bytes):
+                        origin = origin.decode("utf-8")
+                    if origin != INSTANCE_ID:
+                        self._warm_cache()
+                    continue
+
+                # channel → session_id
                 if not ch or not ch.startswith("topic:"):
                     continue
                 session_id = ch.replace("topic:", "", 1)
@@ -544,7 +602,7 @@ class DiscordService:
                                     state["channel_id"],
                                     state["message_id"],
                                     accumulated[:2000],
-                                ):
+                                ) is not None:
                                     state["last_sent_len"] = min(len(accumulated), 2000)
                                     state["last_edit_time"] = now
                     continue
@@ -563,8 +621,9 @@ class DiscordService:
                             content[:2000] or "（无内容）",
                         )
                         if len(content) > 2000:
-                            for part in self._split(content[2000:], self._max_len):
-                                self._send(state["channel_id"], part)
+                            self._outbound.send_many(
+                                state["channel_id"], self._split(content[2000:], self._max_len)
+                            )
                     elif content:
                         self._relay_to_discord(session_id, content)
                     continue
@@ -586,7 +645,7 @@ class DiscordService:
                 time.sleep(2)
 
         try:
-            ps.punsubscribe(pattern)
+            ps.unsubscribe()
             ps.close()
         except Exception:
             pass
@@ -595,87 +654,46 @@ class DiscordService:
     # ━━━━━━━━━━━━━━━━ 发回 Discord ━━━━━━━━━━━━━━━━
 
     def _get_channel_id(self, session_id: str) -> Optional[int]:
-        """根据 linked_agent_id(session_id) 解析 Discord 频道 ID（带缓存）"""
-        channel_id_str = self._session_to_channel.get(session_id)
-        if not channel_id_str:
-            from models.discord_channel import DiscordChannelRepository
-
-            repo = DiscordChannelRepository(self._get_connection)
-            binding = repo.find_by_linked_agent_id(session_id)
-            if not binding:
-                return None
-            channel_id_str = binding.channel_id
-            self._session_to_channel[session_id] = channel_id_str
-        return int(channel_id_str)
+        """根据 linked_agent_id(session_id) 解析 Discord 频道 ID（绑定索引，未绑定结果负缓存）"""
+        channel_id_str = self._bindings.channel_for(session_id)
+        return int(channel_id_str) if channel_id_str else None
 
     def _send_and_return_message_id(self, channel_id: int, text: str) -> Optional[int]:
-        """发送一条消息并返回 Discord message_id（用于后续编辑），失败返回 None"""
-        if not self.bot or not self._loop or self.bot.is_closed():
-            return None
-
-        result = [None]
-
-        async def _do():
-            ch = self.bot.get_channel(channel_id)
-            if not ch:
-                try:
-                    ch = await self.bot.fetch_channel(channel_id)
-                except Exception:
-                    print(f"{_TAG} 频道 {channel_id} 不可达")
-                    return
-            msg = await ch.send((text or "...")[:2000])
-            result[0] = msg.id
+        """发送一条消息并返回 Discord message_id（用于后续编辑），失败返回 None
 
+        超时后撤销仍在排队 / 等待限频的发送，避免占位消息之后被发出、下一个 chunk 又发一条造成重复
+        """
+        future = self._outbound.send(channel_id, text)
         try:
-            fut = asyncio.run_coroutine_threadsafe(_do(), self._loop)
-            fut.result(timeout=15)
-            return result[0]
+            return future.result(timeout=15)
+        except concurrent.futures.TimeoutError:
+            if not self._outbound.cancel(future):
+                print(f"{_TAG} 发送超时且请求已发出，无法撤销 (channel={channel_id})")
+            else:
+                print(f"{_TAG} 发送超时，已撤销排队中的消息 (channel={channel_id})")
+            return None
         except Exception as e:
             print(f"{_TAG} 发送失败 (channel={channel_id}): {e}")
             return None
 
-    def _edit_message(self, channel_id: int, message_id: int, content: str) -> bool:
-        """线程安全地编辑 Discord 消息（单条消息最多 2000 字符）"""
-        if not self.bot or not self._loop or self.bot.is_closed():
-            return False
-        content = (content or "")[:2000]
-
-        async def _do():
-            ch = self.bot.get_channel(channel_id)
-            if not ch:
-                try:
-                    ch = await self.bot.fetch_channel(channel_id)
-                except Exception:
-                    return
-            msg = await ch.fetch_message(message_id)
-            await msg.edit(content=content)
+    def _edit_message(
+        self, channel_id: int, message_id: int, content: str
+    ) -> Optional[concurrent.futures.Future]:
+        """编辑 Discord 消息（排队不等待；同一消息排队中的编辑合并为最新内容）
 
-        try:
-            fut = asyncio.run_coroutine_threadsafe(_do(), self._loop)
-            fut.result(timeout=10)
-            return True
-        except Exception as e:
-            print(f"{_TAG} 编辑消息失败 (channel={channel_id}): {e}")
-            return False
+        Returns:
+            出站 future（结果为是否编辑成功）；Bot 未运行时 None
+        """
+        if not self.bot or not self._loop or self.bot.is_closed():
+            return None
+        return self._outbound.edit(channel_id, message_id, content)
 
     def _relay_to_discord(self, session_id: str, content: str):
         """将 Chaya 回复发送到对应 Discord 频道"""
-        # 先查缓存
-        channel_id_str = self._session_to_channel.get(session_id)
-        if not channel_id_str:
-            # 缓存未命中，查 DB
-            from models.discord_channel import DiscordChannelRepository
-
-            repo = DiscordChannelRepository(self._get_connection)
-            binding = repo.find_by_linked_agent_id(session_id)
-            if not binding:
-                return
-            channel_id_str = binding.channel_id
-            self._session_to_channel[session_id] = channel_id_str
-
-        channel_id = int(channel_id_str)
-        for chunk in self._split(content, self._max_len):
-            self._send(channel_id, chunk)
+        channel_id = self._get_channel_id(session_id)
+        if not channel_id:
+            return
+        self._outbound.send_many(channel_id, self._split(content, self._max_len))
 
     def _split(self, text: str, limit: int) -> list:
         """
@@ -683,59 +701,48 @@ class DiscordService:
         1. 优先在换行处切割
         2. 保持代码块 ``` 的完整性
         3. 回退到空格，最后强制截断
+
+        按偏移量在原文上查找，不再每段复制剩余文本
         """
         if not text or len(text) <= limit:
             return [text] if text else []
 
         chunks = []
-        rest = text
-        while rest:
-            if len(rest) <= limit:
-                chunks.append(rest)
+        n = len(text)
+        pos = 0
+        while pos < n:
+            if n - pos <= limit:
+                chunks.append(text[pos:])
                 break
+            end = pos + limit
 
-            # 如果当前段包含未闭合的代码块，尝试找到闭合位置
-            segment = rest[:limit]
-            # 统计 ``` 出现次数
-            fence_count = segment.count("```")
-            if fence_count % 2 == 1:
-                # 未闭合代码块：尝试往前找到最后一个 ``` 之前切割
-                last_fence = segment.rfind("```")
+            # 当前段包含未闭合的代码块：尝试在最后一个 ``` 之前切割
+            if text.count("```", pos, end) % 2 == 1:
+                last_fence = text.rfind("```", pos, end) - pos
                 if last_fence > limit // 4:
-                    cut = last_fence
-                    chunks.append(rest[:cut].rstrip())
-                    rest = rest[cut:].lstrip("\n")
+                    chunks.append(text[pos:pos + last_fence].rstrip())
+                    pos = self._skip_newlines(text, pos + last_fence)
                     continue
 
             # 正常切割：优先换行 → 空格 → 强制
-            cut = segment.rfind("\n")
+            cut = self._rfind(text, "\n", pos, end)
             if cut <= limit // 4:
-                cut = segment.rfind(" ")
+                cut = self._rfind(text, " ", pos, end)
             if cut <= limit // 4:
                 cut = limit
-            chunks.append(rest[:cut].rstrip())
-            rest = rest[cut:].lstrip("\n")
+            chunks.append(text[pos:pos + cut].rstrip())
+            pos = self._skip_newlines(text, pos + cut)
 
         return chunks
 
-    def _send(self, channel_id: int, text: str):
-        """线程安全地向 Discord 频道发送一条消息"""
-        if not self.bot or not self._loop or self.bot.is_closed():
-            return
-
-        async def _do():
-            ch = self.bot.get_channel(channel_id)
-            if not ch:
-                # get_channel 仅从缓存读取；fetch_channel 走 API
-                try:
-                    ch = await self.bot.fetch_channel(channel_id)
-                except Exception:
-                    print(f"{_TAG} 频道 {channel_id} 不可达")
-                    return
-            await ch.send(text[:2000])
+    @staticmethod
+    def _rfind(text: str, sub: str, start: int, end: int) -> int:
+        """在 text[start:end] 中反向查找，返回相对 start 的偏移（未找到为 -1）"""
+        i = text.rfind(sub, start, end)
+        return i - start if i >= 0 else -1
 
-        try:
-            fut = asyncio.run_coroutine_threadsafe(_do(), self._loop)
-            fut.result(timeout=15)
-        except Exception as e:
-            print(f"{_TAG} 发送失败 (channel={channel_id}): {e}")
+    @staticmethod
+    def _skip_newlines(text: str, pos: int) -> int:
+        while pos < len(text) and text[pos] == "\n":
+            pos += 1
+        return pos
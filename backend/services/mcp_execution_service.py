@@ -23,6 +23,7 @@ MCP 执行服务（供 AgentActor/接口复用）
 from __future__ import annotations
 
 import json
+import logging
 import re
 from datetime import datetime
 from typing import Any, Callable, Dict, List, Optional, Tuple
@@ -67,6 +68,10 @@ from services.mcp.llm_caller import (
     call_llm_api,
     call_llm_with_tools,
 )
+from utils.log_pipeline import get_category_logger, log_event, preview
+
+# 逐次调用的热路径日志（队列异步写出，见 utils/log_pipeline）
+_mcp_log = get_category_logger("mcp")
 
 
 # ==================== 参数生成辅助函数（两步法）====================
@@ -587,18 +592,18 @@ def generate_tool_arguments(
     required = tool_info.get('required', [])
     
     # 【性能优化】快速路径：简单参数场景跳过 LLM 调用
-    print(f"[ArgGen] tool={tool_name}, props={list(props.keys())}, required={required}")
+    log_event(_mcp_log, logging.DEBUG, "ArgGen", tool=tool_name, props=",".join(props.keys()), required=",".join(required))
     
     # 情况1：无参数工具，直接返回空字典
     if not props and not required:
-        print(f"[ArgGen] ⚡ 无参数工具，直接返回空字典")
+        log_event(_mcp_log, logging.DEBUG, "ArgGen 无参数工具，直接返回空字典", tool=tool_name)
         return {}
     
     # 情况2：工具名暗示无需复杂参数（check_*, get_status*, list_* 等）
     no_arg_patterns = ('check_', 'get_status', 'get_profile', 'get_login', 'list_', 'show_')
     tool_lower = tool_name.lower()
     if any(tool_lower.startswith(p) for p in no_arg_patterns) and not required:
-        print(f"[ArgGen] ⚡ 查询类工具无必需参数，跳过 LLM")
+        log_event(_mcp_log, logging.DEBUG, "ArgGen 查询类工具无必需参数，跳过 LLM", tool=tool_name)
         # 直接走规则匹配
         pass  # 继续往下走规则匹配逻辑
     
@@ -606,7 +611,7 @@ def generate_tool_arguments(
     elif not required and len(props) <= 2:
         simple_params = {'input', 'query', 'text', 'prompt', 'message', 'content', 'q', 'keyword'}
         if all(p.lower() in simple_params for p in props.keys()):
-            print(f"[ArgGen] ⚡ 简单可选参数，跳过 LLM")
+            log_event(_mcp_log, logging.DEBUG, "ArgGen 简单可选参数，跳过 LLM", tool=tool_name)
             # 填充简单参数
             args = {}
             for param in props.keys():
@@ -618,7 +623,7 @@ def generate_tool_arguments(
         # 如果提供了 LLM 配置和完整输入文本，使用 LLM 提取参数
         if llm_config and full_input_text:
             try:
-                print(f"[ArgGen] 🤖 复杂参数，使用 LLM 提取...")
+                log_event(_mcp_log, logging.DEBUG, "ArgGen 复杂参数，使用 LLM 提取", tool=tool_name)
                 llm_args = _extract_args_with_llm(
                     tool_name=tool_name,
                     tool_info=tool_info,
@@ -774,21 +779,8 @@ def execute_mcp_with_llm(
         "media": list[dict] | None,  # 提取的媒体数据
       }
     """
-    # ANSI 颜色码
-    CYAN = '\033[96m'
-    GREEN = '\033[92m'
-    YELLOW = '\033[93m'
-    RED = '\033[91m'
-    MAGENTA = '\033[95m'
-    BLUE = '\033[94m'
-    RESET = '\033[0m'
-    BOLD = '\033[1m'
-    
     import datetime
-    def _ts():
-        """返回当前时间戳字符串"""
-        return datetime.datetime.now().strftime("%H:%M:%S.%f")[:-3]
-    
+
     # 结构化执行日志列表（用于返回给调用方持久化）
     structured_logs: List[Dict[str, Any]] = []
     
@@ -817,11 +809,13 @@ def execute_mcp_with_llm(
             from services.topic_service import get_topic_service
             get_topic_service()._publish_event(topic_id, 'execution_log', log_data)
         except Exception as e:
-            print(f"{YELLOW}[MCP EXEC] 发送执行日志失败: {e}{RESET}")
+            log_event(_mcp_log, logging.WARNING, "发送执行日志失败", topic=topic_id, error=e)
     
-    print(f"{MAGENTA}{BOLD}[MCP EXEC] ========== execute_mcp_with_llm 开始 [{_ts()}] =========={RESET}")
-    print(f"{MAGENTA}[MCP EXEC] Server: {mcp_server_id}, LLM: {llm_config_id}{RESET}")
-    print(f"{MAGENTA}[MCP EXEC] Input 长度: {len(input_text) if input_text else 0} 字符{RESET}")
+    exec_started = datetime.datetime.now()
+    log_event(
+        _mcp_log, logging.INFO, "execute_mcp_with_llm 开始",
+        server=mcp_server_id, config_id=llm_config_id, input_chars=len(input_text or ""),
+    )
     
     _send_log("初始化 MCP 执行环境...", log_type='step')
     
@@ -940,7 +934,6 @@ def execute_mcp_with_llm(
                 log(f"复用已有 MCP session: {existing_session_id[:16]}...")
             
             # 2. 初始化 MCP 会话（仅当没有 session_id 时）
-            print(f"{CYAN}[MCP EXEC] [{_ts()}] Step 1: Initialize session...{RESET}")
             _send_log("初始化 MCP 会话...", log_type='step')
             if 'mcp-session-id' not in headers:
                 init_response = initialize_mcp_session(server_url, headers)
@@ -953,10 +946,9 @@ def execute_mcp_with_llm(
             else:
                 log(f"跳过 MCP 会话初始化，使用已有 session_id")
                 _send_log("复用已有会话", log_type='step')
-            print(f"{CYAN}[MCP EXEC] [{_ts()}] Step 1 完成{RESET}")
+            log_event(_mcp_log, logging.DEBUG, "Step 1 完成: initialize", server=mcp_server_id)
             
             # 3. 获取工具列表（性能优化：启用缓存，减少 MCP 调用）
-            print(f"{CYAN}[MCP EXEC] [{_ts()}] Step 2: tools/list...{RESET}")
             log("Step 2/3: tools/list")
             _send_log("获取可用工具列表...", log_type='step')
             # 优化：启用 60 秒缓存，工具列表不常变化
@@ -967,7 +959,7 @@ def execute_mcp_with_llm(
                 use_cache=True,  # 性能优化：启用缓存
                 auto_reconnect=True,
             )
-            print(f"{CYAN}[MCP EXEC] [{_ts()}] Step 2 完成{RESET}")
+            log_event(_mcp_log, logging.DEBUG, "Step 2 完成: tools/list", server=mcp_server_id)
             
             if not tools_response or 'result' not in tools_response:
                 # 获取失败时的调试信息
@@ -999,11 +991,13 @@ def execute_mcp_with_llm(
                 }
 
             log(f"获取到 {len(tools)} 个可用工具")
-            print(f"{GREEN}[MCP EXEC] ✅ 获取到 {len(tools)} 个工具{RESET}")
             # 详细日志：显示所有工具列表
             all_tool_names = [t.get('name', 'unnamed') for t in tools]
             log(f"  可用工具: {', '.join(all_tool_names)}")
-            print(f"{CYAN}[MCP EXEC] 所有工具: {', '.join(all_tool_names)}{RESET}")
+            log_event(
+                _mcp_log, logging.DEBUG, "获取到工具列表",
+                server=mcp_server_id, count=len(tools), tools=preview(", ".join(all_tool_names)),
+            )
             _send_log(f"获取到 {len(tools)} 个可用工具", log_type='step', detail=', '.join(all_tool_names[:5]) + ('...' if len(all_tool_names) > 5 else ''))
             
             # ==================== 【性能优化】简单意图直接映射（跳过 LLM 选择） ====================
@@ -1058,12 +1052,11 @@ def execute_mcp_with_llm(
             # 快速匹配可能导致误匹配，先禁用以确保准确性
             fast_matched_tool = None  # _try_fast_tool_match(effective_input, tools)
             if fast_matched_tool and not forced_tool_name:
-                print(f"{GREEN}[MCP EXEC] ⚡ 快速匹配成功: {fast_matched_tool['name']}（跳过 LLM 选择）{RESET}")
+                log_event(_mcp_log, logging.INFO, "快速匹配成功，跳过 LLM 选择", tool=fast_matched_tool['name'])
                 log(f"⚡ 快速匹配工具: {fast_matched_tool['name']}（跳过 LLM）")
                 _send_log(f"⚡ 快速匹配: {fast_matched_tool['name']}", log_type='tool', detail='跳过 LLM 选择')
                 
                 # 直接调用匹配的工具
-                print(f"{CYAN}[MCP EXEC] [{_ts()}] 快速路径 - MCP 工具调用开始: {fast_matched_tool['name']}{RESET}")
                 _send_log(f"正在执行工具: {fast_matched_tool['name']}...", log_type='tool')
                 fast_call_start = datetime.datetime.now()
                 fast_result = call_mcp_tool(
@@ -1074,7 +1067,10 @@ def execute_mcp_with_llm(
                     add_log=None,
                 )
                 fast_call_duration = int((datetime.datetime.now() - fast_call_start).total_seconds() * 1000)
-                print(f"{CYAN}[MCP EXEC] [{_ts()}] 快速路径 - MCP 工具调用完成: {fast_matched_tool['name']}{RESET}")
+                log_event(
+                    _mcp_log, logging.INFO, "快速路径 MCP 工具调用完成",
+                    tool=fast_matched_tool['name'], duration_ms=fast_call_duration,
+                )
                 _send_log(f"工具执行完成: {fast_matched_tool['name']}", log_type='tool', duration=fast_call_duration)
                 
                 if fast_result.get("success"):
@@ -1086,7 +1082,11 @@ def execute_mcp_with_llm(
                         "raw_result": fast_result.get("raw_result"),
                         "success": True,
                     }]
-                    print(f"{GREEN}[MCP EXEC] [{_ts()}] ========== execute_mcp_with_llm 结束（快速路径） =========={RESET}")
+                    log_event(
+                        _mcp_log, logging.INFO, "execute_mcp_with_llm 结束（快速路径）",
+                        server=mcp_server_id,
+                        duration_ms=int((datetime.datetime.now() - exec_started).total_seconds() * 1000),
+                    )
                     return {
                         "summary": summary,
                         "tool_text": tool_text,
@@ -1101,7 +1101,7 @@ def execute_mcp_with_llm(
                 else:
                     # 快速匹配失败，回退到正常流程
                     log(f"⚠️ 快速匹配工具调用失败，回退到 LLM 选择: {fast_result.get('error')}")
-                    print(f"{YELLOW}[MCP EXEC] ⚠️ 快速匹配失败，回退 LLM 流程{RESET}")
+                    log_event(_mcp_log, logging.WARNING, "快速匹配失败，回退 LLM 流程", error=fast_result.get('error'))
             
             # ==================== 直接调用指定工具（跳过 LLM 选择） ====================
             if forced_tool_name:
@@ -1272,8 +1272,6 @@ def execute_mcp_with_llm(
             
             system_prompt = "\n".join(system_prompt_parts)
             
-            print(f"{CYAN}[MCP EXEC] 系统提示词长度: {len(system_prompt)} 字符{RESET}")
-            
             # 用户消息：历史 + 当前请求 + 工具列表
             user_message_parts = []
             
@@ -1290,7 +1288,10 @@ def execute_mcp_with_llm(
             
             user_input_for_llm = "".join(user_message_parts)
             
-            print(f"{CYAN}[MCP EXEC] 用户消息长度: {len(user_input_for_llm)} 字符{RESET}")
+            log_event(
+                _mcp_log, logging.DEBUG, "工具选择提示词",
+                system_chars=len(system_prompt), user_chars=len(user_input_for_llm),
+            )
 
             # 让同一个 llm_config 决定 tool_calls（支持多轮“连续调用”）
             # 注意：不同模型对“严格输出 JSON”能力差异很大（尤其 Gemini/轻量模型）。
@@ -1385,7 +1386,7 @@ def execute_mcp_with_llm(
             
             if use_native_tool_calling:
                 log("Step 3/3: 工具选择与执行（原生 Tool Calling - 高性能）")
-                print(f"{GREEN}[MCP EXEC] 🚀 使用原生 Tool Calling（{provider_type}）{RESET}")
+                log_event(_mcp_log, logging.INFO, "使用原生 Tool Calling", provider=provider_type)
                 
                 # 构建 OpenAI 格式的工具列表
                 openai_tools = []
@@ -1430,7 +1431,7 @@ def execute_mcp_with_llm(
                 if native_result and native_result.get('tool_calls'):
                     tool_calls_from_native = native_result['tool_calls']
                     log(f"✅ 原生 Tool Calling 返回 {len(tool_calls_from_native)} 个工具调用")
-                    print(f"{GREEN}[MCP EXEC] ✅ 原生返回 {len(tool_calls_from_native)} 个工具调用{RESET}")
+                    log_event(_mcp_log, logging.INFO, "原生 Tool Calling 返回工具调用", count=len(tool_calls_from_native))
                     
                     # 解析工具调用
                     parsed_calls = []
@@ -1456,12 +1457,11 @@ def execute_mcp_with_llm(
                         for name, args in parsed_calls
                     ]
                     
-                    # 📋 打印每个工具的参数列表，方便调试
                     for name, args in parsed_calls:
-                        args_preview = json.dumps(args, ensure_ascii=False, indent=2)
-                        if len(args_preview) > 800:
-                            args_preview = args_preview[:800] + "\n... (参数过长，已截断)"
-                        print(f"{CYAN}[MCP EXEC] 工具 {name} 参数:\n{args_preview}{RESET}")
+                        log_event(
+                            _mcp_log, logging.DEBUG, "工具参数", sample="preview",
+                            tool=name, args=preview(args, 800),
+                        )
                         
                         # 发送到前端执行日志
                         args_summary = ", ".join([f"{k}={repr(v)[:50]}" for k, v in list(args.items())[:5]])
@@ -1480,7 +1480,7 @@ def execute_mcp_with_llm(
                         )
                     
                     log(f"🚀 并行执行 {len(mcp_tool_calls)} 个工具调用...")
-                    print(f"{CYAN}[MCP EXEC] 🚀 并行执行 {len(mcp_tool_calls)} 个工具{RESET}")
+                    log_event(_mcp_log, logging.INFO, "并行执行工具", count=len(mcp_tool_calls))
                     
                     parallel_results = execute_mcp_tools_parallel(
                         tool_calls=mcp_tool_calls,
@@ -1549,10 +1549,10 @@ def execute_mcp_with_llm(
                     # 原生 Tool Calling 没有返回工具调用，可能是不需要工具或失败
                     if native_result and native_result.get('content'):
                         log(f"⚠️ 原生 Tool Calling 返回文本而非工具调用，回退到两步法")
-                        print(f"{YELLOW}[MCP EXEC] ⚠️ 原生返回文本，回退两步法{RESET}")
+                        log_event(_mcp_log, logging.WARNING, "原生 Tool Calling 返回文本，回退两步法")
                     else:
                         log(f"⚠️ 原生 Tool Calling 失败，回退到两步法")
-                        print(f"{YELLOW}[MCP EXEC] ⚠️ 原生失败，回退两步法{RESET}")
+                        log_event(_mcp_log, logging.WARNING, "原生 Tool Calling 失败，回退两步法")
 
             # ==================== 两步法（兼容旧模型） ====================
             log("Step 3/3: 工具选择与执行（两步法 - 兼容模式）")
@@ -1779,7 +1779,6 @@ def execute_mcp_with_llm(
                     intent: Optional[str] = None
                     parse_err: Optional[str] = None
                     try:
-                        print(f"{YELLOW}[MCP EXEC] [{_ts()}] LLM 调用开始: {round_label}{RESET}")
                         log(f"{round_label}：使用LLM选择工具")
                         log(f"   LLM配置ID: {llm_config_id}")
                         log(f"   LLM配置内容: provider={llm_config.get('provider')}, model={llm_config.get('model')}, has_api_key={bool(llm_config.get('api_key'))}")
@@ -1794,7 +1793,7 @@ def execute_mcp_with_llm(
                         llm_call_start = datetime.datetime.now()
                         api_result = call_llm_api(llm_config, system_text, user_text, log)
                         llm_call_duration = int((datetime.datetime.now() - llm_call_start).total_seconds() * 1000)
-                        print(f"{YELLOW}[MCP EXEC] [{_ts()}] LLM 调用完成: {round_label}{RESET}")
+                        log_event(_mcp_log, logging.INFO, "工具选择 LLM 调用完成", round=round_label, duration_ms=llm_call_duration)
                         _send_log(f"LLM 选择完成", log_type='llm', duration=llm_call_duration)
 
                         if api_result is None:
@@ -1815,15 +1814,16 @@ def execute_mcp_with_llm(
                         parse_err = f"llm_call_failed: {type(e).__name__}: {str(e)}"
                         out_text = ""
 
-                    # 关键调试信息：输出预览 + 解析错误
-                    preview = (out_text or "").replace("\n", "\\n")[:600]
-                    print(f"{MAGENTA}[MCP EXEC] {round_label} LLM输出预览: {preview}{RESET}")
-                    print(f"{CYAN}[MCP EXEC] {round_label} LLM输出总长度: {len(out_text or '')} 字符{RESET}")
-                    print(f"{CYAN}[MCP EXEC] {round_label} 选择的工具: {tool_names}{RESET}")
-                    if intent:
-                        print(f"{CYAN}[MCP EXEC] {round_label} 用户意图: {intent}{RESET}")
-                    if parse_err:
-                        print(f"{YELLOW}[MCP EXEC] {round_label} 错误: {parse_err}{RESET}")
+                    # 关键调试信息：选择结果 + 解析错误；输出预览采样记录
+                    log_event(
+                        _mcp_log, logging.WARNING if parse_err else logging.INFO, "工具选择结果",
+                        round=round_label, tools=",".join(tool_names), intent=intent,
+                        output_chars=len(out_text or ""), error=parse_err,
+                    )
+                    log_event(
+                        _mcp_log, logging.DEBUG, "工具选择 LLM 输出", sample="preview",
+                        round=round_label, output=preview(out_text, 600),
+                    )
 
                     return tool_names, intent, out_text, parse_err
 
@@ -1927,7 +1927,6 @@ def execute_mcp_with_llm(
                     if not actual_user_request:
                         actual_user_request = effective_input  # 如果提取失败，使用原始输入
                     
-                    print(f"{YELLOW}[MCP EXEC] [{_ts()}] 参数生成开始: {tool_name_str}{RESET}")
                     _send_log(f"生成工具参数: {tool_name_str}...", log_type='step')
                     arg_gen_start = datetime.datetime.now()
                     tool_args = generate_tool_arguments(
@@ -1942,7 +1941,7 @@ def execute_mcp_with_llm(
                         add_log=None  # 不传递日志函数，减少输出
                     )
                     arg_gen_duration = int((datetime.datetime.now() - arg_gen_start).total_seconds() * 1000)
-                    print(f"{YELLOW}[MCP EXEC] [{_ts()}] 参数生成完成: {tool_name_str}{RESET}")
+                    log_event(_mcp_log, logging.INFO, "参数生成完成", tool=tool_name_str, duration_ms=arg_gen_duration)
                     _send_log(f"参数生成完成: {tool_name_str}", log_type='step', duration=arg_gen_duration)
                     
                     # 只记录关键信息，不输出详细参数
@@ -1999,13 +1998,10 @@ def execute_mcp_with_llm(
                     
                     try:
                         # 使用 mcp_common_logic 直接调用工具（不传递 log 以减少输出）
-                        print(f"{BLUE}[MCP EXEC] [{_ts()}] MCP 工具调用开始: {tool_name_str}{RESET}")
-                        
-                        # 📋 打印完整参数列表，方便调试
-                        args_preview = json.dumps(tool_args, ensure_ascii=False, indent=2)
-                        if len(args_preview) > 1000:
-                            args_preview = args_preview[:1000] + "\n... (参数过长，已截断)"
-                        print(f"{BLUE}[MCP EXEC] 工具参数:\n{args_preview}{RESET}")
+                        log_event(
+                            _mcp_log, logging.DEBUG, "工具参数", sample="preview",
+                            tool=tool_name_str, args=preview(tool_args, 1000),
+                        )
                         
                         # 发送到前端执行日志（包含参数摘要）
                         args_summary = ", ".join([f"{k}={repr(v)[:50]}" for k, v in list(tool_args.items())[:5]])
@@ -2016,7 +2012,7 @@ def execute_mcp_with_llm(
                         mcp_call_start = datetime.datetime.now()
                         tool_result = call_mcp_tool(server_url, headers, tool_name_str, tool_args, None)
                         mcp_call_duration = int((datetime.datetime.now() - mcp_call_start).total_seconds() * 1000)
-                        print(f"{BLUE}[MCP EXEC] [{_ts()}] MCP 工具调用完成: {tool_name_str}{RESET}")
+                        log_event(_mcp_log, logging.INFO, "MCP 工具调用完成", tool=tool_name_str, duration_ms=mcp_call_duration)
                         _send_log(f"工具调用完成: {tool_name_str}", log_type='tool', duration=mcp_call_duration)
                         
                         # 处理新的结构化返回格式
@@ -2256,8 +2252,6 @@ def execute_mcp_with_llm(
                 # 即使提取失败，也不影响整体流程
                 pass
 
-            print(f"{GREEN}[MCP EXEC] [{_ts()}] 结果处理完成，准备返回{RESET}")
-            
             tool_names = [r.get("tool") for r in results if r.get("tool")]
             tool_names_text = ", ".join(tool_names[:8]) + ("..." if len(tool_names) > 8 else "")
             summary = f'✅ MCP "{server_name}" 执行完成（{len(results)} 个工具调用：{tool_names_text}）'
@@ -2271,7 +2265,11 @@ def execute_mcp_with_llm(
                 "results": results,  # results[i].result 保留原始 MCP jsonrpc（含 base64 图片）
             }
 
-            print(f"{GREEN}[MCP EXEC] [{_ts()}] ========== execute_mcp_with_llm 结束 =========={RESET}")
+            log_event(
+                _mcp_log, logging.INFO, "execute_mcp_with_llm 结束",
+                server=mcp_server_id, tools=len(all_tool_calls),
+                duration_ms=int((datetime.datetime.now() - exec_started).total_seconds() * 1000),
+            )
             return {
                 "summary": summary,
                 "tool_text": "\n\n".join(tool_text_outputs).strip() if tool_text_outputs else None,
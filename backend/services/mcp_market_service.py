@@ -4,6 +4,8 @@ MCP Market Service
 - 管理 MCP 市场源（MarketSource）与条目（MarketItem）
 - 支持从 GitHub 仓库同步目录（zipball）
 - 提供搜索、详情、安装（落库到 mcp_servers）
+- 增量同步：页面级 ETag / Last-Modified / sitemap lastmod 跳过未变化页面，
+  线程池并发抓取（按 host 限流），executemany 批量落库，sync_cursor 支持中断续传
 
 说明：
 - 这是“聚合型市场层”的第一版实现，优先保证可用与可扩展。
@@ -12,16 +14,22 @@ MCP Market Service
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
 from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import hashlib
 import io
 import json
 import re
 import shlex
+import threading
 import time
 import zipfile
 
 import requests
+import requests.adapters
 
 
 DEFAULT_GITHUB_SOURCES: List[Dict[str, Any]] = [
@@ -53,7 +61,10 @@ DEFAULT_HTML_SOURCES: List[Dict[str, Any]] = [
             # 只抓 MCP 条目（中文路径优先；也可去掉 /zh）
             "include_prefixes": ["https://mcpdb.org/zh/mcps/"],
             "max_items": 300,
+            # 同一 host 相邻请求的最小间隔；workers 为抓取线程数，per_host_concurrency 为单 host 并发上限
             "request_delay_ms": 150,
+            "workers": 8,
+            "per_host_concurrency": 4,
         },
     },
     {
@@ -67,12 +78,18 @@ DEFAULT_HTML_SOURCES: List[Dict[str, Any]] = [
             "include_prefixes": ["https://smithery.ai/server/"],
             "max_items": 200,
             "request_delay_ms": 200,
+            "workers": 8,
+            "per_host_concurrency": 4,
             # Smithery 详情页通常给出 GitHub 仓库；我们从仓库 zip 提取 package.json 决定 npx 启动方式
             "resolve_github_package": True,
         },
     },
 ]
 
+# 每批落库的条目 / 页面数（同时是游标推进的粒度）
+SYNC_BATCH_SIZE = 50
+
+
 @dataclass
 class MarketSource:
     source_id: str
@@ -98,9 +115,87 @@ class MarketItem:
     raw: Optional[Dict[str, Any]] = None
 
 
+@dataclass
+class PageState:
+    """单个页面（或 zipball）的抓取状态，用于条件请求与增量跳过"""
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    lastmod: Optional[str] = None
+    item_id: Optional[str] = None
+    fetched: bool = False
+
+
+@dataclass
+class SyncStats:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    fetched: int = 0
+    failed: int = 0
+    count: int = 0
+    resumed_from: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class _HostThrottle:
+    """礼貌抓取：同一 host 限制并发数，并保证相邻请求的最小间隔"""
+
+    def __init__(self, per_host: int, min_interval: float):
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._next_at: Dict[str, float] = {}
+
+    @contextmanager
+    def slot(self, url: str):
+        host = urlparse(url).netloc
+        with self._lock:
+            sem = self._semaphores.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        with sem:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_at.get(host, 0.0))
+                self._next_at[host] = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+def _url_hash(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def _conditional_get(http, url: str, state: PageState, timeout: int = 60, accept: Optional[str] = None):
+    """带 If-None-Match / If-Modified-Since 的 GET（http 为 requests 模块或 Session）"""
+    headers = {}
+    if accept:
+        headers["Accept"] = accept
+    if state.etag:
+        headers["If-None-Match"] = state.etag
+    if state.last_modified:
+        headers["If-Modified-Since"] = state.last_modified
+    return http.get(url, timeout=timeout, headers=headers)
+
+
+def _remember_validators(state: PageState, resp) -> None:
+    state.etag = resp.headers.get("ETag")
+    state.last_modified = resp.headers.get("Last-Modified")
+
+
 class MCPMarketService:
-    def __init__(self, get_connection):
+    def __init__(self, get_connection, get_read_connection=None):
+        """
+        Args:
+            get_connection: 获取数据库连接的函数
+            get_read_connection: 目录浏览（search_items / get_item）用的只读连接，可指向副本；
+                目录只由同步写入，容忍复制延迟。None 时使用 get_connection
+        """
         self.get_connection = get_connection
+        self.get_read_connection = get_read_connection or get_connection
 
     # =========================================================================
     # Sources
@@ -251,6 +346,41 @@ class MCPMarketService:
     # =========================================================================
 
     def sync_source(self, source_id: str, force: bool = False) -> Dict[str, Any]:
+        """
+        同步市场源（增量）
+
+        - html_scrape：线程池并发抓取（按 host 限并发 + 请求间隔），sitemap lastmod 未变或
+          条件请求 304 的页面直接跳过；每批条目 executemany 落库并保存页面状态与游标
+        - github_repo：zipball 条件请求，304 时跳过整个仓库
+        - 同步中断（进程退出 / 异常）后，下次同步从 sync_cursor 记录的位置续传，不受间隔限制
+        """
+        source = self._load_source_row(source_id)
+        if not source:
+            raise ValueError("source not found")
+        if not source["enabled"]:
+            return {"source_id": source_id, "skipped": True, "reason": "disabled"}
+
+        config = source["config"]
+        cursor = source["sync_cursor"]
+        last_sync_at = source["last_sync_at"]
+        now = int(time.time())
+        if not cursor and not force and last_sync_at and now - last_sync_at < source["sync_interval_seconds"]:
+            return {"source_id": source_id, "skipped": True, "reason": "interval_not_elapsed", "last_sync_at": last_sync_at}
+
+        stats = SyncStats(resumed_from=int(cursor.get("position") or 0) if cursor else 0)
+        started = time.time()
+        if source["type"] == "github_repo":
+            self._sync_github_repo(config, source_id, stats)
+        elif source["type"] == "html_scrape":
+            self._sync_html_scrape(config, source_id, stats, cursor or {})
+        else:
+            raise ValueError(f"unsupported source type: {source['type']}")
+
+        self._finish_sync(source_id, now)
+        print(f"[MCPMarket] Synced {source_id} in {time.time() - started:.1f}s: {stats.to_dict()}")
+        return {"source_id": source_id, **stats.to_dict(), "last_sync_at": now}
+
+    def _load_source_row(self, source_id: str) -> Optional[Dict[str, Any]]:
         conn = self.get_connection()
         if not conn:
             raise RuntimeError("MySQL not available")
@@ -258,7 +388,7 @@ class MCPMarketService:
         try:
             cur.execute(
                 """
-                SELECT source_id, display_name, type, enabled, config, sync_interval_seconds, last_sync_at
+                SELECT source_id, display_name, type, enabled, config, sync_interval_seconds, last_sync_at, sync_cursor
                 FROM mcp_market_sources
                 WHERE source_id = %s
                 """,
@@ -266,38 +396,89 @@ class MCPMarketService:
             )
             row = cur.fetchone()
             if not row:
-                raise ValueError("source not found")
+                return None
 
-            enabled = bool(row[3])
-            if not enabled:
-                return {"source_id": source_id, "skipped": True, "reason": "disabled"}
+            def _j(v):
+                try:
+                    return json.loads(v) if v else None
+                except Exception:
+                    return None
 
-            config = {}
+            return {
+                "source_id": row[0],
+                "type": row[2],
+                "enabled": bool(row[3]),
+                "config": _j(row[4]) or {},
+                "sync_interval_seconds": int(row[5] or 3600),
+                "last_sync_at": int(row[6]) if row[6] else None,
+                "sync_cursor": _j(row[7]),
+            }
+        finally:
             try:
-                config = json.loads(row[4]) if row[4] else {}
+                cur.close()
             except Exception:
-                config = {}
+                pass
+            try:
+                conn.close()
+            except Exception:
+                pass
 
-            sync_interval = int(row[5] or 3600)
-            last_sync_at = int(row[6]) if row[6] else None
-            now = int(time.time())
-            if not force and last_sync_at and now - last_sync_at < sync_interval:
-                return {"source_id": source_id, "skipped": True, "reason": "interval_not_elapsed", "last_sync_at": last_sync_at}
-
-            source_type = row[2]
-            if source_type == "github_repo":
-                items = self._sync_github_repo(config, source_id)
-            elif source_type == "html_scrape":
-                items = self._sync_html_scrape(config, source_id)
-            else:
-                raise ValueError(f"unsupported source type: {source_type}")
-
-            # upsert items
-            inserted = 0
-            updated = 0
-            for item in items:
-                # 简单按 item_id 唯一
-                cur.execute(
+    def _load_page_states(self, source_id: str) -> Dict[str, PageState]:
+        conn = self.get_connection()
+        if not conn:
+            raise RuntimeError("MySQL not available")
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT url, etag, last_modified, lastmod, item_id
+                FROM mcp_market_page_state
+                WHERE source_id = %s
+                """,
+                (source_id,),
+            )
+            return {
+                row[0]: PageState(url=row[0], etag=row[1], last_modified=row[2], lastmod=row[3], item_id=row[4],
+                                  fetched=True)
+                for row in cur.fetchall()
+            }
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _persist_batch(
+        self,
+        source_id: str,
+        items: List[MarketItem],
+        states: List[PageState],
+        cursor: Optional[Dict[str, Any]],
+    ) -> Tuple[int, int]:
+        """
+        一个事务内写入：条目（executemany upsert）、页面状态、同步游标
+
+        Returns:
+            (inserted, updated)
+        """
+        conn = self.get_connection()
+        if not conn:
+            raise RuntimeError("MySQL not available")
+        cur = conn.cursor()
+        inserted = updated = 0
+        try:
+            if items:
+                # 同一批内按 item_id 去重（保留最后一个）
+                items = list({item.item_id: item for item in items}.values())
+                ids = [item.item_id for item in items]
+                placeholders = ", ".join(["%s"] * len(ids))
+                cur.execute(f"SELECT item_id FROM mcp_market_items WHERE item_id IN ({placeholders})", tuple(ids))
+                existing = {row[0] for row in cur.fetchall()}
+                cur.executemany(
                     """
                     INSERT INTO mcp_market_items
                       (item_id, source_id, name, description, runtime_type, homepage, tags, remote, stdio, raw)
@@ -313,31 +494,77 @@ class MCPMarketService:
                       raw = VALUES(raw),
                       updated_at = CURRENT_TIMESTAMP
                     """,
-                    (
-                        item.item_id,
-                        item.source_id,
-                        item.name,
-                        item.description,
-                        item.runtime_type,
-                        item.homepage,
-                        json.dumps(item.tags or []),
-                        json.dumps(item.remote) if item.remote else None,
-                        json.dumps(item.stdio) if item.stdio else None,
-                        json.dumps(item.raw) if item.raw else None,
-                    ),
+                    [
+                        (
+                            item.item_id,
+                            item.source_id,
+                            item.name,
+                            item.description,
+                            item.runtime_type,
+                            item.homepage,
+                            json.dumps(item.tags or []),
+                            json.dumps(item.remote) if item.remote else None,
+                            json.dumps(item.stdio) if item.stdio else None,
+                            json.dumps(item.raw) if item.raw else None,
+                        )
+                        for item in items
+                    ],
+                )
+                inserted = len(ids) - len(existing)
+                updated = len(existing)
+
+            if states:
+                fetched_at = int(time.time())
+                cur.executemany(
+                    """
+                    INSERT INTO mcp_market_page_state
+                      (source_id, url_hash, url, etag, last_modified, lastmod, item_id, fetched_at)
+                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+                    ON DUPLICATE KEY UPDATE
+                      etag = VALUES(etag),
+                      last_modified = VALUES(last_modified),
+                      lastmod = VALUES(lastmod),
+                      item_id = VALUES(item_id),
+                      fetched_at = VALUES(fetched_at)
+                    """,
+                    [
+                        (source_id, _url_hash(s.url), s.url, s.etag, s.last_modified, s.lastmod, s.item_id, fetched_at)
+                        for s in states
+                    ],
                 )
-                # MySQL rowcount: 1 insert, 2 update (with ON DUPLICATE)
-                if cur.rowcount == 1:
-                    inserted += 1
-                elif cur.rowcount == 2:
-                    updated += 1
 
+            if cursor is not None:
+                cur.execute(
+                    "UPDATE mcp_market_sources SET sync_cursor = %s WHERE source_id = %s",
+                    (json.dumps(cursor), source_id),
+                )
+            conn.commit()
+            return inserted, updated
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _finish_sync(self, source_id: str, now: int) -> None:
+        conn = self.get_connection()
+        if not conn:
+            raise RuntimeError("MySQL not available")
+        cur = conn.cursor()
+        try:
             cur.execute(
-                "UPDATE mcp_market_sources SET last_sync_at = %s, updated_at = CURRENT_TIMESTAMP WHERE source_id = %s",
+                """
+                UPDATE mcp_market_sources
+                SET last_sync_at = %s, sync_cursor = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE source_id = %s
+                """,
                 (now, source_id),
             )
             conn.commit()
-            return {"source_id": source_id, "inserted": inserted, "updated": updated, "count": len(items), "last_sync_at": now}
         finally:
             try:
                 cur.close()
@@ -348,7 +575,7 @@ class MCPMarketService:
             except Exception:
                 pass
 
-    def _sync_github_repo(self, config: Dict[str, Any], source_id: str) -> List[MarketItem]:
+    def _sync_github_repo(self, config: Dict[str, Any], source_id: str, stats: "SyncStats") -> None:
         repo = config.get("repo")
         ref = config.get("ref", "main")
         if not repo or "/" not in repo:
@@ -358,8 +585,14 @@ class MCPMarketService:
         max_items = int(config.get("max_items") or 300)
 
         zip_url = f"https://codeload.github.com/{repo}/zip/{ref}"
-        resp = requests.get(zip_url, timeout=60)
+        state = self._load_page_states(source_id).get(zip_url) or PageState(url=zip_url)
+        resp = _conditional_get(requests, zip_url, state, timeout=60)
+        if resp.status_code == 304:
+            stats.unchanged += 1
+            return
         resp.raise_for_status()
+        stats.fetched += 1
+        _remember_validators(state, resp)
 
         zf = zipfile.ZipFile(io.BytesIO(resp.content))
         package_json_paths = [p for p in zf.namelist() if p.endswith("package.json")]
@@ -416,59 +649,137 @@ class MCPMarketService:
                 )
             )
 
-        return items
-
-    def _sync_html_scrape(self, config: Dict[str, Any], source_id: str) -> List[MarketItem]:
+        # 条目与 zipball 校验信息同一事务写入：落库失败时下次不会误判为未变化
+        for i in range(0, len(items), SYNC_BATCH_SIZE):
+            batch = items[i:i + SYNC_BATCH_SIZE]
+            last = i + SYNC_BATCH_SIZE >= len(items)
+            inserted, updated = self._persist_batch(source_id, batch, [state] if last else [], None)
+            stats.inserted += inserted
+            stats.updated += updated
+        if not items:
+            self._persist_batch(source_id, [], [state], None)
+        stats.count = len(items)
+
+    def _sync_html_scrape(
+        self,
+        config: Dict[str, Any],
+        source_id: str,
+        stats: "SyncStats",
+        cursor: Dict[str, Any],
+    ) -> None:
         sitemap_url = config.get("sitemap_url")
         if not sitemap_url:
             raise ValueError("html_scrape config.sitemap_url is required")
 
         include_prefixes = config.get("include_prefixes") or []
         max_items = int(config.get("max_items") or 200)
-        request_delay_ms = int(config.get("request_delay_ms") or 0)
-
-        locs = self._fetch_sitemap_locs(sitemap_url)
-        if include_prefixes:
-            locs = [u for u in locs if any(u.startswith(p) for p in include_prefixes)]
+        workers = max(1, int(config.get("workers") or 8))
+        throttle = _HostThrottle(
+            per_host=max(1, int(config.get("per_host_concurrency") or 4)),
+            min_interval=int(config.get("request_delay_ms") or 0) / 1000.0,
+        )
+        resolve_github = bool(config.get("resolve_github_package", False))
 
-        items: List[MarketItem] = []
-        for url in locs:
-            if len(items) >= max_items:
-                break
-            try:
-                html = self._fetch_html(url)
-            except Exception:
-                continue
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
 
+        entries = self._fetch_sitemap_entries(session, sitemap_url)
+        if include_prefixes:
+            entries = [e for e in entries if any(e[0].startswith(p) for p in include_prefixes)]
+        states = self._load_page_states(source_id)
+
+        position = int(cursor.get("position") or 0)
+        known_items = int(cursor.get("items") or 0)
+        started_at = cursor.get("started_at") or int(time.time())
+
+        def _process(entry: Tuple[str, Optional[str]]):
+            url, lastmod = entry
+            state = states.get(url) or PageState(url=url)
+            # sitemap lastmod 未变：不发请求
+            if lastmod and state.lastmod == lastmod and state.fetched:
+                return "skipped", state, None
+            with throttle.slot(url):
+                resp = _conditional_get(session, url, state, timeout=60, accept="text/html")
+            if resp.status_code == 304:
+                state.lastmod = lastmod or state.lastmod
+                return "unchanged", state, None
+            resp.raise_for_status()
+            _remember_validators(state, resp)
+            state.lastmod = lastmod
+            state.fetched = True
             item = None
             if source_id.startswith("mcpdb"):
-                item = self._parse_mcpdb_item(url, html, source_id)
+                item = self._parse_mcpdb_item(url, resp.text, source_id)
             elif source_id.startswith("smithery"):
-                item = self._parse_smithery_item(url, html, source_id, resolve_github_package=bool(config.get("resolve_github_package", False)))
-
-            if item:
-                items.append(item)
-
-            if request_delay_ms > 0:
-                time.sleep(request_delay_ms / 1000.0)
+                item = self._parse_smithery_item(
+                    url, resp.text, source_id, resolve_github_package=resolve_github, http=session, throttle=throttle,
+                )
+            state.item_id = item.item_id if item else None
+            return "fetched", state, item
+
+        window = max(SYNC_BATCH_SIZE, workers * 4)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mcp-market-sync") as pool:
+            while position < len(entries) and known_items < max_items:
+                batch = entries[position:position + window]
+                items: List[MarketItem] = []
+                changed_states: List[PageState] = []
+                for entry, future in [(e, pool.submit(_process, e)) for e in batch]:
+                    try:
+                        outcome, state, item = future.result()
+                    except Exception as e:
+                        print(f"[MCPMarket] Fetch failed {entry[0]}: {e}")
+                        stats.failed += 1
+                        continue
+                    if outcome in ("skipped", "unchanged"):
+                        stats.unchanged += 1
+                        if state.item_id:
+                            known_items += 1
+                        if outcome == "unchanged":
+                            changed_states.append(state)
+                        continue
+                    stats.fetched += 1
+                    if item:
+                        if known_items >= max_items:
+                            # 超出上限的条目不写入，页面状态也不记录：下次同步重新抓取
+                            continue
+                        items.append(item)
+                        known_items += 1
+                    changed_states.append(state)
+
+                position += len(batch)
+                inserted, updated = self._persist_batch(
+                    source_id,
+                    items,
+                    changed_states,
+                    {"position": position, "items": known_items, "total": len(entries), "started_at": started_at},
+                )
+                stats.inserted += inserted
+                stats.updated += updated
 
-        return items
+        stats.count = known_items
 
     # =========================================================================
     # HTML / Sitemap Helpers
     # =========================================================================
 
-    def _fetch_sitemap_locs(self, sitemap_url: str) -> List[str]:
-        resp = requests.get(sitemap_url, timeout=60, headers={"Accept": "application/xml,text/xml"})
+    def _fetch_sitemap_entries(self, session, sitemap_url: str) -> List[Tuple[str, Optional[str]]]:
+        """解析 sitemap，返回 [(loc, lastmod)]"""
+        resp = session.get(sitemap_url, timeout=60, headers={"Accept": "application/xml,text/xml"})
         resp.raise_for_status()
         text = resp.text
-        # 简易提取 <loc>...</loc>
-        return re.findall(r"<loc>([^<]+)</loc>", text)
-
-    def _fetch_html(self, url: str) -> str:
-        resp = requests.get(url, timeout=60, headers={"Accept": "text/html"})
-        resp.raise_for_status()
-        return resp.text
+        entries: List[Tuple[str, Optional[str]]] = []
+        for block in re.findall(r"<url>(.*?)</url>", text, flags=re.S):
+            loc = re.search(r"<loc>([^<]+)</loc>", block)
+            if not loc:
+                continue
+            lastmod = re.search(r"<lastmod>([^<]+)</lastmod>", block)
+            entries.append((loc.group(1).strip(), lastmod.group(1).strip() if lastmod else None))
+        if not entries:
+            # 非标准 sitemap：只有 <loc>
+            entries = [(loc.strip(), None) for loc in re.findall(r"<loc>([^<]+)</loc>", text)]
+        return entries
 
     def _extract_code_blocks(self, html: str) -> List[str]:
         # MCPdb 页面中常见 <code>...</code>
@@ -577,7 +888,15 @@ class MCPMarketService:
     # Smithery Parser
     # =========================================================================
 
-    def _parse_smithery_item(self, url: str, html: str, source_id: str, resolve_github_package: bool = True) -> Optional[MarketItem]:
+    def _parse_smithery_item(
+        self,
+        url: str,
+        html: str,
+        source_id: str,
+        resolve_github_package: bool = True,
+        http=None,
+        throttle: Optional[_HostThrottle] = None,
+    ) -> Optional[MarketItem]:
         # url 形如 /server/@owner/name
         m = re.search(r"/server/(@[^/]+/[^/?#]+)", url)
         slug = m.group(1) if m else None
@@ -601,7 +920,7 @@ class MCPMarketService:
             repo = self._github_repo_from_url(gh)
             if repo:
                 homepage = f"https://github.com/{repo}"
-                pkg_name, pkg_desc = self._resolve_npm_package_from_github_repo(repo)
+                pkg_name, pkg_desc = self._resolve_npm_package_from_github_repo(repo, http=http, throttle=throttle)
 
         # 只能在拿到 npm 包名时才生成“可一键安装”的 stdio 条目
         if not pkg_name:
@@ -633,13 +952,18 @@ class MCPMarketService:
         repo = m.group(1).rstrip(".git")
         return repo
 
-    def _resolve_npm_package_from_github_repo(self, repo: str) -> Tuple[Optional[str], Optional[str]]:
+    def _resolve_npm_package_from_github_repo(
+        self, repo: str, http=None, throttle: Optional[_HostThrottle] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
         # 下载 repo zip（默认 main），尝试从任何 package.json 里找到 name/description
         # 注意：有些仓库默认分支不是 main，这里尽量兼容：main -> master
+        # 抓取时与页面请求共用 throttle：codeload.github.com 同样受并发数 / 间隔限制
+        http = http or requests
         for ref in ("main", "master"):
             try:
                 zip_url = f"https://codeload.github.com/{repo}/zip/{ref}"
-                resp = requests.get(zip_url, timeout=60)
+                with throttle.slot(zip_url) if throttle else nullcontext():
+                    resp = http.get(zip_url, timeout=60)
                 if resp.status_code >= 400:
                     continue
                 zf = zipfile.ZipFile(io.BytesIO(resp.content))
@@ -675,7 +999,7 @@ class MCPMarketService:
         limit = min(limit, 100)
         offset = max(offset, 0)
 
-        conn = self.get_connection()
+        conn = self.get_read_connection()
         if not conn:
             return {"items": [], "total": 0}
         cur = conn.cursor()
@@ -739,7 +1063,7 @@ class MCPMarketService:
                 pass
 
     def get_item(self, item_id: str) -> Optional[Dict[str, Any]]:
-        conn = self.get_connection()
+        conn = self.get_read_connection()
         if not conn:
             return None
         cur = conn.cursor()
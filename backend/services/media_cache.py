@@ -0,0 +1,375 @@
+"""
+媒体字节缓存
+
+Drive 缩略图 / 预览与本地媒体产出共用的进程内缓存:
+- 按总字节数限额（而非条目数），LRU 淘汰
+- single-flight：同一 key 并发未命中时只回源一次，其余请求等待结果
+- 可选磁盘溢出层：从内存淘汰的条目写入 spill 目录，同样按字节限额淘汰
+- 每个条目带内容 ETag，media_response() 处理 If-None-Match 返回 304
+
+配置 (config.yaml):
+    media:
+      cache:
+        max_mb: 64           # 内存层总字节上限
+        max_item_mb: 8       # 单条上限，超过的内容不缓存
+        ttl_seconds: 600
+        spill_dir: uploads/media_cache   # 留空关闭磁盘溢出层
+        spill_max_mb: 512
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+
+
+@dataclass(frozen=True)
+class MediaEntry:
+    """缓存的媒体内容"""
+    content: bytes
+    mime_type: str
+    etag: str
+    expires_at: float
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    @property
+    def is_expired(self) -> bool:
+        return time.time() > self.expires_at
+
+
+class _Flight:
+    """进行中的回源（single-flight）"""
+
+    __slots__ = ('event', 'entry', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry: Optional[MediaEntry] = None
+        self.error: Optional[BaseException] = None
+
+
+def make_etag(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()[:32]
+
+
+class MediaCache:
+    """
+    字节限额的媒体 LRU 缓存
+
+    Example:
+        cache = get_media_cache()
+        entry = cache.get_or_fetch(f"drive:thumb:{file_id}", lambda: (content, 'image/jpeg'))
+        return media_response(entry)
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_item_bytes: int = 8 * 1024 * 1024,
+        ttl: float = 600.0,
+        spill_dir: Optional[str] = None,
+        spill_max_bytes: int = 512 * 1024 * 1024,
+    ):
+        """
+        Args:
+            max_bytes: 内存层总字节上限
+            max_item_bytes: 单条上限（超过不缓存，直接返回）
+            ttl: 默认过期时间（秒）
+            spill_dir: 磁盘溢出目录（None 关闭）
+            spill_max_bytes: 磁盘溢出层总字节上限
+        """
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, MediaEntry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {'hits': 0, 'spill_hits': 0, 'misses': 0, 'fetches': 0, 'waits': 0, 'evictions': 0}
+
+        self._spill_dir = Path(spill_dir) if spill_dir else None
+        self.spill_max_bytes = spill_max_bytes
+        self._spill: OrderedDict[str, int] = OrderedDict()  # 文件名 -> 字节数（按写入 / 访问顺序）
+        self._spill_bytes = 0
+        if self._spill_dir is not None:
+            self._load_spill_index()
+
+    # ==================== 读写 ====================
+
+    def get(self, key: str) -> Optional[MediaEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.is_expired:
+                    self._remove(key)
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry
+        entry = self._spill_get(key)
+        if entry is not None:
+            self._stats['spill_hits'] += 1
+            self._put(key, entry)
+            return entry
+        self._stats['misses'] += 1
+        return None
+
+    def set(self, key: str, content: bytes, mime_type: str, ttl: Optional[float] = None) -> MediaEntry:
+        """写入缓存并返回条目（超过单条上限时不缓存，仍返回条目）"""
+        entry = MediaEntry(
+            content=content,
+            mime_type=mime_type,
+            etag=make_etag(content),
+            expires_at=time.time() + (ttl if ttl is not None else self.ttl),
+        )
+        if entry.size <= self.max_item_bytes:
+            self._put(key, entry)
+        return entry
+
+    def get_or_fetch(
+        self,
+        key: str,
+        fetcher: Callable[[], Optional[Tuple[bytes, str]]],
+        ttl: Optional[float] = None,
+    ) -> Optional[MediaEntry]:
+        """
+        读穿：命中直接返回；未命中时同一 key 只有一个线程执行 fetcher
+
+        Args:
+            fetcher: 返回 (content, mime_type)，返回 None 表示不可用（不缓存）
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            self._stats['waits'] += 1
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry
+
+        try:
+            self._stats['fetches'] += 1
+            result = fetcher()
+            if result is not None:
+                content, mime_type = result
+                flight.entry = self.set(key, content, mime_type, ttl)
+            return flight.entry
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+        if self._spill_dir is not None:
+            name = self._spill_name(key)
+            with self._lock:
+                self._spill_bytes -= self._spill.pop(name, 0)
+            for path in self._spill_paths(name):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'spill_entries': len(self._spill),
+                'spill_bytes': self._spill_bytes,
+            }
+
+    # ==================== 内存层 ====================
+
+    def _put(self, key: str, entry: MediaEntry) -> None:
+        evicted = []
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old = self._entries.popitem(last=False)
+                self._bytes -= old.size
+                self._stats['evictions'] += 1
+                evicted.append((old_key, old))
+        # 磁盘 IO 放在锁外
+        for old_key, old in evicted:
+            if not old.is_expired:
+                self._spill_put(old_key, old)
+
+    def _remove(self, key: str) -> None:
+        """调用方持有锁"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+
+    # ==================== 磁盘溢出层 ====================
+
+    @staticmethod
+    def _spill_name(key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _spill_paths(self, name: str):
+        return self._spill_dir / name, self._spill_dir / f"{name}.json"
+
+    def _load_spill_index(self) -> None:
+        try:
+            self._spill_dir.mkdir(parents=True, exist_ok=True)
+            files = [p for p in self._spill_dir.iterdir()
+                     if p.is_file() and p.suffix == '' and not p.name.startswith('.')]
+            for p in sorted(files, key=lambda p: p.stat().st_mtime):
+                size = p.stat().st_size
+                self._spill[p.name] = size
+                self._spill_bytes += size
+        except OSError as e:
+            print(f"[MediaCache] Spill dir unavailable, disabled: {e}")
+            self._spill_dir = None
+
+    def _spill_put(self, key: str, entry: MediaEntry) -> None:
+        if self._spill_dir is None or entry.size > self.spill_max_bytes:
+            return
+        name = self._spill_name(key)
+        data_path, meta_path = self._spill_paths(name)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self._spill_dir, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(entry.content)
+            meta_path.write_text(json.dumps({
+                'mime_type': entry.mime_type, 'etag': entry.etag, 'expires_at': entry.expires_at,
+            }))
+            os.replace(tmp, data_path)
+        except OSError as e:
+            print(f"[MediaCache] Spill write failed: {e}")
+            return
+
+        drop = []
+        with self._lock:
+            self._spill_bytes -= self._spill.pop(name, 0)
+            self._spill[name] = entry.size
+            self._spill_bytes += entry.size
+            while self._spill_bytes > self.spill_max_bytes and len(self._spill) > 1:
+                old_name, size = self._spill.popitem(last=False)
+                self._spill_bytes -= size
+                drop.append(old_name)
+        for old_name in drop:
+            for path in self._spill_paths(old_name):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def _spill_get(self, key: str) -> Optional[MediaEntry]:
+        if self._spill_dir is None:
+            return None
+        name = self._spill_name(key)
+        with self._lock:
+            if name not in self._spill:
+                return None
+        data_path, meta_path = self._spill_paths(name)
+        try:
+            meta = json.loads(meta_path.read_text())
+            if time.time() > meta['expires_at']:
+                raise FileNotFoundError(name)
+            content = data_path.read_bytes()
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self._spill_bytes -= self._spill.pop(name, 0)
+            for path in (data_path, meta_path):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            return None
+        # 提升回内存层后从磁盘层移除，避免重复占用
+        with self._lock:
+            self._spill_bytes -= self._spill.pop(name, 0)
+        for path in (data_path, meta_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        return MediaEntry(content=content, mime_type=meta['mime_type'], etag=meta['etag'],
+                          expires_at=meta['expires_at'])
+
+
+def media_response(entry: MediaEntry, max_age: int = 600, headers: Optional[Dict[str, str]] = None):
+    """
+    构造带 ETag 的响应；请求携带匹配的 If-None-Match 时返回 304（不发送内容）
+    """
+    from flask import Response, request
+
+    etag = f'"{entry.etag}"'
+    resp_headers = {
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={max_age}',
+        **(headers or {}),
+    }
+    if_none_match = request.headers.get('If-None-Match', '')
+    if if_none_match and (if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]):
+        return Response(status=304, headers=resp_headers)
+    return Response(entry.content, mimetype=entry.mime_type, headers=resp_headers)
+
+
+_media_cache: Optional[MediaCache] = None
+_init_lock = threading.Lock()
+
+
+def init_media_cache(cfg: Optional[Dict[str, Any]] = None) -> MediaCache:
+    """按 media.cache 配置初始化"""
+    global _media_cache
+    cfg = cfg or {}
+    spill_dir = cfg.get('spill_dir', 'uploads/media_cache')
+    if spill_dir and not os.path.isabs(spill_dir):
+        spill_dir = str(BACKEND_ROOT / spill_dir)
+    with _init_lock:
+        _media_cache = MediaCache(
+            max_bytes=int(float(cfg.get('max_mb', 64)) * 1024 * 1024),
+            max_item_bytes=int(float(cfg.get('max_item_mb', 8)) * 1024 * 1024),
+            ttl=float(cfg.get('ttl_seconds', 600)),
+            spill_dir=spill_dir or None,
+            spill_max_bytes=int(float(cfg.get('spill_max_mb', 512)) * 1024 * 1024),
+        )
+    return _media_cache
+
+
+def get_media_cache() -> MediaCache:
+    """获取全局媒体缓存（未初始化时使用默认配置，不启用磁盘层）"""
+    global _media_cache
+    if _media_cache is None:
+        with _init_lock:
+            if _media_cache is None:
+                _media_cache = MediaCache()
+    return _media_cache
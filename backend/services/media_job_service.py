@@ -0,0 +1,681 @@
+"""
+媒体生成任务编排
+
+视频生成（Gemini Veo / Runway）是长时间异步任务。原先由前端每 5 秒经 Flask 转发一次供应商状态查询，
+完成后再由前端发起同步下载；现在改为服务端编排:
+- 任务记录持久化到 media_jobs 表，进程重启后自动恢复轮询
+- 单个调度线程按 next_poll_at 排序，到期任务交给线程池查询状态；仍在处理中则按倍数退避
+- 完成后直接流式下载到 MediaOutputService（产出库），任务记录 output_id
+- 状态变化通过 Topic SSE 推送 media_job_update 事件（提交时带 topic_id 的任务）；
+  前端也可查询 GET /api/media/jobs/<job_id>（只读本地记录，不访问供应商）
+
+多进程部署时每次轮询用 Redis 短锁去重，完成处理用条件 UPDATE 抢占，保证只下载一次。
+抢占同时写入下载租约（lease_owner + heartbeat_at），下载期间定期续约；启动恢复只把租约已过期的
+downloading 任务放回 running，其他仍存活的进程正在进行的下载不受影响。
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+STATUS_RUNNING = 'running'
+STATUS_DOWNLOADING = 'downloading'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+TERMINAL_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+_SUCCEEDED = ('SUCCEEDED', 'COMPLETED')
+_FAILED = ('FAILED', 'CANCELLED', 'ERROR')
+
+# 连续多少次查询出错后判定失败
+MAX_CONSECUTIVE_ERRORS = 5
+
+# 进程内保留的最近结束任务数（完成后前端的下一次查询不必回表）
+RECENT_FINISHED = 200
+
+# 下载租约时长（秒）：持有者每 1/4 租约续约一次，超过该时长未续约视为持有进程已退出
+DOWNLOAD_LEASE_SECONDS = 120
+
+
+# 调度堆中的定期回收项（与 job_id 同为字符串，便于堆比较）
+_RECLAIM = '__reclaim_expired__'
+
+
+class LeaseLostError(RuntimeError):
+    """下载租约已被其他进程接管"""
+
+
+@dataclass
+class MediaJob:
+    """媒体生成任务"""
+
+    job_id: str
+    provider: str
+    task_id: str
+    media_type: str = 'video'
+    status: str = STATUS_RUNNING
+    provider_status: Optional[str] = None
+    prompt: Optional[str] = None
+    model: Optional[str] = None
+    config_id: Optional[str] = None
+    topic_id: Optional[str] = None
+    output_id: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    errors: int = 0
+    poll_interval: float = 0.0
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'MediaJob':
+        def _ts(v):
+            if isinstance(v, datetime):
+                return v.timestamp()
+            return v
+
+        return cls(
+            job_id=row['job_id'],
+            provider=row['provider'],
+            task_id=row['task_id'],
+            media_type=row.get('media_type') or 'video',
+            status=row.get('status') or STATUS_RUNNING,
+            provider_status=row.get('provider_status'),
+            prompt=row.get('prompt'),
+            model=row.get('model'),
+            config_id=row.get('config_id'),
+            topic_id=row.get('topic_id'),
+            output_id=row.get('output_id'),
+            error=row.get('error'),
+            attempts=int(row.get('attempts') or 0),
+            created_at=_ts(row.get('created_at')) or time.time(),
+            finished_at=_ts(row.get('finished_at')),
+        )
+
+
+# ==================== 供应商适配 ====================
+
+@dataclass(frozen=True)
+class JobProvider:
+    """
+    供应商适配
+
+    submit(params) -> (task_id, 原始结果)；失败时 task_id 为 None，原始结果含 error
+    status(job) -> {'status': str, 'output': Any, 'error': str?}
+    download(job, output) -> (块迭代器, content_type)
+    """
+    submit: Callable[[Dict[str, Any]], Tuple[Optional[str], Dict[str, Any]]]
+    status: Callable[[MediaJob], Dict[str, Any]]
+    download: Callable[[MediaJob, Any], Tuple[Iterator[bytes], str]]
+
+
+def _gemini_submit(params: Dict[str, Any]):
+    from services import media_service
+    result = media_service.gemini_video_submit(
+        prompt=params.get('prompt') or '',
+        image_b64=params.get('image_b64'),
+        config_id=params.get('config_id'),
+        model=params.get('model'),
+    )
+    return result.get('task_name'), result
+
+
+def _gemini_status(job: MediaJob):
+    from services import media_service
+    return media_service.gemini_video_status(task_name=job.task_id, config_id=job.config_id)
+
+
+def _gemini_download(job: MediaJob, output: Any):
+    from services import media_service
+    result = media_service.gemini_video_download(video_uri=output, config_id=job.config_id)
+    if result.get('error'):
+        raise RuntimeError(result['error'])
+    return result['chunks'], result.get('content_type') or 'video/mp4'
+
+
+def _runway_submit(params: Dict[str, Any]):
+    from services import media_service
+    result = media_service.runway_video_submit(
+        prompt_text=params.get('prompt_text') or params.get('prompt'),
+        prompt_image=params.get('prompt_image'),
+        model=params.get('model') or 'gen4_turbo',
+        ratio=params.get('ratio') or '1280:720',
+        duration=params.get('duration'),
+    )
+    return result.get('task_id'), result
+
+
+def _runway_status(job: MediaJob):
+    from services import media_service
+    return media_service.runway_video_status(job.task_id)
+
+
+def _http_download(job: MediaJob, output: Any):
+    """输出为 URL（或 URL 列表）时直接流式下载"""
+    url = output[0] if isinstance(output, list) and output else output
+    if not isinstance(url, str) or not url:
+        raise RuntimeError('任务未返回可下载的地址')
+    r = requests.get(url, stream=True, timeout=120)
+    if r.status_code != 200:
+        r.close()
+        raise RuntimeError(f'下载失败 (HTTP {r.status_code})')
+
+    def _chunks():
+        try:
+            for chunk in r.iter_content(chunk_size=1024 * 1024):
+                if chunk:
+                    yield chunk
+        finally:
+            r.close()
+
+    content_type = (r.headers.get('Content-Type') or 'video/mp4').split(';')[0].strip()
+    return _chunks(), content_type
+
+
+PROVIDERS: Dict[str, JobProvider] = {
+    'gemini': JobProvider(_gemini_submit, _gemini_status, _gemini_download),
+    'runway': JobProvider(_runway_submit, _runway_status, _http_download),
+}
+
+
+# ==================== 编排服务 ====================
+
+class MediaJobService:
+    """
+    媒体任务编排器
+
+    Example:
+        job = get_media_job_service().submit('gemini', {'prompt': '...', 'config_id': 'xxx'}, topic_id=None)
+        get_media_job_service().get(job['job_id'])
+    """
+
+    def __init__(
+        self,
+        get_connection,
+        max_workers: int = 4,
+        min_interval: float = 5.0,
+        max_interval: float = 60.0,
+        backoff: float = 1.5,
+        timeout: float = 1800.0,
+        providers: Optional[Dict[str, JobProvider]] = None,
+        lease_seconds: float = DOWNLOAD_LEASE_SECONDS,
+    ):
+        """
+        Args:
+            get_connection: 获取数据库连接的函数
+            max_workers: 并发执行状态查询 / 下载的线程数
+            min_interval: 首次查询延迟与最小轮询间隔（秒）
+            max_interval: 轮询间隔上限（秒）
+            backoff: 每次查询仍未完成时间隔的放大倍数
+            timeout: 任务最长等待时间（秒），超时判定失败
+            lease_seconds: 下载租约时长（秒）
+        """
+        self.get_connection = get_connection
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.lease_seconds = lease_seconds
+        # 租约持有者标识（主机 + 进程 + 随机后缀，重启后不同）
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.providers = providers if providers is not None else PROVIDERS
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='media-job')
+        self._jobs: Dict[str, MediaJob] = {}
+        self._finished: OrderedDict[str, MediaJob] = OrderedDict()
+        # 已写入 media_jobs 的任务（其他进程可能恢复同一任务，下载前需抢占）
+        self._persisted: set = set()
+        self._heap: List[Tuple[float, str]] = []
+        self._cond = threading.Condition()
+        self._scheduler: Optional[threading.Thread] = None
+        self._stopped = False
+
+    # ==================== 对外接口 ====================
+
+    def submit(self, provider: str, params: Dict[str, Any], topic_id: Optional[str] = None) -> Dict[str, Any]:
+        """向供应商提交任务并开始后台轮询；返回任务记录或 {'error': ...}"""
+        adapter = self.providers.get(provider)
+        if adapter is None:
+            return {'error': f'不支持的供应商: {provider}'}
+        task_id, raw = adapter.submit(params)
+        if not task_id:
+            return {'error': raw.get('error') or '供应商未返回任务 ID', 'raw': raw.get('raw')}
+
+        job = MediaJob(
+            job_id=f"mj_{uuid.uuid4().hex[:16]}",
+            provider=provider,
+            task_id=task_id,
+            prompt=params.get('prompt') or params.get('prompt_text'),
+            model=raw.get('model') or params.get('model'),
+            config_id=params.get('config_id'),
+            topic_id=topic_id,
+            poll_interval=self.min_interval,
+        )
+        self._insert(job)
+        self._track(job, self.min_interval)
+        self._publish(job)
+        print(f"[MediaJob] Submitted {job.job_id} ({provider} task {task_id})")
+        return job.to_dict()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id) or self._finished.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        row = self._fetch_row(job_id)
+        return MediaJob.from_row(row).to_dict() if row else None
+
+    def list_jobs(self, active_only: bool = False, limit: int = 50) -> List[Dict[str, Any]]:
+        conn = self.get_connection()
+        if not conn:
+            return [j.to_dict() for j in self._jobs.values()]
+        try:
+            cursor = conn.cursor(_dict_cursor())
+            where = "WHERE status NOT IN ('succeeded', 'failed')" if active_only else ''
+            cursor.execute(f"SELECT * FROM media_jobs {where} ORDER BY created_at DESC LIMIT %s", (limit,))
+            rows = cursor.fetchall() or []
+            cursor.close()
+        finally:
+            conn.close()
+        return [MediaJob.from_row(r).to_dict() for r in rows]
+
+    def resume(self) -> int:
+        """
+        进程启动时恢复未完成任务的轮询，并定期回收租约过期的下载
+
+        租约已过期的 downloading 任务（持有进程在下载途中退出）落库回到 running，下载前的条件
+        UPDATE 才能重新抢占；租约仍有效的由持有进程继续下载，不恢复。持有进程之后才退出的
+        （含重启快于租约时长的情况）由每个租约周期一次的回收接管。
+        """
+        resumed = self._reclaim_expired()
+        if resumed is None:
+            return 0
+        with self._cond:
+            self._push(_RECLAIM, self.lease_seconds)
+        if resumed:
+            print(f"[MediaJob] Resumed {resumed} pending job(s)")
+        return resumed
+
+    def _reclaim_expired(self) -> Optional[int]:
+        """放回租约过期的下载并跟踪本进程尚未跟踪的 running 任务；返回新跟踪数，数据库不可用时 None"""
+        conn = self.get_connection()
+        if not conn:
+            return None
+        try:
+            cursor = conn.cursor(_dict_cursor())
+            cursor.execute(
+                """
+                UPDATE media_jobs SET status = %s, lease_owner = NULL
+                WHERE status = %s AND (heartbeat_at IS NULL OR heartbeat_at < NOW() - INTERVAL %s SECOND)
+                """,
+                (STATUS_RUNNING, STATUS_DOWNLOADING, math.ceil(self.lease_seconds)),
+            )
+            conn.commit()
+            cursor.execute("SELECT * FROM media_jobs WHERE status = %s", (STATUS_RUNNING,))
+            rows = cursor.fetchall() or []
+            cursor.close()
+        except Exception as e:
+            print(f"[MediaJob] Failed to load pending jobs: {e}")
+            return None
+        finally:
+            conn.close()
+        tracked = 0
+        for row in rows:
+            job = MediaJob.from_row(row)
+            if job.job_id in self._jobs:
+                continue
+            self._persisted.add(job.job_id)
+            job.poll_interval = self.min_interval
+            self._track(job, self.min_interval)
+            tracked += 1
+        return tracked
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._executor.shutdown(wait=False)
+
+    # ==================== 调度 ====================
+
+    def _track(self, job: MediaJob, delay: float) -> None:
+        with self._cond:
+            self._jobs[job.job_id] = job
+            self._push(job.job_id, delay)
+
+    def _push(self, key: str, delay: float) -> None:
+        """加入调度堆（调用方持有 self._cond）；首次调用时启动调度线程"""
+        heapq.heappush(self._heap, (time.time() + delay, key))
+        if self._scheduler is None:
+            self._scheduler = threading.Thread(target=self._run_scheduler, name='media-job-scheduler',
+                                               daemon=True)
+            self._scheduler.start()
+        self._cond.notify()
+
+    def _run_scheduler(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped and (not self._heap or self._heap[0][0] > time.time()):
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+                _, job_id = heapq.heappop(self._heap)
+                if job_id == _RECLAIM:
+                    # 定期回收租约过期的下载（持有进程已退出）
+                    heapq.heappush(self._heap, (time.time() + self.lease_seconds, _RECLAIM))
+                    self._executor.submit(self._reclaim_expired)
+                    continue
+                job = self._jobs.get(job_id)
+            if job is not None and job.status == STATUS_RUNNING:
+                self._executor.submit(self._poll, job)
+
+    def _reschedule(self, job: MediaJob) -> None:
+        job.poll_interval = min(self.max_interval, max(self.min_interval, job.poll_interval * self.backoff))
+        with self._cond:
+            heapq.heappush(self._heap, (time.time() + job.poll_interval, job.job_id))
+            self._cond.notify()
+
+    # ==================== 轮询 / 完成 ====================
+
+    def _poll(self, job: MediaJob) -> None:
+        if not _acquire_poll_lock(job.job_id, int(self.min_interval) or 1):
+            # 其他进程正在查询该任务
+            self._reschedule(job)
+            return
+        try:
+            if time.time() - job.created_at > self.timeout:
+                self._finish(job, STATUS_FAILED, error='任务超时')
+                return
+            job.attempts += 1
+            result = self.providers[job.provider].status(job) or {}
+            provider_status = (result.get('status') or '').upper()
+            changed = provider_status != job.provider_status
+            job.provider_status = provider_status or job.provider_status
+
+            if provider_status in _SUCCEEDED:
+                if result.get('output'):
+                    self._complete(job, result['output'])
+                else:
+                    self._finish(job, STATUS_FAILED, error=result.get('error') or '任务完成但未返回产出')
+                return
+            if provider_status in _FAILED:
+                self._finish(job, STATUS_FAILED, error=result.get('error') or f'状态: {provider_status}')
+                return
+
+            if result.get('error'):
+                job.errors += 1
+                if job.errors >= MAX_CONSECUTIVE_ERRORS:
+                    self._finish(job, STATUS_FAILED, error=result['error'])
+                    return
+            else:
+                job.errors = 0
+            self._save_progress(job)
+            if changed:
+                self._publish(job)
+            self._reschedule(job)
+        except Exception as e:
+            print(f"[MediaJob] Poll failed for {job.job_id}: {e}")
+            job.errors += 1
+            if job.errors >= MAX_CONSECUTIVE_ERRORS:
+                self._finish(job, STATUS_FAILED, error=str(e))
+            else:
+                self._reschedule(job)
+
+    def _complete(self, job: MediaJob, output: Any) -> None:
+        """下载产出到媒体产出库（条件 UPDATE 抢占，多进程只下载一次）"""
+        claimed = self._claim_download(job)
+        if claimed is None:
+            # 数据库暂不可用：不冒险重复下载，稍后重试
+            self._reschedule(job)
+            return
+        if not claimed:
+            with self._cond:
+                self._jobs.pop(job.job_id, None)
+            self._persisted.discard(job.job_id)
+            return
+        job.status = STATUS_DOWNLOADING
+        self._publish(job)
+        lease_lost = threading.Event()
+        try:
+            from services.media_output_service import get_media_output_service
+            chunks, content_type = self.providers[job.provider].download(job, output)
+            saved = get_media_output_service().save_output_stream(
+                self._renewing(job, chunks, lease_lost),
+                media_type=job.media_type,
+                mime_type=content_type,
+                prompt=job.prompt,
+                model=job.model,
+                provider=job.provider,
+                source='generated',
+                metadata={'job_id': job.job_id, 'task_id': job.task_id, 'config_id': job.config_id},
+            )
+        except Exception as e:
+            saved = {'error': str(e)}
+        if lease_lost.is_set():
+            # 其他进程已接管下载：不写任务状态，交给新的持有者
+            print(f"[MediaJob] Lost download lease for {job.job_id}, leaving it to the new owner")
+            with self._cond:
+                self._jobs.pop(job.job_id, None)
+            self._persisted.discard(job.job_id)
+            return
+        if saved.get('error'):
+            self._finish(job, STATUS_FAILED, error=f"下载产出失败: {saved['error']}")
+        else:
+            job.output_id = saved.get('output_id')
+            self._finish(job, STATUS_SUCCEEDED)
+
+    def _finish(self, job: MediaJob, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        self._save_progress(job)
+        self._persisted.discard(job.job_id)
+        with self._cond:
+            self._jobs.pop(job.job_id, None)
+            self._finished[job.job_id] = job
+            while len(self._finished) > RECENT_FINISHED:
+                self._finished.popitem(last=False)
+        self._publish(job)
+        print(f"[MediaJob] {job.job_id} {status} after {job.attempts} poll(s)"
+              + (f": {error}" if error else f", output={job.output_id}"))
+
+    def _publish(self, job: MediaJob) -> None:
+        if not job.topic_id:
+            return
+        try:
+            from services.topic_service import TopicEventType, get_topic_service
+            get_topic_service()._publish_event(job.topic_id, TopicEventType.MEDIA_JOB_UPDATE, job.to_dict())
+        except Exception as e:
+            print(f"[MediaJob] Failed to publish job update: {e}")
+
+    # ==================== 持久化 ====================
+
+    def _insert(self, job: MediaJob) -> None:
+        conn = self.get_connection()
+        if not conn:
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO media_jobs (job_id, provider, task_id, media_type, status, prompt, model,
+                                        config_id, topic_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                (job.job_id, job.provider, job.task_id, job.media_type, job.status, job.prompt, job.model,
+                 job.config_id, job.topic_id),
+            )
+            conn.commit()
+            cursor.close()
+            self._persisted.add(job.job_id)
+        except Exception as e:
+            print(f"[MediaJob] Failed to persist job {job.job_id}: {e}")
+        finally:
+            conn.close()
+
+    def _save_progress(self, job: MediaJob) -> None:
+        conn = self.get_connection()
+        if not conn:
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE media_jobs
+                SET status = %s, provider_status = %s, attempts = %s, output_id = %s, error = %s,
+                    finished_at = %s
+                WHERE job_id = %s
+                """,
+                (job.status, job.provider_status, job.attempts, job.output_id, job.error,
+                 datetime.fromtimestamp(job.finished_at) if job.finished_at else None, job.job_id),
+            )
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            print(f"[MediaJob] Failed to update job {job.job_id}: {e}")
+        finally:
+            conn.close()
+
+    def _claim_download(self, job: MediaJob) -> Optional[bool]:
+        """
+        条件 UPDATE running -> downloading 抢占下载，同时取得下载租约
+
+        Returns:
+            True 抢占成功；False 已被其他进程抢占；None 数据库不可用（调用方稍后重试）
+        """
+        if job.job_id not in self._persisted:
+            return True  # 未落库的任务只有本进程可见
+        conn = self.get_connection()
+        if not conn:
+            return None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE media_jobs SET status = %s, lease_owner = %s, heartbeat_at = NOW()
+                WHERE job_id = %s AND status = %s
+                """,
+                (STATUS_DOWNLOADING, self.worker_id, job.job_id, STATUS_RUNNING),
+            )
+            conn.commit()
+            claimed = cursor.rowcount == 1
+            cursor.close()
+            return claimed
+        except Exception as e:
+            print(f"[MediaJob] Failed to claim job {job.job_id}: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def _renew_lease(self, job: MediaJob) -> Optional[bool]:
+        """
+        续约下载租约
+
+        Returns:
+            True 续约成功；False 租约已被其他进程接管；None 数据库暂不可用（继续下载，下次再续）
+        """
+        conn = self.get_connection()
+        if not conn:
+            return None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE media_jobs SET heartbeat_at = NOW() WHERE job_id = %s AND lease_owner = %s",
+                (job.job_id, self.worker_id),
+            )
+            conn.commit()
+            renewed = cursor.rowcount == 1
+            cursor.close()
+            return renewed
+        except Exception as e:
+            print(f"[MediaJob] Failed to renew lease for {job.job_id}: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def _renewing(self, job: MediaJob, chunks: Iterator[bytes], lost: threading.Event) -> Iterator[bytes]:
+        """下载块迭代器：每 1/4 租约续约一次，租约被接管时中止下载（已写入的临时文件由产出库清理）"""
+        if job.job_id not in self._persisted:
+            yield from chunks
+            return
+        interval = self.lease_seconds / 4
+        renewed_at = time.monotonic()
+        for chunk in chunks:
+            if time.monotonic() - renewed_at >= interval:
+                if self._renew_lease(job) is False:
+                    lost.set()
+                    raise LeaseLostError(f'download lease for {job.job_id} taken over')
+                renewed_at = time.monotonic()
+            yield chunk
+
+    def _fetch_row(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self.get_connection()
+        if not conn:
+            return None
+        try:
+            cursor = conn.cursor(_dict_cursor())
+            cursor.execute("SELECT * FROM media_jobs WHERE job_id = %s", (job_id,))
+            row = cursor.fetchone()
+            cursor.close()
+            return row
+        finally:
+            conn.close()
+
+
+def _dict_cursor():
+    import pymysql
+    return pymysql.cursors.DictCursor
+
+
+def _acquire_poll_lock(job_id: str, ttl: int) -> bool:
+    """多进程去重：同一任务同一时间只有一个进程查询（Redis 不可用时直接放行）"""
+    try:
+        from database import get_redis_client
+        redis = get_redis_client()
+        if redis is None:
+            return True
+        return bool(redis.set(f"media_job:poll:{job_id}", '1', nx=True, ex=ttl))
+    except Exception:
+        return True
+
+
+media_job_service: Optional[MediaJobService] = None
+
+
+def init_media_job_service(get_connection, cfg: Optional[Dict[str, Any]] = None) -> MediaJobService:
+    """初始化媒体任务编排器并恢复未完成任务"""
+    global media_job_service
+    cfg = cfg or {}
+    media_job_service = MediaJobService(
+        get_connection,
+        max_workers=int(cfg.get('workers', 4)),
+        min_interval=float(cfg.get('min_poll_seconds', 5)),
+        max_interval=float(cfg.get('max_poll_seconds', 60)),
+        backoff=float(cfg.get('backoff', 1.5)),
+        timeout=float(cfg.get('timeout_seconds', 1800)),
+        lease_seconds=float(cfg.get('lease_seconds', DOWNLOAD_LEASE_SECONDS)),
+    )
+    media_job_service.resume()
+    return media_job_service
+
+
+def get_media_job_service() -> MediaJobService:
+    """获取媒体任务编排器实例"""
+    if media_job_service is None:
+        raise RuntimeError('Media job service not initialized')
+    return media_job_service
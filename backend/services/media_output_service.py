@@ -1,14 +1,23 @@
 """
 媒体创作产出服务层
 负责文件存储与数据库 CRUD
+
+文件写入是流式的（save_output_stream）：输入可以是 bytes / base64 字符串 / 文件对象 / 块迭代器，
+base64 按块增量解码，边写临时文件边计算 sha256，完成后原子 rename，
+几百 MB 的视频不会在内存中出现多份完整副本。
 """
 
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, Iterator, List, Union
 from datetime import datetime
 import uuid
 import base64
+import binascii
+import hashlib
 import logging
+import os
+import re
+import tempfile
 
 from models.media_output import MediaOutput, MediaOutputRepository
 
@@ -18,6 +27,89 @@ logger = logging.getLogger(__name__)
 BACKEND_ROOT = Path(__file__).resolve().parent.parent
 UPLOADS_MEDIA = BACKEND_ROOT / 'uploads' / 'media'
 
+# 流式写入的块大小
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+_NON_B64 = re.compile(rb'[^A-Za-z0-9+/=]')
+
+
+class Base64StreamDecoder:
+    """
+    增量 base64 解码器
+
+    支持 data URI 前缀（data:xxx;base64,）跨块出现；与 b64decode 默认行为一致，忽略非字母表字符。
+
+    Example:
+        decoder = Base64StreamDecoder()
+        for chunk in chunks:
+            out.write(decoder.feed(chunk))
+        out.write(decoder.flush())
+    """
+
+    _MAX_PREFIX = 256
+
+    def __init__(self):
+        self._pending = b''
+        self._prefix: Optional[bytes] = b''  # None 表示前缀已处理
+
+    def feed(self, chunk: Union[bytes, str]) -> bytes:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('ascii', errors='ignore')
+        if self._prefix is not None:
+            self._prefix += chunk
+            head = self._prefix.lstrip()
+            if head[:5] == b'data:'[:len(head)] and len(head) < 5:
+                return b''  # 还无法判断是否为 data URI
+            if head.startswith(b'data:'):
+                comma = head.find(b',')
+                if comma < 0:
+                    if len(head) > self._MAX_PREFIX:
+                        raise ValueError('data URI 前缀过长')
+                    return b''
+                chunk = head[comma + 1:]
+            else:
+                chunk = self._prefix
+            self._prefix = None
+        data = self._pending + _NON_B64.sub(b'', chunk)
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return base64.b64decode(data[:usable]) if usable else b''
+
+    def flush(self) -> bytes:
+        tail = self._pending
+        if self._prefix is not None:
+            tail = _NON_B64.sub(b'', self._prefix)
+            self._prefix = None
+        self._pending = b''
+        if not tail:
+            return b''
+        # 缺少填充时补齐（与一次性 b64decode 同样严格：长度余 1 仍报错）
+        return base64.b64decode(tail + b'=' * (-len(tail) % 4))
+
+
+def iter_chunks(stream: Any, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Union[bytes, str]]:
+    """把 bytes / str / 文件对象 / 块迭代器统一成块迭代（bytes 与 str 按切片产出，不复制整体）"""
+    if isinstance(stream, (bytes, bytearray, memoryview)):
+        view = memoryview(stream)
+        for i in range(0, len(view), chunk_size):
+            yield view[i:i + chunk_size].tobytes()
+        return
+    if isinstance(stream, str):
+        for i in range(0, len(stream), chunk_size):
+            yield stream[i:i + chunk_size]
+        return
+    read = getattr(stream, 'read', None)
+    if callable(read):
+        while True:
+            chunk = read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+        return
+    for chunk in stream:
+        if chunk:
+            yield chunk
+
 
 media_output_service: Optional['MediaOutputService'] = None
 
@@ -83,17 +175,69 @@ class MediaOutputService:
         保存产出：写入文件 + 写入数据库。
         file_data: 图片或视频的二进制数据，或 base64 字符串（含 data:xxx;base64, 前缀时会自动剥离）。
         """
-        if isinstance(file_data, str):
-            raw = file_data.strip()
-            if raw.startswith('data:'):
-                if ';base64,' in raw:
-                    raw = raw.split(';base64,', 1)[1]
-                else:
-                    raw = raw.split(',', 1)[-1]
+        return self.save_output_stream(
+            file_data,
+            media_type=media_type,
+            mime_type=mime_type,
+            prompt=prompt,
+            model=model,
+            provider=provider,
+            source=source,
+            metadata=metadata,
+            output_id=output_id,
+            base64_encoded=isinstance(file_data, str),
+        )
+
+    def _write_stream(self, stream: Any, target: Path, base64_encoded: bool) -> tuple:
+        """流式写入临时文件并原子 rename 到 target，返回 (字节数, sha256)"""
+        decoder = Base64StreamDecoder() if base64_encoded else None
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=str(target.parent), prefix=f'.{target.stem}-', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter_chunks(stream):
+                    if decoder is not None:
+                        chunk = decoder.feed(chunk)
+                    elif isinstance(chunk, str):
+                        raise TypeError('二进制流中出现 str 块，请设置 base64_encoded=True')
+                    if chunk:
+                        f.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                if decoder is not None:
+                    tail = decoder.flush()
+                    if tail:
+                        f.write(tail)
+                        digest.update(tail)
+                        size += len(tail)
+            os.replace(tmp_path, target)
+        except BaseException:
             try:
-                file_data = base64.b64decode(raw)
-            except Exception as e:
-                return {'error': f'base64 解码失败: {e}'}
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return size, digest.hexdigest()
+
+    def save_output_stream(
+        self,
+        stream: Any,
+        media_type: str,
+        mime_type: Optional[str] = None,
+        prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        provider: Optional[str] = None,
+        source: str = 'generated',
+        metadata: Optional[Dict[str, Any]] = None,
+        output_id: Optional[str] = None,
+        base64_encoded: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        流式保存产出。
+        stream: bytes / str / 文件对象（read(n)）/ 块迭代器（如 requests 的 iter_content）
+        base64_encoded: 输入为 base64 文本（可带 data URI 前缀）时为 True，按块增量解码
+        """
         output_id = output_id or f"mo_{uuid.uuid4().hex[:16]}"
         ext = self._ext_from_mime(mime_type, media_type)
         month_dir = self._month_dir()
@@ -101,13 +245,17 @@ class MediaOutputService:
         file_path_obj = month_dir / filename
         # 存库用相对路径，便于迁移
         relative_path = f"uploads/media/{month_dir.name}/{filename}"
-        file_size = len(file_data)
 
         try:
-            file_path_obj.write_bytes(file_data)
+            file_size, sha256 = self._write_stream(stream, file_path_obj, base64_encoded)
+        except (binascii.Error, ValueError) as e:
+            return {'error': f'base64 解码失败: {e}'}
         except Exception as e:
             logger.exception("[MediaOutput] Failed to write file")
             return {'error': f'写入文件失败: {e}'}
+        if file_size == 0:
+            file_path_obj.unlink(missing_ok=True)
+            return {'error': '文件内容为空'}
 
         output = MediaOutput(
             output_id=output_id,
@@ -119,7 +267,7 @@ class MediaOutputService:
             provider=provider,
             source=source,
             file_size=file_size,
-            metadata=metadata,
+            metadata={**(metadata or {}), 'sha256': sha256},
         )
         if not self.repository.save(output):
             try:
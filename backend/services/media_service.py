@@ -741,13 +741,15 @@ def gemini_video_status(task_name: str, config_id: Optional[str] = None) -> Dict
         return {'error': str(e), 'status': 'UNKNOWN'}
 
 
-def gemini_video_download(video_uri: str, config_id: Optional[str] = None) -> Dict[str, Any]:
+def gemini_video_download(video_uri: str, config_id: Optional[str] = None,
+                          chunk_size: int = 1024 * 1024) -> Dict[str, Any]:
     """
     代理下载 Gemini Veo 生成的视频。
     根据官方文档，下载视频 URI 需要附带 x-goog-api-key header。
-    返回视频的二进制内容和 content-type，或错误信息。
+    以流式方式返回视频内容（不在内存中缓冲整个文件），可直接转发给前端
+    或交给 MediaOutputService.save_output_stream 落盘。
 
-    Returns: {'data': bytes, 'content_type': str} or {'error': str}
+    Returns: {'chunks': Iterator[bytes], 'content_type': str, 'content_length': int | None} or {'error': str}
     """
     try:
         svc = _get_llm_service()
@@ -764,15 +766,32 @@ def gemini_video_download(video_uri: str, config_id: Optional[str] = None) -> Di
         }
 
         logger.info(f'[Gemini Video] Downloading video from: {video_uri[:100]}...')
-        r = requests.get(video_uri, headers=headers, timeout=120, allow_redirects=True)
+        r = requests.get(video_uri, headers=headers, timeout=120, allow_redirects=True, stream=True)
         if r.status_code != 200:
             err_text = r.text[:300] if r.text else f'HTTP {r.status_code}'
+            r.close()
             logger.error(f'[Gemini Video] Download failed: {err_text}')
             return {'error': f'视频下载失败 (HTTP {r.status_code})'}
 
         content_type = r.headers.get('Content-Type', 'video/mp4')
-        logger.info(f'[Gemini Video] Downloaded {len(r.content)} bytes, type={content_type}')
-        return {'data': r.content, 'content_type': content_type}
+        content_length = r.headers.get('Content-Length')
+
+        def _chunks():
+            received = 0
+            try:
+                for chunk in r.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        received += len(chunk)
+                        yield chunk
+            finally:
+                r.close()
+                logger.info(f'[Gemini Video] Streamed {received} bytes, type={content_type}')
+
+        return {
+            'chunks': _chunks(),
+            'content_type': content_type,
+            'content_length': int(content_length) if content_length and content_length.isdigit() else None,
+        }
 
     except Exception as e:
         logger.exception('[Gemini Video] Download error')
@@ -113,7 +113,7 @@ class MessageCacheService:
         
         # 检查内容中是否有 base64 图片
         content = message.get('content', '')
-        if content and ('data:image/' in content or 'base64,' in content):
+        if content and ('data:image/' in content or 'base64,' in content or '/api/blobs/' in content):
             return True
         
         return False
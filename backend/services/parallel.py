@@ -17,6 +17,7 @@
 from __future__ import annotations
 
 import asyncio
+import contextvars
 import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, Future, as_completed, TimeoutError
@@ -246,7 +247,7 @@ class ParallelExecutor:
             
             for task_id, func in tasks:
                 start_time = time.time()
-                future = executor.submit(self._execute_single, func)
+                future = executor.submit(contextvars.copy_context().run, self._execute_single, func)
                 future_to_task[future] = (task_id, start_time)
             
             # 收集结果
@@ -396,7 +397,7 @@ class BatchExecutor:
         # 使用线程池并行执行
         with ThreadPoolExecutor(max_workers=self._max_concurrent) as pool:
             for i, item in enumerate(items):
-                pool.submit(execute_with_retry, i, item)
+                pool.submit(contextvars.copy_context().run, execute_with_retry, i, item)
             
             wg.wait(timeout=self._timeout * len(items))
         
@@ -562,10 +563,10 @@ def execute_mcp_tools_parallel(
         finally:
             wg.done()
     
-    # 启动所有任务
+    # 启动所有任务（复制 contextvars：本轮取消令牌随之传入 call_mcp_tool）
     with ThreadPoolExecutor(max_workers=max_concurrent) as pool:
         for i, tc in enumerate(tool_calls):
-            pool.submit(worker, i, tc)
+            pool.submit(contextvars.copy_context().run, worker, i, tc)
         
         # 等待完成（带总超时）
         total_timeout = timeout * len(tool_calls) / max_concurrent + 10
@@ -9,7 +9,10 @@ from typing import List, Optional, Dict, Any, Generator
 import json
 import requests
 
-from .base import BaseLLMProvider, LLMMessage, LLMResponse
+from .base import BaseLLMProvider, LLMMessage, LLMResponse, make_usage, split_cache_blocks
+
+# Anthropic 单次请求最多 4 个 cache_control 断点
+MAX_CACHE_BREAKPOINTS = 4
 
 
 class AnthropicProvider(BaseLLMProvider):
@@ -49,10 +52,11 @@ class AnthropicProvider(BaseLLMProvider):
     
     def chat_stream(self, messages: List[LLMMessage], **kwargs) -> Generator[str, None, LLMResponse]:
         """流式聊天"""
+        # 使用 return (yield from ...) 以传递 generator 的返回值（含 usage）
         if self.sdk_available and self._client:
-            yield from self._chat_stream_sdk(messages, **kwargs)
+            return (yield from self._chat_stream_sdk(messages, **kwargs))
         else:
-            yield from self._chat_stream_rest(messages, **kwargs)
+            return (yield from self._chat_stream_rest(messages, **kwargs))
     
     def _chat_sdk(self, messages: List[LLMMessage], **kwargs) -> LLMResponse:
         """使用 SDK 的非流式聊天"""
@@ -77,10 +81,7 @@ class AnthropicProvider(BaseLLMProvider):
             return LLMResponse(
                 content=content,
                 finish_reason=response.stop_reason,
-                usage={
-                    'prompt_tokens': response.usage.input_tokens if response.usage else 0,
-                    'completion_tokens': response.usage.output_tokens if response.usage else 0,
-                } if response.usage else None,
+                usage=self._parse_usage(response.usage.model_dump()) if response.usage else None,
                 raw=response.model_dump()
             )
         except Exception as e:
@@ -102,20 +103,24 @@ class AnthropicProvider(BaseLLMProvider):
             
             full_content = ""
             finish_reason = None
+            usage = None
             
             with self._client.messages.stream(**create_params) as stream:
-                for text in stream.text_stream:
+                for text in self._cancellable(stream.text_stream, stream):
                     full_content += text
                     yield text
                 
-                # 获取最终响应
-                final_message = stream.get_final_message()
+                # 获取最终响应（被取消时连接已关闭，只返回已生成的部分）
+                final_message = None if self._stream_cancelled() else stream.get_final_message()
                 if final_message:
                     finish_reason = final_message.stop_reason
+                    if final_message.usage:
+                        usage = self._parse_usage(final_message.usage.model_dump())
             
             return LLMResponse(
                 content=full_content,
-                finish_reason=finish_reason
+                finish_reason=finish_reason,
+                usage=usage
             )
         except Exception as e:
             self._log_error(f"SDK stream error: {e}", e)
@@ -151,6 +156,7 @@ class AnthropicProvider(BaseLLMProvider):
         return LLMResponse(
             content=content,
             finish_reason=data.get('stop_reason'),
+            usage=self._parse_usage(data['usage']) if data.get('usage') else None,
             raw=data
         )
     
@@ -181,8 +187,10 @@ class AnthropicProvider(BaseLLMProvider):
         
         full_content = ""
         finish_reason = None
+        # message_start 携带输入 token（含缓存命中），message_delta 携带累计输出 token
+        raw_usage: Dict[str, Any] = {}
         
-        for line in response.iter_lines():
+        for line in self._cancellable(response.iter_lines(), response):
             if line:
                 line = line.decode('utf-8')
                 if line.startswith('data: '):
@@ -194,31 +202,64 @@ class AnthropicProvider(BaseLLMProvider):
                                 text = delta.get('text', '')
                                 full_content += text
                                 yield text
+                        elif data.get('type') == 'message_start':
+                            raw_usage.update(data.get('message', {}).get('usage') or {})
                         elif data.get('type') == 'message_delta':
                             finish_reason = data.get('delta', {}).get('stop_reason')
+                            raw_usage.update(data.get('usage') or {})
                     except json.JSONDecodeError:
                         continue
         
         return LLMResponse(
             content=full_content,
-            finish_reason=finish_reason
+            finish_reason=finish_reason,
+            usage=self._parse_usage(raw_usage) if raw_usage else None
         )
     
     def _split_messages(self, messages: List[LLMMessage]) -> tuple:
-        """分离 system 消息和用户消息"""
-        system_msg = None
+        """
+        分离 system 消息和用户消息
+
+        多条 system 消息（人设 + 对话摘要）合并为 system 内容块；带 cache_breakpoints 的
+        system 消息在断点处切分，断点前的块标记 cache_control（最多保留最后 4 个断点）。
+        无断点时仍返回纯字符串。
+        """
+        system_blocks: List[Dict[str, Any]] = []
         user_msgs = []
         
         for msg in messages:
             if msg.role == 'system':
-                system_msg = msg.content
+                for text, cached in split_cache_blocks(msg.content, msg.cache_breakpoints):
+                    block = {'type': 'text', 'text': text}
+                    if cached:
+                        block['cache_control'] = {'type': 'ephemeral'}
+                    system_blocks.append(block)
             else:
                 user_msgs.append({
                     'role': msg.role,
                     'content': msg.content
                 })
         
-        return system_msg, user_msgs
+        if not system_blocks:
+            return None, user_msgs
+        marked = [b for b in system_blocks if 'cache_control' in b]
+        if not marked:
+            return "\n\n".join(b['text'] for b in system_blocks), user_msgs
+        for block in marked[:-MAX_CACHE_BREAKPOINTS]:
+            del block['cache_control']
+        return system_blocks, user_msgs
+    
+    @staticmethod
+    def _parse_usage(raw: Dict[str, Any]) -> Dict[str, int]:
+        """Anthropic 的 input_tokens 不含缓存读写部分，这里折算为输入总数"""
+        cache_read = raw.get('cache_read_input_tokens') or 0
+        cache_creation = raw.get('cache_creation_input_tokens') or 0
+        return make_usage(
+            prompt_tokens=(raw.get('input_tokens') or 0) + cache_read + cache_creation,
+            completion_tokens=raw.get('output_tokens'),
+            cached_tokens=cache_read,
+            cache_creation_tokens=cache_creation,
+        )
     
     def models(self) -> List[str]:
         """
@@ -6,8 +6,14 @@ LLM Provider 基类
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any, Generator
-import traceback
+from typing import List, Optional, Dict, Any, Generator, Iterable, Iterator, Tuple
+import logging
+
+from utils.cancellation import current_cancel_token
+from utils.log_pipeline import get_category_logger, log_event
+
+# Provider 日志走 llm 分类（队列异步写出，见 utils/log_pipeline）
+_llm_log = get_category_logger("llm")
 
 
 @dataclass
@@ -19,6 +25,8 @@ class LLMMessage:
     tool_calls: Optional[List[Dict[str, Any]]] = None
     tool_call_id: Optional[str] = None
     name: Optional[str] = None
+    # 提示词缓存断点（content 中的字符偏移，断点之前的内容可被 Provider 缓存）
+    cache_breakpoints: Optional[List[int]] = None
 
 
 @dataclass
@@ -33,6 +41,48 @@ class LLMResponse:
     raw: Optional[Dict[str, Any]] = None
 
 
+def split_cache_blocks(text: str, breakpoints: Optional[List[int]]) -> List[Tuple[str, bool]]:
+    """
+    按缓存断点切分文本
+
+    Returns:
+        [(片段, 片段之后是否为缓存断点)]
+    """
+    if not breakpoints:
+        return [(text, False)] if text else []
+    pieces: List[Tuple[str, bool]] = []
+    start = 0
+    for offset in sorted(set(breakpoints)):
+        if start < offset <= len(text):
+            pieces.append((text[start:offset], True))
+            start = offset
+    if start < len(text):
+        pieces.append((text[start:], False))
+    return pieces
+
+
+def make_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int],
+               total_tokens: Optional[int] = None, cached_tokens: Optional[int] = None,
+               cache_creation_tokens: Optional[int] = None) -> Dict[str, int]:
+    """
+    统一的 usage 字典
+
+    prompt_tokens 为输入 token 总数（含缓存命中部分）；cached_tokens 为其中命中提示词缓存的部分
+    """
+    prompt_tokens = int(prompt_tokens or 0)
+    completion_tokens = int(completion_tokens or 0)
+    usage = {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': int(total_tokens) if total_tokens else prompt_tokens + completion_tokens,
+    }
+    if cached_tokens is not None:
+        usage['cached_tokens'] = int(cached_tokens or 0)
+    if cache_creation_tokens:
+        usage['cache_creation_tokens'] = int(cache_creation_tokens)
+    return usage
+
+
 class BaseLLMProvider(ABC):
     """LLM Provider 基类"""
     
@@ -114,13 +164,56 @@ class BaseLLMProvider(ABC):
             for msg in messages
         ]
     
+    def _cancellable(self, iterable: Iterable[Any], closeable: Any = None) -> Iterator[Any]:
+        """
+        按当前上下文的取消令牌包装流式迭代
+
+        每个分片前检查令牌（内存读）；取消时立即调用 closeable.close() 关闭 HTTP 响应，
+        迭代随即结束（关闭连接引发的读错误视为正常结束），调用方返回已生成的部分。
+        closeable 可以是 SDK 返回的流生成器：正在读取时无法从其他线程关闭，
+        退出迭代后会再关闭一次（生成器退出时释放底层 HTTP 响应）。
+        未绑定令牌时原样迭代。
+        """
+        token = current_cancel_token()
+        if token is None:
+            yield from iterable
+            return
+        close = getattr(closeable, 'close', None)
+        unregister = token.on_cancel(close)
+        try:
+            for item in iterable:
+                if token.cancelled:
+                    break
+                yield item
+        except Exception:
+            if not token.cancelled:
+                raise
+        finally:
+            unregister()
+            if token.cancelled and close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+        if token.cancelled:
+            self._log(f"Stream cancelled: {token.reason}")
+
+    @staticmethod
+    def _stream_cancelled() -> bool:
+        """当前上下文的取消令牌是否已触发"""
+        token = current_cancel_token()
+        return token is not None and token.cancelled
+
     def _log(self, message: str, level: str = "info"):
         """日志输出"""
-        prefix = f"[{self.provider_type.upper()}Provider]"
-        print(f"{prefix} {message}")
+        log_event(
+            _llm_log, getattr(logging, str(level).upper(), logging.INFO),
+            message, provider=self.provider_type,
+        )
     
     def _log_error(self, message: str, exc: Optional[Exception] = None):
         """错误日志"""
-        self._log(f"ERROR: {message}", "error")
-        if exc:
-            traceback.print_exc()
+        _llm_log.error(
+            "%s", message, exc_info=exc if exc else None,
+            extra={"fields": {"provider": self.provider_type}},
+        )
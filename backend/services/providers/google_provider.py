@@ -11,7 +11,7 @@ import base64
 import time
 import requests
 
-from .base import BaseLLMProvider, LLMMessage, LLMResponse
+from .base import BaseLLMProvider, LLMMessage, LLMResponse, make_usage
 
 # 模块级缓存: (api_url, api_key) -> (timestamp, list_models_result)，TTL 5 分钟
 _LIST_MODELS_CACHE: Dict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]] = {}
@@ -58,10 +58,8 @@ class GoogleProvider(BaseLLMProvider):
                 http_options['base_url'] = base_url
                 if is_official:
                     self._log(f"✅ Using official API URL: {base_url}")
-                    print(f"[GEMINIProvider] ✅ SDK 使用官方 API: {base_url}")
                 else:
                     self._log(f"✅ Using custom API URL (proxy): {base_url}")
-                    print(f"[GEMINIProvider] ✅ SDK 使用代理: {base_url}")
             
             # 2. 检查系统代理环境变量（HTTP_PROXY / HTTPS_PROXY）
             http_proxy = os.environ.get('HTTPS_PROXY') or os.environ.get('HTTP_PROXY') or \
@@ -74,7 +72,6 @@ class GoogleProvider(BaseLLMProvider):
                     'timeout': 120.0,
                 }
                 self._log(f"✅ Using system proxy: {http_proxy}")
-                print(f"[GEMINIProvider] ✅ SDK 使用系统代理: {http_proxy}")
             
             # 3. 创建 Client
             if http_options.get('base_url') or http_options.get('client_args'):
@@ -86,8 +83,7 @@ class GoogleProvider(BaseLLMProvider):
             else:
                 # 无代理配置，直接使用官方 API
                 self._log("⚠️ No proxy configured, using official API directly")
-                print("[GEMINIProvider] ⚠️ 未检测到代理配置，直接使用官方 API")
-                print("[GEMINIProvider] 💡 提示：如遇地区限制，请设置环境变量 HTTPS_PROXY 或在 LLM 配置中设置 api_url")
+                self._log("Hint: set HTTPS_PROXY or api_url in the LLM config if the region is restricted")
                 self._client = genai.Client(api_key=self.api_key)
             
             self._types = types
@@ -220,7 +216,8 @@ class GoogleProvider(BaseLLMProvider):
             return LLMResponse(
                 content=content,
                 media=media if media else None,
-                finish_reason=response.candidates[0].finish_reason if response.candidates else None
+                finish_reason=response.candidates[0].finish_reason if response.candidates else None,
+                usage=self._parse_usage(getattr(response, 'usage_metadata', None))
             )
         except Exception as e:
             self._log_error(f"SDK chat error: {e}", e)
@@ -259,8 +256,12 @@ class GoogleProvider(BaseLLMProvider):
             full_content = ""
             finish_reason = None
             media = []
+            usage_metadata = None
             
-            for chunk in stream:
+            for chunk in self._cancellable(stream, stream):
+                # usage_metadata 为累计值，取最后一个
+                if getattr(chunk, 'usage_metadata', None):
+                    usage_metadata = chunk.usage_metadata
                 if chunk.candidates:
                     for candidate in chunk.candidates:
                         if candidate.content and candidate.content.parts:
@@ -301,7 +302,8 @@ class GoogleProvider(BaseLLMProvider):
             return LLMResponse(
                 content=full_content,
                 media=media if media else None,
-                finish_reason=finish_reason
+                finish_reason=finish_reason,
+                usage=self._parse_usage(usage_metadata)
             )
         except Exception as e:
             self._log_error(f"SDK stream error: {e}", e)
@@ -361,6 +363,7 @@ class GoogleProvider(BaseLLMProvider):
         return LLMResponse(
             content=content,
             media=media if media else None,
+            usage=self._parse_usage(data.get('usageMetadata')),
             raw=data
         )
     
@@ -382,13 +385,16 @@ class GoogleProvider(BaseLLMProvider):
         
         full_content = ""
         finish_reason = None
+        usage_metadata = None
         
-        for line in response.iter_lines():
+        for line in self._cancellable(response.iter_lines(), response):
             if line:
                 line = line.decode('utf-8')
                 if line.startswith('data: '):
                     try:
                         chunk = json.loads(line[6:])
+                        if chunk.get('usageMetadata'):
+                            usage_metadata = chunk['usageMetadata']
                         candidates = chunk.get('candidates', [])
                         if candidates:
                             parts = candidates[0].get('content', {}).get('parts', [])
@@ -404,7 +410,31 @@ class GoogleProvider(BaseLLMProvider):
         
         return LLMResponse(
             content=full_content,
-            finish_reason=finish_reason
+            finish_reason=finish_reason,
+            usage=self._parse_usage(usage_metadata)
+        )
+    
+    @staticmethod
+    def _parse_usage(meta: Any) -> Optional[Dict[str, int]]:
+        """
+        解析 usage_metadata（SDK 对象或 REST 的 usageMetadata）
+
+        Gemini 2.5 对重复前缀做隐式缓存，命中部分记在 cached_content_token_count
+        """
+        if not meta:
+            return None
+        if not isinstance(meta, dict):
+            meta = {
+                'promptTokenCount': getattr(meta, 'prompt_token_count', None),
+                'candidatesTokenCount': getattr(meta, 'candidates_token_count', None),
+                'totalTokenCount': getattr(meta, 'total_token_count', None),
+                'cachedContentTokenCount': getattr(meta, 'cached_content_token_count', None),
+            }
+        return make_usage(
+            prompt_tokens=meta.get('promptTokenCount'),
+            completion_tokens=meta.get('candidatesTokenCount'),
+            total_tokens=meta.get('totalTokenCount'),
+            cached_tokens=meta.get('cachedContentTokenCount') or 0,
         )
     
     def _get_api_url(self, stream: bool = False) -> str:
@@ -92,7 +92,7 @@ class OllamaProvider(BaseLLMProvider):
             
             full_content = ""
             
-            for chunk in stream:
+            for chunk in self._cancellable(stream, stream):
                 if chunk.get('message', {}).get('content'):
                     text = chunk['message']['content']
                     full_content += text
@@ -146,7 +146,7 @@ class OllamaProvider(BaseLLMProvider):
         
         full_content = ""
         
-        for line in response.iter_lines():
+        for line in self._cancellable(response.iter_lines(), response):
             if line:
                 try:
                     chunk = json.loads(line)
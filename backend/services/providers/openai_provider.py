@@ -9,7 +9,7 @@ from typing import List, Optional, Dict, Any, Generator
 import json
 import requests
 
-from .base import BaseLLMProvider, LLMMessage, LLMResponse
+from .base import BaseLLMProvider, LLMMessage, LLMResponse, make_usage
 
 
 class OpenAIProvider(BaseLLMProvider):
@@ -84,11 +84,7 @@ class OpenAIProvider(BaseLLMProvider):
                 content=choice.message.content or '',
                 finish_reason=choice.finish_reason,
                 tool_calls=self._parse_tool_calls(choice.message.tool_calls) if choice.message.tool_calls else None,
-                usage={
-                    'prompt_tokens': response.usage.prompt_tokens if response.usage else 0,
-                    'completion_tokens': response.usage.completion_tokens if response.usage else 0,
-                    'total_tokens': response.usage.total_tokens if response.usage else 0,
-                } if response.usage else None,
+                usage=self._parse_usage(response.usage.model_dump()) if response.usage else None,
                 raw=response.model_dump()
             )
         except Exception as e:
@@ -104,14 +100,18 @@ class OpenAIProvider(BaseLLMProvider):
                 model=self.model or 'gpt-4',
                 messages=msg_list,
                 stream=True,
-                **kwargs
+                **{**self._stream_usage_options(), **kwargs}
             )
             
             full_content = ""
             full_thinking = ""
             finish_reason = None
+            usage = None
             
-            for chunk in stream:
+            for chunk in self._cancellable(stream, stream):
+                # include_usage 时最后一个 chunk 的 choices 为空，只携带 usage
+                if getattr(chunk, 'usage', None):
+                    usage = self._parse_usage(chunk.usage.model_dump())
                 if chunk.choices:
                     delta = chunk.choices[0].delta
                     
@@ -144,7 +144,8 @@ class OpenAIProvider(BaseLLMProvider):
             return LLMResponse(
                 content=full_content,
                 thinking=full_thinking if full_thinking else None,
-                finish_reason=finish_reason
+                finish_reason=finish_reason,
+                usage=usage
             )
         except Exception as e:
             self._log_error(f"SDK stream error: {e}", e)
@@ -186,6 +187,7 @@ class OpenAIProvider(BaseLLMProvider):
             content=choice['message']['content'],
             thinking=thinking,
             finish_reason=choice.get('finish_reason'),
+            usage=self._parse_usage(data['usage']) if data.get('usage') else None,
             raw=data
         )
     
@@ -201,6 +203,7 @@ class OpenAIProvider(BaseLLMProvider):
             'model': self.model or ('deepseek-chat' if self.provider_type == 'deepseek' else 'gpt-4'),
             'messages': self._convert_messages_for_openai(messages),
             'stream': True,
+            **self._stream_usage_options(),
             **filtered_kwargs
         }
 
@@ -215,8 +218,9 @@ class OpenAIProvider(BaseLLMProvider):
         full_content = ""
         full_thinking = ""
         finish_reason = None
+        usage = None
 
-        for line in response.iter_lines():
+        for line in self._cancellable(response.iter_lines(), response):
             if line:
                 line = line.decode('utf-8')
                 if line.startswith('data: '):
@@ -225,6 +229,8 @@ class OpenAIProvider(BaseLLMProvider):
                         break
                     try:
                         chunk = json.loads(data)
+                        if chunk.get('usage'):
+                            usage = self._parse_usage(chunk['usage'])
                         if chunk.get('choices'):
                             delta = chunk['choices'][0].get('delta', {})
                             
@@ -250,7 +256,35 @@ class OpenAIProvider(BaseLLMProvider):
         return LLMResponse(
             content=full_content,
             thinking=full_thinking if full_thinking else None,
-            finish_reason=finish_reason
+            finish_reason=finish_reason,
+            usage=usage
+        )
+    
+    def _stream_usage_options(self) -> Dict[str, Any]:
+        """
+        流式请求附带 stream_options.include_usage，以便拿到 usage（含提示词缓存命中数）
+
+        仅对官方 OpenAI / DeepSeek 端点开启；其他兼容端点不一定支持该参数
+        """
+        if self.provider_type == 'deepseek' or not self.api_url or 'api.openai.com' in self.api_url:
+            return {'stream_options': {'include_usage': True}}
+        return {}
+    
+    @staticmethod
+    def _parse_usage(raw: Dict[str, Any]) -> Dict[str, int]:
+        """
+        解析 usage；缓存命中数：OpenAI 为 prompt_tokens_details.cached_tokens，
+        DeepSeek 为 prompt_cache_hit_tokens
+        """
+        details = raw.get('prompt_tokens_details') or {}
+        cached = details.get('cached_tokens')
+        if cached is None:
+            cached = raw.get('prompt_cache_hit_tokens')
+        return make_usage(
+            prompt_tokens=raw.get('prompt_tokens'),
+            completion_tokens=raw.get('completion_tokens'),
+            total_tokens=raw.get('total_tokens'),
+            cached_tokens=cached,
         )
     
     def _get_api_url(self) -> str:
@@ -373,11 +407,7 @@ class DeepSeekProvider(OpenAIProvider):
                 thinking=thinking,
                 finish_reason=choice.finish_reason,
                 tool_calls=self._parse_tool_calls(choice.message.tool_calls) if choice.message.tool_calls else None,
-                usage={
-                    'prompt_tokens': response.usage.prompt_tokens if response.usage else 0,
-                    'completion_tokens': response.usage.completion_tokens if response.usage else 0,
-                    'total_tokens': response.usage.total_tokens if response.usage else 0,
-                } if response.usage else None,
+                usage=self._parse_usage(response.usage.model_dump()) if response.usage else None,
                 raw=response.model_dump()
             )
         except Exception as e:
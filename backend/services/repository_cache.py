@@ -0,0 +1,267 @@
+"""
+仓储层读穿缓存
+
+为 sessions / session_participants / Agent 配置等高频读取、低频修改的数据提供两级缓存:
+- L1: 进程内 LRU（services.cache.LRUCache）
+- L2: Redis，键带版本号 repo:{entity}:{key}:{gen}.{ver}
+
+失效采用版本号递增（write-through invalidation）:
+- invalidate(entity, key) 递增该条目的版本号，所有进程在下一次读取时发现版本变化并回源
+- invalidate_all() 递增全局代数，用于批量 UPDATE 等无法精确定位的修改
+
+读路径每次仅一次 Redis MGET（全局代数 + 条目版本）；L1 命中且版本一致时不访问 MySQL 和 L2。
+Redis 不可用时退化为进程内缓存 + 本地版本号。
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from services.cache import LRUCache
+
+
+# 实体类型
+ENTITY_SESSION = 'session'              # sessions 行（SessionRepository.find_by_id）
+ENTITY_PARTICIPANTS = 'participants'    # Topic 参与者列表
+ENTITY_TOPIC_AGENTS = 'topic_agents'    # Topic 应由哪些 Agent 处理（ActorManager）
+ENTITY_AGENT_CONFIG = 'agent_config'    # Agent 配置（含 LLM 配置联表，含 api_key）
+ENTITY_SKILL_PACK = 'skill_pack'        # 技能包 / SOP 行（SkillCatalog 目录条目）
+ENTITY_AGENT_SKILLS = 'agent_skills'    # Agent 已分配的技能包 ID 列表
+ENTITY_RESEARCH_SOURCES = 'research_sources'  # Research 会话的来源别名索引
+
+# 含敏感字段的实体只在进程内缓存，不写入 Redis
+_LOCAL_ONLY_ENTITIES = frozenset((ENTITY_AGENT_CONFIG,))
+
+# 一个 session 变化时需要失效的实体
+_SESSION_ENTITIES = (ENTITY_SESSION, ENTITY_PARTICIPANTS, ENTITY_TOPIC_AGENTS, ENTITY_AGENT_CONFIG)
+
+_GEN_KEY = 'repo:gen'
+
+# 缓存缺失的哨兵（区分「未缓存」与「缓存了 None」）
+_MISS = object()
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return {'__dt__': obj.isoformat()}
+    if isinstance(obj, date):
+        return {'__d__': obj.isoformat()}
+    if isinstance(obj, (bytes, bytearray)):
+        return {'__b__': obj.decode('utf-8', errors='replace')}
+    return str(obj)
+
+
+def _json_hook(obj: dict) -> Any:
+    if len(obj) == 1:
+        if '__dt__' in obj:
+            return datetime.fromisoformat(obj['__dt__'])
+        if '__d__' in obj:
+            return date.fromisoformat(obj['__d__'])
+        if '__b__' in obj:
+            return obj['__b__']
+    return obj
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps({'v': value}, default=_json_default, ensure_ascii=False)
+
+
+def _loads(raw: str) -> Any:
+    return json.loads(raw, object_hook=_json_hook)['v']
+
+
+class RepositoryCache:
+    """
+    版本化两级读穿缓存
+
+    Example:
+        cache = get_repository_cache()
+        row = cache.get_or_load('session', session_id, lambda: load_row(session_id))
+        cache.invalidate('session', session_id)
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        maxsize: int = 4096,
+        local_ttl: float = 300.0,
+        redis_ttl: int = 1800,
+    ):
+        """
+        Args:
+            redis_client: Redis 客户端（None 时延迟从 database 获取）
+            maxsize: 进程内 LRU 最大条目数
+            local_ttl: 进程内条目的兜底过期时间（秒）
+            redis_ttl: Redis 条目过期时间（秒）
+        """
+        self._redis = redis_client
+        self._local: LRUCache[Tuple[str, Any]] = LRUCache(maxsize=maxsize, ttl=local_ttl)
+        self._redis_ttl = redis_ttl
+        # Redis 不可用时使用的本地版本号
+        self._local_versions: Dict[str, int] = {}
+        self._local_gen = 0
+        self._lock = threading.Lock()
+        self._stats = {'l1_hits': 0, 'l2_hits': 0, 'loads': 0, 'invalidations': 0}
+
+    def _get_redis(self):
+        if self._redis is not None:
+            return self._redis
+        try:
+            from database import get_redis_client
+            return get_redis_client()
+        except Exception:
+            return None
+
+    @staticmethod
+    def _ver_key(entity: str, key: str) -> str:
+        return f"repo:ver:{entity}:{key}"
+
+    def _current_version(self, entity: str, key: str) -> str:
+        """返回条目当前版本（全局代数.条目版本）"""
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                gen, ver = redis.mget(_GEN_KEY, self._ver_key(entity, key))
+                return f"{gen or 0}.{ver or 0}"
+            except Exception as e:
+                print(f"[RepositoryCache] Redis version read failed: {e}")
+        with self._lock:
+            return f"L{self._local_gen}.{self._local_versions.get(f'{entity}:{key}', 0)}"
+
+    def get_or_load(self, entity: str, key: str, loader: Callable[[], Any], cache_none: bool = False) -> Any:
+        """
+        读穿：L1 -> L2 -> loader
+
+        Args:
+            entity: 实体类型
+            key: 实体 ID
+            loader: 回源函数（查 MySQL）
+            cache_none: loader 返回 None 时是否也缓存（默认否，避免缓存查询失败）
+        """
+        if not key:
+            return loader()
+
+        local_key = f"{entity}:{key}"
+        version = self._current_version(entity, key)
+
+        entry = self._local.get(local_key)
+        if entry is not None and entry[0] == version:
+            self._stats['l1_hits'] += 1
+            return entry[1]
+
+        redis = self._get_redis()
+        data_key = f"repo:{entity}:{key}:{version}"
+        shared = entity not in _LOCAL_ONLY_ENTITIES and redis is not None
+
+        if shared:
+            try:
+                raw = redis.get(data_key)
+                if raw is not None:
+                    value = _loads(raw)
+                    self._local.set(local_key, (version, value))
+                    self._stats['l2_hits'] += 1
+                    return value
+            except Exception as e:
+                print(f"[RepositoryCache] Redis read failed for {data_key}: {e}")
+
+        value = loader()
+        self._stats['loads'] += 1
+        if value is None and not cache_none:
+            return None
+
+        self._local.set(local_key, (version, value))
+        if shared:
+            try:
+                redis.setex(data_key, self._redis_ttl, _dumps(value))
+            except Exception as e:
+                print(f"[RepositoryCache] Redis write failed for {data_key}: {e}")
+        return value
+
+    def invalidate(self, entity: str, key: str) -> None:
+        """使单个条目失效（递增版本号，所有进程生效）"""
+        if not key:
+            return
+        self._stats['invalidations'] += 1
+        self._local.delete(f"{entity}:{key}")
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                redis.incr(self._ver_key(entity, key))
+            except Exception as e:
+                print(f"[RepositoryCache] Redis version bump failed: {e}")
+        with self._lock:
+            local_key = f"{entity}:{key}"
+            self._local_versions[local_key] = self._local_versions.get(local_key, 0) + 1
+
+    def invalidate_many(self, entities: Iterable[str], key: str) -> None:
+        for entity in entities:
+            self.invalidate(entity, key)
+
+    def invalidate_all(self) -> None:
+        """全部失效（递增全局代数），用于批量修改"""
+        self._stats['invalidations'] += 1
+        self._local.clear()
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                redis.incr(_GEN_KEY)
+            except Exception as e:
+                print(f"[RepositoryCache] Redis generation bump failed: {e}")
+        with self._lock:
+            self._local_gen += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, 'local': self._local.stats()}
+
+
+_repository_cache: Optional[RepositoryCache] = None
+_init_lock = threading.Lock()
+
+
+def get_repository_cache() -> RepositoryCache:
+    """获取全局仓储缓存实例"""
+    global _repository_cache
+    if _repository_cache is None:
+        with _init_lock:
+            if _repository_cache is None:
+                _repository_cache = RepositoryCache()
+    return _repository_cache
+
+
+def invalidate_session(session_id: str, cascade: bool = False) -> None:
+    """
+    session 行被修改后调用
+
+    Args:
+        session_id: 会话 / Agent / Topic ID
+        cascade: Agent 的名称、头像、人设等被修改时为 True。
+                 这些字段会被联表进其他 Topic 的参与者列表，因此整体失效。
+    """
+    cache = get_repository_cache()
+    if cascade:
+        cache.invalidate_all()
+        return
+    cache.invalidate_many(_SESSION_ENTITIES, session_id)
+
+
+def invalidate_participants(topic_id: str) -> None:
+    """Topic 参与者增删后调用"""
+    get_repository_cache().invalidate_many((ENTITY_PARTICIPANTS, ENTITY_TOPIC_AGENTS), topic_id)
+
+
+def invalidate_skill_pack(skill_pack_id: str) -> None:
+    """技能包 / SOP 修改后调用"""
+    get_repository_cache().invalidate(ENTITY_SKILL_PACK, skill_pack_id)
+
+
+def invalidate_skill_assignments(session_id: str) -> None:
+    """技能包分配到 / 移出某个 Agent（或会话）后调用"""
+    get_repository_cache().invalidate(ENTITY_AGENT_SKILLS, session_id)
+
+
+def invalidate_research_sources(session_id: str) -> None:
+    """Research 来源增删或统计更新后调用"""
+    get_repository_cache().invalidate(ENTITY_RESEARCH_SOURCES, session_id)
@@ -0,0 +1,35 @@
+"""
+Research 本地检索模块
+
+模块结构:
+- tokenizer: 分词（ASCII 单词 + CJK 二元组），带字符偏移
+- chunker: 文档切分为带重叠的段落
+- index: 每个 Research 会话一个 BM25 倒排索引（数组化 postings 落盘）
+- reranker: 可插拔的本地向量重排（可选依赖 sentence-transformers）
+- aliases: 会话级 $alias 别名索引（读穿缓存）
+- ingest: 上传文件的后台入库队列
+
+使用方式:
+    from services.research import get_research_index
+    results = get_research_index().search(session_id, query, limit=8)
+"""
+
+from services.research.tokenizer import tokenize, tokenize_with_offsets
+from services.research.chunker import Chunk, chunk_text
+from services.research.index import ResearchIndex, get_research_index
+from services.research.reranker import get_reranker, register_reranker
+from services.research.aliases import SourceAliasIndex, build_alias_index, load_alias_index
+
+__all__ = [
+    'tokenize',
+    'tokenize_with_offsets',
+    'Chunk',
+    'chunk_text',
+    'ResearchIndex',
+    'get_research_index',
+    'get_reranker',
+    'register_reranker',
+    'SourceAliasIndex',
+    'build_alias_index',
+    'load_alias_index',
+]
@@ -0,0 +1,235 @@
+"""
+Research 来源别名索引
+
+`$alias` 引用解析原先每次请求都加载最多 2000 行 research_sources 并逐个 token 线性扫描。
+这里为每个会话构建一次别名索引，放入仓储读穿缓存（进程内 LRU + Redis，按版本号失效）:
+- by_id / by_title / by_url: 精确匹配 O(1)
+- titles: 排序后的标题列表，前缀匹配用二分查找
+- 形如 `alias/sub/dir` 的 token 解析为目录来源 + rel_path 前缀
+
+目录统计（文档数、字节数、示例路径）在入库完成时预计算，写入 research_sources.meta.stats，
+解析时直接读取，不再对每个目录 token 查询 research_documents。
+
+来源新增 / 删除 / 统计更新后调用 invalidate_research_sources(session_id)。
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 单会话最多纳入索引的来源数
+MAX_SOURCES = 5000
+
+# 目录统计中保留的示例路径数
+SAMPLE_PATHS = 30
+
+
+def _parse_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    row = dict(row)
+    meta = row.get('meta')
+    if meta and isinstance(meta, str):
+        try:
+            row['meta'] = json.loads(meta)
+        except ValueError:
+            row['meta'] = None
+    if row.get('created_at') and not isinstance(row['created_at'], str):
+        row['created_at'] = row['created_at'].isoformat()
+    return row
+
+
+def build_alias_index(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    由 research_sources 行（created_at 倒序）构建可 JSON 序列化的索引
+
+    同名 / 同 URL 时保留最新的来源（与原线性扫描的命中顺序一致）。
+    """
+    sources: Dict[str, Dict[str, Any]] = {}
+    rank: Dict[str, int] = {}
+    by_title: Dict[str, str] = {}
+    by_url: Dict[str, str] = {}
+    for i, row in enumerate(rows):
+        row = _parse_row(row)
+        source_id = row.get('source_id')
+        if not source_id:
+            continue
+        sources[source_id] = row
+        rank[source_id] = i
+        if row.get('title'):
+            by_title.setdefault(row['title'], source_id)
+        if row.get('url'):
+            by_url.setdefault(row['url'], source_id)
+    return {
+        'sources': sources,
+        'rank': rank,
+        'by_title': by_title,
+        'by_url': by_url,
+        'titles': sorted(by_title),
+    }
+
+
+class SourceAliasIndex:
+    """
+    会话级别名索引（只读视图，包装 build_alias_index 的结果）
+
+    Example:
+        index = load_alias_index(session_id)
+        source, rel_prefix = index.find('$docs/src'.lstrip('$'))
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self._data = data
+        self.sources: Dict[str, Dict[str, Any]] = data['sources']
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def _exact(self, token: str) -> Optional[Dict[str, Any]]:
+        if token in self.sources:
+            return self.sources[token]
+        source_id = self._data['by_title'].get(token) or self._data['by_url'].get(token)
+        return self.sources.get(source_id) if source_id else None
+
+    def _prefix(self, token: str) -> Optional[Dict[str, Any]]:
+        """标题前缀匹配：命中多个时取最新的来源"""
+        titles: List[str] = self._data['titles']
+        by_title, rank = self._data['by_title'], self._data['rank']
+        best = None
+        i = bisect.bisect_left(titles, token)
+        while i < len(titles) and titles[i].startswith(token):
+            source_id = by_title[titles[i]]
+            if best is None or rank[source_id] < rank[best]:
+                best = source_id
+            i += 1
+        return self.sources.get(best) if best else None
+
+    def find(self, token: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        解析单个 token
+
+        Returns:
+            (来源, rel_path 前缀)；rel_path 前缀仅在 `目录别名/子路径` 形式时非空
+        """
+        source = self._exact(token)
+        if source:
+            return source, None
+        if '/' in token:
+            head, rest = token.split('/', 1)
+            source = self._exact(head)
+            if source and source.get('source_type') == 'dir' and rest:
+                return source, rest
+        return self._prefix(token), None
+
+
+def _load_rows(conn, session_id: str) -> List[Dict[str, Any]]:
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT source_id, session_id, source_type, title, url, file_path, mime_type, meta, created_at
+            FROM research_sources
+            WHERE session_id = %s
+            ORDER BY created_at DESC
+            LIMIT %s
+            """,
+            (session_id, MAX_SOURCES),
+        )
+        columns = [d[0] for d in cursor.description]
+        return [r if isinstance(r, dict) else dict(zip(columns, r)) for r in cursor.fetchall() or []]
+    finally:
+        cursor.close()
+
+
+def load_alias_index(session_id: str, get_connection: Optional[Callable] = None) -> SourceAliasIndex:
+    """获取会话别名索引（读穿缓存，未命中时一次查询构建）"""
+    from services.repository_cache import ENTITY_RESEARCH_SOURCES, get_repository_cache
+
+    if get_connection is None:
+        from database import get_mysql_connection as get_connection
+
+    def _loader():
+        conn = get_connection()
+        if not conn:
+            return None
+        try:
+            return build_alias_index(_load_rows(conn, session_id))
+        finally:
+            conn.close()
+
+    data = get_repository_cache().get_or_load(ENTITY_RESEARCH_SOURCES, session_id, _loader)
+    if data is None:
+        raise RuntimeError('MySQL not available')
+    return SourceAliasIndex(data)
+
+
+def refresh_source_stats(conn, session_id: str, source_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    重新统计来源下的文档（文档数、文本字节数、最近的示例路径），写入 meta.stats 并提交
+
+    入库任务结束时调用；解析时遇到缺少统计的旧目录来源也会调用一次。
+    调用方负责之后失效别名索引。
+    """
+    source_ids = list(dict.fromkeys(s for s in source_ids if s))
+    if not source_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(source_ids))
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            SELECT source_id, COUNT(*) AS doc_count, COALESCE(SUM(LENGTH(content_text)), 0) AS total_bytes
+            FROM research_documents
+            WHERE session_id = %s AND source_id IN ({placeholders})
+            GROUP BY source_id
+            """,
+            (session_id, *source_ids),
+        )
+        stats = {sid: {'doc_count': 0, 'total_bytes': 0, 'sample_paths': []} for sid in source_ids}
+        for row in cursor.fetchall() or []:
+            sid, count, size = _values(row, ('source_id', 'doc_count', 'total_bytes'))
+            stats[sid]['doc_count'] = int(count)
+            stats[sid]['total_bytes'] = int(size)
+
+        for sid in source_ids:
+            if not stats[sid]['doc_count']:
+                continue
+            cursor.execute(
+                """
+                SELECT rel_path FROM research_documents
+                WHERE session_id = %s AND source_id = %s
+                ORDER BY created_at DESC
+                LIMIT %s
+                """,
+                (session_id, sid, SAMPLE_PATHS),
+            )
+            stats[sid]['sample_paths'] = [
+                p for p in (_values(r, ('rel_path',))[0] for r in cursor.fetchall() or []) if p
+            ]
+
+        cursor.execute(
+            f"SELECT source_id, meta FROM research_sources WHERE session_id = %s AND source_id IN ({placeholders})",
+            (session_id, *source_ids),
+        )
+        for row in cursor.fetchall() or []:
+            sid, meta = _values(row, ('source_id', 'meta'))
+            try:
+                meta = json.loads(meta) if isinstance(meta, str) else (meta or {})
+            except ValueError:
+                meta = {}
+            meta['stats'] = stats[sid]
+            cursor.execute(
+                "UPDATE research_sources SET meta = %s WHERE source_id = %s",
+                (json.dumps(meta, ensure_ascii=False), sid),
+            )
+        conn.commit()
+        return stats
+    finally:
+        cursor.close()
+
+
+def _values(row, keys) -> tuple:
+    """兼容元组游标与 DictCursor"""
+    if isinstance(row, dict):
+        return tuple(row[k] for k in keys)
+    return tuple(row)
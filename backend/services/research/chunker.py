@@ -0,0 +1,52 @@
+"""
+文档切分
+
+按目标长度切段，优先在段落 / 换行 / 句末标点处断开，相邻段落保留少量重叠，
+保证命中的句子在至少一个段落中是完整的。
+"""
+
+from dataclasses import dataclass
+from typing import List
+
+_BREAKS = ('\n\n', '\n', '。', '！', '？', '. ', '! ', '? ', '；', '; ', '，', ', ', ' ')
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """段落在原文中的位置 [start, end)"""
+
+    start: int
+    end: int
+    text: str
+
+
+def chunk_text(text: str, size: int = 800, overlap: int = 120) -> List[Chunk]:
+    """
+    Args:
+        text: 原文
+        size: 目标段落长度（字符）
+        overlap: 相邻段落重叠字符数
+    """
+    if not text:
+        return []
+    n = len(text)
+    if n <= size:
+        return [Chunk(0, n, text)]
+
+    chunks: List[Chunk] = []
+    start = 0
+    while start < n:
+        end = min(start + size, n)
+        if end < n:
+            # 在后半段内寻找最靠后的自然断点
+            window = text[start + size // 2:end]
+            for sep in _BREAKS:
+                pos = window.rfind(sep)
+                if pos != -1:
+                    end = start + size // 2 + pos + len(sep)
+                    break
+        chunks.append(Chunk(start, end, text[start:end]))
+        if end >= n:
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
@@ -0,0 +1,443 @@
+"""
+Research 会话级 BM25 倒排索引
+
+每个会话一个只读段（segment），位于 uploads/research_index/<session_id>/seg-<fingerprint>/:
+- meta.json     词典 {term: [offset, df]}、段落表、文档表、avgdl
+- postings.bin  array('I')：按词项连续存放的段落编号
+- freqs.bin     array('H')：与 postings 一一对应的词频
+- texts.bin     段落原文（UTF-8 拼接，按字节偏移读取，只在返回结果时读取）
+
+段写完后再原子替换 CURRENT 指针，多个 worker 共享同一份磁盘索引。
+旧段不会立即删除：保留上一代（其他 worker 可能仍持有并按需读取 texts.bin），
+更早的段超过宽限期后才回收。
+会话文档变化（指纹 = 文档数 + 最大 id）或显式 invalidate 后，下一次检索时重建。
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from services.cache import LRUCache
+from services.research.chunker import chunk_text
+from services.research.tokenizer import tokenize, tokenize_with_offsets
+
+# 后端根目录（backend/）
+BACKEND_ROOT = Path(__file__).resolve().parent.parent.parent
+INDEX_ROOT = BACKEND_ROOT / 'uploads' / 'research_index'
+
+_FORMAT_VERSION = 1
+_MAX_TF = 65535
+
+# BM25 参数
+_K1 = 1.2
+_B = 0.75
+
+# 旧段回收宽限期（秒）：不低于 worker 缓存段的复查间隔
+_SEGMENT_GC_GRACE = 600.0
+
+# 同一文档最多返回的段落数（避免结果被一个大文件占满）
+_MAX_PASSAGES_PER_DOC = 2
+
+
+def _safe_name(session_id: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', session_id)[:120] or '_'
+
+
+class _Segment:
+    """已加载到内存的只读索引段"""
+
+    __slots__ = ('path', 'fingerprint', 'terms', 'chunks', 'docs', 'avgdl', 'postings', 'freqs')
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path / 'meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format {meta.get('version')}")
+        self.fingerprint = meta['fingerprint']
+        self.terms: Dict[str, List[int]] = meta['terms']
+        # [doc_idx, start, end, dl, byte_off, byte_len]
+        self.chunks: List[List[int]] = meta['chunks']
+        # [doc_id, source_id, rel_path]
+        self.docs: List[List[Any]] = meta['docs']
+        self.avgdl: float = meta['avgdl'] or 1.0
+
+        self.postings = array('I')
+        self.freqs = array('H')
+        total = sum(df for _, df in self.terms.values())
+        with open(path / 'postings.bin', 'rb') as f:
+            self.postings.fromfile(f, total)
+        with open(path / 'freqs.bin', 'rb') as f:
+            self.freqs.fromfile(f, total)
+
+    def read_text(self, chunk_idx: int) -> str:
+        _, _, _, _, off, length = self.chunks[chunk_idx]
+        with open(self.path / 'texts.bin', 'rb') as f:
+            f.seek(off)
+            return f.read(length).decode('utf-8', errors='replace')
+
+
+def _highlights(text: str, terms: set) -> List[List[int]]:
+    """返回命中词项在段落中的 [start, end) 区间（相邻 / 重叠区间合并）"""
+    spans: List[List[int]] = []
+    for term, start, end in tokenize_with_offsets(text):
+        if term not in terms:
+            continue
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    return spans
+
+
+class ResearchIndex:
+    """
+    Research 检索引擎
+
+    Example:
+        index = get_research_index()
+        index.invalidate(session_id)           # 上传 / 删除来源后
+        results = index.search(session_id, '向量检索 BM25', limit=8)
+    """
+
+    def __init__(self, root: Path = INDEX_ROOT, chunk_size: int = 800, overlap: int = 120,
+                 recheck_seconds: float = 60.0):
+        """
+        Args:
+            root: 索引根目录
+            chunk_size: 段落目标长度（字符）
+            overlap: 相邻段落重叠字符数
+            recheck_seconds: 已加载的段在该时间内不再查询文档指纹
+        """
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self._segments: LRUCache[_Segment] = LRUCache(maxsize=32, ttl=recheck_seconds)
+        self._build_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+    # ==================== 构建 ====================
+
+    def build(self, session_id: str, docs: Iterable[Dict[str, Any]], fingerprint: str) -> Dict[str, int]:
+        """
+        全量构建会话索引
+
+        Args:
+            docs: [{doc_id, source_id, rel_path, content_text}, ...]
+            fingerprint: 文档集合指纹（写入段名，用于判断是否过期）
+        """
+        session_dir = self.root / _safe_name(session_id)
+        session_dir.mkdir(parents=True, exist_ok=True)
+        previous = self._read_current(session_dir)
+        tmp_dir = Path(tempfile.mkdtemp(dir=str(session_dir), prefix='.build-'))
+
+        doc_table: List[List[Any]] = []
+        chunk_table: List[List[int]] = []
+        postings_map: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        total_len = 0
+        byte_off = 0
+
+        try:
+            with open(tmp_dir / 'texts.bin', 'wb') as texts:
+                for doc in docs:
+                    content = doc.get('content_text') or ''
+                    doc_idx = len(doc_table)
+                    doc_table.append([doc.get('doc_id'), doc.get('source_id'), doc.get('rel_path')])
+                    # 路径也参与检索（与原 FULLTEXT(content_text, rel_path) 一致）
+                    path_terms = tokenize(doc.get('rel_path') or '')
+                    for chunk in chunk_text(content, self.chunk_size, self.overlap) or [None]:
+                        text = chunk.text if chunk else ''
+                        terms = tokenize(text) + path_terms
+                        if not terms:
+                            continue
+                        chunk_idx = len(chunk_table)
+                        raw = text.encode('utf-8')
+                        texts.write(raw)
+                        chunk_table.append([
+                            doc_idx, chunk.start if chunk else 0, chunk.end if chunk else 0,
+                            len(terms), byte_off, len(raw),
+                        ])
+                        byte_off += len(raw)
+                        total_len += len(terms)
+                        for term, tf in Counter(terms).items():
+                            postings_map[term].append((chunk_idx, min(tf, _MAX_TF)))
+
+            postings = array('I')
+            freqs = array('H')
+            term_table: Dict[str, List[int]] = {}
+            for term in sorted(postings_map):
+                plist = postings_map[term]
+                term_table[term] = [len(postings), len(plist)]
+                postings.extend(c for c, _ in plist)
+                freqs.extend(tf for _, tf in plist)
+            with open(tmp_dir / 'postings.bin', 'wb') as f:
+                postings.tofile(f)
+            with open(tmp_dir / 'freqs.bin', 'wb') as f:
+                freqs.tofile(f)
+
+            meta = {
+                'version': _FORMAT_VERSION,
+                'fingerprint': fingerprint,
+                'avgdl': (total_len / len(chunk_table)) if chunk_table else 0,
+                'terms': term_table,
+                'chunks': chunk_table,
+                'docs': doc_table,
+            }
+            with open(tmp_dir / 'meta.json', 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, separators=(',', ':'))
+
+            seg_name = f"seg-{re.sub(r'[^A-Za-z0-9_.-]', '_', fingerprint)}"
+            seg_dir = session_dir / seg_name
+            if seg_dir.exists():
+                shutil.rmtree(seg_dir, ignore_errors=True)
+            os.replace(tmp_dir, seg_dir)
+            self._write_current(session_dir, seg_name)
+            if previous and previous != seg_name:
+                # 宽限期从被替换时起算
+                try:
+                    os.utime(session_dir / previous)
+                except OSError:
+                    pass
+        finally:
+            if tmp_dir.exists():
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self._gc_segments(session_dir, keep={seg_name, previous})
+        self._segments.delete(session_id)
+        stats = {'documents': len(doc_table), 'chunks': len(chunk_table), 'terms': len(term_table)}
+        print(f"[ResearchIndex] Built index for {session_id}: {stats}")
+        return stats
+
+    @staticmethod
+    def _write_current(session_dir: Path, seg_name: str) -> None:
+        fd, tmp = tempfile.mkstemp(dir=str(session_dir), prefix='.current-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(seg_name)
+        os.replace(tmp, session_dir / 'CURRENT')
+
+    @staticmethod
+    def _read_current(session_dir: Path) -> Optional[str]:
+        try:
+            return (session_dir / 'CURRENT').read_text(encoding='utf-8').strip() or None
+        except OSError:
+            return None
+
+    @staticmethod
+    def _gc_segments(session_dir: Path, keep: set, grace: float = _SEGMENT_GC_GRACE) -> None:
+        """回收旧段：keep 中的段（当前 + 上一代）与宽限期内写入的段保留"""
+        cutoff = time.time() - grace
+        for p in session_dir.glob('seg-*'):
+            if p.name in keep:
+                continue
+            try:
+                if p.stat().st_mtime > cutoff:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(p, ignore_errors=True)
+
+    # ==================== 加载 / 失效 ====================
+
+    def invalidate(self, session_id: str) -> None:
+        """会话文档变化后调用：下一次检索会重新比对指纹"""
+        self._segments.delete(session_id)
+
+    def refresh(self, session_id: str) -> None:
+        """失效并立即按最新文档重建（若已是最新则只比对指纹）"""
+        self.invalidate(session_id)
+        try:
+            self._ensure(session_id)
+        except Exception as e:
+            print(f"[ResearchIndex] Refresh failed for {session_id}: {e}")
+
+    def refresh_async(self, session_id: str) -> None:
+        """后台线程中 refresh（上传接口调用，不阻塞请求）"""
+        self.invalidate(session_id)
+        threading.Thread(target=self.refresh, args=(session_id,), daemon=True,
+                         name=f"research-index-{session_id}").start()
+
+    def drop(self, session_id: str) -> None:
+        """删除会话索引（会话删除时）"""
+        self._segments.delete(session_id)
+        shutil.rmtree(self.root / _safe_name(session_id), ignore_errors=True)
+
+    def _load_current(self, session_id: str) -> Optional[_Segment]:
+        session_dir = self.root / _safe_name(session_id)
+        seg_name = self._read_current(session_dir)
+        if not seg_name:
+            return None
+        try:
+            return _Segment(session_dir / seg_name)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _ensure(self, session_id: str) -> Optional[_Segment]:
+        segment = self._segments.get(session_id)
+        if segment is not None:
+            return segment
+
+        fingerprint = _db_fingerprint(session_id)
+        if fingerprint is None:
+            return None
+        with self._build_locks[session_id]:
+            segment = self._load_current(session_id)
+            if segment is None or segment.fingerprint != fingerprint:
+                self.build(session_id, _iter_db_documents(session_id), fingerprint)
+                segment = self._load_current(session_id)
+            if segment is not None:
+                self._segments.set(session_id, segment)
+        return segment
+
+    # ==================== 检索 ====================
+
+    def search(self, session_id: str, query: str, limit: int = 8,
+               source_ids: Optional[Sequence[str]] = None, rerank: bool = False) -> List[Dict[str, Any]]:
+        """
+        BM25 检索最相关段落
+
+        Returns:
+            [{doc_id, source_id, rel_path, chunk_index, start, end, score, snippet, highlights}, ...]
+            highlights 为 snippet 内的 [start, end) 字符区间
+        """
+        segment = self._ensure(session_id)
+        if segment is None:
+            return []
+        return self.search_segment(segment, query, limit, source_ids, rerank)
+
+    def search_segment(self, segment: _Segment, query: str, limit: int = 8,
+                       source_ids: Optional[Sequence[str]] = None, rerank: bool = False) -> List[Dict[str, Any]]:
+        query_terms = set(tokenize(query))
+        n_chunks = len(segment.chunks)
+        if not query_terms or not n_chunks:
+            return []
+
+        allowed_docs = None
+        if source_ids:
+            wanted = set(source_ids)
+            allowed_docs = {i for i, d in enumerate(segment.docs) if d[1] in wanted}
+
+        scores: Dict[int, float] = defaultdict(float)
+        postings, freqs, chunks, avgdl = segment.postings, segment.freqs, segment.chunks, segment.avgdl
+        for term in query_terms:
+            entry = segment.terms.get(term)
+            if not entry:
+                continue
+            off, df = entry
+            idf = math.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+            for i in range(off, off + df):
+                c = postings[i]
+                tf = freqs[i]
+                dl = chunks[c][3]
+                scores[c] += idf * tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * dl / avgdl))
+
+        if allowed_docs is not None:
+            scores = {c: s for c, s in scores.items() if chunks[c][0] in allowed_docs}
+        if not scores:
+            return []
+
+        pool = limit * 4 if rerank else limit * _MAX_PASSAGES_PER_DOC
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:max(pool, limit)]
+
+        candidates = []
+        per_doc: Counter = Counter()
+        for chunk_idx, score in ranked:
+            doc_idx, start, end = chunks[chunk_idx][0], chunks[chunk_idx][1], chunks[chunk_idx][2]
+            if per_doc[doc_idx] >= _MAX_PASSAGES_PER_DOC:
+                continue
+            per_doc[doc_idx] += 1
+            doc_id, source_id, rel_path = segment.docs[doc_idx]
+            text = segment.read_text(chunk_idx)
+            candidates.append({
+                'doc_id': doc_id,
+                'source_id': source_id,
+                'rel_path': rel_path,
+                'chunk_index': chunk_idx,
+                'start': start,
+                'end': end,
+                'score': round(score, 4),
+                'snippet': text,
+                'highlights': _highlights(text, query_terms),
+            })
+
+        if rerank:
+            from services.research.reranker import get_reranker
+            reranker = get_reranker()
+            if reranker is not None and candidates:
+                candidates = reranker.rerank(query, candidates)
+        return candidates[:limit]
+
+
+# ==================== 数据源（MySQL research_documents） ====================
+
+def _db_fingerprint(session_id: str) -> Optional[str]:
+    """会话文档集合指纹：文档数 + 最大自增 id（走 idx_rd_session_id）"""
+    from database import get_mysql_connection
+    conn = get_mysql_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM research_documents WHERE session_id = %s",
+            (session_id,),
+        )
+        count, max_id = cursor.fetchone()
+        cursor.close()
+        return f"{count}-{max_id}"
+    finally:
+        conn.close()
+
+
+def _iter_db_documents(session_id: str, batch_size: int = 200):
+    """按 id 分批读取会话文档，避免一次性加载全部 LONGTEXT"""
+    import pymysql
+    from database import get_mysql_connection
+    last_id = 0
+    while True:
+        conn = get_mysql_connection()
+        if not conn:
+            return
+        try:
+            cursor = conn.cursor(pymysql.cursors.DictCursor)
+            cursor.execute(
+                """
+                SELECT id, doc_id, source_id, rel_path, content_text
+                FROM research_documents
+                WHERE session_id = %s AND id > %s
+                ORDER BY id
+                LIMIT %s
+                """,
+                (session_id, last_id, batch_size),
+            )
+            rows = cursor.fetchall() or []
+            cursor.close()
+        finally:
+            conn.close()
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1]['id']
+
+
+_research_index: Optional[ResearchIndex] = None
+_init_lock = threading.Lock()
+
+
+def get_research_index() -> ResearchIndex:
+    """获取全局 Research 检索引擎实例"""
+    global _research_index
+    if _research_index is None:
+        with _init_lock:
+            if _research_index is None:
+                _research_index = ResearchIndex()
+    return _research_index
@@ -0,0 +1,536 @@
+"""
+Research 上传后台入库
+
+上传接口只负责把文件落盘并登记来源，随即返回 job_id；
+文本抽取、去重与入库在后台线程池中完成:
+- 每个文件按 2MB 上限读取文本并计算 sha256
+- 同一来源下 rel_path 相同且 content_hash 未变的文件直接跳过（重复上传不再重复写库）
+- 内容变化的文件替换旧文档；新文件按批 executemany 插入，每批提交一次
+- 每批完成后通过 Topic SSE 推送 research_ingest_progress 事件（TopicEventType.RESEARCH_INGEST_PROGRESS）
+- 任务结束后更新来源统计（meta.stats）并后台重建会话检索索引
+
+任务连同文件清单持久化到 research_ingest_jobs 表，上传接口返回成功后进程重启也不会丢失:
+提交时写入租约（lease_owner + heartbeat_at），持有进程定期续约；启动时及每个续约周期
+接管租约已过期的 queued / running 任务重新入队。重跑时已入库且内容未变的文件按 content_hash 跳过。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# 单个文件最多抽取的字节数（与原同步上传一致）
+MAX_TEXT_BYTES = 2 * 1024 * 1024
+
+_STATUS_TTL = 24 * 3600
+
+# 已结束任务在本进程内保留的时长 / 数量上限（之后仅能从 Redis 查询）
+_FINISHED_JOB_TTL = 3600
+_MAX_FINISHED_JOBS = 256
+
+# 任务租约时长（秒）：持有进程每 1/4 租约续约一次，超过该时长未续约视为持有进程已退出
+INGEST_LEASE_SECONDS = 300
+
+_ACTIVE_STATUSES = ('queued', 'running')
+
+
+class LeaseLostError(RuntimeError):
+    """入库任务租约已被其他进程接管"""
+
+
+@dataclass
+class IngestFile:
+    """待入库的文件（已落盘）"""
+
+    path: str
+    rel_path: str
+    source_id: str
+
+
+@dataclass
+class IngestJob:
+    """入库任务状态"""
+
+    job_id: str
+    session_id: str
+    total: int
+    status: str = 'queued'  # queued | running | done | failed
+    processed: int = 0
+    indexed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'IngestJob':
+        def _ts(v):
+            if isinstance(v, datetime):
+                return v.timestamp()
+            return v
+
+        return cls(
+            job_id=row['job_id'],
+            session_id=row['session_id'],
+            total=int(row.get('total') or 0),
+            status=row.get('status') or 'queued',
+            processed=int(row.get('processed') or 0),
+            indexed=int(row.get('indexed') or 0),
+            skipped=int(row.get('skipped') or 0),
+            failed=int(row.get('failed') or 0),
+            error=row.get('error'),
+            created_at=_ts(row.get('created_at')) or time.time(),
+            finished_at=_ts(row.get('finished_at')),
+        )
+
+
+def _read_text(path: str) -> Optional[tuple]:
+    """读取文本（超过上限返回 None），返回 (text, sha256)"""
+    p = Path(path)
+    if p.stat().st_size > MAX_TEXT_BYTES:
+        return None
+    raw = p.read_bytes()
+    return raw.decode('utf-8', errors='ignore'), hashlib.sha256(raw).hexdigest()
+
+
+class IngestQueue:
+    """
+    后台入库队列
+
+    Example:
+        job = get_ingest_queue().submit(session_id, [IngestFile(path, rel, source_id), ...])
+        get_ingest_queue().get_status(job.job_id)
+    """
+
+    def __init__(self, get_connection=None, max_workers: int = 2, batch_size: int = 50,
+                 lease_seconds: float = INGEST_LEASE_SECONDS):
+        """
+        Args:
+            get_connection: 获取数据库连接的函数（None 时使用 database.get_mysql_connection）
+            max_workers: 并发处理的任务数
+            batch_size: 每批插入 / 提交的文档数
+            lease_seconds: 任务租约时长，超过该时长未续约的任务由其他进程接管
+        """
+        self._get_connection = get_connection
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='research-ingest')
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._jobs: Dict[str, IngestJob] = {}
+        # 本进程持有租约（已落库）的任务；落库失败的任务只在内存中执行
+        self._leased: set = set()
+        self._lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def _connection(self):
+        if self._get_connection is not None:
+            return self._get_connection()
+        from database import get_mysql_connection
+        return get_mysql_connection()
+
+    # ==================== 提交 / 查询 ====================
+
+    def submit(self, session_id: str, files: List[IngestFile]) -> IngestJob:
+        job = IngestJob(job_id=f"ingest-{uuid.uuid4().hex[:12]}", session_id=session_id, total=len(files))
+        with self._lock:
+            self._evict_finished()
+            self._jobs[job.job_id] = job
+        self._insert(job, files)
+        self._report(job)
+        self._executor.submit(self._run, job, files)
+        return job
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态（本进程没有时从 Redis 读取，其他 worker 提交的任务也可查询）"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        redis = _get_redis()
+        if redis is not None:
+            try:
+                raw = redis.get(f"research:ingest:{job_id}")
+                if raw:
+                    return json.loads(raw)
+            except Exception as e:
+                print(f"[ResearchIngest] Redis status read failed: {e}")
+        row = self._fetch_row(job_id)
+        return IngestJob.from_row(row).to_dict() if row else None
+
+    def _evict_finished(self, now: Optional[float] = None) -> None:
+        """移除已结束且超过保留期的任务；仍超过上限时按结束时间淘汰最早的（调用方持有 _lock）"""
+        now = now if now is not None else time.time()
+        finished = sorted(
+            (job.finished_at, job_id) for job_id, job in self._jobs.items() if job.finished_at is not None
+        )
+        overflow = len(finished) - _MAX_FINISHED_JOBS
+        for i, (finished_at, job_id) in enumerate(finished):
+            if i < overflow or now - finished_at > _FINISHED_JOB_TTL:
+                del self._jobs[job_id]
+
+    def _report(self, job: IngestJob) -> None:
+        data = job.to_dict()
+        redis = _get_redis()
+        if redis is not None:
+            try:
+                redis.setex(f"research:ingest:{job.job_id}", _STATUS_TTL, json.dumps(data))
+            except Exception as e:
+                print(f"[ResearchIngest] Redis status write failed: {e}")
+        try:
+            from services.topic_service import TopicEventType, get_topic_service
+            get_topic_service()._publish_event(job.session_id, TopicEventType.RESEARCH_INGEST_PROGRESS, data)
+        except Exception as e:
+            print(f"[ResearchIngest] Failed to publish progress: {e}")
+
+    # ==================== 持久化 / 恢复 ====================
+
+    def resume(self) -> int:
+        """
+        进程启动时接管未完成的入库任务，并启动租约续约线程
+
+        租约已过期的 queued / running 任务（持有进程已退出）改由本进程持有并重新入队；
+        租约仍有效的由持有进程继续处理。持有进程之后才退出的由每个续约周期一次的回收接管。
+        """
+        resumed = self._reclaim_expired()
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name='research-ingest-lease',
+                                                   daemon=True)
+                self._heartbeat.start()
+        if resumed:
+            print(f"[ResearchIngest] Resumed {resumed} pending job(s)")
+        return resumed or 0
+
+    def _heartbeat_loop(self) -> None:
+        while True:
+            time.sleep(self.lease_seconds / 4)
+            self._renew_leases()
+            self._reclaim_expired()
+
+    def _insert(self, job: IngestJob, files: List[IngestFile]) -> None:
+        conn = self._connection()
+        if not conn:
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO research_ingest_jobs
+                    (job_id, session_id, status, total, files, lease_owner, heartbeat_at)
+                VALUES (%s, %s, %s, %s, %s, %s, NOW())
+                """,
+                (job.job_id, job.session_id, job.status, job.total,
+                 json.dumps([asdict(f) for f in files], ensure_ascii=False), self.worker_id),
+            )
+            conn.commit()
+            cursor.close()
+            with self._lock:
+                self._leased.add(job.job_id)
+        except Exception as e:
+            print(f"[ResearchIngest] Failed to persist job {job.job_id}: {e}")
+        finally:
+            conn.close()
+
+    def _save(self, job: IngestJob) -> Optional[bool]:
+        """写回进度并续约；租约已被接管时返回 False，未落库或数据库不可用时 None"""
+        if job.job_id not in self._leased:
+            return None
+        conn = self._connection()
+        if not conn:
+            return None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE research_ingest_jobs
+                SET status = %s, processed = %s, indexed = %s, skipped = %s, failed = %s, error = %s,
+                    finished_at = %s, heartbeat_at = NOW()
+                WHERE job_id = %s AND lease_owner = %s
+                """,
+                (job.status, job.processed, job.indexed, job.skipped, job.failed, job.error,
+                 datetime.fromtimestamp(job.finished_at) if job.finished_at else None,
+                 job.job_id, self.worker_id),
+            )
+            conn.commit()
+            saved = cursor.rowcount > 0
+            cursor.close()
+            if not saved or job.finished_at:
+                with self._lock:
+                    self._leased.discard(job.job_id)
+            return saved
+        except Exception as e:
+            print(f"[ResearchIngest] Failed to save job {job.job_id}: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def _renew_leases(self) -> None:
+        """为本进程持有的全部未完成任务续约（含仍在线程池中排队的任务）"""
+        conn = self._connection()
+        if not conn:
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE research_ingest_jobs SET heartbeat_at = NOW()
+                WHERE lease_owner = %s AND status IN (%s, %s)
+                """,
+                (self.worker_id, *_ACTIVE_STATUSES),
+            )
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            print(f"[ResearchIngest] Failed to renew leases: {e}")
+        finally:
+            conn.close()
+
+    def _reclaim_expired(self) -> Optional[int]:
+        """接管租约过期的未完成任务并重新入队；返回入队数，数据库不可用时 None"""
+        conn = self._connection()
+        if not conn:
+            return None
+        try:
+            cursor = conn.cursor(_dict_cursor())
+            cursor.execute(
+                """
+                UPDATE research_ingest_jobs SET lease_owner = %s, heartbeat_at = NOW()
+                WHERE status IN (%s, %s)
+                  AND (heartbeat_at IS NULL OR heartbeat_at < NOW() - INTERVAL %s SECOND)
+                """,
+                (self.worker_id, *_ACTIVE_STATUSES, math.ceil(self.lease_seconds)),
+            )
+            conn.commit()
+            cursor.execute(
+                "SELECT * FROM research_ingest_jobs WHERE lease_owner = %s AND status IN (%s, %s)",
+                (self.worker_id, *_ACTIVE_STATUSES),
+            )
+            rows = cursor.fetchall() or []
+            cursor.close()
+        except Exception as e:
+            print(f"[ResearchIngest] Failed to load pending jobs: {e}")
+            return None
+        finally:
+            conn.close()
+        resumed = 0
+        for row in rows:
+            with self._lock:
+                if row['job_id'] in self._jobs:
+                    continue
+                job = IngestJob.from_row(row)
+                # 从头重跑：已入库且内容未变的文件会被跳过
+                job.status, job.processed, job.indexed, job.skipped, job.failed = 'queued', 0, 0, 0, 0
+                self._jobs[job.job_id] = job
+                self._leased.add(job.job_id)
+            raw = row.get('files')
+            files = [IngestFile(**f) for f in (json.loads(raw) if isinstance(raw, str) else raw or [])]
+            self._executor.submit(self._run, job, files, True)
+            resumed += 1
+        return resumed
+
+    def _fetch_row(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connection()
+        if not conn:
+            return None
+        try:
+            cursor = conn.cursor(_dict_cursor())
+            cursor.execute(
+                """
+                SELECT job_id, session_id, status, total, processed, indexed, skipped, failed, error,
+                       created_at, finished_at
+                FROM research_ingest_jobs WHERE job_id = %s
+                """,
+                (job_id,),
+            )
+            row = cursor.fetchone()
+            cursor.close()
+            return row
+        except Exception as e:
+            print(f"[ResearchIngest] Failed to read job {job_id}: {e}")
+            return None
+        finally:
+            conn.close()
+
+    # ==================== 执行 ====================
+
+    def _run(self, job: IngestJob, files: List[IngestFile], resumed: bool = False) -> None:
+        """
+        Args:
+            resumed: 接管的未完成任务（之前的持有进程可能已入库部分文件，结束后总是刷新统计与索引）
+        """
+        job.status = 'running'
+        self._report(job)
+        try:
+            if self._save(job) is False:
+                raise LeaseLostError(job.job_id)
+            existing = self._load_existing(job.session_id, {f.source_id for f in files})
+            for i in range(0, len(files), self.batch_size):
+                self._process_batch(job, files[i:i + self.batch_size], existing)
+                if self._save(job) is False:
+                    raise LeaseLostError(job.job_id)
+                self._report(job)
+            job.status = 'done'
+        except LeaseLostError:
+            # 已由其他进程接管重跑，本进程不再写回状态
+            print(f"[ResearchIngest] Job {job.job_id} taken over by another worker")
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+            return
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            job.status = 'failed'
+            job.error = str(e)
+        job.finished_at = time.time()
+        self._save(job)
+        self._report(job)
+        print(f"[ResearchIngest] Job {job.job_id} {job.status}: indexed={job.indexed} "
+              f"skipped={job.skipped} failed={job.failed} / {job.total}")
+
+        if job.indexed or resumed:
+            self._refresh_stats(job.session_id, {f.source_id for f in files})
+            from services.research.index import get_research_index
+            get_research_index().refresh(job.session_id)
+
+    def _refresh_stats(self, session_id: str, source_ids: set) -> None:
+        """预计算来源统计（目录文档数 / 字节数 / 示例路径），供 $alias 解析直接读取"""
+        from services.repository_cache import invalidate_research_sources
+        from services.research.aliases import refresh_source_stats
+        conn = self._connection()
+        if not conn:
+            return
+        try:
+            refresh_source_stats(conn, session_id, source_ids)
+        except Exception as e:
+            print(f"[ResearchIngest] Failed to refresh source stats: {e}")
+        finally:
+            conn.close()
+        invalidate_research_sources(session_id)
+
+    def _load_existing(self, session_id: str, source_ids: set) -> Dict[tuple, tuple]:
+        """(source_id, rel_path) -> (doc_id, content_hash)"""
+        if not source_ids:
+            return {}
+        conn = self._connection()
+        if not conn:
+            raise RuntimeError('MySQL not available')
+        try:
+            cursor = conn.cursor()
+            placeholders = ', '.join(['%s'] * len(source_ids))
+            cursor.execute(
+                f"""
+                SELECT source_id, rel_path, doc_id, content_hash
+                FROM research_documents
+                WHERE session_id = %s AND source_id IN ({placeholders})
+                """,
+                (session_id, *source_ids),
+            )
+            existing = {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall() or []}
+            cursor.close()
+            return existing
+        finally:
+            conn.close()
+
+    def _process_batch(self, job: IngestJob, batch: List[IngestFile], existing: Dict[tuple, tuple]) -> None:
+        inserts = []
+        replaced_doc_ids = []
+        for f in batch:
+            job.processed += 1
+            try:
+                result = _read_text(f.path)
+            except OSError as e:
+                print(f"[ResearchIngest] Read failed for {f.rel_path}: {e}")
+                job.failed += 1
+                continue
+            if result is None:
+                job.skipped += 1
+                continue
+            text, content_hash = result
+            key = (f.source_id, f.rel_path)
+            old = existing.get(key)
+            if old and old[1] == content_hash:
+                job.skipped += 1
+                continue
+            if old:
+                replaced_doc_ids.append(old[0])
+            doc_id = f"rd-{uuid.uuid4().hex[:16]}"
+            inserts.append((doc_id, job.session_id, f.source_id, f.rel_path, text, content_hash))
+            existing[key] = (doc_id, content_hash)
+
+        if not inserts:
+            return
+        conn = self._connection()
+        if not conn:
+            raise RuntimeError('MySQL not available')
+        try:
+            cursor = conn.cursor()
+            if replaced_doc_ids:
+                placeholders = ', '.join(['%s'] * len(replaced_doc_ids))
+                cursor.execute(f"DELETE FROM research_documents WHERE doc_id IN ({placeholders})",
+                               replaced_doc_ids)
+            cursor.executemany(
+                """
+                INSERT INTO research_documents (doc_id, session_id, source_id, rel_path, content_text, content_hash)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                inserts,
+            )
+            conn.commit()
+            cursor.close()
+            job.indexed += len(inserts)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+def _dict_cursor():
+    import pymysql
+    return pymysql.cursors.DictCursor
+
+
+def _get_redis():
+    try:
+        from database import get_redis_client
+        return get_redis_client()
+    except Exception:
+        return None
+
+
+_ingest_queue: Optional[IngestQueue] = None
+_init_lock = threading.Lock()
+
+
+def init_ingest_queue(max_workers: int = 2, batch_size: int = 50,
+                      lease_seconds: float = INGEST_LEASE_SECONDS) -> IngestQueue:
+    """按配置初始化入库队列（数据库就绪后调用 resume() 接管未完成任务）"""
+    global _ingest_queue
+    with _init_lock:
+        _ingest_queue = IngestQueue(max_workers=max_workers, batch_size=batch_size, lease_seconds=lease_seconds)
+    return _ingest_queue
+
+
+def get_ingest_queue() -> IngestQueue:
+    """获取全局入库队列实例"""
+    global _ingest_queue
+    if _ingest_queue is None:
+        with _init_lock:
+            if _ingest_queue is None:
+                _ingest_queue = IngestQueue()
+    return _ingest_queue
@@ -0,0 +1,80 @@
+"""
+可插拔的本地向量重排
+
+BM25 召回候选段落后，可选地用本地 embedding 模型按语义相似度重排。
+默认实现基于 sentence-transformers（可选依赖，未安装时自动禁用）；
+也可以通过 register_reranker() 注入任何实现了 rerank(query, candidates) 的对象。
+
+配置 (config.yaml):
+    research:
+      reranker:
+        enabled: true
+        model: BAAI/bge-small-zh-v1.5
+        weight: 0.7        # 语义分数权重，其余为归一化 BM25 分数
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class EmbeddingReranker:
+    """基于 sentence-transformers 的重排器（模型在首次使用时加载）"""
+
+    def __init__(self, model_name: str, weight: float = 0.7):
+        self.model_name = model_name
+        self.weight = weight
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    print(f"[Reranker] Loading embedding model {self.model_name}...")
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def rerank(self, query: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        model = self._get_model()
+        vectors = model.encode([query] + [c['snippet'] for c in candidates], normalize_embeddings=True)
+        q = vectors[0]
+        top_bm25 = max(c['score'] for c in candidates) or 1.0
+        for c, v in zip(candidates, vectors[1:]):
+            semantic = float(sum(a * b for a, b in zip(q, v)))
+            c['bm25_score'] = c['score']
+            c['semantic_score'] = round(semantic, 4)
+            c['score'] = round(self.weight * semantic + (1 - self.weight) * c['score'] / top_bm25, 4)
+        return sorted(candidates, key=lambda c: c['score'], reverse=True)
+
+
+_reranker: Optional[Any] = None
+
+
+def register_reranker(reranker: Optional[Any]) -> None:
+    """注册重排器（None 表示禁用）"""
+    global _reranker
+    _reranker = reranker
+
+
+def get_reranker() -> Optional[Any]:
+    return _reranker
+
+
+def configure_reranker(cfg: Optional[Dict[str, Any]]) -> None:
+    """根据 research.reranker 配置注册默认重排器；依赖缺失时只打印提示"""
+    cfg = cfg or {}
+    if not cfg.get('enabled', False):
+        return
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        print("[Reranker] sentence-transformers not installed, embedding rerank disabled")
+        return
+    weight = float(cfg.get('weight', 0.7))
+    if not 0 <= weight <= 1 or math.isnan(weight):
+        weight = 0.7
+    register_reranker(EmbeddingReranker(cfg.get('model', 'BAAI/bge-small-zh-v1.5'), weight))
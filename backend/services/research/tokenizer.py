@@ -0,0 +1,43 @@
+"""
+检索分词
+
+- ASCII 字母数字按单词切分并转小写
+- CJK 连续片段切为重叠二元组（"机器学习" → 机器 / 器学 / 学习），单字片段保留单字
+- 返回每个词项在原文中的 [start, end) 偏移，用于高亮
+"""
+
+import re
+from typing import List, Tuple
+
+# 单词 或 CJK 连续片段（中日韩统一表意文字、扩展 A、兼容表意、假名、韩文音节）
+_TOKEN_RE = re.compile(
+    r"[A-Za-z0-9_]+"
+    r"|[㐀-䶿一-鿿豈-﫿぀-ヿ가-힯]+"
+)
+
+# 过长的 ASCII 词（base64、哈希等）不建索引
+_MAX_WORD_LEN = 40
+
+
+def tokenize_with_offsets(text: str) -> List[Tuple[str, int, int]]:
+    """返回 [(term, start, end), ...]"""
+    out: List[Tuple[str, int, int]] = []
+    if not text:
+        return out
+    for m in _TOKEN_RE.finditer(text):
+        seg = m.group(0)
+        start = m.start()
+        if seg[0].isascii():
+            if len(seg) <= _MAX_WORD_LEN:
+                out.append((seg.lower(), start, m.end()))
+            continue
+        if len(seg) == 1:
+            out.append((seg, start, start + 1))
+            continue
+        for i in range(len(seg) - 1):
+            out.append((seg[i:i + 2], start + i, start + i + 2))
+    return out
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t, _, _ in tokenize_with_offsets(text)]
@@ -11,6 +11,8 @@ from datetime import datetime
 
 from models.session import Session, SessionRepository
 from database import get_redis_client
+from services.repository_cache import invalidate_session, invalidate_participants
+from services.blob_store import offload_content, offload_payload
 
 
 # ==================== 事件类型定义 ====================
@@ -47,6 +49,12 @@ class TopicEventType:
     ACTION_CHAIN_PROGRESS = 'action_chain_progress'  # ActionChain 进度更新
     ACTION_CHAIN_INTERRUPT = 'action_chain_interrupt'  # ActionChain 被中断
 
+    # Research 上传入库进度
+    RESEARCH_INGEST_PROGRESS = 'research_ingest_progress'
+
+    # 媒体生成任务状态变化（提交 / 下载中 / 完成 / 失败）
+    MEDIA_JOB_UPDATE = 'media_job_update'
+
 
 class ProcessEventPhase:
     """处理流程事件阶段"""
@@ -56,6 +64,8 @@ class ProcessEventPhase:
     MSG_PRE_DEAL = 'msg_pre_deal'              # 消息预处理
     MSG_DEAL = 'msg_deal'                      # 消息处理（LLM调用）
     POST_MSG_DEAL = 'post_msg_deal'            # 消息后处理
+    RESOLVE_SESSION = 'resolve_session'        # 解析话题类型与用户选择的模型
+    PLAN_ACTIONS = 'plan_actions'              # 规划行动（Skill 加载、MCP 路由）
 
 
 
@@ -121,6 +131,7 @@ class TopicService:
             conn.commit()
             cursor.close()
             conn.close()
+            invalidate_session(topic_id)
             
             # 通知参与者类型已变动
             self._publish_event(topic_id, 'topic_updated', {'session_type': session_type})
@@ -133,40 +144,8 @@ class TopicService:
     # ==================== 参与者管理 ====================
 
     def get_participants(self, topic_id: str) -> List[dict]:
-        """获取 Topic 参与者列表"""
-        conn = self.get_connection()
-        if not conn: return []
-        try:
-            import pymysql
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            cursor.execute("""
-                SELECT p.*, s.name as agent_name, s.avatar as agent_avatar, s.system_prompt as agent_prompt
-                FROM session_participants p
-                LEFT JOIN sessions s ON p.participant_id = s.session_id AND p.participant_type = 'agent'
-                WHERE p.session_id = %s
-            """, (topic_id,))
-            rows = cursor.fetchall()
-            cursor.close()
-            conn.close()
-            
-            participants = []
-            for row in rows:
-                p = {
-                    'participant_id': row['participant_id'],
-                    'participant_type': row['participant_type'],
-                    'role': row['role'],
-                    'joined_at': row['joined_at'].isoformat() if row['joined_at'] else None
-                }
-                if row['participant_type'] == 'agent':
-                    p['name'] = row['agent_name']
-                    p['avatar'] = row['agent_avatar']
-                    p['system_prompt'] = row['agent_prompt']
-                participants.append(p)
-            return participants
-        except Exception as e:
-            print(f"[TopicService] Error getting participants: {e}")
-            if conn: conn.close()
-            return []
+        """获取 Topic 参与者列表（经 SessionRepository 读穿缓存）"""
+        return self.repository.get_participants(topic_id)
 
     def add_participant(self, topic_id: str, participant_id: str, 
                         p_type: str = 'agent', role: str = 'member') -> bool:
@@ -183,6 +162,7 @@ class TopicService:
             conn.commit()
             cursor.close()
             conn.close()
+            invalidate_participants(topic_id)
             
             # 如果是 Agent，通知它加入 Topic (激活 Actor)
             if p_type == 'agent':
@@ -216,6 +196,7 @@ class TopicService:
             conn.commit()
             cursor.close()
             conn.close()
+            invalidate_participants(topic_id)
             
             self._publish_event(topic_id, 'participant_left', {'participant_id': participant_id})
             # 通知所有参与者：参与者列表已更新
@@ -240,29 +221,11 @@ class TopicService:
         sender_avatar = None
         
         if sender_type == 'agent':
-            # 从 sessions 表查询 Agent 信息
-            conn = self.get_connection()
-            if conn:
-                try:
-                    import pymysql
-                    cursor = conn.cursor(pymysql.cursors.DictCursor)
-                    cursor.execute("""
-                        SELECT name, avatar FROM sessions 
-                        WHERE session_id = %s AND session_type = 'agent'
-                    """, (sender_id,))
-                    row = cursor.fetchone()
-                    cursor.close()
-                    conn.close()
-                    if row:
-                        sender_name = row.get('name')
-                        sender_avatar = row.get('avatar')
-                except Exception as e:
-                    print(f"[TopicService] Error getting sender info: {e}")
-                    if conn:
-                        try:
-                            conn.close()
-                        except:
-                            pass
+            # 从 sessions 表查询 Agent 信息（读穿缓存）
+            session = self.repository.find_by_id(sender_id)
+            if session and session.session_type == 'agent':
+                sender_name = session.name
+                sender_avatar = session.avatar
         elif sender_type == 'user':
             # 用户发送者，可以从用户表获取或使用默认值
             sender_name = '用户'
@@ -357,10 +320,11 @@ class TopicService:
                 (message_id, session_id, role, sender_id, sender_type, content, mentions, ext)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             """
+            # 行内只存引用：大字段（base64 媒体等）移入 Blob 存储；实时事件仍携带原始 ext
             cursor.execute(sql, (
-                msg_id, topic_id, role, sender_id, sender_type, content,
+                msg_id, topic_id, role, sender_id, sender_type, offload_content(content),
                 json.dumps(mentions) if mentions else None,
-                json.dumps(ext) if ext else None
+                json.dumps(offload_payload(ext)) if ext else None
             ))
             
             # 更新 Topic 的最后消息时间
@@ -497,7 +461,7 @@ class TopicService:
 
     def publish_interrupt(self, topic_id: str, agent_id: str, reason: str = 'user_interrupt') -> bool:
         """
-        发布中断信号并设置 Redis 标记
+        发布中断信号（ActorManager 收到后直接触发进程内取消令牌，见 utils/cancellation）
         
         Args:
             topic_id: Topic ID
@@ -510,14 +474,6 @@ class TopicService:
         if not self.redis_client:
             return False
         
-        # 设置 Redis 中断标记 (TTL 60秒)，供 Actor 轮询检查
-        interrupt_key = f'interrupt:{topic_id}:{agent_id}'
-        try:
-            self.redis_client.setex(interrupt_key, 60, reason)
-        except Exception as e:
-            print(f"[TopicService] Failed to set interrupt flag: {e}")
-            return False
-        
         # 打断走独立通道 actor_manager:interrupt，由 ActorManager 单独订阅，避免与 topic:* 混在一起被阻塞
         try:
             channel = "actor_manager:interrupt"
@@ -534,51 +490,11 @@ class TopicService:
         print(f"[TopicService] 🛑 Published interrupt for agent {agent_id} in {topic_id} (channel={channel})")
         return True
 
-    def check_interrupt(self, topic_id: str, agent_id: str) -> bool:
-        """
-        检查是否有中断信号
-        
-        Args:
-            topic_id: Topic ID
-            agent_id: Agent ID
-            
-        Returns:
-            True if interrupt flag is set
-        """
-        if not self.redis_client:
-            return False
-        
-        interrupt_key = f'interrupt:{topic_id}:{agent_id}'
-        try:
-            return self.redis_client.get(interrupt_key) is not None
-        except Exception:
-            return False
-
-    def clear_interrupt(self, topic_id: str, agent_id: str) -> bool:
-        """
-        清除中断标记
-        
-        Args:
-            topic_id: Topic ID
-            agent_id: Agent ID
-            
-        Returns:
-            True if cleared successfully
-        """
-        if not self.redis_client:
-            return False
-        
-        interrupt_key = f'interrupt:{topic_id}:{agent_id}'
-        try:
-            self.redis_client.delete(interrupt_key)
-            return True
-        except Exception:
-            return False
-
     def publish_action_chain_progress(self, topic_id: str, agent_id: str,
                                        chain_id: str, current_index: int,
                                        total_steps: int, status: str,
-                                       current_step: dict = None):
+                                       current_step: dict = None,
+                                       step_delta: dict = None):
         """
         发布 ActionChain 进度事件
         
@@ -589,7 +505,8 @@ class TopicService:
             current_index: 当前步骤索引
             total_steps: 总步骤数
             status: 链状态
-            current_step: 当前步骤详情
+            current_step: 当前步骤详情（切换到新步骤时）
+            step_delta: 当前步骤自上次事件以来变化的字段（含 step_id）
         """
         event_data = {
             'chain_id': chain_id,
@@ -598,9 +515,12 @@ class TopicService:
             'total_steps': total_steps,
             'status': status,
             'progress_text': f'{current_index}/{total_steps}',
-            'current_step': current_step,
             'timestamp': time.time(),
         }
+        if current_step is not None:
+            event_data['current_step'] = current_step
+        if step_delta is not None:
+            event_data['step_delta'] = step_delta
         self._publish_event(topic_id, TopicEventType.ACTION_CHAIN_PROGRESS, event_data)
 
 # 全局实例
@@ -5,7 +5,7 @@ Provides text-to-speech synthesis with support for:
 - Multiple voices (21 premade + custom voices)
 - Custom voice uploads (requires paid plan)
 - Voice settings (stability, similarity boost)
-- Streaming audio output
+- Streaming audio output (see services/tts_stream.py for phrase splitting and caching)
 - Error handling and rate limit management
 """
 
@@ -13,7 +13,7 @@ import os
 import io
 import requests
 import logging
-from typing import Optional, Dict, List, BinaryIO, Tuple
+from typing import Optional, Dict, Iterator, List, BinaryIO, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import hashlib
@@ -163,6 +163,78 @@ class ElevenLabsClient:
             logger.error(f"Failed to generate speech: {e}")
             return None, f"Network error: {str(e)}"
 
+    def text_to_speech_stream(
+        self,
+        text: str,
+        voice_id: str,
+        model_id: str = "eleven_multilingual_v2",
+        stability: float = 0.5,
+        similarity_boost: float = 0.75,
+        output_format: str = "mp3_44100_128",
+        optimize_streaming_latency: int = 0,
+        chunk_size: int = 4096,
+    ) -> Tuple[Optional[Iterator[bytes]], Optional[str]]:
+        """
+        Convert text to speech via the streaming endpoint.
+
+        Same arguments as text_to_speech. The HTTP status is checked before
+        returning, so errors are reported up front; audio chunks are then
+        yielded as they arrive instead of buffering the whole response.
+
+        Returns:
+            Tuple of (chunk_iterator, error_message)
+        """
+        url = f"{self.api_base}/text-to-speech/{voice_id}/stream"
+
+        payload = {
+            "text": text,
+            "model_id": model_id,
+            "voice_settings": {
+                "stability": stability,
+                "similarity_boost": similarity_boost
+            }
+        }
+
+        params = {
+            "output_format": output_format,
+            "optimize_streaming_latency": optimize_streaming_latency
+        }
+
+        try:
+            response = self.session.post(
+                url,
+                json=payload,
+                params=params,
+                headers=self._get_headers("application/json"),
+                stream=True,
+                timeout=(10, 120)
+            )
+        except requests.RequestException as e:
+            logger.error(f"Failed to start speech stream: {e}")
+            return None, f"Network error: {str(e)}"
+
+        if response.status_code != 200:
+            response.close()
+            if response.status_code == 401:
+                return None, "Invalid API key"
+            elif response.status_code == 429:
+                return None, "Rate limit exceeded. Please try again later."
+            elif response.status_code == 422:
+                return None, "Invalid request parameters"
+            elif response.status_code >= 500:
+                return None, "ElevenLabs service unavailable. Please try again."
+            return None, f"API error: {response.status_code}"
+
+        def _chunks():
+            try:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        yield chunk
+            finally:
+                response.close()
+
+        return _chunks(), None
+
     def create_voice_clone(
         self,
         name: str,
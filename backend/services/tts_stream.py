@@ -0,0 +1,208 @@
+"""
+Streaming TTS with a phrase-level audio cache
+
+- Long replies are split at sentence boundaries; each phrase is synthesized
+  separately so playback can start as soon as the first sentence arrives.
+- Audio is content-addressed by (voice_id, model_id, voice settings, output
+  format, normalised text) and kept in a byte-budgeted MediaCache with an
+  optional disk spill tier, so repeated greetings / system phrases cost no
+  API calls.
+- Uncached phrases are piped from the ElevenLabs streaming endpoint chunk by
+  chunk and stored once complete.
+
+Config (config.yaml):
+    tts:
+      cache:
+        max_mb: 32
+        max_item_mb: 4
+        ttl_seconds: 604800
+        spill_dir: uploads/tts_cache    # empty disables the disk tier
+        spill_max_mb: 256
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional
+
+from services.media_cache import BACKEND_ROOT, MediaCache, MediaEntry
+
+logger = logging.getLogger(__name__)
+
+# Sentence terminators (CJK and Latin); Latin ones must be followed by whitespace
+_SENTENCE_END = re.compile(r'(?<=[。！？；…\n])|(?<=[.!?;])\s+')
+# Softer break points used when a single sentence exceeds max_chars
+_CLAUSE_END = re.compile(r'(?<=[，、,：:])')
+
+MIME_TYPES = {
+    'mp3': 'audio/mpeg',
+    'pcm': 'audio/pcm',
+    'ulaw': 'audio/basic',
+    'opus': 'audio/ogg',
+}
+
+
+class TTSError(Exception):
+    """Synthesis failed before any audio was produced"""
+
+
+@dataclass(frozen=True)
+class VoiceParams:
+    voice_id: str
+    model_id: str = "eleven_multilingual_v2"
+    stability: float = 0.5
+    similarity_boost: float = 0.75
+    output_format: str = "mp3_44100_128"
+    optimize_streaming_latency: int = 0
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES.get(self.output_format.split('_', 1)[0], 'audio/mpeg')
+
+
+def normalize_text(text: str) -> str:
+    """NFKC + collapsed whitespace; the cache key is computed on this form"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text or '')).strip()
+
+
+def audio_cache_key(params: VoiceParams, text: str) -> str:
+    raw = json.dumps([asdict(params), normalize_text(text)], ensure_ascii=False, sort_keys=True)
+    return "tts:" + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def split_phrases(text: str, max_chars: int = 400, min_chars: int = 12) -> List[str]:
+    """
+    Split text at sentence boundaries.
+
+    Fragments shorter than min_chars are merged into the following sentence
+    (avoids one API call per "OK." / "嗯。"); sentences longer than max_chars
+    are split at clause punctuation, then hard-cut.
+    """
+    phrases: List[str] = []
+    pending = ''
+    for sentence in _SENTENCE_END.split(text or ''):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        pending = _join(pending, sentence) if pending else sentence
+        if len(pending) >= min_chars:
+            phrases.extend(_cap_length(pending, max_chars))
+            pending = ''
+    if pending:
+        if phrases and len(phrases[-1]) + len(pending) < max_chars:
+            phrases[-1] = _join(phrases[-1], pending)
+        else:
+            phrases.append(pending)
+    return phrases
+
+
+def _join(head: str, tail: str) -> str:
+    # CJK sentences need no separating space
+    return head + tail if head[-1] in '。！？；…' else f"{head} {tail}"
+
+
+def _cap_length(sentence: str, max_chars: int) -> List[str]:
+    if len(sentence) <= max_chars:
+        return [sentence]
+    out: List[str] = []
+    current = ''
+    for clause in _CLAUSE_END.split(sentence):
+        if current and len(current) + len(clause) > max_chars:
+            out.append(current.strip())
+            current = ''
+        current += clause
+        while len(current) > max_chars:
+            out.append(current[:max_chars].strip())
+            current = current[max_chars:]
+    if current.strip():
+        out.append(current.strip())
+    return out
+
+
+def cached_speech(client, params: VoiceParams, text: str) -> MediaEntry:
+    """Whole-text synthesis for /speak through the audio cache (single-flight on misses)"""
+    def _fetch():
+        audio, error = client.text_to_speech(text=text, **asdict(params))
+        if error:
+            raise TTSError(error)
+        return audio, params.mime_type
+
+    return get_tts_audio_cache().get_or_fetch(audio_cache_key(params, text), _fetch)
+
+
+def stream_speech(client, params: VoiceParams, text: str, max_phrase_chars: int = 400) -> Iterator[bytes]:
+    """
+    Yield audio for text phrase by phrase.
+
+    Cached phrases are yielded immediately; uncached ones are piped from the
+    streaming endpoint and cached once the phrase is complete. Raises TTSError
+    if a phrase fails before any audio has been produced for the request;
+    later failures end the stream early.
+    """
+    cache = get_tts_audio_cache()
+    produced = False
+    for phrase in split_phrases(text, max_chars=max_phrase_chars):
+        key = audio_cache_key(params, phrase)
+        entry = cache.get(key)
+        if entry is not None:
+            produced = True
+            yield entry.content
+            continue
+
+        chunks, error = client.text_to_speech_stream(text=phrase, **asdict(params))
+        if error:
+            if not produced:
+                raise TTSError(error)
+            logger.error(f"TTS stream aborted mid-reply: {error}")
+            return
+        buffer = bytearray()
+        try:
+            for chunk in chunks:
+                buffer.extend(chunk)
+                produced = True
+                yield chunk
+        except Exception as e:
+            if not produced:
+                raise TTSError(str(e))
+            logger.error(f"TTS stream aborted mid-reply: {e}")
+            return
+        if buffer:
+            cache.set(key, bytes(buffer), params.mime_type)
+
+
+_audio_cache: Optional[MediaCache] = None
+_init_lock = threading.Lock()
+
+
+def init_tts_audio_cache(cfg: Optional[Dict] = None) -> MediaCache:
+    """Initialize the audio cache from tts.cache"""
+    global _audio_cache
+    cfg = cfg or {}
+    spill_dir = cfg.get('spill_dir', 'uploads/tts_cache')
+    if spill_dir and not os.path.isabs(spill_dir):
+        spill_dir = str(BACKEND_ROOT / spill_dir)
+    with _init_lock:
+        _audio_cache = MediaCache(
+            max_bytes=int(float(cfg.get('max_mb', 32)) * 1024 * 1024),
+            max_item_bytes=int(float(cfg.get('max_item_mb', 4)) * 1024 * 1024),
+            ttl=float(cfg.get('ttl_seconds', 7 * 24 * 3600)),
+            spill_dir=spill_dir or None,
+            spill_max_bytes=int(float(cfg.get('spill_max_mb', 256)) * 1024 * 1024),
+        )
+    return _audio_cache
+
+
+def get_tts_audio_cache() -> MediaCache:
+    """Get the audio cache (memory-only defaults if not initialized)"""
+    global _audio_cache
+    if _audio_cache is None:
+        with _init_lock:
+            if _audio_cache is None:
+                _audio_cache = MediaCache(max_bytes=32 * 1024 * 1024, max_item_bytes=4 * 1024 * 1024,
+                                          ttl=7 * 24 * 3600)
+    return _audio_cache
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+测试 ActionChain 持久化：步骤追加日志往返、单步更新只写该步骤、日志压缩、结束后缩短 TTL、
+旧格式（整链 JSON）兼容读取、增量进度事件、msgpack 编码（Redis 用内存桩替代）
+"""
+
+import sys
+import os
+import json
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from services.actor.action_chain import (
+    ActionChain,
+    ActionChainStore,
+    ActionStepStatus,
+    AgentActionType,
+    decode_step,
+    encode_step,
+)
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._ops = []
+
+    def __getattr__(self, name):
+        def op(*args, **kwargs):
+            self._ops.append((name, args, kwargs))
+            return self
+        return op
+
+    def execute(self):
+        return [getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in self._ops]
+
+
+class _FakeRedis:
+    """内存 Redis 桩（只实现 ActionChainStore 用到的命令）"""
+
+    def __init__(self, decode_responses=True):
+        self.data = {}
+        self.ttls = {}
+        self.rpush_calls = []
+        self.connection_pool = type("Pool", (), {"connection_kwargs": {"decode_responses": decode_responses}})()
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+        self.ttls[key] = ttl
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def rpush(self, key, *values):
+        self.rpush_calls.append(len(values))
+        self.data.setdefault(key, []).extend(values)
+        return len(self.data[key])
+
+    def lrange(self, key, start, end):
+        return list(self.data.get(key, []))
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    def ttl(self, key):
+        return self.ttls.get(key, -2)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+            self.ttls.pop(key, None)
+
+
+def _chain(steps=20):
+    chain = ActionChain(name="demo", origin_agent_id="agent_a", origin_topic_id="topic_1")
+    for i in range(steps):
+        chain.add_step(AgentActionType.AG_USE_MCP, description=f"step {i}",
+                       params={"query": f"q{i}" * 20}, mcp_server_id="srv")
+    return chain
+
+
+def test_round_trip_and_legacy_fallback():
+    redis = _FakeRedis()
+    store = ActionChainStore(redis)
+    chain = _chain(3)
+    chain.steps[0].result = {"text": "ok"}
+    chain.steps[0].status = ActionStepStatus.COMPLETED
+    chain.current_index = 1
+    assert store.save(chain)
+
+    loaded = ActionChainStore(redis).load(chain.chain_id)
+    assert loaded.to_dict() == chain.to_dict()
+
+    legacy = _chain(2)
+    redis.setex(f"action_chain:{legacy.chain_id}", 3600, legacy.to_json())
+    assert store.load(legacy.chain_id).to_dict() == legacy.to_dict()
+
+    store.delete(chain.chain_id)
+    assert store.load(chain.chain_id) is None
+
+
+def test_step_update_writes_only_that_step():
+    redis = _FakeRedis()
+    store = ActionChainStore(redis)
+    chain = _chain(20)
+    store.save(chain)
+    full_bytes = store.last_write_bytes
+
+    # 另一个 Actor 加载后更新一个步骤
+    other = ActionChainStore(redis)
+    loaded = other.load(chain.chain_id)
+    step = loaded.steps[7]
+    step.status = ActionStepStatus.COMPLETED
+    step.result = {"text": "done"}
+    loaded.current_index = 8
+    assert other.save(loaded)
+    assert redis.rpush_calls[-1] == 1
+    assert other.last_write_bytes < full_bytes / 10
+
+    assert other.save(loaded) and other.last_write_bytes == 0  # 无变化不写
+    assert store.load(chain.chain_id).to_dict() == loaded.to_dict()
+
+
+def test_log_compaction_and_finished_ttl():
+    redis = _FakeRedis()
+    store = ActionChainStore(redis)
+    chain = _chain(2)
+    for i in range(40):
+        chain.steps[0].description = f"update {i}"
+        store.save(chain)
+    log = redis.data[f"action_chain:{chain.chain_id}:log"]
+    assert len(log) <= store.COMPACT_FACTOR * 8
+    assert store.load(chain.chain_id).steps[0].description == "update 39"
+
+    meta_key = f"action_chain:{chain.chain_id}:meta"
+    assert redis.ttls[meta_key] == chain.REDIS_TTL
+    chain.status = ActionStepStatus.COMPLETED
+    store.save(chain)
+    assert redis.ttls[meta_key] == chain.FINISHED_TTL
+    assert redis.ttls[f"action_chain:{chain.chain_id}:log"] == chain.FINISHED_TTL
+
+
+def test_progress_delta():
+    chain = _chain(2)
+    first = chain.get_progress_delta()
+    assert first["current_step"]["step_id"] == chain.steps[0].step_id and first["step_delta"] is None
+    assert chain.get_progress_delta() is None  # 无变化
+
+    chain.steps[0].status = ActionStepStatus.RUNNING
+    delta = chain.get_progress_delta()
+    assert delta["current_step"] is None
+    assert delta["step_delta"] == {"status": "running", "step_id": chain.steps[0].step_id}
+
+    chain.advance()
+    assert chain.get_progress_delta()["current_step"]["step_id"] == chain.steps[1].step_id
+
+
+def test_compact_encoding():
+    chain = _chain(1)
+    step = chain.steps[0]
+    record = encode_step(0, step)
+    assert len(record) < 0.6 * len(json.dumps(step.to_dict()))
+    assert decode_step(record)[1].to_dict() == step.to_dict()
+
+    pytest.importorskip("msgpack")
+    packed = encode_step(3, step, "msgpack")
+    assert isinstance(packed, bytes)
+    index, decoded = decode_step(packed)
+    assert index == 3 and decoded.to_dict() == step.to_dict()
+
+    redis = _FakeRedis(decode_responses=False)
+    store = ActionChainStore(redis)
+    assert store.codec == "msgpack"
+    store.save(chain)
+    assert store.load(chain.chain_id).to_dict() == chain.to_dict()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+测试 BlobStore 内容寻址存储与消息大字段移出 / 还原
+"""
+
+import sys
+import os
+import base64
+import json
+import tempfile
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import blob_store
+from services.blob_store import (
+    BlobStore, hydrate_column, hydrate_content, hydrate_media, hydrate_message, hydrate_payload, is_blob_ref,
+    offload_column, offload_content, offload_payload,
+)
+
+
+def test_put_dedup_and_path_safety():
+    """相同内容只写一次；非法 digest 不会映射到文件路径"""
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root)
+        a = store.put(b'hello', 'text/plain')
+        b = store.put(b'hello', 'text/plain')
+        assert a == b
+        assert store.stats()['writes'] == 1 and store.stats()['dedup'] == 1
+        assert store.read_bytes(a['$blob']) == b'hello'
+        assert store.content_type(a['$blob']) == 'text/plain'
+        assert store.path_for('../../etc/passwd') is None
+
+
+def test_media_offload_roundtrip():
+    """ext.media 中的 base64 移出后只剩 url，按需还原为原始 data"""
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root)
+        raw = os.urandom(4096)
+        ext = {'media': [{'type': 'image', 'mimeType': 'image/png', 'data': base64.b64encode(raw).decode()}],
+               'sender_name': 'A'}
+        stored = offload_payload(ext, threshold=1024, store=store)
+        item = stored['media'][0]
+        assert 'data' not in item and item['url'].startswith('/api/blobs/')
+        assert stored['sender_name'] == 'A'
+        assert 'data' in ext['media'][0]  # 入参未被修改
+
+        media = hydrate_media(stored['media'], store=store)
+        assert base64.b64decode(media[0]['data']) == raw
+
+
+def test_large_strings_and_columns():
+    """MCP 原始结果等大字符串、整列 LONGTEXT 可移出并还原"""
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root)
+        detail = {'raw_result': {'text': 'x' * 5000}, 'logs': ['ok']}
+        stored = offload_payload(detail, threshold=1024, store=store)
+        assert is_blob_ref(stored['raw_result']['text'])
+        assert hydrate_payload(stored, store=store) == detail
+
+        column = json.dumps({'result': 'y' * 5000})
+        ref_text = offload_column(column, threshold=1024, store=store)
+        assert len(ref_text) < 200
+        assert hydrate_column(ref_text, store=store) == column
+        assert hydrate_column('{"small": 1}', store=store) == '{"small": 1}'
+
+
+def test_content_data_uri():
+    """正文中内联的大 data URI 替换为 Blob 地址"""
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root)
+        b64 = base64.b64encode(os.urandom(3000)).decode()
+        content = f"看图 ![img](data:image/png;base64,{b64}) 完"
+        out = offload_content(content, threshold=1024, store=store)
+        assert 'base64,' not in out and '/api/blobs/' in out
+        assert out.startswith('看图 ![img](') and out.endswith(') 完')
+        assert hydrate_content(out, store=store) == content
+
+
+def test_hydrate_message_restores_written_shape():
+    """读取路径还原：原始 JSON 列与已解析对象都恢复为移出前的结构"""
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root)
+        b64 = base64.b64encode(os.urandom(3000)).decode()
+        ext = {'media': [{'type': 'image', 'mimeType': 'image/png', 'data': b64}]}
+        tool_calls = [{'name': 'search', 'result': 'z' * 5000}]
+        content = f"![img](data:image/png;base64,{b64})"
+        row = {
+            'content': offload_content(content, threshold=1024, store=store),
+            'ext': json.dumps(offload_payload(ext, threshold=1024, store=store)),
+            'tool_calls': offload_payload(tool_calls, threshold=1024, store=store),
+            'mcpdetail': offload_column(json.dumps({'raw': 'w' * 5000}), threshold=1024, store=store),
+        }
+        message = hydrate_message(row, store=store)
+        assert message['content'] == content
+        item = json.loads(message['ext'])['media'][0]
+        assert item['data'] == b64 and 'url' not in item and 'blob' not in item
+        assert message['tool_calls'] == tool_calls
+        assert json.loads(message['mcpdetail']) == {'raw': 'w' * 5000}
+        assert hydrate_message({'content': 'plain', 'ext': '{"a": 1}'}, store=store) == {
+            'content': 'plain', 'ext': '{"a": 1}'}
+
+
+def test_text_only_hydrate_and_list_reads_keep_refs():
+    """media=False 只还原文本引用；Message.from_db_row（列表 / 历史读取）不读 Blob"""
+    from models.message import Message
+
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root)
+        b64 = base64.b64encode(os.urandom(3000)).decode()
+        ext = offload_payload({'media': [{'type': 'image', 'mimeType': 'image/png', 'data': b64}],
+                               'note': 'n' * 5000}, threshold=1024, store=store)
+        content = offload_content(f"![img](data:image/png;base64,{b64})", threshold=1024, store=store)
+        row = {'message_id': 'm1', 'session_id': 's1', 'role': 'user', 'content': content, 'ext': json.dumps(ext)}
+
+        message = hydrate_message(dict(row), store=store, media=False)
+        parsed = json.loads(message['ext'])
+        assert message['content'] == content and parsed['note'] == 'n' * 5000
+        assert 'data' not in parsed['media'][0] and parsed['media'][0]['blob']
+
+        previous, blob_store._blob_store = blob_store._blob_store, store
+        try:
+            reads = store.stats()['reads']
+            listed = Message.from_db_row(row).to_dict()
+        finally:
+            blob_store._blob_store = previous
+        assert listed['ext'] == ext and listed['content'] == content
+        assert store.stats()['reads'] == reads
+
+
+if __name__ == "__main__":
+    test_put_dedup_and_path_safety()
+    test_media_offload_roundtrip()
+    test_large_strings_and_columns()
+    test_content_data_uri()
+    test_hydrate_message_restores_written_shape()
+    test_text_only_hydrate_and_list_reads_keep_refs()
+    print("✅ BlobStore 测试通过")
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+测试进程内取消令牌：令牌回调 / 注册表、Provider 流在一个分片内停止并关闭 HTTP 响应、
+MCP 调用的退避与响应体读取可被取消，以及 ActorManager 打断时保留 Actor、丢弃排队消息、
+进行中的回复不再推送（Redis、话题服务与 HTTP 均替换为桩）
+"""
+
+import sys
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import mcp_server.mcp_common_logic as mcp_common_logic
+import services.providers.openai_provider as openai_provider
+import services.topic_service as topic_service
+from services.actor.action_chain import ResponseDecision
+from services.actor.actor_manager import ActorManager
+from services.actor.agents.chat_agent import ChatAgent
+from services.providers import LLMMessage
+from utils.cancellation import (
+    CancellationToken,
+    bind_cancel_token,
+    cancel_token,
+    current_cancel_token,
+    get_token,
+    reset_token,
+)
+
+
+def test_token_callbacks_and_registry():
+    token = CancellationToken()
+    calls = []
+    unregister = token.on_cancel(lambda: calls.append("a"))
+    token.on_cancel(lambda: calls.append("b"))
+    token.on_cancel(lambda: 1 / 0)  # 回调异常不影响其他回调
+    unregister()
+    assert not token.wait(0.01)
+    assert token.cancel("user_interrupt") and not token.cancel("again")
+    assert calls == ["b"] and token.reason == "user_interrupt"
+    token.on_cancel(lambda: calls.append("late"))  # 已取消：立即执行
+    assert calls == ["b", "late"] and token.wait(0)
+
+    first = reset_token("topic_1", "agent_a")
+    assert get_token("topic_1", "agent_a") is first
+    assert cancel_token("topic_1", "agent_a") and first.cancelled
+    assert not reset_token("topic_1", "agent_a").cancelled
+    assert not cancel_token("topic_x", "agent_missing")
+
+    assert current_cancel_token() is None
+    with bind_cancel_token(first):
+        assert current_cancel_token() is first
+    assert current_cancel_token() is None
+
+
+class _StreamResponse:
+    """逐行产出 SSE 的 requests 响应桩；close() 后读取报错（模拟连接被关闭）"""
+
+    status_code = 200
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = threading.Event()
+        self.read = 0
+
+    def iter_lines(self):
+        for text in self.chunks:
+            if self.closed.is_set():
+                raise ConnectionError("connection closed")
+            self.read += 1
+            yield f'data: {{"choices": [{{"delta": {{"content": "{text}"}}}}]}}'.encode()
+        yield b"data: [DONE]"
+
+    def close(self):
+        self.closed.set()
+
+
+def test_provider_stream_stops_within_one_chunk(monkeypatch):
+    response = _StreamResponse([f"c{i}" for i in range(50)])
+    monkeypatch.setattr(openai_provider.requests, "post", lambda *a, **k: response)
+    # reasoner 模型固定走 REST 流（requests + iter_lines）
+    provider = openai_provider.DeepSeekProvider("key", "http://llm.local/v1/chat/completions", "deepseek-reasoner")
+
+    token = CancellationToken()
+    received = []
+    with bind_cancel_token(token):
+        stream = provider.chat_stream([LLMMessage(role="user", content="hi")])
+        while True:
+            try:
+                received.append(next(stream))
+            except StopIteration as stop:
+                result = stop.value
+                break
+            if len(received) == 3:
+                token.cancel("user_interrupt")
+
+    assert received == ["c0", "c1", "c2"]
+    assert response.closed.is_set() and response.read <= 4
+    assert result.content == "c0c1c2"
+
+    # 未绑定令牌：行为不变
+    response = _StreamResponse(["a", "b"])
+    monkeypatch.setattr(openai_provider.requests, "post", lambda *a, **k: response)
+    assert list(provider.chat_stream([LLMMessage(role="user", content="hi")])) == ["a", "b"]
+
+
+def test_sdk_generator_stream_closed_after_cancel():
+    """SDK 流生成器：读取中途被取消（无法从其他线程 close）时，退出迭代后仍关闭生成器释放响应"""
+    released = threading.Event()
+    token = CancellationToken()
+
+    def sdk_stream():
+        try:
+            for i in range(10):
+                if i == 2:
+                    token.cancel("user_interrupt")  # 正在读取时取消：此时 close() 报 already executing
+                yield i
+        finally:
+            released.set()
+
+    stream = sdk_stream()
+    provider = openai_provider.OpenAIProvider("key", "http://llm.local/v1", "gpt-4o")
+    with bind_cancel_token(token):
+        assert list(provider._cancellable(stream, stream)) == [0, 1]
+    assert released.is_set()
+
+
+class _McpResponse:
+    def __init__(self, status=500, block=False):
+        self.status_code = status
+        self.ok = status < 400
+        self.headers = {"Content-Type": "application/json"}
+        self.text = "server error"
+        self._closed = threading.Event()
+        self._block = block
+
+    @property
+    def content(self):
+        if self._block:
+            self._closed.wait(5)  # 等待响应体，直到连接被关闭
+            raise ConnectionError("connection closed")
+        return b"server error"
+
+    def close(self):
+        self._closed.set()
+
+
+@pytest.fixture
+def mcp_session(monkeypatch):
+    session = SimpleNamespace(responses=[], posts=0)
+
+    def post(url, **kwargs):
+        session.posts += 1
+        assert kwargs.get("stream") is True
+        return session.responses.pop(0)
+
+    session.post = post
+    monkeypatch.setattr(mcp_common_logic, "get_mcp_session", lambda url: session)
+    monkeypatch.setattr(mcp_common_logic, "prepare_mcp_headers", lambda url, headers, base=None: dict(base or {}))
+    return session
+
+
+def test_mcp_retry_backoff_is_cancellable(mcp_session):
+    mcp_session.responses = [_McpResponse(500) for _ in range(3)]
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel, args=("user_interrupt",)).start()
+
+    started = time.perf_counter()
+    result = mcp_common_logic.call_mcp_tool("http://mcp.local", {}, "search", {"q": "x"}, cancel_token=token)
+    assert result["error_type"] == "cancelled"
+    assert time.perf_counter() - started < 0.9  # 不等满 1s 退避
+    assert mcp_session.posts == 1
+
+
+def test_mcp_body_read_closed_on_cancel(mcp_session):
+    response = _McpResponse(200, block=True)
+    mcp_session.responses = [response]
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel, args=("user_interrupt",)).start()
+
+    started = time.perf_counter()
+    with bind_cancel_token(token):  # 取上下文绑定的令牌
+        result = mcp_common_logic.call_mcp_tool("http://mcp.local", {}, "browse", {})
+    assert result["error_type"] == "cancelled" and response._closed.is_set()
+    assert time.perf_counter() - started < 2
+
+
+class _FakeTopicService:
+    def __init__(self):
+        self.sent = []
+        self.events = []
+        self.repository = SimpleNamespace(find_by_id=lambda topic_id: None)
+
+    def get_topic(self, topic_id):
+        return {"session_type": "topic_general"}
+
+    def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+
+    def _publish_event(self, topic_id, event_type, data=None):
+        self.events.append((event_type, data))
+
+
+@pytest.fixture
+def env(monkeypatch):
+    fake = _FakeTopicService()
+    monkeypatch.setattr(topic_service, "get_topic_service", lambda: fake)
+
+    manager = ActorManager.__new__(ActorManager)  # 不启动 Redis 监听
+    manager.actors, manager._lock, manager._channel_to_agents = {}, threading.Lock(), {}
+    monkeypatch.setattr(manager, "_ensure_topic_handled", lambda topic_id: pytest.fail("actor rebuilt"))
+
+    actor = ChatAgent("agent_x")
+    actor.is_running = True
+    actor._config = {"llm_config_id": "cfg", "system_prompt": "你是测试助手。"}
+    actor.info = {"name": "测试"}
+    actor.SPECULATIVE_REPLY = False
+    manager.actors["agent_x"] = actor
+    monkeypatch.setattr(actor, "_plan_actions", lambda ctx: [])
+    monkeypatch.setattr(actor, "_resolve_reply_llm_config", lambda ctx: ("cfg", SimpleNamespace(
+        provider="openai", model="gpt-4o", supplier=None, metadata=None)))
+    monkeypatch.setattr(actor, "_check_is_thinking_model", lambda provider, model: False)
+    return manager, actor, fake
+
+
+def test_manager_interrupt_keeps_actor_and_drops_queued(env):
+    manager, actor, fake = env
+    for i in range(3):
+        actor.on_event("topic_1", {"type": "new_message", "data": {"message_id": f"m{i}"}})
+    actor.on_event("topic_2", {"type": "new_message", "data": {"message_id": "other"}})
+    actor.on_event("topic_1", {"type": "topic_updated", "data": {}})
+    token = reset_token("topic_1", "agent_x")
+
+    manager._on_interrupt("topic_1", "actor_manager:interrupt", {"agent_id": "agent_x"})
+
+    assert token.cancelled and token.reason == "user_interrupt"
+    assert manager.actors["agent_x"] is actor and actor.is_running
+    remaining = list(actor.mailbox.queue)
+    assert [(e["topic_id"], e["type"]) for e in remaining] == [("topic_2", "new_message"), ("topic_1", "topic_updated")]
+    assert actor.mailbox.unfinished_tasks == 2
+    assert fake.events[-1][0] == "agent_interrupt_ack"
+
+
+def test_interrupt_stops_reply_within_one_chunk(env, monkeypatch):
+    manager, actor, fake = env
+    pulled = []
+
+    def stream(messages, llm_config_id=None, ctx=None):
+        for i in range(20):
+            pulled.append(i)
+            if i == 2:  # 前端在第 3 个分片时打断
+                manager._on_interrupt("topic_1", "actor_manager:interrupt", {"agent_id": "agent_x"})
+            yield f"c{i}"
+
+    monkeypatch.setattr(actor, "_stream_llm_response", stream)
+    actor.process_message("topic_1", {"message_id": "m1", "content": "写一篇长文", "sender_type": "user"})
+
+    chunks = [data["chunk"] for kind, data in fake.events if kind == "agent_stream_chunk"]
+    assert chunks == ["c0", "c1"] and pulled == [0, 1, 2]
+    assert not fake.sent  # 被打断的回复不写库
+    assert not any(kind == "agent_stream_done" for kind, _ in fake.events)
+
+    # 同一个 Actor 继续处理下一条消息，历史未重新加载
+    history = len(actor.state.history)
+    monkeypatch.setattr(actor, "_stream_llm_response", lambda *a, **k: iter(["好的"]))
+    actor.process_message("topic_1", {"message_id": "m2", "content": "简短点", "sender_type": "user"})
+    assert fake.sent[-1]["content"] == "好的"
+    assert len(actor.state.history) == history + 1
+
+
+def test_interrupt_during_decision_cancels_turn(env, monkeypatch):
+    """_run 出队时即换新令牌：响应决策（可能调用 LLM）期间的打断使本轮不再生成回复"""
+    manager, actor, fake = env
+    streamed = []
+
+    def should_respond(topic_id, msg_data):
+        manager._on_interrupt("topic_1", "actor_manager:interrupt", {"agent_id": "agent_x"})
+        return ResponseDecision(action="reply")
+
+    def stream(messages, llm_config_id=None, ctx=None):
+        streamed.append(messages)
+        yield "不应输出"
+
+    monkeypatch.setattr(actor, "_should_respond", should_respond)
+    monkeypatch.setattr(actor, "_stream_llm_response", stream)
+    actor.on_event("topic_1", {"type": "new_message", "data": {
+        "message_id": "m1", "content": "你好", "sender_type": "user", "sender_id": "user_1"}})
+
+    worker = threading.Thread(target=actor._run, daemon=True)
+    worker.start()
+    deadline = time.time() + 5
+    while actor.mailbox.unfinished_tasks and time.time() < deadline:
+        time.sleep(0.01)
+    actor.is_running = False
+    worker.join(2)
+
+    assert get_token("topic_1", "agent_x").cancelled
+    assert not streamed and not fake.sent
+    assert not any(kind == "agent_stream_chunk" for kind, _ in fake.events)
+
+
+
+def test_interrupt_between_dequeue_and_new_token(env):
+    """消息已出队、尚未换新令牌时到达的打断：按入队时的打断代数补上；打断之后入队的消息不受影响"""
+    manager, actor, fake = env
+    actor.on_event("topic_1", {"type": "new_message", "data": {"message_id": "m1"}})
+    event = actor.mailbox.get_nowait()
+    actor.mailbox.task_done()
+
+    manager._on_interrupt("topic_1", "actor_manager:interrupt", {"agent_id": "agent_x"})
+    token = actor._begin_turn("topic_1", event["interrupt_generation"])
+    assert token.cancelled and token.reason == "user_interrupt"
+
+    actor.on_event("topic_1", {"type": "new_message", "data": {"message_id": "m2"}})
+    event = actor.mailbox.get_nowait()
+    assert not actor._begin_turn("topic_1", event["interrupt_generation"]).cancelled
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+测试 InstrumentedPool 连接池监控封装（使用假连接池，无需 MySQL）
+"""
+
+import sys
+import os
+import threading
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.db_pool import InstrumentedPool, LatencyHistogram
+
+
+class _FakeCursor:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.rows = [(1,)]
+
+    def execute(self, query, args=None):
+        time.sleep(self.delay)
+        return 1
+
+    def executemany(self, query, args):
+        return len(args)
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class _FakeConn:
+    def __init__(self, pool):
+        self.pool = pool
+        self.delay = 0.0
+
+    def cursor(self, *args):
+        return _FakeCursor(self.delay)
+
+    def close(self):
+        self.pool.returned += 1
+
+
+class _FakePool:
+    def __init__(self):
+        self.returned = 0
+        self._idle_cache = []
+        self._maxcached = 5
+
+    def connection(self):
+        return _FakeConn(self)
+
+
+def test_checkout_and_release():
+    """借出 / 归还计数与 in_use 指标"""
+    raw = _FakePool()
+    pool = InstrumentedPool(raw, max_connections=2)
+
+    conn = pool.connection()
+    assert pool.snapshot()['in_use'] == 1
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1")
+    assert cursor.fetchall() == [(1,)]
+    conn.close()
+    conn.close()  # 重复 close 不应重复归还
+
+    snap = pool.snapshot()
+    assert snap['in_use'] == 0
+    assert snap['checkouts'] == 1
+    assert raw.returned == 1
+    assert snap['query']['count'] == 1
+    assert snap['call_sites'][0]['site'].startswith('test_db_pool.py:test_checkout_and_release')
+
+
+def test_exhaustion_times_out():
+    """池耗尽时有界等待并返回 None"""
+    pool = InstrumentedPool(_FakePool(), max_connections=1, checkout_timeout=0.05)
+    held = pool.connection()
+    assert pool.connection() is None
+    assert pool.snapshot()['exhausted'] == 1
+    held.close()
+    assert pool.connection() is not None
+
+
+def test_slow_query_and_leaks():
+    """慢查询按调用点记录，长时间未归还的连接被报告为疑似泄漏"""
+    pool = InstrumentedPool(_FakePool(), max_connections=3, slow_query_ms=5, leak_threshold=0)
+    conn = pool.connection()
+    conn._conn.delay = 0.01
+    conn.cursor().execute("SELECT SLEEP(0.01)")
+
+    snap = pool.snapshot()
+    assert snap['call_sites'][0]['slow'] == 1
+    assert snap['slow_samples'][0]['sql'] == "SELECT SLEEP(0.01)"
+    assert len(snap['leaks']) == 1
+    conn.close()
+    assert pool.find_leaks() == []
+
+
+def test_concurrent_checkouts_bounded():
+    """并发借出数不超过 max_connections"""
+    pool = InstrumentedPool(_FakePool(), max_connections=3, checkout_timeout=5)
+
+    def worker():
+        for _ in range(20):
+            c = pool.connection()
+            c.cursor().execute("SELECT 1")
+            c.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    snap = pool.snapshot()
+    assert snap['checkouts'] == 160
+    assert snap['peak_in_use'] <= 3
+    assert snap['in_use'] == 0
+
+
+def test_histogram_quantiles():
+    hist = LatencyHistogram()
+    for ms in (0.5, 2, 3, 40, 3000):
+        hist.observe(ms)
+    data = hist.to_dict()
+    assert data['count'] == 5
+    assert data['p50_ms'] == 5
+    assert data['buckets']['le_5000'] == 1
+
+
+def test_read_only_routes_to_replica_pool():
+    """read_only=True 走副本池（未配置时回退主库）；目录浏览用只读连接，写入仍走主库"""
+    import database
+    from services.mcp_market_service import MCPMarketService
+
+    primary, replica = _FakePool(), _FakePool()
+    saved = (database.mysql_pool, database.mysql_read_pool, database.mysql_config)
+    database.mysql_pool, database.mysql_read_pool, database.mysql_config = primary, replica, {'enabled': True}
+    try:
+        assert database.get_mysql_connection(read_only=True).pool is replica
+        assert database.get_mysql_connection().pool is primary
+        database.mysql_read_pool = None
+        assert database.get_mysql_connection(read_only=True).pool is primary
+    finally:
+        database.mysql_pool, database.mysql_read_pool, database.mysql_config = saved
+
+    reads = []
+    service = MCPMarketService(lambda: None, lambda: reads.append(1))
+    assert service.search_items('x') == {"items": [], "total": 0}
+    assert service.get_item('x') is None
+    assert len(reads) == 2
+
+
+if __name__ == "__main__":
+    test_checkout_and_release()
+    test_exhaustion_times_out()
+    test_slow_query_and_leaks()
+    test_concurrent_checkouts_bounded()
+    test_histogram_quantiles()
+    test_read_only_routes_to_replica_pool()
+    print("✅ InstrumentedPool 测试通过")
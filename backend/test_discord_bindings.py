@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+测试 Discord 绑定索引：预加载、负缓存、变更后重载（假仓库，无需 MySQL）
+"""
+
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.discord_channel import DiscordChannel
+from services.discord_bindings import DiscordBindingIndex
+
+
+class _FakeRepo:
+    def __init__(self, bindings):
+        self.bindings = bindings
+        self.lookups = 0
+
+    def list_all(self, enabled_only=False):
+        return list(self.bindings)
+
+    def find_by_linked_agent_id(self, agent_id):
+        self.lookups += 1
+        return next((b for b in self.bindings if b.linked_agent_id == agent_id), None)
+
+
+def _index(repo, **kwargs):
+    index = DiscordBindingIndex(lambda: None, **kwargs)
+    index._repo = lambda: repo
+    return index
+
+
+def test_preload_and_negative_cache():
+    repo = _FakeRepo([DiscordChannel(channel_id='100', guild_id='g', linked_agent_id='agent_a')])
+    index = _index(repo)
+    assert index.load() == 1
+    assert index.channel_for('agent_a') == '100'
+    assert repo.lookups == 0
+
+    # 未绑定会话只查一次库
+    for _ in range(50):
+        assert index.channel_for('agent_other') is None
+    assert repo.lookups == 1
+    assert index.sessions() == {'agent_a'}
+
+
+def test_reload_on_change_bumps_version():
+    repo = _FakeRepo([])
+    index = _index(repo)
+    index.load()
+    assert index.channel_for('agent_b') is None
+    version = index.version
+
+    repo.bindings.append(DiscordChannel(channel_id='200', guild_id='g', linked_agent_id='agent_b'))
+    index.load()
+    assert index.version > version
+    # 重载清空负缓存
+    assert index.channel_for('agent_b') == '200'
+
+    version = index.version
+    index.load()
+    assert index.version == version  # 无变化不触发重新订阅
+
+    index.put('agent_c', '300')
+    assert index.channel_for('agent_c') == '300'
+    assert index.version > version
+
+
+if __name__ == "__main__":
+    test_preload_and_negative_cache()
+    test_reload_on_change_bumps_version()
+    print("✅ Discord 绑定索引测试通过")
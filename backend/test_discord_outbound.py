@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+测试 Discord 出站调度：编辑合并、频道限频、同频道顺序、429 重试、超时撤销（假客户端，无需 discord.py）
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.discord_outbound import DiscordOutbound
+
+
+class _RateLimited(Exception):
+    status = 429
+    retry_after = 0.05
+
+
+class _Msg:
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.id = message_id
+
+    async def edit(self, content):
+        self.channel.calls.append(('edit', self.id, content, time.monotonic()))
+
+
+class _Channel:
+    def __init__(self, fail_first=0):
+        self.calls = []
+        self.fail_first = fail_first
+        self.block = None
+
+    async def send(self, text):
+        if self.block is not None:
+            await self.block.wait()
+        if self.fail_first:
+            self.fail_first -= 1
+            raise _RateLimited()
+        self.calls.append(('send', text, time.monotonic()))
+        return _Msg(self, len(self.calls))
+
+    def get_partial_message(self, message_id):
+        return _Msg(self, message_id)
+
+
+class _Client:
+    def __init__(self, channel):
+        self.channel = channel
+
+    def is_closed(self):
+        return False
+
+    def get_channel(self, channel_id):
+        return self.channel
+
+
+def _loop_thread():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+def test_edit_coalescing_and_order():
+    loop = _loop_thread()
+    channel = _Channel()
+    channel.block = asyncio.Event()
+    outbound = DiscordOutbound(lambda: _Client(channel), lambda: loop, channel_rate=100, channel_per=1)
+    try:
+        first = outbound.send(1, 'hello')
+        # 首条发送阻塞期间排队的编辑合并为一条
+        for i in range(20):
+            outbound.edit(1, 1, f'v{i}')
+        tail = outbound.send_many(1, ['p1', 'p2'])
+        loop.call_soon_threadsafe(channel.block.set)
+        assert first.result(timeout=2) == 1
+        assert tail.result(timeout=2) == [3, 4]
+        kinds = [c[0] for c in channel.calls]
+        assert kinds == ['send', 'edit', 'send', 'send']
+        assert channel.calls[1][2] == 'v19'
+        stats = outbound.stats()
+        assert stats['coalesced'] == 19 and stats['edited'] == 1
+        assert stats['latency_ms']['max'] is not None
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+
+
+def test_channel_rate_limit_and_429_retry():
+    loop = _loop_thread()
+    channel = _Channel(fail_first=1)
+    outbound = DiscordOutbound(lambda: _Client(channel), lambda: loop, channel_rate=2, channel_per=0.2)
+    try:
+        start = time.monotonic()
+        ids = outbound.send_many(1, ['a', 'b', 'c', 'd']).result(timeout=3)
+        assert len(ids) == 4
+        # 令牌桶容量 2、速率 10/s：4 条加一次 429 冻结至少需要 ~0.2s
+        assert time.monotonic() - start >= 0.15
+        assert outbound.stats()['rate_limited'] == 1
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+
+
+def test_cancel_queued_and_rate_limited_send():
+    """排队中 / 等待限频令牌的发送可撤销，之后不会发出；已发出的不能撤销"""
+    import concurrent.futures
+    loop = _loop_thread()
+    channel = _Channel()
+    outbound = DiscordOutbound(lambda: _Client(channel), lambda: loop, channel_rate=1, channel_per=0.3)
+    try:
+        first = outbound.send(1, 'first')
+        waiting = outbound.send(1, 'waiting')  # 出队后等待频道令牌
+        queued = outbound.send(1, 'queued')
+        assert first.result(timeout=2) == 1
+        assert not outbound.cancel(first)
+        time.sleep(0.05)
+        assert outbound.cancel(queued) and queued.cancelled()
+        assert outbound.cancel(waiting)
+        try:
+            waiting.result(timeout=2)
+            assert False, 'cancelled send should not complete'
+        except concurrent.futures.CancelledError:
+            pass
+        assert outbound.send(1, 'after').result(timeout=2) == 2
+        assert [c[1] for c in channel.calls] == ['first', 'after']
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    test_edit_coalescing_and_order()
+    test_channel_rate_limit_and_429_retry()
+    test_cancel_queued_and_rate_limited_send()
+    print("✅ Discord 出站调度测试通过")
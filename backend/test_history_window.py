@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+测试 ActorState 历史窗口：时间有序写入、message_id 去重 / 定位、前缀和预算与全量估算一致、
+淘汰与回退后前缀和仍正确、去重集合按加入顺序淘汰
+"""
+
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from token_counter import estimate_messages_tokens
+from services.actor.actor_state import ActorState
+from services.actor.history_window import HistoryWindow, RecentIdSet
+
+
+def _msg(i, ts=None, content=None, role=None):
+    return {
+        'message_id': f"m{i}",
+        'role': role or ('user' if i % 2 == 0 else 'assistant'),
+        'content': content if content is not None else f"消息内容 {i} " * (i % 5 + 1),
+        'created_at': ts if ts is not None else 1_700_000_000 + i,
+    }
+
+
+def _expected_tokens(items, model='gpt-4'):
+    return estimate_messages_tokens(
+        [{'role': m.get('role', 'user'), 'content': m.get('content', '')} for m in items if m.get('content')], model
+    )
+
+
+def test_ordering_and_dedup():
+    window = HistoryWindow([_msg(2, ts='2024-01-01T00:00:02Z'), _msg(1, ts='2024-01-01T00:00:01+00:00')])
+    assert [m['message_id'] for m in window] == ['m1', 'm2']
+
+    assert window.append(_msg(4, ts=1704067204.0))
+    assert not window.append(_msg(4))  # 重复 message_id
+    # 乱序到达：插入到对应时间位置
+    assert window.append(_msg(3, ts='2024-01-01T00:00:03Z'))
+    assert [m['message_id'] for m in window] == ['m1', 'm2', 'm3', 'm4']
+    assert window.position('m3') == 2 and 'm3' in window and 'mx' not in window
+
+    # 缺少时间的消息追加在末尾
+    window.append({'message_id': 'm5', 'role': 'user', 'content': 'x'})
+    assert window[-1]['message_id'] == 'm5'
+    assert [m['message_id'] for m in window.tail(2)] == ['m4', 'm5']
+    assert [m['message_id'] for m in window[1:3]] == ['m2', 'm3']
+
+
+def test_prefix_sums_match_full_estimate():
+    items = [_msg(i) for i in range(50)]
+    window = HistoryWindow(items, maxlen=30)
+    kept = items[-30:]
+    assert len(window) == 30 and window[0]['message_id'] == 'm20'
+    assert window.tokens_after(None, 'gpt-4') == _expected_tokens(kept)
+    assert window.tokens_after('m29', 'gpt-4') == _expected_tokens(items[30:])
+
+    # 追加触发淘汰后前缀和仍正确
+    for i in range(50, 60):
+        window.append(_msg(i))
+    items = [_msg(i) for i in range(30, 60)]
+    assert window[0]['message_id'] == 'm30'
+    assert window.tokens_after(None, 'gpt-4') == _expected_tokens(items)
+    assert window.tokens_after('m45', 'gpt-4') == _expected_tokens(items[16:])
+    assert window.chars_after('m45') == sum(len(m['content']) for m in items[16:])
+
+    # 回退
+    assert window.truncate_after('m40')
+    assert window[-1]['message_id'] == 'm40' and 'm41' not in window
+    assert window.tokens_after('m35', 'gpt-4') == _expected_tokens(items[6:11])
+
+
+def test_actor_state_window():
+    state = ActorState('topic')
+    state.history = [_msg(i) for i in range(20)]
+    state.history += [_msg(20)]
+    assert len(state.history) == 21
+
+    state.append_history(_msg(5))  # 已存在，忽略
+    assert len(state.history) == 21
+
+    state.set_summary('摘要', 'm9')
+    assert [m['message_id'] for m in state.unsummarized_history()][:2] == ['m10', 'm11']
+    assert state.estimate_tokens('gpt-4') == (
+        _expected_tokens([_msg(i) for i in range(10, 21)])
+        + estimate_messages_tokens([{'role': 'system', 'content': '摘要'}], 'gpt-4')
+    )
+
+    recent = state.get_recent_history(max_messages=4, include_summary=True)
+    assert recent[0]['role'] == 'system'
+    assert [m['content'] for m in recent[1:]] == [_msg(i)['content'].strip() for i in range(17, 21)]
+
+    state.clear_after('m8')
+    assert state.summary is None and len(state.history) == 9
+
+
+def test_recent_id_set_evicts_oldest():
+    ids = RecentIdSet(maxlen=10)
+    for i in range(11):
+        ids.add(f"id{i}")
+    assert len(ids) == 5
+    assert 'id0' not in ids and 'id10' in ids and 'id6' in ids
+
+    state = ActorState('topic')
+    assert state.is_processed('a') is False
+    assert state.is_processed('a') is True
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+测试 IterationContext 轻量化：StepRecord 兼容 dict 访问、派生视图缓存到下次修改、
+媒体按引用登记（不复制 base64），以及 30 步工具调用回合的基准
+（每次步骤变更都同步 processSteps / processMessages / ext，与普通 dict 步骤的旧路径对比）
+
+直接运行输出基准数据：python test_iteration_context_perf.py --bench
+"""
+
+import sys
+import os
+import json
+import time
+import tracemalloc
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from services.actor.iteration_context import IterationContext, StepRecord
+
+_IMAGE = "iVBORw0KGgo" * 20000  # ~220KB base64
+
+
+def _mcp_result(i):
+    content = [{"type": "text", "text": f"结果 {i}"}]
+    if i % 5 == 0:
+        content.append({"type": "image", "mimeType": "image/png", "data": _IMAGE})
+    return {"result": {"content": content}}
+
+
+def _run_turn(ctx, steps=30, legacy=False, sync=None):
+    """模拟一次工具调用回合：每步 add + update，每次变更后同步一次"""
+    ctx.llm_config, ctx.llm_config_id = {"provider": "openai", "model": "gpt-4o"}, "cfg"
+    sync = sync or (lambda c: None)
+    for i in range(steps):
+        ctx.add_step("mcp_call", thinking=f"调用工具 {i}", mcpServer="srv", toolName=f"tool_{i}",
+                     arguments={"q": f"query {i}"}, iteration=i)
+        if legacy:
+            ctx.process_steps[-1] = dict(ctx.process_steps[-1].to_dict())  # 旧实现：普通 dict 步骤
+        sync(ctx)
+        ctx.update_last_step(status="completed", result=_mcp_result(i))
+        sync(ctx)
+        ctx.add_execution_log(f"工具 {i} 完成", log_type="tool")
+    return ctx
+
+
+def _sync(ctx):
+    return ctx.to_process_steps_dict(), ctx.to_process_messages(), ctx.build_ext_data()
+
+
+def test_step_record_is_dict_compatible():
+    ctx = IterationContext()
+    step = ctx.add_step("thinking", thinking="思考中", extra_field="x")
+    assert isinstance(step, StepRecord)
+    assert step["type"] == "thinking" and step.get("extra_field") == "x"
+    assert "duration" not in step and step.get("duration", 0) == 0
+    with pytest.raises(KeyError):
+        step["missing"]
+
+    ctx.update_last_step(status="completed", result={"ok": True})
+    assert "duration" in step and step["result"] == {"ok": True}
+    assert step.pop("extra_field") == "x" and "extra_field" not in step
+    assert not hasattr(step, "__dict__")
+
+    # 视图是普通 dict，可直接 JSON 序列化
+    json.dumps(ctx.to_event_data())
+    json.dumps(ctx.build_ext_data())
+
+
+def test_callback_receives_plain_dict():
+    received = []
+    ctx = IterationContext()
+    ctx.set_step_callback(lambda c, s: received.append(s), "agent_x")
+    ctx.add_step("thinking", thinking="a")
+    ctx.update_last_step(status="completed")
+    assert all(type(s) is dict for s in received)
+    assert received[-1]["status"] == "completed"
+
+
+def test_views_cached_until_mutation():
+    ctx = IterationContext()
+    ctx.add_step("mcp_call", mcpServer="srv", toolName="a", result=_mcp_result(0))
+    ctx.add_step("thinking", thinking="b")
+
+    first = ctx.to_process_messages()
+    second = ctx.to_process_messages()
+    assert first is not second and all(a is b for a, b in zip(first, second))
+    nodes = ctx._build_mind_nodes()
+
+    ctx.update_last_step(status="completed")
+    after = ctx.to_process_messages()
+    assert after[0] is first[0]  # 未修改的步骤复用缓存
+    assert after[1] is not first[1] and after[1]["meta"]["status"] == "completed"
+    assert ctx._build_mind_nodes()[0] is nodes[0]
+
+    ctx.max_iterations = 3  # 影响思维链的上下文字段变化时重建
+    ctx.add_step("iteration", iteration=1)
+    assert ctx._build_mind_nodes()[-1]["iteration"]["maxRounds"] == 3
+
+
+def test_media_by_reference():
+    ctx = IterationContext()
+    step = ctx.add_step("mcp_call", mcpServer="srv", toolName="draw", result=_mcp_result(0))
+    [ref] = step.media
+    assert ref.data is step["result"]["result"]["content"][1]["data"]  # 不复制 payload
+
+    message = ctx.to_process_messages()[0]
+    assert message["contentType"] == "image" and message["image"]["data"] is _IMAGE
+    extracted = ctx.build_ext_data()["agent_ext_content"]["mcpResults"][0]["extractedMedia"]
+    assert extracted[0]["mediaId"] == ref.media_id
+    assert ctx.get_media(ref.media_id) is ref
+
+    ctx.update_last_step(result={"content": [{"type": "audio", "url": "http://a/b.mp3"}]})
+    assert [r.kind for r in step.media] == ["audio"] and step.media[0].data == "http://a/b.mp3"
+    assert ctx.get_media(ref.media_id) is None
+
+
+def test_matches_legacy_dict_steps():
+    cached = _run_turn(IterationContext(), steps=6)
+    legacy = _run_turn(IterationContext(), steps=6, legacy=True)
+
+    def strip(value):
+        # step_id / 时间戳 / mediaId 每次运行不同
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items()
+                    if k not in ("step_id", "id", "timestamp", "duration", "mediaId")}
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+
+    assert strip(cached.to_process_messages()) == strip(legacy.to_process_messages())
+    assert strip(cached.build_ext_data()) == strip(legacy.build_ext_data())
+
+
+def run_benchmark(steps=30):
+    """每次步骤变更同步一次，对比缓存视图与普通 dict 步骤（旧实现）的耗时与新分配内存"""
+    stats = {}
+    for name, legacy in (("cached", False), ("legacy", True)):
+        allocated = [0]
+
+        def sync(ctx):
+            before = tracemalloc.get_traced_memory()[0]
+            views = _sync(ctx)
+            allocated[0] += tracemalloc.get_traced_memory()[0] - before
+            del views
+
+        tracemalloc.start()
+        _run_turn(IterationContext(), steps, legacy, sync)
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        _run_turn(IterationContext(), steps, legacy, _sync)
+        stats[name] = {"seconds": time.perf_counter() - started, "view_bytes": allocated[0]}
+    return stats
+
+
+def test_benchmark_30_step_turn():
+    # 只断言分配量；耗时受机器负载影响，用 --bench 查看
+    stats = run_benchmark(30)
+    assert stats["cached"]["view_bytes"] < stats["legacy"]["view_bytes"] / 3
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        for name, row in run_benchmark(30).items():
+            print(f"{name:7s} {row['seconds'] * 1000:8.1f} ms  {row['view_bytes'] / 1024:10.1f} KiB allocated by views")
+        sys.exit(0)
+    sys.exit(pytest.main([__file__, "-q"]))
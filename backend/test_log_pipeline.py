@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+测试热路径日志管道：记录在后台线程写出、分类级别、级别未启用时不格式化预览、
+预览按 1/N 采样、队列满时丢弃而不阻塞、json 格式输出结构化字段、可变参数入队时取快照
+"""
+
+import sys
+import os
+import io
+import json
+import logging
+import threading
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from utils import log_pipeline
+from utils.log_pipeline import (
+    get_category_logger,
+    init_log_pipeline,
+    log_event,
+    pipeline_stats,
+    preview,
+    shutdown_log_pipeline,
+)
+
+
+class _ThreadRecordingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def write(self, s):
+        self.threads.add(threading.current_thread().name)
+        return super().write(s)
+
+
+class _Counting:
+    """str() 时计数，用于验证惰性格式化"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "x" * 50
+
+
+@pytest.fixture
+def stream():
+    out = _ThreadRecordingStream()
+    yield out
+    init_log_pipeline()  # 恢复默认配置（stderr）
+
+
+def _flush():
+    shutdown_log_pipeline()  # 停止时写完队列中剩余记录
+
+
+def test_written_by_background_thread_with_fields(stream):
+    init_log_pipeline({"categories": {"mcp": "DEBUG"}}, stream=stream)
+    log = get_category_logger("mcp")
+    log_event(log, logging.INFO, "call_mcp_tool 完成", tool="search", duration_ms=12)
+    _flush()
+
+    text = stream.getvalue()
+    assert "[mcp] [INFO] call_mcp_tool 完成 | tool=search duration_ms=12" in text
+    assert threading.current_thread().name not in stream.threads
+
+
+def test_category_levels_and_lazy_preview(stream):
+    init_log_pipeline({"categories": {"llm": "INFO", "actor": "DEBUG"}, "sample": {"preview": 1}}, stream=stream)
+    probe = _Counting()
+    log_event(get_category_logger("llm"), logging.DEBUG, "提示词", preview=preview(probe))
+    assert probe.calls == 0  # 级别未启用：不入队、不格式化
+
+    log_event(get_category_logger("actor"), logging.DEBUG, "ActionStep 参数", params=preview({"q": "天气" * 10}, 8))
+    _flush()
+    assert probe.calls == 0
+    text = stream.getvalue()
+    assert "提示词" not in text
+    assert 'params={"q": "天...(+' in text
+
+
+def test_mutable_values_snapshotted_before_enqueue(stream):
+    init_log_pipeline({"categories": {"actor": "DEBUG"}, "sample": {"preview": 1}}, stream=stream)
+    log = get_category_logger("actor")
+    result = {"status": "running"}
+    steps = ["a"]
+    probe = _Counting()
+    log_event(log, logging.INFO, "ActionStep Result %s", steps, result=preview(result), probe=preview(probe))
+    result["status"] = "done"
+    steps.append("b")
+    _flush()
+
+    text = stream.getvalue()
+    assert "ActionStep Result ['a'] | result={\"status\": \"running\"}" in text
+    assert probe.calls == 1  # 非容器值不拷贝，仍只在后台线程格式化
+
+
+def test_preview_sampling(stream):
+    init_log_pipeline({"categories": {"llm": "DEBUG"}, "sample": {"preview": 5}}, stream=stream)
+    log = get_category_logger("llm")
+    for i in range(20):
+        log_event(log, logging.DEBUG, "提示词 %d", i, sample="preview")
+    log_event(log, logging.INFO, "流式生成完成")
+    _flush()
+
+    lines = stream.getvalue().splitlines()
+    assert len([l for l in lines if "提示词" in l]) == 4
+    assert any("流式生成完成" in l for l in lines)  # 未带 sample 的记录不受影响
+    assert pipeline_stats()["sampled_out"] == 16
+
+
+def test_full_queue_drops_without_blocking(stream, monkeypatch):
+    init_log_pipeline({"queue_size": 3}, stream=stream)
+    handler = log_pipeline._queue_handler
+    listener = log_pipeline._listener
+    listener.stop()  # 模拟写出线程跟不上
+    log_pipeline._listener = listener  # 保持“已初始化”状态
+
+    log = get_category_logger("actor")
+    for i in range(10):
+        log_event(log, logging.INFO, "收到消息 %d", i)
+    stats = pipeline_stats()
+    assert stats["enqueued"] == 3 and stats["dropped"] == 7
+    log_pipeline._listener = None
+    assert handler.queue.qsize() == 3
+
+
+def test_json_format(stream):
+    init_log_pipeline({"format": "json"}, stream=stream)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        get_category_logger("mcp").error("MCP 调用异常", exc_info=True, extra={"fields": {"server": "srv"}})
+    _flush()
+
+    record = json.loads(stream.getvalue().splitlines()[0])
+    assert record["category"] == "mcp" and record["level"] == "ERROR"
+    assert record["server"] == "srv" and "ValueError: boom" in record["exc"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
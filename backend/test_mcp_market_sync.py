@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+测试 MCP 市场增量同步：sitemap lastmod 跳过、304 条件请求、批量落库与游标续传（假 HTTP / 假存储）
+"""
+
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import mcp_market_service as mms
+from services.mcp_market_service import MCPMarketService, SyncStats
+
+SITEMAP = "".join(
+    f"<url><loc>https://mcpdb.org/zh/mcps/s{i}</loc><lastmod>2025-01-0{i % 3 + 1}</lastmod></url>"
+    for i in range(6)
+)
+PAGE = '<title>S</title><code>npx -y pkg-{slug}</code>'
+
+
+class _Resp:
+    def __init__(self, status, text="", headers=None):
+        self.status_code = status
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class _Session:
+    requests = []
+
+    def mount(self, *args):
+        pass
+
+    def get(self, url, timeout=None, headers=None):
+        _Session.requests.append((url, dict(headers or {})))
+        if url.endswith("sitemap"):
+            return _Resp(200, SITEMAP)
+        if (headers or {}).get("If-None-Match") == '"v1"':
+            return _Resp(304)
+        slug = url.rsplit("/", 1)[-1]
+        return _Resp(200, PAGE.format(slug=slug), {"ETag": '"v1"'})
+
+
+def _service(states):
+    service = MCPMarketService(lambda: None)
+    batches = []
+    service._load_page_states = lambda source_id: states
+    service._persist_batch = lambda source_id, items, changed, cursor: (
+        batches.append((items, changed, cursor)) or (len(items), 0))
+    return service, batches
+
+
+def test_incremental_html_sync():
+    original = mms.requests.Session
+    mms.requests.Session = _Session
+    try:
+        config = {"sitemap_url": "https://mcpdb.org/api/sitemap", "include_prefixes": ["https://mcpdb.org/zh/mcps/"],
+                  "workers": 3, "max_items": 100}
+        _Session.requests = []
+        service, batches = _service({})
+        stats = SyncStats()
+        service._sync_html_scrape(config, "mcpdb-zh-mcps", stats, {})
+        assert stats.fetched == 6 and stats.inserted == 6 and stats.count == 6
+        assert batches[-1][2]["position"] == 6
+        states = {s.url: s for _, changed, _ in batches for s in changed}
+        for s in states.values():
+            s.fetched = True
+
+        # 第二轮：sitemap lastmod 未变 → 不发请求；lastmod 变化 → 条件请求 304
+        changed_url = "https://mcpdb.org/zh/mcps/s0"
+        states[changed_url].lastmod = "old"
+        _Session.requests = []
+        service, batches = _service(states)
+        stats = SyncStats()
+        service._sync_html_scrape(config, "mcpdb-zh-mcps", stats, {})
+        page_requests = [r for r in _Session.requests if not r[0].endswith("sitemap")]
+        assert [r[0] for r in page_requests] == [changed_url]
+        assert page_requests[0][1]["If-None-Match"] == '"v1"'
+        assert stats.unchanged == 6 and stats.fetched == 0 and stats.count == 6
+
+        # 续传：从游标位置开始
+        _Session.requests = []
+        service, batches = _service({})
+        stats = SyncStats()
+        service._sync_html_scrape(config, "mcpdb-zh-mcps", stats, {"position": 4, "items": 4})
+        assert stats.fetched == 2 and stats.count == 6
+
+        # 达到 max_items：超出上限的页面既不写条目，也不记录页面状态（下次仍会抓取）
+        service, batches = _service({})
+        stats = SyncStats()
+        service._sync_html_scrape(dict(config, max_items=4), "mcpdb-zh-mcps", stats, {})
+        written = [item.item_id for items, _, _ in batches for item in items]
+        persisted = [s for _, changed, _ in batches for s in changed]
+        assert len(written) == 4 and stats.count == 4
+        assert sorted(s.item_id for s in persisted) == sorted(written)
+    finally:
+        mms.requests.Session = original
+
+
+def test_throttle_spacing():
+    import time
+    throttle = mms._HostThrottle(per_host=2, min_interval=0.02)
+    start = time.monotonic()
+    for _ in range(4):
+        with throttle.slot("https://example.com/a"):
+            pass
+    assert time.monotonic() - start >= 0.06
+
+
+if __name__ == "__main__":
+    test_incremental_html_sync()
+    test_throttle_spacing()
+    print("✅ MCP 市场增量同步测试通过")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+测试媒体字节缓存：字节限额淘汰、磁盘溢出层、single-flight 回源、ETag / 304
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from services.media_cache import MediaCache, media_response
+
+
+def test_byte_budget_and_spill():
+    with tempfile.TemporaryDirectory() as root:
+        cache = MediaCache(max_bytes=250, max_item_bytes=200, spill_dir=root, spill_max_bytes=1000)
+        cache.set('a', b'a' * 100, 'image/png')
+        cache.set('b', b'b' * 100, 'image/png')
+        cache.get('a')  # a 变为最近使用
+        cache.set('c', b'c' * 100, 'image/png')  # 超出 250 字节，淘汰 b 到磁盘
+        stats = cache.stats()
+        assert stats['bytes'] == 200 and stats['spill_entries'] == 1
+
+        entry = cache.get('b')
+        assert entry.content == b'b' * 100
+        assert cache.stats()['spill_hits'] == 1
+
+        # 超过单条上限的内容不缓存
+        cache.set('big', b'x' * 300, 'image/png')
+        assert cache.get('big') is None
+
+        # 重启后磁盘层仍可命中
+        reopened = MediaCache(max_bytes=250, spill_dir=root, spill_max_bytes=1000)
+        assert reopened.stats()['spill_entries'] == cache.stats()['spill_entries']
+
+
+def test_single_flight():
+    cache = MediaCache()
+    calls = []
+
+    def fetcher():
+        calls.append(1)
+        time.sleep(0.05)
+        return b'thumb', 'image/jpeg'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch('k', fetcher)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert all(r.content == b'thumb' for r in results)
+
+
+def test_etag_not_modified():
+    app = Flask(__name__)
+    entry = MediaCache().set('k', b'img', 'image/png')
+    with app.test_request_context('/'):
+        resp = media_response(entry)
+        assert resp.status_code == 200 and resp.headers['ETag'] == f'"{entry.etag}"'
+    with app.test_request_context('/', headers={'If-None-Match': f'"{entry.etag}"'}):
+        assert media_response(entry).status_code == 304
+
+
+if __name__ == "__main__":
+    test_byte_budget_and_spill()
+    test_single_flight()
+    test_etag_not_modified()
+    print("✅ 媒体缓存测试通过")
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+测试媒体任务编排：退避轮询、完成后流式保存产出、失败判定、重启恢复后抢占下载、下载租约续约与接管
+（假供应商与假数据库，无需 MySQL / Redis）
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import media_job_service as mjs
+from services.media_job_service import JobProvider, MediaJobService
+
+
+class _FakeOutputs:
+    def __init__(self):
+        self.saved = []
+
+    def save_output_stream(self, stream, **kwargs):
+        self.saved.append((b''.join(stream), kwargs))
+        return {'output_id': f'mo_{len(self.saved)}'}
+
+
+def _wait(service, job_id, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = service.get(job_id)
+        if job and job['status'] in mjs.TERMINAL_STATUSES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError('job did not finish')
+
+
+def test_poll_backoff_and_download():
+    import services.media_output_service as mos
+    outputs = _FakeOutputs()
+    original = mos.get_media_output_service
+    mos.get_media_output_service = lambda: outputs
+    polls = []
+
+    def status(job):
+        polls.append(time.time())
+        return {'status': 'SUCCEEDED', 'output': 'https://x/video'} if len(polls) >= 3 else {'status': 'PROCESSING'}
+
+    provider = JobProvider(
+        submit=lambda params: ('task-1', {'model': 'veo'}),
+        status=status,
+        download=lambda job, output: (iter([b'vid', b'eo']), 'video/mp4'),
+    )
+    service = MediaJobService(lambda: None, min_interval=0.02, max_interval=0.1, backoff=2.0,
+                              providers={'fake': provider})
+    try:
+        job = service.submit('fake', {'prompt': 'a cat'})
+        done = _wait(service, job['job_id'])
+        assert done['status'] == 'succeeded' and done['output_id'] == 'mo_1'
+        assert outputs.saved[0][0] == b'video'
+        assert outputs.saved[0][1]['provider'] == 'fake'
+        # 间隔逐次放大
+        gaps = [b - a for a, b in zip(polls, polls[1:])]
+        assert gaps[1] > gaps[0]
+    finally:
+        mos.get_media_output_service = original
+        service.shutdown()
+
+
+def test_provider_failure_and_unknown_provider():
+    provider = JobProvider(
+        submit=lambda params: ('task-2', {}),
+        status=lambda job: {'status': 'FAILED', 'error': 'quota'},
+        download=lambda job, output: (iter([]), 'video/mp4'),
+    )
+    service = MediaJobService(lambda: None, min_interval=0.01, providers={'fake': provider})
+    try:
+        assert 'error' in service.submit('nope', {})
+        job = service.submit('fake', {})
+        done = _wait(service, job['job_id'])
+        assert done['status'] == 'failed' and done['error'] == 'quota'
+    finally:
+        service.shutdown()
+
+
+class _FakeJobsDB:
+    """只实现 media_jobs 恢复 / 抢占 / 续约 / 进度更新用到的语句；available=False 模拟数据库不可用"""
+
+    def __init__(self, rows):
+        self.rows = {r['job_id']: dict(r) for r in rows}
+        self.available = True
+        self.renewals = 0
+
+    def connect(self):
+        return _FakeJobsConn(self) if self.available else None
+
+
+class _FakeJobsConn:
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 0
+        self._result = []
+
+    def cursor(self, *args):
+        return self
+
+    def execute(self, sql, params=()):
+        sql = ' '.join(sql.split())
+        rows = self.db.rows.values()
+        now = time.time()
+        if sql.startswith('SELECT * FROM media_jobs WHERE status'):
+            self._result = [dict(r) for r in rows if r['status'] == params[0]]
+        elif sql.startswith('UPDATE media_jobs SET status = %s, lease_owner = NULL WHERE status = %s'):
+            matched = [r for r in rows if r['status'] == params[1]
+                       and (r.get('heartbeat_at') is None or r['heartbeat_at'] < now - params[2])]
+            for r in matched:
+                r['status'], r['lease_owner'] = params[0], None
+            self.rowcount = len(matched)
+        elif sql.startswith('UPDATE media_jobs SET status = %s, lease_owner = %s, heartbeat_at = NOW()'):
+            row = self.db.rows.get(params[2])
+            self.rowcount = 0
+            if row and row['status'] == params[3]:
+                row.update(status=params[0], lease_owner=params[1], heartbeat_at=now)
+                self.rowcount = 1
+        elif sql.startswith('UPDATE media_jobs SET heartbeat_at = NOW()'):
+            row = self.db.rows.get(params[0])
+            self.rowcount = 0
+            if row and row.get('lease_owner') == params[1]:
+                row['heartbeat_at'] = now
+                self.db.renewals += 1
+                self.rowcount = 1
+        elif sql.startswith('UPDATE media_jobs SET status = %s, provider_status'):
+            self.db.rows[params[-1]]['status'] = params[0]
+        else:
+            raise AssertionError(f'unexpected SQL: {sql}')
+
+    def fetchall(self):
+        return self._result
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_resume_reclaims_interrupted_download():
+    """上次在下载途中退出（downloading）的任务：恢复后能重新抢占并下载；数据库不可用时不下载、稍后重试"""
+    import services.media_output_service as mos
+    outputs = _FakeOutputs()
+    original = mos.get_media_output_service
+    mos.get_media_output_service = lambda: outputs
+    db = _FakeJobsDB([
+        {'job_id': 'mj_1', 'provider': 'fake', 'task_id': 't1', 'status': 'downloading',
+         'lease_owner': 'old-worker', 'heartbeat_at': time.time() - 600},
+        {'job_id': 'mj_2', 'provider': 'fake', 'task_id': 't2', 'status': 'succeeded'},
+        # 其他存活进程正在下载（租约未过期）：不恢复
+        {'job_id': 'mj_3', 'provider': 'fake', 'task_id': 't3', 'status': 'downloading',
+         'lease_owner': 'live-worker', 'heartbeat_at': time.time()},
+    ])
+    provider = JobProvider(
+        submit=lambda params: (None, {}),
+        status=lambda job: {'status': 'SUCCEEDED', 'output': 'https://x/video'},
+        download=lambda job, output: (iter([b'video']), 'video/mp4'),
+    )
+    service = MediaJobService(db.connect, min_interval=0.02, providers={'fake': provider})
+    try:
+        db.available = False
+        assert service.resume() == 0
+        db.available = True
+        # 模拟恢复后首次抢占时数据库暂不可用
+        claims = []
+        claim = service._claim_download
+
+        def flaky_claim(job):
+            claims.append(job.job_id)
+            db.available = len(claims) > 1
+            try:
+                return claim(job)
+            finally:
+                db.available = True
+
+        service._claim_download = flaky_claim
+        assert service.resume() == 1
+        assert db.rows['mj_1']['status'] == 'running'
+        done = _wait(service, 'mj_1')
+        assert done['status'] == 'succeeded'
+        assert len(claims) == 2 and len(outputs.saved) == 1
+        assert db.rows['mj_1']['status'] == 'succeeded'
+        assert db.rows['mj_3']['status'] == 'downloading' and 'mj_3' not in service._jobs
+    finally:
+        mos.get_media_output_service = original
+        service.shutdown()
+
+
+def test_download_renews_lease_and_stops_when_taken_over():
+    """下载期间按租约周期续约；租约被其他进程接管时中止下载且不写任务状态"""
+    import services.media_output_service as mos
+    outputs = _FakeOutputs()
+    original = mos.get_media_output_service
+    mos.get_media_output_service = lambda: outputs
+    db = _FakeJobsDB([
+        {'job_id': 'mj_1', 'provider': 'fake', 'task_id': 't1', 'status': 'running'},
+        {'job_id': 'mj_2', 'provider': 'fake', 'task_id': 't2', 'status': 'running'},
+    ])
+
+    def download(job, output):
+        def chunks():
+            for i in range(6):
+                time.sleep(0.03)
+                if job.job_id == 'mj_2' and i == 3:
+                    db.rows['mj_2']['lease_owner'] = 'other-worker'  # 被判定过期后由其他进程接管
+                yield b'x'
+        return chunks(), 'video/mp4'
+
+    provider = JobProvider(
+        submit=lambda params: (None, {}),
+        status=lambda job: {'status': 'SUCCEEDED', 'output': 'https://x/video'},
+        download=download,
+    )
+    service = MediaJobService(db.connect, min_interval=0.02, providers={'fake': provider}, lease_seconds=0.1)
+    try:
+        assert service.resume() == 2
+        assert _wait(service, 'mj_1')['status'] == 'succeeded'
+        assert db.renewals >= 2 and db.rows['mj_1']['lease_owner'] == service.worker_id
+        deadline = time.time() + 2
+        while 'mj_2' in service._jobs and time.time() < deadline:
+            time.sleep(0.01)
+        assert 'mj_2' not in service._jobs and 'mj_2' not in service._finished
+        assert db.rows['mj_2']['status'] == 'downloading' and len(outputs.saved) == 1
+    finally:
+        mos.get_media_output_service = original
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    test_poll_backoff_and_download()
+    test_provider_failure_and_unknown_provider()
+    test_resume_reclaims_interrupted_download()
+    test_download_renews_lease_and_stops_when_taken_over()
+    print("✅ 媒体任务编排测试通过")
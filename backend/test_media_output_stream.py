@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+测试媒体产出流式保存：base64 增量解码（含 data URI 前缀跨块）、块迭代写盘、sha256、失败时不留临时文件
+"""
+
+import sys
+import os
+import base64
+import hashlib
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import media_output_service as mos
+from services.media_output_service import Base64StreamDecoder, MediaOutputService, iter_chunks
+
+
+class _FakeRepository:
+    def __init__(self):
+        self.saved = []
+
+    def save(self, output):
+        self.saved.append(output)
+        return True
+
+
+def _service(root):
+    mos.UPLOADS_MEDIA = Path(root) / 'uploads' / 'media'
+    mos.BACKEND_ROOT = Path(root)
+    svc = MediaOutputService(get_connection=lambda: None)
+    svc.repository = _FakeRepository()
+    return svc
+
+
+def test_decoder_chunk_boundaries():
+    raw = os.urandom(10001)
+    text = 'data:image/png;base64,' + base64.b64encode(raw).decode()
+    for size in (1, 3, 5, 64, 4096):
+        decoder = Base64StreamDecoder()
+        out = b''.join(decoder.feed(c) for c in iter_chunks(text, size)) + decoder.flush()
+        assert out == raw
+
+
+def test_save_output_stream_from_chunks():
+    raw = os.urandom(300 * 1024)
+    original = (mos.UPLOADS_MEDIA, mos.BACKEND_ROOT)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            _check_save(_service(root), root, raw)
+    finally:
+        mos.UPLOADS_MEDIA, mos.BACKEND_ROOT = original
+
+
+def _check_save(svc, root, raw):
+    result = svc.save_output_stream(iter_chunks(raw, 8192), media_type='video', mime_type='video/mp4')
+    path = Path(root) / result['file_path']
+    assert path.read_bytes() == raw
+    assert result['file_size'] == len(raw)
+    assert result['metadata']['sha256'] == hashlib.sha256(raw).hexdigest()
+
+    # 兼容旧接口：base64 字符串
+    result = svc.save_output(base64.b64encode(b'png-bytes').decode(), media_type='image')
+    assert (Path(root) / result['file_path']).read_bytes() == b'png-bytes'
+
+    # 解码失败：返回错误，且不残留临时文件
+    result = svc.save_output('data:image/png;base64,abcde', media_type='image')
+    assert 'error' in result
+    leftovers = [p for p in mos.UPLOADS_MEDIA.rglob('*') if p.name.endswith('.part')]
+    assert leftovers == []
+
+
+if __name__ == "__main__":
+    test_decoder_chunk_boundaries()
+    test_save_output_stream_from_chunks()
+    print("✅ 媒体产出流式保存测试通过")
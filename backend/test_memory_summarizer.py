@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+测试后台记忆摘要：调度不阻塞、增量摘要（已有摘要 + 新消息）、比较并交换、回退后丢弃、Redis 持久化与恢复、
+摘要未覆盖的历史按 token 预算装入上下文
+（假 Actor / 假 Redis，无需 LLM 与 MySQL）
+"""
+
+import sys
+import os
+import threading
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.actor.actor_state import ActorState
+from services.actor.memory_summarizer import MemorySummarizer, select_batch
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class _FakeActor:
+    def __init__(self, n_messages, gate=None):
+        self.agent_id = "agent_a"
+        self.topic_id = "topic_1"
+        self._config = {"model": "gpt-4"}
+        self.state = ActorState("topic_1")
+        self.state.history = [
+            {"message_id": f"m{i}", "role": "user" if i % 2 == 0 else "assistant", "content": f"消息 {i}"}
+            for i in range(n_messages)
+        ]
+        self.calls = []
+        self.gate = gate
+
+    def _generate_summary(self, previous, messages):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.calls.append((previous, [m["message_id"] for m in messages]))
+        return f"摘要至 {messages[-1]['message_id']}"
+
+
+def _summarizer(redis=None):
+    return MemorySummarizer(max_workers=1, get_connection=lambda: None, get_redis=lambda: redis)
+
+
+def test_select_batch():
+    history = [{"message_id": f"m{i}"} for i in range(10)]
+    assert [m["message_id"] for m in select_batch(history, None, keep_recent=3)] == [f"m{i}" for i in range(7)]
+    assert [m["message_id"] for m in select_batch(history, "m4", keep_recent=3)] == ["m5", "m6"]
+    assert select_batch(history, "m8", keep_recent=3) == []
+    assert len(select_batch(history, None, keep_recent=0, max_batch=4)) == 4
+
+
+def test_background_incremental_summary():
+    gate = threading.Event()
+    actor = _FakeActor(30, gate=gate)
+    redis = _FakeRedis()
+    summarizer = _summarizer(redis)
+
+    future = summarizer.schedule(actor, keep_recent=10)
+    assert future is not None and not future.done()  # 调度立即返回
+    assert summarizer.schedule(actor, keep_recent=10) is None  # 同一 (agent, topic) 不重复提交
+    gate.set()
+    assert future.result(timeout=5) is True
+    assert actor.state.memory_snapshot() == ("摘要至 m19", "m19")
+    assert actor.calls[0] == (None, [f"m{i}" for i in range(20)])
+
+    # 新消息到达后增量摘要：已有摘要 + m20 之后的消息
+    actor.state.history += [{"message_id": f"m{i}", "role": "user", "content": "x"} for i in range(30, 40)]
+    assert summarizer.schedule(actor, keep_recent=10).result(timeout=5) is True
+    assert actor.calls[1] == ("摘要至 m19", [f"m{i}" for i in range(20, 30)])
+    assert actor.state.summary_until == "m29"
+
+    # 摘要覆盖的消息不再计入预算
+    assert len(actor.state.unsummarized_history()) == 10
+
+    # 恢复到新的 ActorState（模拟进程重启）
+    restored = ActorState("topic_1")
+    restored.history = list(actor.state.history)
+    assert summarizer.restore("agent_a", "topic_1", restored) is True
+    assert restored.memory_snapshot() == actor.state.memory_snapshot()
+
+
+def test_rollback_during_summary_discards_result():
+    gate = threading.Event()
+    actor = _FakeActor(30, gate=gate)
+    redis = _FakeRedis()
+    summarizer = _summarizer(redis)
+
+    future = summarizer.schedule(actor, keep_recent=10)
+    actor.state.clear_after("m5")  # 回退删除了待摘要的消息
+    gate.set()
+    assert future.result(timeout=5) is False
+    assert actor.state.memory_snapshot() == (None, None)
+    assert redis.data == {}
+
+    # summary_until 已不在历史中时不恢复
+    redis.setex("actor:summary:topic_1:agent_a", 60, '{"summary": "旧摘要", "summary_until": "m25"}')
+    assert summarizer.restore("agent_a", "topic_1", actor.state) is False
+
+
+def test_baseline_change_discards_result():
+    gate = threading.Event()
+    actor = _FakeActor(30, gate=gate)
+    summarizer = _summarizer()
+
+    future = summarizer.schedule(actor, keep_recent=10)
+    actor.state.set_summary("另一个摘要", "m3")
+    gate.set()
+    assert future.result(timeout=5) is False
+    assert actor.state.summary == "另一个摘要"
+
+
+def test_persist_uses_topic_captured_at_submit():
+    gate = threading.Event()
+    actor = _FakeActor(30, gate=gate)
+    redis = _FakeRedis()
+    summarizer = _summarizer(redis)
+
+    future = summarizer.schedule(actor, keep_recent=10)
+    actor.topic_id = "topic_2"  # 摘要期间 Actor 切换了话题
+    gate.set()
+    assert future.result(timeout=5) is True
+    assert list(redis.data) == ["actor:summary:topic_1:agent_a"]
+
+
+
+def test_history_after_summary_fills_token_budget():
+    """硬预算分支：摘要之后的消息从最新往前填满预算，不只取最近 5 条（中间的消息不会丢失）"""
+    from token_counter import estimate_messages_tokens
+
+    state = _FakeActor(40).state
+    state.set_summary("摘要至 m9", "m9")
+    _, until = state.memory_snapshot()
+
+    msgs = state.get_history_after(until, "gpt-4", max_tokens=100000)
+    assert [m["content"] for m in msgs] == [f"消息 {i}" for i in range(10, 40)]
+
+    one = estimate_messages_tokens([msgs[-1]], "gpt-4")
+    tight = state.get_history_after(until, "gpt-4", max_tokens=one * 8)
+    assert tight == msgs[-len(tight):] and 5 < len(tight) < 30
+    assert state.get_history_after(until, "gpt-4", max_tokens=0) == msgs[-1:]  # 至少保留最新一条
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
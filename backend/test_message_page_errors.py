@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+测试 MessageRepository.find_page 的错误语义：无连接 / 查询失败时抛出 DatabaseUnavailableError
+（路由返回 503），而不是返回与「没有更多历史」无法区分的空页
+"""
+
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from models.message import MessageRepository
+from utils.db import DatabaseUnavailableError
+
+
+class _BrokenConnection:
+    closed = False
+
+    def cursor(self, *args):
+        return self
+
+    def execute(self, *args):
+        raise RuntimeError("Lost connection to MySQL server during query")
+
+    def close(self):
+        self.closed = True
+
+
+def test_no_connection_raises():
+    repo = MessageRepository(lambda: None)
+    with pytest.raises(DatabaseUnavailableError):
+        repo.find_page("s1", limit=20)
+    assert repo.find_by_session("s1") == []
+
+
+def test_query_error_raises_and_closes():
+    conn = _BrokenConnection()
+    repo = MessageRepository(lambda: conn)
+    with pytest.raises(DatabaseUnavailableError, match="Lost connection"):
+        repo.find_page("s1", limit=20)
+    assert conn.closed
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+测试版本化迁移执行器（使用内存版假 MySQL 连接）
+"""
+
+import sys
+import os
+import threading
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from migrations.runner import Migration, add_index, run_migrations
+
+
+class _MySQLError(Exception):
+    pass
+
+
+class _FakeDB:
+    """共享状态：迁移记录、咨询锁、已执行语句"""
+
+    def __init__(self):
+        self.versions = None  # None 表示 schema_migrations 表不存在
+        self.lock = threading.Lock()
+        self.statements = []
+        self.indexes = set()
+
+
+class _FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = None
+
+    def execute(self, sql, args=None):
+        self.db.statements.append(sql.strip().split()[0:2])
+        if 'MAX(`version`)' in sql:
+            if self.db.versions is None:
+                raise _MySQLError(1146, "Table doesn't exist")
+            self.result = (max(self.db.versions, default=None),)
+        elif 'GET_LOCK' in sql:
+            self.result = (1 if self.db.lock.acquire(timeout=args[1]) else 0,)
+        elif 'RELEASE_LOCK' in sql:
+            self.db.lock.release()
+            self.result = (1,)
+        elif 'CREATE TABLE IF NOT EXISTS `schema_migrations`' in sql:
+            if self.db.versions is None:
+                self.db.versions = []
+        elif sql.startswith('INSERT INTO `schema_migrations`'):
+            self.db.versions.append(args[0])
+        elif sql.startswith('CREATE INDEX'):
+            name = sql.split('`')[1]
+            if name in self.db.indexes:
+                raise _MySQLError(1061, "Duplicate key name")
+            self.db.indexes.add(name)
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class _FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return _FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _migrations(calls):
+    return [
+        Migration(1, 'baseline', lambda c: calls.append(1)),
+        Migration(2, 'index', lambda c: (calls.append(2), add_index(c, 'messages', 'idx_x', ('a', 'b')))),
+    ]
+
+
+def test_applies_pending_once():
+    """首次启动按顺序执行全部迁移；再次启动只做一次版本查询"""
+    db = _FakeDB()
+    calls = []
+    assert run_migrations(lambda: _FakeConn(db), _migrations(calls)) == [1, 2]
+    assert calls == [1, 2]
+
+    db.statements.clear()
+    assert run_migrations(lambda: _FakeConn(db), _migrations(calls)) == []
+    assert calls == [1, 2]
+    assert len(db.statements) == 1  # 快速路径：仅 SELECT MAX(version)
+
+
+def test_incremental_and_idempotent_index():
+    """已有 v1 的库只执行 v2；索引已存在（1061）时忽略"""
+    db = _FakeDB()
+    db.versions = [1]
+    db.indexes.add('idx_x')
+    calls = []
+    assert run_migrations(lambda: _FakeConn(db), _migrations(calls)) == [2]
+    assert calls == [2]
+
+
+def test_concurrent_workers_run_once():
+    """多个 worker 同时启动，迁移只执行一次"""
+    db = _FakeDB()
+    calls = []
+    migrations = _migrations(calls)
+    threads = [threading.Thread(target=run_migrations, args=(lambda: _FakeConn(db), migrations)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == [1, 2]
+    assert db.versions == [1, 2]
+
+
+def test_rejects_unordered_versions():
+    try:
+        run_migrations(lambda: None, [Migration(2, 'b', print), Migration(1, 'a', print)])
+    except ValueError:
+        return
+    raise AssertionError("unordered migrations should be rejected")
+
+
+if __name__ == "__main__":
+    test_applies_pending_once()
+    test_incremental_and_idempotent_index()
+    test_concurrent_workers_run_once()
+    test_rejects_unordered_versions()
+    print("✅ 迁移执行器测试通过")
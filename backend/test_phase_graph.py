@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+测试消息处理阶段 DAG：无依赖阶段并行执行、依赖失败时下游跳过、阶段事件带耗时且在等待线程投递、
+推测生成流的采用 / 丢弃（副作用只在采用时执行、放弃时立即停止生成），以及 process_message 在工具可选时提前开始主 LLM 流
+（话题服务、LLM 配置与 Provider 均替换为桩）
+"""
+
+import sys
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import services.topic_service as topic_service
+from services.actor.actions import ActionResult
+from services.actor.agents.chat_agent import ChatAgent
+from services.actor.iteration_context import ProcessPhase
+from services.actor.phase_graph import PhaseError, PhaseGraph, SpeculativeStream, apply_side_effect
+from utils.cancellation import CancellationToken, bind_cancel_token, current_cancel_token
+
+
+def test_independent_phases_run_concurrently():
+    events = []
+    graph = PhaseGraph(on_event=lambda phase, status, data: events.append((phase, status, data)))
+    graph.add("a", lambda: time.sleep(0.15) or "A")
+    graph.add("b", lambda: time.sleep(0.15) or "B")
+    graph.add("c", lambda: "C", deps=("a", "b"))
+
+    started = time.perf_counter()
+    run = graph.start()
+    assert run.wait("c", timeout=2) == "C"
+    elapsed = time.perf_counter() - started
+    assert elapsed < 0.28  # a、b 并行，而不是 0.3s 串行
+
+    completed = {p: d for p, s, d in events if s == "completed"}
+    assert set(completed) == {"a", "b", "c"}
+    assert completed["a"]["duration_ms"] >= 140
+    assert completed["c"]["started_ms"] >= completed["a"]["duration_ms"]
+    assert run.timings["c"]["status"] == "completed"
+
+
+def test_events_delivered_on_waiting_thread():
+    """阶段事件在调用 wait() / drain() 的线程投递（回调可安全修改 IterationContext）"""
+    threads = []
+    graph = PhaseGraph(on_event=lambda phase, status, data: threads.append(threading.current_thread()))
+    graph.add("a", lambda: time.sleep(0.05) or "A")
+    graph.add("b", lambda: time.sleep(0.1) or "B")
+    run = graph.start()
+    assert run.wait("a", timeout=2) == "A"
+    time.sleep(0.15)  # b 在无人等待时完成：事件留在队列
+    delivered = len(threads)
+    run.drain()
+    assert len(threads) == 4 and delivered < 4
+    assert all(t is threading.current_thread() for t in threads)
+
+    graph = PhaseGraph()
+    graph.add("slow", lambda: time.sleep(0.3))
+    with pytest.raises(TimeoutError):
+        graph.start().wait("slow", timeout=0.05)
+
+
+def test_speculative_stream_uses_own_executor():
+    names = []
+    spec = SpeculativeStream(lambda: iter([threading.current_thread().name]))
+    names.extend(spec.commit())
+    assert names[0].startswith("actor-stream")
+
+
+def test_failure_skips_dependents_but_not_optional():
+    graph = PhaseGraph()
+
+    def boom():
+        raise ValueError("boom")
+
+    graph.add("bad", boom)
+    graph.add("hint", boom, optional=True)
+    graph.add("after_bad", lambda: "x", deps=("bad",))
+    graph.add("after_hint", lambda: "y", deps=("hint",))
+    run = graph.start()
+
+    with pytest.raises(ValueError):
+        run.wait("bad", timeout=2)
+    with pytest.raises(PhaseError):
+        run.wait("after_bad", timeout=2)
+    assert run.wait("after_hint", timeout=2) == "y"
+    assert run.status("after_bad") == "skipped"
+
+    with pytest.raises(ValueError):
+        PhaseGraph().add("x", lambda: 1, deps=("missing",))
+
+
+def test_speculative_stream_commit_and_abandon():
+    spec = SpeculativeStream(lambda: iter(["a", "b", "c"]))
+    assert "".join(spec.commit()) == "abc"
+
+    closed = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        try:
+            yield "x"
+            release.wait(2)
+            yield "y"
+            yield "z"
+        finally:
+            closed.set()
+
+    spec = SpeculativeStream(slow)
+    deadline = time.time() + 2
+    while spec.first_chunk_ms is None and time.time() < deadline:
+        time.sleep(0.01)
+    spec.abandon()
+    release.set()
+    assert closed.wait(2)  # 生成器被关闭，不再继续拉取
+
+
+def _effectful(effects, blocked=None, finished=None):
+    try:
+        yield "a"
+        apply_side_effect(lambda: effects.append("thinking"))
+        if blocked is not None:
+            # 模拟阻塞在 HTTP 读取上的 Provider：取消令牌触发时返回
+            blocked.set()
+            if current_cancel_token().wait(5):
+                return
+        yield "b"
+        apply_side_effect(lambda: effects.append("metadata"))
+    finally:
+        if finished is not None:
+            finished.set()
+
+
+def test_speculative_side_effects_apply_on_commit_only():
+    effects = []
+    spec = SpeculativeStream(lambda: _effectful(effects))
+    time.sleep(0.05)
+    assert effects == []  # 推测期间不修改任何状态
+    consumed = []
+    for chunk in spec.commit():
+        consumed.append((chunk, list(effects)))
+    assert consumed == [("a", []), ("b", ["thinking"])]
+    assert effects == ["thinking", "metadata"]
+
+    effects = []
+    apply_side_effect(lambda: effects.append("direct"))  # 非推测路径立即执行
+    assert effects == ["direct"]
+
+
+def test_speculative_abandon_stops_blocked_generator_and_drops_effects():
+    effects = []
+    blocked, finished = threading.Event(), threading.Event()
+    spec = SpeculativeStream(lambda: _effectful(effects, blocked, finished))
+    assert blocked.wait(2)
+    spec.abandon()
+    assert finished.wait(1)  # 不等阻塞的读取超时
+    assert effects == []
+
+    # 本轮令牌被打断时推测流一并取消
+    turn = CancellationToken()
+    blocked = threading.Event()
+    with bind_cancel_token(turn):
+        spec = SpeculativeStream(lambda: _effectful(effects, blocked))
+    assert blocked.wait(2)
+    turn.cancel("user_interrupt")
+    assert list(spec.commit()) == ["a"]
+
+
+class _FakeTopicService:
+    def __init__(self):
+        self.sent = []
+        self.repository = SimpleNamespace(find_by_id=lambda topic_id: None)
+
+    def get_topic(self, topic_id):
+        time.sleep(0.1)
+        return {"session_type": "topic_general"}
+
+    def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+
+    def _publish_event(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    fake = _FakeTopicService()
+    monkeypatch.setattr(topic_service, "get_topic_service", lambda: fake)
+
+    actor = ChatAgent("agent_x")
+    actor.is_running = True
+    actor._config = {"llm_config_id": "cfg", "system_prompt": "你是测试助手。"}
+    actor.info = {"name": "测试"}
+    events = []
+    monkeypatch.setattr(actor, "_publish_process_event", lambda ctx, phase, status, data=None: events.append((phase, status)))
+    monkeypatch.setattr(actor, "_sync_message", lambda *a, **k: None)
+    monkeypatch.setattr(actor, "_send_execution_log", lambda *a, **k: None)
+
+    config = SimpleNamespace(provider="openai", model="gpt-4o", supplier=None, metadata=None)
+
+    def resolve(ctx):
+        time.sleep(0.1)
+        return "cfg", config
+
+    monkeypatch.setattr(actor, "_resolve_reply_llm_config", resolve)
+    monkeypatch.setattr(actor, "_check_is_thinking_model", lambda provider, model: False)
+    return actor, fake, events
+
+
+def _stream_recorder(actor, monkeypatch, log):
+    def stream(messages, llm_config_id=None, ctx=None):
+        log.append(("stream_start", time.perf_counter(), [m["content"] for m in messages]))
+        yield "你好"
+        yield "！"
+
+    monkeypatch.setattr(actor, "_stream_llm_response", stream)
+
+
+def test_process_message_speculates_when_tools_optional(agent, monkeypatch):
+    actor, fake, events = agent
+    log = []
+    _stream_recorder(actor, monkeypatch, log)
+
+    def plan(ctx):
+        time.sleep(0.3)  # MCP 路由较慢，且最终无需工具
+        log.append(("plan_done", time.perf_counter()))
+        return []
+
+    monkeypatch.setattr(actor, "_plan_actions", plan)
+    actor.process_message("topic_1", {"message_id": "m1", "content": "讲个笑话", "sender_type": "user"})
+
+    assert fake.sent and fake.sent[-1]["content"] == "你好！"
+    (_, stream_at, _), (_, plan_at) = log[0], log[1]
+    assert stream_at < plan_at  # 主 LLM 流在规划完成前已开始
+    assert (ProcessPhase.PLAN_ACTIONS, "completed") in events
+    assert (ProcessPhase.RESOLVE_SESSION, "completed") in events
+
+
+def test_process_message_discards_speculation_when_tools_planned(agent, monkeypatch):
+    actor, fake, _ = agent
+    log = []
+    _stream_recorder(actor, monkeypatch, log)
+
+    step = SimpleNamespace(action_type="ag_use_mcp", mcp_server_id="srv", mcp_tool_name="auto")
+    monkeypatch.setattr(actor, "_plan_actions", lambda ctx: time.sleep(0.1) or [step])
+
+    def execute(action, ctx):
+        ctx.tool_results_text = "工具结果"
+        return ActionResult(action_type="mcp", success=True, text_result="工具结果")
+
+    monkeypatch.setattr(actor, "_execute_action", execute)
+    monkeypatch.setattr(actor, "_should_continue", lambda ctx: False)
+    actor.process_message("topic_1", {"message_id": "m2", "content": "查一下天气", "sender_type": "user"})
+
+    assert fake.sent[-1]["content"] == "你好！"
+    # 推测流被丢弃（可能尚未开始拉取），回复基于工具结果重新生成
+    starts = [entry for entry in log if entry[0] == "stream_start"]
+    assert 1 <= len(starts) <= 2
+    assert "工具已自动执行完毕" in starts[-1][2][0]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+测试分段 system prompt：稳定前缀不随历史条数变化、缓存断点转换为 Anthropic cache_control、
+各 Provider usage 中的缓存命中数归一化并记录到 llmResponse.prompt_cache
+"""
+
+import sys
+import os
+from types import SimpleNamespace
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from services.actor.actor_base import ActorBase
+from services.actor.iteration_context import IterationContext
+from services.actor.prompt_segments import SegmentedPrompt
+from services.providers.anthropic_provider import AnthropicProvider
+from services.providers.base import LLMMessage, split_cache_blocks
+from services.providers.google_provider import GoogleProvider
+from services.providers.openai_provider import OpenAIProvider
+
+
+def _fake_actor(history_len):
+    capabilities = SimpleNamespace(
+        get_capability_description=lambda: "## 可用的内置工具\n- search",
+        get_available_skills=lambda: [],
+    )
+    return SimpleNamespace(
+        _config={"system_prompt": "你是测试助手。"},
+        capabilities=capabilities,
+        topic_id=None,
+        agent_id="agent_test",
+        state=SimpleNamespace(history=[{}] * history_len),
+    )
+
+
+def test_segments_order_and_breakpoints():
+    prompt = SegmentedPrompt()
+    prompt.add("persona", "P")
+    prompt.add("history_hint", "H", stable=False)
+    prompt.add("capabilities", "C", breakpoint=True)
+    prompt.add("skill_catalog", "S")
+    prompt.add("empty", "")
+    layout = prompt.render()
+
+    assert layout.text == "P\n\nC\n\nS\n\nH"
+    assert layout.segments == ("persona", "capabilities", "skill_catalog", "history_hint")
+    assert layout.breakpoints == (len("P\n\nC"), len("P\n\nC\n\nS"))
+    # 末尾追加内容仍可复用断点；前缀被改动则不带断点
+    assert layout.cache_hints(layout.text + "\n\n附加说明") == list(layout.breakpoints)
+    assert layout.cache_hints("X" + layout.text) is None
+
+
+def test_stable_prefix_survives_history_growth():
+    ctx_a, ctx_b = IterationContext(), IterationContext()
+    text_a = ActorBase._build_system_prompt(_fake_actor(3), ctx_a)
+    text_b = ActorBase._build_system_prompt(_fake_actor(4), ctx_b)
+
+    assert text_a != text_b
+    assert "已有 3 条对话记录" in text_a and "已有 4 条对话记录" in text_b
+    layout_a, layout_b = ctx_a.prompt_layout, ctx_b.prompt_layout
+    assert layout_a.prefix_hash == layout_b.prefix_hash
+    assert text_a[:layout_a.stable_length] == text_b[:layout_b.stable_length]
+    assert text_a.startswith("你是测试助手。\n\n## 可用的内置工具")
+
+
+def test_anthropic_system_blocks():
+    provider = AnthropicProvider(api_key="test")
+    text = "persona\n\ncapabilities\n\nhistory"
+    system, user_msgs = provider._split_messages([
+        LLMMessage(role="system", content=text, cache_breakpoints=[len("persona\n\ncapabilities")]),
+        LLMMessage(role="system", content="【对话摘要】"),
+        LLMMessage(role="user", content="hi"),
+    ])
+    assert [b["text"] for b in system] == ["persona\n\ncapabilities", "\n\nhistory", "【对话摘要】"]
+    assert system[0]["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in system[1]
+    assert user_msgs == [{"role": "user", "content": "hi"}]
+
+    # 无断点时保持纯字符串
+    system, _ = provider._split_messages([LLMMessage(role="system", content="plain")])
+    assert system == "plain"
+
+    # 最多保留最后 4 个断点
+    blocks = split_cache_blocks("abcdef", [1, 2, 3, 4, 5])
+    assert len(blocks) == 6
+    system, _ = provider._split_messages([LLMMessage(role="system", content="abcdef", cache_breakpoints=[1, 2, 3, 4, 5])])
+    assert sum(1 for b in system if "cache_control" in b) == 4 and "cache_control" not in system[0]
+
+
+def test_usage_normalisation():
+    usage = AnthropicProvider._parse_usage({
+        "input_tokens": 100, "output_tokens": 20,
+        "cache_read_input_tokens": 900, "cache_creation_input_tokens": 0,
+    })
+    assert usage["prompt_tokens"] == 1000 and usage["cached_tokens"] == 900
+
+    usage = OpenAIProvider._parse_usage({
+        "prompt_tokens": 2000, "completion_tokens": 10, "total_tokens": 2010,
+        "prompt_tokens_details": {"cached_tokens": 1536},
+    })
+    assert usage["cached_tokens"] == 1536 and usage["total_tokens"] == 2010
+
+    # DeepSeek
+    usage = OpenAIProvider._parse_usage({
+        "prompt_tokens": 500, "completion_tokens": 5, "prompt_cache_hit_tokens": 384,
+    })
+    assert usage["cached_tokens"] == 384 and usage["total_tokens"] == 505
+
+    usage = GoogleProvider._parse_usage({"promptTokenCount": 4096, "candidatesTokenCount": 8,
+                                         "cachedContentTokenCount": 2048})
+    assert usage["cached_tokens"] == 2048
+
+
+def test_prompt_cache_recorded_in_metadata():
+    ctx = IterationContext()
+    ActorBase._build_system_prompt(_fake_actor(1), ctx)
+    ctx.set_llm_response_metadata(
+        usage={"prompt_tokens": 1000, "completion_tokens": 5, "total_tokens": 1005, "cached_tokens": 750},
+        finish_reason="stop",
+    )
+    prompt_cache = ctx.final_ext["llmResponse"]["prompt_cache"]
+    assert prompt_cache["cached_ratio"] == 0.75
+    assert prompt_cache["prefix_hash"] == ctx.prompt_layout.prefix_hash
+
+    # 未报告缓存命中数的 Provider 不记录
+    ctx.set_llm_response_metadata(usage={"prompt_tokens": 10, "completion_tokens": 1})
+    assert "prompt_cache" not in ctx.final_ext["llmResponse"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+测试 RepositoryCache 版本化读穿缓存（使用内存版假 Redis）
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.repository_cache import RepositoryCache, ENTITY_SESSION, ENTITY_AGENT_CONFIG
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, *keys):
+        return [self.data.get(k) for k in keys]
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+
+def test_read_through_and_invalidate():
+    """首次回源，之后命中缓存；失效后重新回源"""
+    redis = _FakeRedis()
+    cache = RepositoryCache(redis_client=redis)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {'session_id': 's1', 'name': f'v{len(calls)}', 'created_at': datetime(2024, 1, 2, 3, 4, 5)}
+
+    first = cache.get_or_load(ENTITY_SESSION, 's1', loader)
+    second = cache.get_or_load(ENTITY_SESSION, 's1', loader)
+    assert first['name'] == second['name'] == 'v1'
+    assert len(calls) == 1
+
+    cache.invalidate(ENTITY_SESSION, 's1')
+    third = cache.get_or_load(ENTITY_SESSION, 's1', loader)
+    assert third['name'] == 'v2'
+    assert len(calls) == 2
+
+
+def test_shared_across_processes():
+    """另一进程（另一个实例）从 Redis 读取，并能感知失效"""
+    redis = _FakeRedis()
+    a = RepositoryCache(redis_client=redis)
+    b = RepositoryCache(redis_client=redis)
+
+    a.get_or_load(ENTITY_SESSION, 's1', lambda: {'name': 'x', 'created_at': datetime(2024, 1, 1)})
+    row = b.get_or_load(ENTITY_SESSION, 's1', lambda: {'name': 'should-not-load'})
+    assert row['name'] == 'x'
+    assert row['created_at'] == datetime(2024, 1, 1)  # datetime 经 Redis 往返保持类型
+
+    # b 已有 L1 条目；a 失效后 b 必须回源
+    a.invalidate(ENTITY_SESSION, 's1')
+    row = b.get_or_load(ENTITY_SESSION, 's1', lambda: {'name': 'y'})
+    assert row['name'] == 'y'
+
+    a.invalidate_all()
+    row = b.get_or_load(ENTITY_SESSION, 's1', lambda: {'name': 'z'})
+    assert row['name'] == 'z'
+
+
+def test_local_only_entities_not_in_redis():
+    """含 api_key 的 Agent 配置不写入 Redis"""
+    redis = _FakeRedis()
+    cache = RepositoryCache(redis_client=redis)
+    cache.get_or_load(ENTITY_AGENT_CONFIG, 'agent_1', lambda: {'api_key': 'sk-secret'})
+    assert not any('sk-secret' in str(v) for v in redis.data.values())
+
+
+def test_none_not_cached():
+    """回源失败（None）不缓存"""
+    cache = RepositoryCache(redis_client=_FakeRedis())
+    assert cache.get_or_load(ENTITY_SESSION, 'missing', lambda: None) is None
+    assert cache.get_or_load(ENTITY_SESSION, 'missing', lambda: {'name': 'now'})['name'] == 'now'
+
+
+if __name__ == "__main__":
+    test_read_through_and_invalidate()
+    test_shared_across_processes()
+    test_local_only_entities_not_in_redis()
+    test_none_not_cached()
+    print("✅ RepositoryCache 测试通过")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+测试 Research 段落检索：CJK 分词、切段、BM25 排序与高亮、$alias 别名索引（直接构建索引，无需 MySQL）
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.research import ResearchIndex, SourceAliasIndex, build_alias_index, chunk_text, tokenize
+from services.research.reranker import register_reranker
+
+
+def _build(root):
+    index = ResearchIndex(root=root, chunk_size=200, overlap=20)
+    filler = '这是一段与主题无关的填充文字，用来把文档撑长。' * 20
+    docs = [
+        {'doc_id': 'd1', 'source_id': 's1', 'rel_path': 'notes/intro.md',
+         'content_text': filler + '向量数据库适合语义检索，倒排索引适合关键词检索。' + filler},
+        {'doc_id': 'd2', 'source_id': 's2', 'rel_path': 'src/bm25.py',
+         'content_text': 'def bm25(query): return score  # BM25 ranking function'},
+    ]
+    index.build('sess-1', docs, fingerprint='2-2')
+    return index, index._load_current('sess-1')
+
+
+def test_tokenize_cjk_bigrams():
+    assert tokenize('机器学习 BM25') == ['机器', '器学', '学习', 'bm25']
+    assert tokenize('中') == ['中']
+
+
+def test_chunks_cover_text():
+    text = '第一句。' * 300
+    chunks = chunk_text(text, size=200, overlap=20)
+    assert chunks[0].start == 0 and chunks[-1].end == len(text)
+    assert all(c.text == text[c.start:c.end] for c in chunks)
+    assert all(len(c.text) <= 200 for c in chunks)
+
+
+def test_bm25_returns_matching_passage_with_highlights():
+    with tempfile.TemporaryDirectory() as root:
+        index, segment = _build(root)
+        results = index.search_segment(segment, '倒排索引', limit=3)
+        top = results[0]
+        assert top['doc_id'] == 'd1'
+        assert '倒排索引' in top['snippet']
+        start, end = top['highlights'][0]
+        assert top['snippet'][start:end] == '倒排索引'
+
+        results = index.search_segment(segment, 'bm25', limit=3)
+        assert results[0]['doc_id'] == 'd2'
+        assert index.search_segment(segment, 'bm25', source_ids=['s1']) == []
+
+
+def test_gc_keeps_previous_generation():
+    """重建后保留上一代段（其他 worker 可能仍在读）；更早且超过宽限期的段才回收"""
+    with tempfile.TemporaryDirectory() as root:
+        index, old = _build(root)
+        docs = [{'doc_id': 'd3', 'source_id': 's3', 'rel_path': 'a.md', 'content_text': '倒排索引'}]
+        index.build('sess-1', docs, fingerprint='3-3')
+        assert old.path.exists()
+        assert index.search_segment(old, '倒排索引', limit=1)[0]['doc_id'] == 'd1'
+
+        past = time.time() - 3600
+        os.utime(old.path, (past, past))
+        index.build('sess-1', docs, fingerprint='4-4')
+        session_dir = old.path.parent
+        assert sorted(p.name for p in session_dir.glob('seg-*')) == ['seg-3-3', 'seg-4-4']
+
+
+def test_pluggable_reranker():
+    class _Reverse:
+        def rerank(self, query, candidates):
+            return list(reversed(candidates))
+
+    with tempfile.TemporaryDirectory() as root:
+        index, segment = _build(root)
+        register_reranker(_Reverse())
+        try:
+            plain = index.search_segment(segment, '检索 bm25', limit=5)
+            reranked = index.search_segment(segment, '检索 bm25', limit=5, rerank=True)
+            assert [r['chunk_index'] for r in reranked] == [r['chunk_index'] for r in reversed(plain)][:len(reranked)]
+        finally:
+            register_reranker(None)
+
+
+def test_alias_index_resolution():
+    # created_at 倒序：越靠前越新
+    rows = [
+        {'source_id': 'rs-3', 'source_type': 'file', 'title': 'notes/b.md', 'meta': '{"rel_path": "notes/b.md"}'},
+        {'source_id': 'rs-dir', 'source_type': 'dir', 'title': 'proj',
+         'meta': '{"stats": {"doc_count": 2, "total_bytes": 10, "sample_paths": ["src/a.py"]}}'},
+        {'source_id': 'rs-2', 'source_type': 'file', 'title': 'notes/a.md', 'meta': None},
+        {'source_id': 'rs-1', 'source_type': 'url', 'title': 'paper', 'url': 'https://example.com/p'},
+    ]
+    index = SourceAliasIndex(build_alias_index(rows))
+    assert index.find('rs-2')[0]['title'] == 'notes/a.md'
+    assert index.find('paper')[0]['source_id'] == 'rs-1'
+    assert index.find('https://example.com/p')[0]['source_id'] == 'rs-1'
+    assert index.find('proj')[0]['meta']['stats']['doc_count'] == 2
+    # 前缀命中多个时取最新
+    assert index.find('notes/')[0]['source_id'] == 'rs-3'
+    # 目录别名 + 子路径
+    source, rel = index.find('proj/src')
+    assert source['source_id'] == 'rs-dir' and rel == 'src'
+    assert index.find('missing') == (None, None)
+
+
+if __name__ == "__main__":
+    test_tokenize_cjk_bigrams()
+    test_chunks_cover_text()
+    test_bm25_returns_matching_passage_with_highlights()
+    test_gc_keeps_previous_generation()
+    test_pluggable_reranker()
+    test_alias_index_resolution()
+    print("✅ Research 检索测试通过")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+测试 Research 后台入库：按批插入、内容未变跳过、内容变化替换、重启后接管未完成任务
+（假数据库，无需 MySQL / Redis）
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import services.research.ingest as ingest_mod
+from services.research.ingest import IngestFile, IngestJob, IngestQueue
+
+
+class _FakeDB:
+    """只实现入库与任务表用到的语句"""
+
+    def __init__(self):
+        self.docs = {}  # doc_id -> (session_id, source_id, rel_path, text, hash)
+        self.jobs = {}  # job_id -> research_ingest_jobs 行
+        self.insert_batches = []
+        self.lock = threading.Lock()
+
+    def connect(self):
+        return _FakeConn(self)
+
+
+class _FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, *args):
+        return _FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        sql = ' '.join(sql.split())
+        jobs = self.db.jobs
+        if sql.startswith('INSERT INTO research_ingest_jobs'):
+            job_id, session_id, status, total, files, owner = params
+            jobs[job_id] = {'job_id': job_id, 'session_id': session_id, 'status': status, 'total': total,
+                            'files': files, 'lease_owner': owner, 'heartbeat_at': time.time()}
+        elif sql.startswith('UPDATE research_ingest_jobs SET status'):
+            *values, job_id, owner = params
+            row = jobs.get(job_id)
+            self.rowcount = 0
+            if row and row['lease_owner'] == owner:
+                for k, v in zip(('status', 'processed', 'indexed', 'skipped', 'failed', 'error', 'finished_at'),
+                                values):
+                    row[k] = v
+                row['heartbeat_at'] = time.time()
+                self.rowcount = 1
+        elif sql.startswith('UPDATE research_ingest_jobs SET heartbeat_at'):
+            for row in jobs.values():
+                if row['lease_owner'] == params[0] and row['status'] in params[1:]:
+                    row['heartbeat_at'] = time.time()
+        elif sql.startswith('UPDATE research_ingest_jobs SET lease_owner'):
+            owner, s1, s2, lease = params
+            for row in jobs.values():
+                if row['status'] in (s1, s2) and row['heartbeat_at'] < time.time() - lease:
+                    row['lease_owner'], row['heartbeat_at'] = owner, time.time()
+        elif sql.startswith('SELECT * FROM research_ingest_jobs'):
+            self._rows = [dict(r) for r in jobs.values() if r['lease_owner'] == params[0] and r['status'] in params[1:]]
+        elif sql.startswith('SELECT source_id, rel_path, doc_id, content_hash'):
+            session_id, source_ids = params[0], set(params[1:])
+            self._rows = [(v[1], v[2], k, v[4]) for k, v in self.db.docs.items()
+                          if v[0] == session_id and v[1] in source_ids]
+        elif sql.startswith('DELETE FROM research_documents'):
+            for doc_id in params:
+                self.db.docs.pop(doc_id, None)
+
+    def executemany(self, sql, rows):
+        self.db.insert_batches.append(len(rows))
+        for doc_id, session_id, source_id, rel_path, text, content_hash in rows:
+            self.db.docs[doc_id] = (session_id, source_id, rel_path, text, content_hash)
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def close(self):
+        pass
+
+
+def _write(root, name, text):
+    path = os.path.join(root, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return IngestFile(path=path, rel_path=name, source_id='rs-dir-1')
+
+
+def _run(queue, files):
+    job = IngestJob(job_id='job-1', session_id='sess-1', total=len(files))
+    queue._run(job, files)
+    return job
+
+
+def test_batches_skip_unchanged_and_replace_changed():
+    import services.research.index as index_mod
+    db = _FakeDB()
+    queue = IngestQueue(get_connection=db.connect, max_workers=1, batch_size=2)
+    # 不连 Redis / Topic / 索引重建
+    queue._report = lambda job: None
+    original_get_index = index_mod.get_research_index
+    index_mod.get_research_index = lambda: type('I', (), {'refresh': lambda self, s: None})()
+
+    try:
+        _check_ingest(queue, db)
+    finally:
+        index_mod.get_research_index = original_get_index
+
+
+def _check_ingest(queue, db):
+    with tempfile.TemporaryDirectory() as root:
+        files = [_write(root, f'f{i}.md', f'内容 {i}') for i in range(5)]
+        job = _run(queue, files)
+        assert job.status == 'done'
+        assert (job.indexed, job.skipped) == (5, 0)
+        assert db.insert_batches == [2, 2, 1]
+
+        # 再次上传：只改了一个文件
+        _write(root, 'f3.md', '新的内容')
+        job = _run(queue, files)
+        assert (job.indexed, job.skipped) == (1, 4)
+        assert len(db.docs) == 5
+        texts = sorted(v[3] for v in db.docs.values())
+        assert '新的内容' in texts and '内容 3' not in texts
+
+
+def test_pending_job_resumed_after_restart_and_old_worker_stops():
+    """提交后进程退出：租约过期后由新进程接管重跑；原进程之后再写回时发现租约已失并停止"""
+    import services.research.index as index_mod
+    db = _FakeDB()
+    refreshed = []
+    original_get_index = index_mod.get_research_index
+    index_mod.get_research_index = lambda: type('I', (), {'refresh': lambda self, s: refreshed.append(s)})()
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            files = [_write(root, f'f{i}.md', f'内容 {i}') for i in range(3)]
+            old = IngestQueue(get_connection=db.connect, max_workers=1, lease_seconds=1)
+            old._report = lambda job: None
+            old._refresh_stats = lambda *a: None
+            # 只落库不执行：模拟上传返回后进程退出
+            old._executor.submit = lambda *a, **k: None
+            job = old.submit('sess-1', files)
+            row = db.jobs[job.job_id]
+            assert row['status'] == 'queued' and len(json.loads(row['files'])) == 3
+
+            new = IngestQueue(get_connection=db.connect, max_workers=1, lease_seconds=1)
+            new._report = lambda job: None
+            new._refresh_stats = lambda *a: None
+            new._heartbeat = object()  # 不启动续约线程
+            assert new.resume() == 0  # 租约未过期，不接管
+            db.jobs[job.job_id]['heartbeat_at'] -= 5
+            assert new.resume() == 1
+            new._executor.shutdown(wait=True)
+
+            row = db.jobs[job.job_id]
+            assert row['status'] == 'done' and row['indexed'] == 3
+            assert row['lease_owner'] == new.worker_id
+            assert len(db.docs) == 3 and refreshed == ['sess-1']
+            assert new.get_status(job.job_id)['status'] == 'done'
+
+            # 原进程恢复运行：首次写回即发现租约已被接管，不重复入库
+            old._run(job, files)
+            assert len(db.docs) == 3 and job.job_id not in old._jobs
+    finally:
+        index_mod.get_research_index = original_get_index
+
+
+def test_finished_jobs_are_evicted():
+    """已结束任务超过保留期或数量上限后从内存移除，进行中的任务不受影响"""
+    queue = IngestQueue(get_connection=lambda: None, max_workers=1)
+    now = 10_000.0
+    queue._jobs = {
+        'running': IngestJob(job_id='running', session_id='s', total=1, status='running', created_at=0),
+        'old': IngestJob(job_id='old', session_id='s', total=1, status='done', finished_at=now - ingest_mod._FINISHED_JOB_TTL - 1),
+        'recent': IngestJob(job_id='recent', session_id='s', total=1, status='failed', finished_at=now - 5),
+    }
+    queue._evict_finished(now)
+    assert sorted(queue._jobs) == ['recent', 'running']
+
+    original_max = ingest_mod._MAX_FINISHED_JOBS
+    ingest_mod._MAX_FINISHED_JOBS = 1
+    try:
+        queue._jobs['newer'] = IngestJob(job_id='newer', session_id='s', total=1, status='done', finished_at=now - 1)
+        queue._evict_finished(now)
+        assert sorted(queue._jobs) == ['newer', 'running']
+    finally:
+        ingest_mod._MAX_FINISHED_JOBS = original_max
+
+
+if __name__ == "__main__":
+    test_batches_skip_unchanged_and_replace_changed()
+    test_pending_job_resumed_after_restart_and_old_worker_stops()
+    test_finished_jobs_are_evicted()
+    print("✅ research ingest tests passed")
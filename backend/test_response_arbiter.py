@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+测试群聊响应决策本地预筛：点名 / 能力匹配打分、话题内只有前 TOP_K 个 Agent 升级为 LLM 决策、
+决策缓存复用、session_type 不再每条消息查库、按话题统计 LLM 调用次数
+（LLM 决策与话题查询均替换为计数桩）
+"""
+
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from services.actor.actions import ResponseDecision
+from services.actor.agents.chat_agent import ChatAgent
+from services.actor import response_arbiter
+from services.actor.response_arbiter import ResponseArbiter, extract_terms, score_agent
+
+PARTICIPANTS = [
+    {'participant_type': 'agent', 'participant_id': 'coder', 'name': '码农',
+     'system_prompt': '你擅长 Python 编程、代码调试与数据库优化'},
+    {'participant_type': 'agent', 'participant_id': 'painter', 'name': '画师',
+     'system_prompt': '你擅长绘画、插画设计与配色'},
+    {'participant_type': 'agent', 'participant_id': 'chef', 'name': '大厨',
+     'system_prompt': '你擅长中餐烹饪、菜谱与食材搭配'},
+    {'participant_type': 'agent', 'participant_id': 'poet', 'name': '诗人',
+     'system_prompt': '你擅长古诗词创作与赏析'},
+    {'participant_type': 'user', 'participant_id': 'u1', 'name': '用户'},
+]
+
+
+@pytest.fixture
+def arbiter(monkeypatch):
+    fresh = ResponseArbiter(top_k=2)
+    monkeypatch.setattr(response_arbiter, '_arbiter', fresh)
+    return fresh
+
+
+@pytest.fixture
+def agents(monkeypatch):
+    topic_loads = []
+    llm_calls = []
+
+    def _load_session_type(self, topic_id):
+        topic_loads.append(topic_id)
+        return 'topic_general'
+
+    def _llm(self, topic_id, msg_data, default_action='silent'):
+        llm_calls.append(self.agent_id)
+        return ResponseDecision.reply('LLM 决策回复')
+
+    monkeypatch.setattr(ChatAgent, '_load_session_type', _load_session_type)
+    monkeypatch.setattr(ChatAgent, '_llm_intent_decision', _llm)
+
+    actors = []
+    for p in PARTICIPANTS[:4]:
+        actor = ChatAgent(p['participant_id'])
+        actor.info = {'name': p['name']}
+        actor._config = {'llm_config_id': 'cfg', 'system_prompt': p['system_prompt']}
+        actor.state.update_participants(PARTICIPANTS)
+        actors.append(actor)
+    return actors, topic_loads, llm_calls
+
+
+def _msg(message_id, content, mentions=None):
+    return {'message_id': message_id, 'sender_type': 'user', 'sender_id': 'u1',
+            'content': content, 'mentions': mentions or []}
+
+
+def test_scoring():
+    assert 'py' not in extract_terms('Python') and 'python' in extract_terms('Python')
+    assert {'编程', '程序'} <= extract_terms('编程序')
+    assert score_agent('a', '码农', '', 'x', ['a'])[0] == response_arbiter.MENTION_SCORE
+    assert score_agent('a', '码农', '', '@码农 看一下', [])[0] == response_arbiter.MENTION_SCORE
+    assert score_agent('a', '码农', '擅长编程', '这段编程题怎么做？', [])[0] > 0
+    assert score_agent('a', '码农', '擅长编程', '今天天气不错', [])[0] == 0
+
+
+def test_only_top_k_escalate(arbiter, agents):
+    actors, topic_loads, llm_calls = agents
+    msg = _msg('m1', '这段 Python 代码调试报错了，数据库连接怎么优化？')
+    decisions = {a.agent_id: a._should_respond('t1', msg) for a in actors}
+
+    assert llm_calls == ['coder']  # 只有能力匹配的 Agent 调用决策 LLM
+    assert decisions['coder'].action == 'reply'
+    assert all(decisions[a].action == 'silent' for a in ('painter', 'chef', 'poet'))
+    assert topic_loads == ['t1']  # session_type 缓存
+
+    stats = arbiter.stats('t1')['t1']
+    assert stats['decisions'] == 4 and stats['llm_calls'] == 1 and stats['local'] == 3
+
+
+def test_unmatched_question_and_statement(arbiter, agents):
+    actors, _, llm_calls = agents
+    # 无人匹配的问题：只有轮换出的前 2 名升级
+    for a in actors:
+        a._should_respond('t1', _msg('m2', '你们觉得明天会下雨吗？'))
+    assert len(llm_calls) == 2
+
+    # 无人匹配的陈述：全部本地沉默
+    llm_calls.clear()
+    decisions = [a._should_respond('t1', _msg('m3', '我刚到家了')) for a in actors]
+    assert llm_calls == [] and all(d.action == 'silent' for d in decisions)
+
+
+def test_mention_and_decision_cache(arbiter, agents):
+    actors, _, llm_calls = agents
+    decisions = {a.agent_id: a._should_respond('t1', _msg('m4', '@画师 帮我想个标题')) for a in actors}
+    assert decisions['painter'].action == 'reply' and llm_calls == []
+
+    # 相同内容再次出现：命中决策缓存
+    coder = actors[0]
+    coder._should_respond('t1', _msg('m5', '写个 Python 爬虫？'))
+    coder._should_respond('t1', _msg('m6', '写个 Python 爬虫？'))
+    assert llm_calls == ['coder']
+    assert arbiter.stats('t1')['t1']['cache_hits'] == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
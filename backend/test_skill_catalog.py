@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+测试技能包目录与关键词匹配：Aho-Corasick 自动机与逐个子串查找结果一致、多技能命中时返回
+注册顺序最靠前的、技能变化后重新编译，以及 SkillCatalog 跨 Actor 共享缓存、按路由失效
+（RepositoryCache 使用内存版假 Redis，MySQL 回源替换为桩）
+"""
+
+import sys
+import os
+import random
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from services.actor.capability_registry import CapabilityRegistry
+from services.actor.skill_catalog import KeywordMatcher, SkillCatalog, normalize_skill_pack_row
+from services.repository_cache import ENTITY_AGENT_SKILLS, ENTITY_SKILL_PACK, RepositoryCache
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, *keys):
+        return [self.data.get(k) for k in keys]
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+
+def _naive_first(patterns, text):
+    text = text.lower()
+    hits = [payload for keyword, payload in patterns if keyword and keyword.lower() in text]
+    return min(hits) if hits else None
+
+
+def test_matcher_agrees_with_substring_scan():
+    patterns = [("he", 3), ("she", 1), ("his", 2), ("hers", 0), ("天气", 4), ("天气预报", 5), ("", 6)]
+    matcher = KeywordMatcher(patterns)
+    assert matcher.size == 6
+    for text in ["ushers", "this", "HiS dog", "明天天气预报", "今天天气", "nothing", ""]:
+        assert matcher.first(text) == _naive_first(patterns, text), text
+
+    rng = random.Random(7)
+    alphabet = "abc天气"
+    patterns = [("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))), i) for i in range(60)]
+    matcher = KeywordMatcher(patterns)
+    for _ in range(300):
+        text = "".join(rng.choice(alphabet + "xyz") for _ in range(rng.randint(0, 30)))
+        assert matcher.first(text) == _naive_first(patterns, text), text
+
+
+def test_registry_keeps_registration_order_and_recompiles():
+    registry = CapabilityRegistry()
+    registry.register_skill("weather", "天气", trigger_keywords=["天气", "Forecast"])
+    registry.register_skill("travel", "出行", trigger_keywords=["出行", "天"])
+    assert registry.find_skill_by_keyword("明天出行的天气如何").skill_id == "weather"
+    assert registry.find_skill_by_keyword("后天出行").skill_id == "travel"
+    assert registry.find_skill_by_keyword("the FORECAST").skill_id == "weather"
+    assert registry.find_skill_by_keyword("你好") is None
+
+    registry.register_skill("greet", "问候", trigger_keywords=["你好"])
+    assert registry.find_skill_by_keyword("你好").skill_id == "greet"
+    registry.clear()
+    assert registry.find_skill_by_keyword("天气") is None
+
+
+def test_match_cost_independent_of_skill_count():
+    registry = CapabilityRegistry()
+    for i in range(500):
+        registry.register_skill(f"s{i}", f"skill {i}", trigger_keywords=[f"关键词{i}号", f"kw-{i}-x"])
+    text = "这是一条普通的消息，没有任何触发词。" * 20
+    registry.find_skill_by_keyword(text)  # 编译
+
+    started = time.perf_counter()
+    for _ in range(50):
+        assert registry.find_skill_by_keyword(text) is None
+    indexed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(50):
+        lowered = text.lower()
+        any(k.lower() in lowered for s in registry.get_available_skills() for k in s.trigger_keywords)
+    scanned = time.perf_counter() - started
+    assert indexed < scanned
+    assert registry.find_skill_by_keyword("请执行关键词321号").skill_id == "s321"
+
+
+def test_normalize_row():
+    entry = normalize_skill_pack_row({
+        "skill_pack_id": "p1", "name": "查天气", "summary": None,
+        "process_steps": '[{"name": "调用天气 MCP"}]',
+        "ext": '{"trigger_keywords": "天气， 气温,"}',
+    })
+    assert entry["process_steps"] == [{"name": "调用天气 MCP"}]
+    assert entry["trigger_keywords"] == ["天气", "气温"]
+    assert normalize_skill_pack_row({"skill_pack_id": "p2", "process_steps": "bad"})["process_steps"] == []
+
+
+@pytest.fixture
+def catalog_env():
+    packs = {
+        "p1": {"skill_pack_id": "p1", "name": "查天气", "summary": "", "process_steps": [], "trigger_keywords": ["天气"]},
+        "p2": {"skill_pack_id": "p2", "name": "订机票", "summary": "", "process_steps": [], "trigger_keywords": ["机票"]},
+    }
+    assignments = {"agent_a": ["p1"], "agent_b": ["p1", "p2"]}
+    calls = {"pack": 0, "assign": 0}
+
+    def fetch_pack(pid):
+        calls["pack"] += 1
+        return dict(packs[pid]) if pid in packs else None
+
+    def fetch_assign(agent_id):
+        calls["assign"] += 1
+        return list(assignments.get(agent_id, []))
+
+    redis = _FakeRedis()
+
+    def make():
+        return SkillCatalog(RepositoryCache(redis_client=redis), fetch_pack, fetch_assign)
+
+    return make, packs, assignments, calls
+
+
+def test_catalog_shared_and_invalidated(catalog_env):
+    make, packs, assignments, calls = catalog_env
+    catalog = make()
+    assert [p["skill_pack_id"] for p in catalog.get_agent_skill_packs("agent_b")] == ["p1", "p2"]
+    assert catalog.get_agent_skill_packs("agent_a")[0]["name"] == "查天气"
+    assert calls == {"pack": 2, "assign": 2}  # p1 只回源一次
+
+    # 另一进程的 Actor 激活：走 Redis，不回源
+    other = make()
+    other.get_agent_skill_packs("agent_b")
+    assert calls == {"pack": 2, "assign": 2}
+
+    # 路由：修改技能包 / 分配
+    packs["p1"]["name"] = "查天气 v2"
+    catalog.cache.invalidate(ENTITY_SKILL_PACK, "p1")
+    assignments["agent_a"].append("p2")
+    catalog.cache.invalidate(ENTITY_AGENT_SKILLS, "agent_a")
+    names = [p["name"] for p in other.get_agent_skill_packs("agent_a")]
+    assert names == ["查天气 v2", "订机票"]
+
+    # 已删除的技能包跳过
+    del packs["p2"]
+    catalog.cache.invalidate(ENTITY_SKILL_PACK, "p2")
+    assert [p["skill_pack_id"] for p in other.get_agent_skill_packs("agent_b")] == ["p1"]
+    assert other.get_skill_pack("missing") is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
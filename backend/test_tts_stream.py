@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+测试流式 TTS：按句切分、短语级缓存命中不再调用 API、首段失败报错（假客户端，无需 ElevenLabs）
+"""
+
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from services import tts_stream
+from services.media_cache import MediaCache
+from services.tts_stream import TTSError, VoiceParams, audio_cache_key, cached_speech, split_phrases, stream_speech
+
+
+class _FakeClient:
+    def __init__(self, fail=None):
+        self.stream_calls = []
+        self.full_calls = 0
+        self.fail = fail
+
+    def text_to_speech_stream(self, text, **kwargs):
+        if self.fail:
+            return None, self.fail
+        self.stream_calls.append(text)
+        return iter([f"<{text}".encode(), b">"]), None
+
+    def text_to_speech(self, text, **kwargs):
+        self.full_calls += 1
+        return f"[{text}]".encode(), None
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    original = tts_stream._audio_cache
+    tts_stream._audio_cache = MediaCache(max_bytes=1024 * 1024)
+    yield
+    tts_stream._audio_cache = original
+
+
+def test_split_phrases():
+    phrases = split_phrases("你好！我是 Chaya。今天天气很好，我们去公园吧？Sure. That sounds great! OK.")
+    assert phrases == ['你好！我是 Chaya。', '今天天气很好，我们去公园吧？', 'Sure. That sounds great! OK.']
+    long = split_phrases("一二三四五，" * 40, max_chars=50)
+    assert all(len(p) <= 50 for p in long) and ''.join(long) == "一二三四五，" * 40
+
+
+def test_stream_caches_phrases():
+    params = VoiceParams(voice_id='v1')
+    client = _FakeClient()
+    text = "Hello there, welcome back. How can I help you today?"
+    first = b''.join(stream_speech(client, params, text))
+    assert len(client.stream_calls) == 2
+    second = b''.join(stream_speech(client, params, text))
+    assert second == first and len(client.stream_calls) == 2
+
+    # 规范化后相同的文本命中同一 key；音色不同则不命中
+    assert audio_cache_key(params, "Hello  there") == audio_cache_key(params, " Hello there ")
+    assert audio_cache_key(params, "Hello") != audio_cache_key(VoiceParams(voice_id='v2'), "Hello")
+
+
+def test_speak_cache_and_errors():
+    params = VoiceParams(voice_id='v1')
+    client = _FakeClient()
+    assert cached_speech(client, params, "Good morning!").content == b"[Good morning!]"
+    cached_speech(client, params, "Good morning!")
+    assert client.full_calls == 1
+
+    with pytest.raises(TTSError):
+        next(stream_speech(_FakeClient(fail="Invalid API key"), params, "Something new to say."))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,165 @@
+"""
+进程内取消令牌
+
+前端打断原先经 Redis 传递：TopicService.publish_interrupt 写 interrupt:{topic}:{agent} 键并发布
+actor_manager:interrupt，Actor 在迭代之间 GET 轮询该键；ActorManager 收到通道消息后销毁并重建整个
+Actor（重新加载配置与历史），正在进行的 LLM 流 / MCP 请求则一直跑到结束。
+
+这里改为每个 (topic, agent) 一个 CancellationToken：
+- ActorManager 的监听线程收到打断后直接 cancel_token()，不经 Redis 往返
+- Actor 每轮消息处理开始时 reset_token() 换新令牌，并用 bind_cancel_token() 绑定到 contextvar；
+  并行阶段 / 推测流在线程池中运行时复制 contextvars，令牌随之传递
+- Provider 流式循环、call_mcp_tool 通过 current_cancel_token() 取得令牌：每个分片前检查一次
+  （内存读），并用 on_cancel() 登记 HTTP 响应的 close，取消时立即关闭连接
+
+Example:
+    token = reset_token(topic_id, agent_id)
+    with bind_cancel_token(token):
+        for chunk in provider.chat_stream(messages):
+            if token.cancelled:
+                break
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CancelledError(RuntimeError):
+    """操作因取消令牌被触发而中止"""
+
+
+class CancellationToken:
+    """
+    一次性取消令牌（线程安全）
+
+    cancel() 之后 cancelled 永远为 True；新一轮处理应换新令牌（reset_token）。
+    """
+
+    __slots__ = ('_event', '_lock', '_callbacks', 'reason')
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = 'cancelled') -> bool:
+        """
+        触发取消并依次执行已登记的回调
+
+        Returns:
+            本次调用是否真正触发（已取消过返回 False）
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"[Cancellation] on_cancel callback failed: {e}")
+        return True
+
+    def on_cancel(self, callback: Optional[Callable[[], None]]) -> Callable[[], None]:
+        """
+        登记取消回调（如关闭 HTTP 响应）；已取消时立即执行
+
+        Returns:
+            注销函数，操作正常结束后调用
+        """
+        if callback is None:
+            return lambda: None
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+
+                def unregister():
+                    with self._lock:
+                        try:
+                            self._callbacks.remove(callback)
+                        except ValueError:
+                            pass
+
+                return unregister
+        try:
+            callback()
+        except Exception as e:
+            logger.debug(f"[Cancellation] on_cancel callback failed: {e}")
+        return lambda: None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待取消（可替代 time.sleep 做可打断的退避）；返回是否已取消"""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise CancelledError(self.reason or 'cancelled')
+
+
+_tokens: Dict[Tuple[str, str], CancellationToken] = {}
+_tokens_lock = threading.Lock()
+
+
+def get_token(topic_id: str, agent_id: str) -> CancellationToken:
+    """(topic, agent) 当前的令牌（不存在则创建）"""
+    key = (topic_id or '', agent_id or '')
+    with _tokens_lock:
+        token = _tokens.get(key)
+        if token is None:
+            token = _tokens[key] = CancellationToken()
+        return token
+
+
+def reset_token(topic_id: str, agent_id: str) -> CancellationToken:
+    """新一轮处理开始：换新令牌（之前的打断不影响本轮）"""
+    token = CancellationToken()
+    with _tokens_lock:
+        _tokens[(topic_id or '', agent_id or '')] = token
+    return token
+
+
+def cancel_token(topic_id: str, agent_id: str, reason: str = 'cancelled') -> bool:
+    """取消 (topic, agent) 当前的令牌；返回是否真正触发"""
+    with _tokens_lock:
+        token = _tokens.get((topic_id or '', agent_id or ''))
+    return token.cancel(reason) if token is not None else False
+
+
+def discard_token(topic_id: str, agent_id: str) -> None:
+    """Actor 解绑话题时移除令牌"""
+    with _tokens_lock:
+        _tokens.pop((topic_id or '', agent_id or ''), None)
+
+
+_current: contextvars.ContextVar[Optional[CancellationToken]] = contextvars.ContextVar(
+    'cancel_token', default=None
+)
+
+
+def current_cancel_token() -> Optional[CancellationToken]:
+    """当前上下文绑定的令牌（未绑定返回 None）"""
+    return _current.get()
+
+
+@contextmanager
+def bind_cancel_token(token: Optional[CancellationToken]) -> Iterator[Optional[CancellationToken]]:
+    """在当前上下文绑定令牌（线程池任务需以 contextvars.copy_context().run 提交才能继承）"""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
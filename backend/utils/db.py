@@ -17,9 +17,11 @@ from flask import jsonify
 
 
 @contextmanager
-def get_db_cursor(dict_cursor=False):
+def get_db_cursor(dict_cursor=False, read_only=False):
     """
     数据库游标上下文管理器，自动管理连接和游标的生命周期。
+    read_only=True 时优先使用只读副本连接池（未配置副本则回退主库）；
+    副本有复制延迟，写后立即回读的路径不要使用。
 
     Usage:
         with get_db_cursor(dict_cursor=True) as (conn, cursor):
@@ -36,7 +38,7 @@ def get_db_cursor(dict_cursor=False):
     from database import get_mysql_connection
     import pymysql
 
-    conn = get_mysql_connection()
+    conn = get_mysql_connection(read_only=read_only)
     if not conn:
         raise DatabaseUnavailableError("MySQL not available")
 
@@ -0,0 +1,393 @@
+"""
+MySQL 连接池监控封装
+
+在 DBUtils PooledDB 外包一层，提供:
+- 获取连接的等待耗时直方图
+- 使用中 / 空闲连接数量
+- 按调用位置统计的 SQL 耗时与慢查询
+- 泄漏连接检测（借出超过阈值仍未归还）
+- 有界等待（池耗尽时超时返回，而不是无限阻塞）
+- 空闲连接保有量自适应（按近期峰值调整 maxcached）
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 直方图桶上界（毫秒），最后一个桶为 +Inf
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# 统计调用位置时跳过的模块（连接管理本身的封装层）
+_SKIP_FILES = frozenset(('database.py', 'db_pool.py', 'db.py', 'contextlib.py'))
+
+# 最多保留的调用位置数量（代码位置有限，防御性上限）
+_MAX_CALL_SITES = 500
+
+
+class LatencyHistogram:
+    """固定桶的耗时直方图（线程安全由调用方的锁保证）"""
+
+    __slots__ = ('counts', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        idx = len(LATENCY_BUCKETS_MS)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                idx = i
+                break
+        self.counts[idx] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def quantile(self, q: float) -> float:
+        """按桶上界估算分位数（毫秒）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {f"le_{b:g}": self.counts[i] for i, b in enumerate(LATENCY_BUCKETS_MS)}
+        buckets['le_inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 2) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 2),
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+def _caller_site() -> str:
+    """返回第一个不在连接封装层内的调用位置: file:function:line"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.basename(frame.f_code.co_filename)
+        if filename not in _SKIP_FILES:
+            return f"{filename}:{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+class _TrackedCursor:
+    """游标代理：记录 execute/executemany 的耗时"""
+
+    __slots__ = ('_cursor', '_pool', '_site')
+
+    def __init__(self, cursor, pool: 'InstrumentedPool', site: str):
+        self._cursor = cursor
+        self._pool = pool
+        self._site = site
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self._pool._record_query(self._site, (time.perf_counter() - start) * 1000, query)
+
+    def executemany(self, query, args):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self._pool._record_query(self._site, (time.perf_counter() - start) * 1000, query)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._cursor.close()
+        return False
+
+
+class _TrackedConnection:
+    """连接代理：记录借出时长，close() 时归还并释放并发许可"""
+
+    __slots__ = ('_conn', '_pool', '_site', '_checkout_id', '_closed', '__weakref__')
+
+    def __init__(self, conn, pool: 'InstrumentedPool', site: str, checkout_id: int):
+        self._conn = conn
+        self._pool = pool
+        self._site = site
+        self._checkout_id = checkout_id
+        self._closed = False
+
+    def cursor(self, *args, **kwargs):
+        return _TrackedCursor(self._conn.cursor(*args, **kwargs), self._pool, self._site)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._conn.close()
+        finally:
+            self._pool._release(self._checkout_id)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        # 调用方忘记 close() 时兜底归还，并计入泄漏统计
+        if not self._closed:
+            try:
+                self._pool._note_gc_leak(self._site)
+                self.close()
+            except Exception:
+                pass
+
+
+class InstrumentedPool:
+    """
+    带监控的连接池封装
+
+    Example:
+        pool = InstrumentedPool(PooledDB(...), name='primary', max_connections=10)
+        conn = pool.connection()     # 池耗尽且超时时返回 None
+        ...
+        conn.close()                 # 归还
+        pool.snapshot()              # 指标快照
+    """
+
+    def __init__(
+        self,
+        pool,
+        name: str = 'primary',
+        max_connections: int = 10,
+        checkout_timeout: float = 10.0,
+        slow_query_ms: float = 500.0,
+        leak_threshold: float = 60.0,
+        min_idle: int = 2,
+        adapt_interval: float = 30.0,
+    ):
+        """
+        Args:
+            pool: DBUtils PooledDB 实例
+            name: 池名称（primary / replica）
+            max_connections: 最大并发借出数，与 PooledDB.maxconnections 保持一致
+            checkout_timeout: 等待空闲连接的最长秒数，超时视为池耗尽
+            slow_query_ms: 慢查询阈值（毫秒）
+            leak_threshold: 借出超过该秒数未归还视为疑似泄漏
+            min_idle: 自适应调整时保有的最少空闲连接
+            adapt_interval: 自适应调整周期（秒）
+        """
+        self._pool = pool
+        self.name = name
+        self.max_connections = max_connections
+        self.checkout_timeout = checkout_timeout
+        self.slow_query_ms = slow_query_ms
+        self.leak_threshold = leak_threshold
+        self.min_idle = min_idle
+        self.adapt_interval = adapt_interval
+
+        self._permits = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # checkout_id -> (call_site, start_ts, thread_name)
+        self._active: Dict[int, Tuple[str, float, str]] = {}
+
+        self._wait_hist = LatencyHistogram()
+        self._hold_hist = LatencyHistogram()
+        self._query_hist = LatencyHistogram()
+        # call_site -> [count, total_ms, max_ms, slow_count]
+        self._sites: Dict[str, List[float]] = {}
+        self._slow_samples: List[Dict[str, Any]] = []
+
+        self._checkouts = 0
+        self._exhausted = 0
+        self._errors = 0
+        self._gc_leaks = 0
+        self._peak_in_use = 0
+        self._window_peak = 0
+        self._last_adapt = time.time()
+
+    # ==================== 借出 / 归还 ====================
+
+    def connection(self) -> Optional[_TrackedConnection]:
+        """
+        借出连接
+
+        Returns:
+            连接代理；池耗尽等待超时或底层出错时返回 None
+        """
+        site = _caller_site()
+        start = time.perf_counter()
+        if not self._permits.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self._exhausted += 1
+                self._wait_hist.observe((time.perf_counter() - start) * 1000)
+            print(f"[MySQL Pool:{self.name}] Pool exhausted after {self.checkout_timeout}s wait ({site})")
+            return None
+
+        try:
+            raw = self._pool.connection()
+        except Exception:
+            self._permits.release()
+            with self._lock:
+                self._errors += 1
+            raise
+
+        wait_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._next_id += 1
+            checkout_id = self._next_id
+            self._active[checkout_id] = (site, time.time(), threading.current_thread().name)
+            self._checkouts += 1
+            self._wait_hist.observe(wait_ms)
+            in_use = len(self._active)
+            if in_use > self._peak_in_use:
+                self._peak_in_use = in_use
+            if in_use > self._window_peak:
+                self._window_peak = in_use
+        return _TrackedConnection(raw, self, site, checkout_id)
+
+    def _release(self, checkout_id: int) -> None:
+        with self._lock:
+            entry = self._active.pop(checkout_id, None)
+            if entry is not None:
+                self._hold_hist.observe((time.time() - entry[1]) * 1000)
+        if entry is not None:
+            self._permits.release()
+        self._maybe_adapt()
+
+    def _note_gc_leak(self, site: str) -> None:
+        with self._lock:
+            self._gc_leaks += 1
+        print(f"[MySQL Pool:{self.name}] Connection garbage-collected without close() ({site})")
+
+    def record_error(self) -> None:
+        with self._lock:
+            self._errors += 1
+
+    # ==================== 查询统计 ====================
+
+    def _record_query(self, site: str, ms: float, query: Any) -> None:
+        slow = ms >= self.slow_query_ms
+        with self._lock:
+            self._query_hist.observe(ms)
+            stats = self._sites.get(site)
+            if stats is None:
+                if len(self._sites) >= _MAX_CALL_SITES:
+                    site = 'other'
+                    stats = self._sites.setdefault(site, [0, 0.0, 0.0, 0])
+                else:
+                    stats = self._sites[site] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += ms
+            if ms > stats[2]:
+                stats[2] = ms
+            if slow:
+                stats[3] += 1
+                self._slow_samples.append({
+                    'site': site,
+                    'ms': round(ms, 2),
+                    'sql': ' '.join(str(query).split())[:200],
+                    'at': time.time(),
+                })
+                if len(self._slow_samples) > 50:
+                    del self._slow_samples[:-50]
+        if slow:
+            print(f"[MySQL Pool:{self.name}] Slow query {ms:.0f}ms at {site}")
+
+    # ==================== 自适应 ====================
+
+    def _maybe_adapt(self) -> None:
+        """按周期内峰值调整空闲连接保有量，突发流量后不必反复重建连接"""
+        now = time.time()
+        if now - self._last_adapt < self.adapt_interval:
+            return
+        with self._lock:
+            if now - self._last_adapt < self.adapt_interval:
+                return
+            target = max(self.min_idle, min(self._window_peak, self.max_connections))
+            self._window_peak = len(self._active)
+            self._last_adapt = now
+        if getattr(self._pool, '_maxcached', None) not in (None, target):
+            self._pool._maxcached = target
+
+    # ==================== 观测 ====================
+
+    def find_leaks(self) -> List[Dict[str, Any]]:
+        """借出时间超过 leak_threshold 的连接"""
+        now = time.time()
+        with self._lock:
+            items = list(self._active.values())
+        return [
+            {'site': site, 'held_s': round(now - ts, 1), 'thread': thread}
+            for site, ts, thread in items
+            if now - ts >= self.leak_threshold
+        ]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """指标快照（用于 metrics 接口）"""
+        with self._lock:
+            in_use = len(self._active)
+            sites = sorted(
+                (
+                    {
+                        'site': site,
+                        'count': int(s[0]),
+                        'avg_ms': round(s[1] / s[0], 2) if s[0] else 0.0,
+                        'total_ms': round(s[1], 2),
+                        'max_ms': round(s[2], 2),
+                        'slow': int(s[3]),
+                    }
+                    for site, s in self._sites.items()
+                ),
+                key=lambda x: x['total_ms'],
+                reverse=True,
+            )
+            data = {
+                'name': self.name,
+                'max_connections': self.max_connections,
+                'in_use': in_use,
+                'idle': len(getattr(self._pool, '_idle_cache', []) or []),
+                'max_idle': getattr(self._pool, '_maxcached', None),
+                'peak_in_use': self._peak_in_use,
+                'checkouts': self._checkouts,
+                'exhausted': self._exhausted,
+                'errors': self._errors,
+                'gc_leaks': self._gc_leaks,
+                'checkout_wait': self._wait_hist.to_dict(),
+                'checkout_hold': self._hold_hist.to_dict(),
+                'query': self._query_hist.to_dict(),
+                'slow_query_ms': self.slow_query_ms,
+                'call_sites': sites[:50],
+                'slow_samples': list(self._slow_samples[-20:]),
+            }
+        data['leaks'] = self.find_leaks()
+        return data
@@ -0,0 +1,304 @@
+"""
+热路径日志管道
+
+Actor / MCP / Provider 的逐消息日志原先是同步 print：每次调用都要拿 stdout 锁，提示词预览、
+参数 dump 即使没人看也会先拼好字符串；并发时多个 Actor 线程在 stdout 上排队。
+
+这里改为标准 logging + 队列：
+- 业务线程只做级别判断与入队（QueueHandler），格式化与写出在后台线程（QueueListener）
+- 队列满时丢弃并计数，不阻塞业务线程
+- 分类 logger（actor / mcp / llm）各自独立的级别
+- 结构化字段：log_event(logger, level, msg, **fields)，text 格式输出 key=value，json 格式输出单行 JSON
+- 预览采样：带 sample 键的记录每 N 条只保留 1 条（提示词 / 参数 / 输出预览）
+- preview(text) 返回惰性对象，只在记录真正被写出时才截断 / 序列化
+- log_event 入队前对 dict / list / set 参数（含 preview 包装的）取浅拷贝快照，
+  后台线程格式化时不会读到调用方之后的修改；不可变值仍延迟到后台线程格式化
+
+配置 (config.yaml):
+    logging:
+      level: INFO               # 分类未单独配置时的级别
+      format: text              # text | json
+      queue_size: 10000
+      preview_chars: 300
+      categories:
+        actor: INFO
+        mcp: INFO
+        llm: INFO
+      sample:
+        preview: 10             # 预览每 10 条写 1 条；1 = 全部
+"""
+
+from __future__ import annotations
+
+import atexit
+import itertools
+import json
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+# 分类 logger 的名称前缀
+LOGGER_PREFIX = "hotpath"
+
+CATEGORIES = ("actor", "mcp", "llm")
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "level": "INFO",
+    "format": "text",
+    "queue_size": 10000,
+    "preview_chars": 300,
+    "categories": {},
+    "sample": {"preview": 10},
+}
+
+_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["_DroppingQueueHandler"] = None
+_sampler: Optional["_SamplingFilter"] = None
+_preview_chars = DEFAULT_CONFIG["preview_chars"]
+
+
+class _Preview:
+    """惰性预览：str() 时才截断 / 序列化"""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: Optional[int]):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        value = self.value
+        if isinstance(value, (dict, list, tuple)):
+            try:
+                text = json.dumps(value, ensure_ascii=False, default=str)
+            except Exception:
+                text = str(value)
+        else:
+            text = "" if value is None else str(value)
+        limit = self.limit if self.limit is not None else _preview_chars
+        if limit and len(text) > limit:
+            return f"{text[:limit]}...(+{len(text) - limit} chars)"
+        return text
+
+    __repr__ = __str__
+
+
+def preview(value: Any, limit: Optional[int] = None) -> _Preview:
+    """
+    生成惰性预览，用作日志参数 / 字段
+
+    Args:
+        value: 文本、dict 或 list（dict / list 写出时序列化为 JSON）
+        limit: 最大字符数，默认 logging.preview_chars
+    """
+    return _Preview(value, limit)
+
+
+def _snapshot(value: Any) -> Any:
+    """可变容器取浅拷贝（记录在后台线程格式化，调用方可能继续修改原对象）"""
+    if isinstance(value, _Preview):
+        inner = _snapshot(value.value)
+        return value if inner is value.value else _Preview(inner, value.limit)
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """非阻塞入队；队列满时丢弃并计数"""
+
+    def __init__(self, q: "queue.Queue"):
+        super().__init__(q)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 不在业务线程格式化 msg % args（默认实现会这么做）；只有异常栈必须在当前线程取出
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class _SamplingFilter(logging.Filter):
+    """带 sample 键的记录按 1/N 采样"""
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = {k: max(1, int(v)) for k, v in (rates or {}).items()}
+        self._counters: Dict[str, Any] = {}
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample", None)
+        if not key:
+            return True
+        rate = self.rates.get(key, 1)
+        if rate <= 1:
+            return True
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count())
+        # itertools.count 的 next() 在 GIL 下是原子的
+        if next(counter) % rate == 0:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class StructuredFormatter(logging.Formatter):
+    """输出 message 与结构化字段（text: key=value；json: 单行 JSON）"""
+
+    def __init__(self, fmt: str = "text"):
+        super().__init__(datefmt="%Y-%m-%d %H:%M:%S")
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        fields = getattr(record, "fields", None) or {}
+        category = record.name.rsplit(".", 1)[-1]
+        if self.json:
+            payload = {
+                "ts": self.formatTime(record, self.datefmt),
+                "level": record.levelname,
+                "category": category,
+                "thread": record.threadName,
+                "msg": message,
+            }
+            for key, value in fields.items():
+                payload[key] = value if isinstance(value, (int, float, bool, type(None))) else str(value)
+            if record.exc_text:
+                payload["exc"] = record.exc_text
+            return json.dumps(payload, ensure_ascii=False)
+        line = f"[{self.formatTime(record, self.datefmt)}] [{category}] [{record.levelname}] {message}"
+        if fields:
+            line += " | " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def _level(value: Any, default: int = logging.INFO) -> int:
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        resolved = logging.getLevelName(value.strip().upper())
+        if isinstance(resolved, int):
+            return resolved
+    return default
+
+
+def init_log_pipeline(cfg: Optional[Dict[str, Any]] = None, stream=None) -> None:
+    """
+    初始化（或按新配置重建）日志管道
+
+    Args:
+        cfg: config.yaml 的 logging 节
+        stream: 输出流（默认 sys.stderr）
+    """
+    global _listener, _queue_handler, _sampler, _preview_chars
+    cfg = {**DEFAULT_CONFIG, **(cfg or {})}
+    with _lock:
+        _shutdown_locked()
+
+        q: "queue.Queue" = queue.Queue(maxsize=max(0, int(cfg.get("queue_size") or 0)))
+        writer = logging.StreamHandler(stream or sys.stderr)
+        writer.setFormatter(StructuredFormatter(str(cfg.get("format") or "text").lower()))
+
+        _sampler = _SamplingFilter(cfg.get("sample") or {})
+        _queue_handler = _DroppingQueueHandler(q)
+        _queue_handler.addFilter(_sampler)
+        _preview_chars = int(cfg.get("preview_chars") or 0)
+
+        default_level = _level(cfg.get("level"))
+        levels = cfg.get("categories") or {}
+        for category in CATEGORIES:
+            logger = logging.getLogger(f"{LOGGER_PREFIX}.{category}")
+            logger.handlers = [_queue_handler]
+            logger.setLevel(_level(levels.get(category), default_level))
+            logger.propagate = False
+
+        _listener = QueueListener(q, writer, respect_handler_level=False)
+        _listener.start()
+
+
+def _shutdown_locked() -> None:
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()  # 写出队列中剩余记录
+        except Exception:
+            pass
+        _listener = None
+
+
+def shutdown_log_pipeline() -> None:
+    """停止后台写出线程（写完已入队的记录）"""
+    with _lock:
+        _shutdown_locked()
+
+
+atexit.register(shutdown_log_pipeline)
+
+
+def get_category_logger(category: str) -> logging.Logger:
+    """
+    获取分类 logger（actor / mcp / llm）；管道未初始化时按默认配置初始化
+    """
+    if _listener is None:
+        with _lock:
+            needs_init = _listener is None
+        if needs_init:
+            init_log_pipeline()
+    return logging.getLogger(f"{LOGGER_PREFIX}.{category}")
+
+
+def log_event(
+    logger: logging.Logger,
+    level: int,
+    msg: str,
+    *args: Any,
+    sample: Optional[str] = None,
+    **fields: Any,
+) -> None:
+    """
+    写一条结构化日志；级别未启用时直接返回（不构造任何字段）
+
+    Args:
+        msg / args: 与 logging 相同的 % 格式，在后台线程格式化
+        sample: 采样键（如 'preview'），按 logging.sample 配置 1/N 保留
+        fields: 结构化字段；大文本请用 preview() 包装
+
+    dict / list / set 类型的参数与字段在入队前取浅拷贝快照
+    """
+    if not logger.isEnabledFor(level):
+        return
+    args = tuple(_snapshot(a) for a in args)
+    fields = {k: _snapshot(v) for k, v in fields.items()}
+    logger.log(level, msg, *args, extra={"fields": fields, "sample": sample})
+
+
+def pipeline_stats() -> Dict[str, int]:
+    """入队 / 丢弃 / 采样丢弃计数"""
+    handler, sampler = _queue_handler, _sampler
+    return {
+        "enqueued": handler.enqueued if handler else 0,
+        "dropped": handler.dropped if handler else 0,
+        "sampled_out": sampler.sampled_out if sampler else 0,
+        "queued": handler.queue.qsize() if handler else 0,
+    }
@@ -508,14 +508,25 @@ const MediaCreatorPage: React.FC<MediaCreatorPageProps> = ({ embedded = false, m
     if (item.output_id || item.source !== 'generated') return;
     const mediaType = item.mimeType?.startsWith('video/') ? 'video' : 'image';
     try {
-      const b64 = await getBase64FromItem(item);
-      if (!b64) return;
-      const res = await mediaApi.saveOutput({
-        data: b64,
-        media_type: mediaType,
-        mime_type: item.mimeType,
-        source: 'generated',
-      });
+      let res: Awaited<ReturnType<typeof mediaApi.saveOutput>>;
+      if (!item.rawB64 && item.url.startsWith('blob:')) {
+        // 本地 Blob（如代理下载的视频）：直接上传二进制，避免在浏览器和后端各转一次 base64
+        const blob = await fetch(item.url).then((r) => r.blob());
+        res = await mediaApi.saveOutputFile(blob, {
+          media_type: mediaType,
+          mime_type: item.mimeType || blob.type || undefined,
+          source: 'generated',
+        });
+      } else {
+        const b64 = await getBase64FromItem(item);
+        if (!b64) return;
+        res = await mediaApi.saveOutput({
+          data: b64,
+          media_type: mediaType,
+          mime_type: item.mimeType,
+          source: 'generated',
+        });
+      }
       if (res.error) {
         console.warn('[chatu] 保存产出失败:', res.error);
         return;
@@ -764,105 +775,65 @@ const MediaCreatorPage: React.FC<MediaCreatorPageProps> = ({ embedded = false, m
   };
 
   /* ─── 视频（支持 Gemini/Veo 和 Runway） ─── */
+  // 任务由服务端提交并轮询供应商，完成后自动保存到产出库；前端只查询服务端任务记录
   const handleVideoSubmit = async () => {
     if (!videoPrompt.trim() && refImages.length === 0) return;
     setVideoLoading(true); setVideoError(null); setVideoTaskId(null); setVideoOutput(null); setVideoStatus('');
     try {
+      let body: Record<string, unknown>;
       if (activeProviderId === 'gemini') {
         // Gemini Veo 视频生成
-        const body: any = { prompt: videoPrompt };
+        body = { provider: 'gemini', prompt: videoPrompt };
         if (refImages.length > 0) body.image_b64 = getB64(refImages[0]);
         if (activeConfig) {
           body.config_id = activeConfig.config_id;
           body.model = activeConfig.model;
         }
-        const result = await mediaApi.geminiVideoSubmit(body);
-        if (result.error) throw new Error(result.error);
-        if (result.task_name) {
-          setVideoTaskId(result.task_name);
-          setVideoStatus('PROCESSING');
-          pollGeminiVideo(result.task_name, activeConfig?.config_id);
-        }
       } else if (activeProviderId === 'runway') {
         // Runway 视频生成
-        const body: any = {};
+        body = { provider: 'runway' };
         if (videoPrompt.trim()) body.prompt_text = videoPrompt;
         if (refImages.length > 0) body.prompt_image = refImages[0].url;
         if (activeConfig) body.model = activeConfig.model;
-        const result = await mediaApi.runwayVideoSubmit(body);
-        if (result.error) throw new Error(result.error);
-        if (result.task_id) { setVideoTaskId(result.task_id); setVideoStatus('PENDING'); pollRunwayVideo(result.task_id); }
       } else {
         throw new Error(`不支持的视频供应商: ${activeProviderId}`);
       }
+      const job = await mediaApi.submitMediaJob(body as { provider: string });
+      if (job.error) throw new Error(job.error);
+      setVideoTaskId(job.task_id);
+      setVideoStatus('PROCESSING');
+      pollMediaJob(job.job_id);
     } catch (e: any) { setVideoError(e?.message || String(e)); }
     finally { setVideoLoading(false); }
   };
 
-  /** 轮询 Runway 视频状态 */
-  const pollRunwayVideo = (taskId: string) => {
+  /** 查询服务端任务记录（不访问供应商，开销很小） */
+  const pollMediaJob = (jobId: string) => {
     let n = 0;
     const go = async () => {
-      if (n++ >= 60) { setVideoError('轮询超时'); return; }
+      if (n++ >= 600) { setVideoError('等待超时'); return; }
       try {
-        const r = await mediaApi.runwayVideoStatus(taskId);
-        const st = (r.status || '').toUpperCase();
-        setVideoStatus(st);
-        if (st === 'SUCCEEDED' || st === 'COMPLETED') {
-          setVideoOutput(r.output || null);
-          if (r.output) {
-            const vItem: MediaItem = { url: r.output, mimeType: 'video/mp4', source: 'generated' };
-            addToCreated(vItem);
-            persistCreatedItem(vItem);
-          }
+        const job = await mediaApi.getMediaJob(jobId);
+        setVideoStatus(job.status === 'downloading' ? 'DOWNLOADING' : (job.provider_status || job.status).toUpperCase());
+        if (job.status === 'succeeded' && job.output_id) {
+          const fileUrl = mediaApi.getOutputFileUrl(job.output_id);
+          setVideoOutput(fileUrl);
+          addToCreated({
+            url: fileUrl,
+            mimeType: 'video/mp4',
+            source: 'generated',
+            output_id: job.output_id,
+            created_at: new Date().toISOString(),
+          });
           return;
         }
-        if (st === 'FAILED' || st === 'CANCELLED' || st === 'ERROR') { setVideoError(r.error || `状态: ${st}`); return; }
-        setTimeout(go, 5000);
-      } catch (e: any) { setVideoError(e?.message || '轮询失败'); }
+        if (job.status === 'failed') { setVideoError(job.error || '视频生成失败'); return; }
+        setTimeout(go, 3000);
+      } catch (e: any) { setVideoError(e?.message || '查询任务失败'); }
     };
     setTimeout(go, 3000);
   };
 
-  /** 轮询 Gemini Veo 视频状态 */
-  const pollGeminiVideo = (taskName: string, configId?: string) => {
-    let n = 0;
-    const go = async () => {
-      if (n++ >= 120) { setVideoError('轮询超时（10 分钟）'); return; }
-      try {
-        const r = await mediaApi.geminiVideoStatus(taskName, configId);
-        const st = (r.status || '').toUpperCase();
-        setVideoStatus(st);
-        if (st === 'SUCCEEDED' || st === 'COMPLETED') {
-          if (r.output) {
-            // 视频 URI 需要 API Key 才能访问，通过后端代理下载
-            try {
-              setVideoStatus('DOWNLOADING');
-              const blobUrl = await mediaApi.geminiVideoDownload(r.output, configId);
-              setVideoOutput(blobUrl);
-              const vItem: MediaItem = { url: blobUrl, mimeType: 'video/mp4', source: 'generated' };
-              addToCreated(vItem);
-              persistCreatedItem(vItem);
-            } catch (dlErr: any) {
-              setVideoError(`视频生成成功，但下载失败: ${dlErr?.message || '未知错误'}`);
-            }
-          } else {
-            setVideoOutput(null);
-            setVideoError('视频生成完成，但未返回视频地址');
-          }
-          return;
-        }
-        if (st === 'FAILED' || st === 'CANCELLED' || st === 'ERROR') {
-          setVideoError(r.error || `状态: ${st}`);
-          return;
-        }
-        // PROCESSING — 继续轮询
-        setTimeout(go, 5000);
-      } catch (e: any) { setVideoError(e?.message || '轮询失败'); }
-    };
-    setTimeout(go, 5000);
-  };
-
   /* ─── 下载：保存到本地，不新开标签 ─── */
   const dl = (url: string, name?: string) => {
     const filename = name || 'media';
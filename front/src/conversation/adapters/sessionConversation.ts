@@ -1,6 +1,13 @@
 import type { ConversationAdapter, ListMessagesParams, ListMessagesResult, UnifiedMedia, UnifiedMessage } from '../types';
 import { deleteMessage, getSessionMessages, getSessionMessagesCursor, saveMessage, type Message } from '../../services/sessionApi';
 import { normalizeBase64ForInlineData } from '../../utils/dataUrl';
+import { getBackendUrl } from '../../utils/backendUrl';
+
+/** 后端返回的 Blob 引用是相对路径（/api/blobs/<sha256>），需拼接后端地址 */
+function resolveMediaUrl(url: string | undefined): string | undefined {
+  if (url && url.startsWith('/api/')) return `${getBackendUrl()}${url}`;
+  return url;
+}
 
 function mapSessionMedia(msg: Message): UnifiedMedia[] | undefined {
   const media: UnifiedMedia[] = [];
@@ -12,7 +19,7 @@ function mapSessionMedia(msg: Message): UnifiedMedia[] | undefined {
       media.push({
         type: m.type,
         mimeType: m.mimeType,
-        url: m.url || m.data, // 优先使用 url，如果没有则使用 data
+        url: resolveMediaUrl(m.url) || m.data, // 优先使用 url，如果没有则使用 data
       });
     }
   }
@@ -22,7 +29,7 @@ function mapSessionMedia(msg: Message): UnifiedMedia[] | undefined {
     for (const m of ext.media) {
       if (!m?.data && !m?.url) continue;
       // 如果 data 是 base64，需要转换为 data URL；如果是 URL，直接使用
-      let mediaUrl = m.url;
+      let mediaUrl = resolveMediaUrl(m.url);
       if (!mediaUrl && m.data) {
         // 检查是否是 base64 数据
         if (m.data.startsWith('data:')) {
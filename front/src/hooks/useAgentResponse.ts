@@ -6,6 +6,7 @@
  */
 
 import { useMemo } from 'react';
+import { getBackendUrl } from '../utils/backendUrl';
 import type { 
   AgentLog, 
   AgentMind, 
@@ -238,11 +239,12 @@ function extractMediaFromMCPResult(result: any): MediaItem[] {
   for (const item of content) {
     if (!item || typeof item !== 'object') continue;
     
-    if (item.type === 'image' && item.data) {
+    if (item.type === 'image' && (item.data || item.url)) {
       media.push({
         type: 'image',
         mimeType: item.mimeType || item.mime_type || 'image/png',
-        data: item.data,
+        // Blob 引用为相对路径 /api/blobs/<sha256>
+        data: item.data || (item.url.startsWith('/') ? `${getBackendUrl()}${item.url}` : item.url),
       });
     } else if ((item.type === 'video' || item.type === 'audio') && (item.data || item.url)) {
       media.push({
@@ -52,6 +52,19 @@ export interface ModelRegistryEntry {
 }
 
 /** 媒体创作产出（持久化） */
+/** 服务端编排的媒体生成任务 */
+export interface MediaJob {
+  job_id: string;
+  provider: string;
+  task_id: string;
+  media_type: 'image' | 'video';
+  status: 'running' | 'downloading' | 'succeeded' | 'failed';
+  provider_status?: string | null;
+  output_id?: string | null;
+  error?: string | null;
+  attempts: number;
+}
+
 export interface MediaOutputItem {
   output_id: string;
   media_type: 'image' | 'video';
@@ -215,6 +228,42 @@ export const mediaApi = {
       body: JSON.stringify(body),
     }),
 
+  /** 保存产出（二进制文件，multipart 上传，后端流式写盘；适合视频等大文件） */
+  saveOutputFile: async (
+    file: Blob,
+    fields: {
+      media_type: 'image' | 'video';
+      mime_type?: string;
+      prompt?: string;
+      model?: string;
+      provider?: string;
+      source?: string;
+      metadata?: Record<string, unknown>;
+    },
+  ): Promise<MediaOutputItem & { error?: string }> => {
+    const fd = new FormData();
+    fd.append('file', file);
+    for (const [k, v] of Object.entries(fields)) {
+      if (v == null) continue;
+      fd.append(k, typeof v === 'string' ? v : JSON.stringify(v));
+    }
+    const res = await fetch(`${BASE()}/outputs`, { method: 'POST', body: fd });
+    const data = await res.json().catch(() => ({}));
+    if (!res.ok) throw new Error((data as any).error || `HTTP ${res.status}`);
+    return data as MediaOutputItem & { error?: string };
+  },
+
+  // ─── 媒体生成任务（服务端轮询，完成后自动保存到产出库） ───
+
+  submitMediaJob: (body: { provider: string; topic_id?: string; [key: string]: unknown }) =>
+    req<MediaJob & { error?: string }>('/jobs', {
+      method: 'POST',
+      body: JSON.stringify(body),
+    }),
+
+  /** 查询任务（只读服务端记录，不触发供应商请求） */
+  getMediaJob: (jobId: string) => req<MediaJob>(`/jobs/${encodeURIComponent(jobId)}`),
+
   /** 产出列表 */
   listOutputs: (limit?: number, offset?: number) => {
     const params = new URLSearchParams();
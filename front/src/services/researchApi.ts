@@ -37,16 +37,46 @@ export async function listSources(session_id: string): Promise<ResearchSource[]>
   return data.sources || [];
 }
 
+export interface ResearchUploadResult {
+  sources: ResearchSource[];
+  indexed_documents: number;
+  // 文本入库在后台进行，进度通过 research_ingest_progress 事件推送
+  queued_documents?: number;
+  job_id?: string | null;
+  dir_source_id?: string | null;
+}
+
+export interface ResearchIngestStatus {
+  job_id: string;
+  session_id: string;
+  total: number;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  processed: number;
+  indexed: number;
+  skipped: number;
+  failed: number;
+  error?: string | null;
+}
+
+export async function getIngestStatus(job_id: string): Promise<ResearchIngestStatus> {
+  const resp = await fetch(`${API_BASE}/ingest/${encodeURIComponent(job_id)}`);
+  if (!resp.ok) throw new Error(`Failed to get ingest status: ${resp.statusText}`);
+  return await resp.json();
+}
+
 export async function uploadSources(params: {
   session_id: string;
   files: File[];
   upload_kind?: 'files' | 'dir';
   dir_alias?: string;
-}): Promise<{ sources: ResearchSource[]; indexed_documents: number }> {
+  // 分批上传同一目录时，后续批次传入首批返回的 dir_source_id
+  dir_source_id?: string;
+}): Promise<ResearchUploadResult> {
   const fd = new FormData();
   fd.append('session_id', params.session_id);
   if (params.upload_kind) fd.append('upload_kind', params.upload_kind);
   if (params.dir_alias) fd.append('dir_alias', params.dir_alias);
+  if (params.dir_source_id) fd.append('dir_source_id', params.dir_source_id);
   for (const f of params.files) {
     // If it's directory selection, preserve relative path
     const anyF: any = f as any;